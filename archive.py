@@ -0,0 +1,73 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveJob:
+    """
+    Фоновый перенос закрытых заявок в архивные таблицы
+
+    Раз в interval секунд вызывает archive_batch(older_than_days, batch_size) в
+    отдельном потоке. Между пакетами делается пауза pause секунд, а за один проход
+    переносится не больше max_batches пакетов: архивация не должна отнимать
+    соединения и блокировки у рабочих запросов. Оставшийся хвост переносится
+    следующими проходами.
+
+    После переноса вызывается maintenance() (если задан) - обслуживание секций:
+    заранее созданные секции будущих месяцев и отключение опустевших старых.
+    """
+
+    def __init__(self, archive_batch, older_than_days=90, interval=3600.0,
+                 batch_size=200, pause=1.0, max_batches=50, maintenance=None):
+        self.archive_batch = archive_batch
+        self.maintenance = maintenance
+        self.older_than_days = older_than_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self.max_batches = max_batches
+        self._task = None
+
+    async def run_once(self):
+        """Один проход; возвращает число перенесенных заявок"""
+        archived = 0
+        for batch in range(self.max_batches):
+            if batch:
+                await asyncio.sleep(self.pause)
+            moved = await asyncio.to_thread(self.archive_batch, self.older_than_days, self.batch_size)
+            archived += moved
+            if moved < self.batch_size:
+                break
+        if archived:
+            logger.info(f"Перенесено в архив заявок: {archived}")
+        if self.maintenance is not None:
+            try:
+                result = await asyncio.to_thread(self.maintenance)
+                logger.info(f"Обслуживание секций: {result}")
+            except Exception as e:
+                logger.error(f"Ошибка обслуживания секций: {e}", exc_info=True)
+        return archived
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Ошибка архивации заявок: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Запуск периодического прохода (вызывать внутри работающего loop)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Остановка"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
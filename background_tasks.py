@@ -0,0 +1,107 @@
+import asyncio
+import functools
+import logging
+import time
+
+from callback_dedup import callback_key
+from loop_monitor import register_context_frame
+from query_tracker import current_query_log
+from metrics import BACKGROUND_TASK_LATENCY, BACKGROUND_TASK_ERRORS, BACKGROUND_TASKS_ACTIVE
+
+logger = logging.getLogger(__name__)
+
+ACK_TEXT = "⏳ Сўров бажарилмоқда..."
+
+
+class BackgroundRunner:
+    """Фоновые задачи обработчиков с ограничением параллельности"""
+
+    def __init__(self, max_concurrency=8):
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._tasks = set()
+
+    def spawn(self, coro, name, context=None, on_error=None):
+        """
+        Запуск корутины в фоне; задача отслеживается до завершения
+
+        on_error вызывается без аргументов, если корутина завершилась исключением.
+        """
+        if self._semaphore is None:
+            # Семафор создается внутри работающего loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        task = asyncio.create_task(self._run(coro, name, context or {}, on_error), name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, coro, name, context, on_error=None):
+        # Локальная переменная читается монитором event loop для атрибуции блокировок
+        handler_context = dict(context, handler=name)
+        # Middleware учета запросов уже подвело итог апдейта; фоновые запросы в него не пишутся
+        current_query_log.set(None)
+        async with self._semaphore:
+            BACKGROUND_TASKS_ACTIVE.inc()
+            start = time.perf_counter()
+            try:
+                return await coro
+            except Exception as e:
+                BACKGROUND_TASK_ERRORS.labels(name).inc()
+                logger.error(f"Ошибка фоновой задачи {name}: {e}", exc_info=True)
+                if on_error is not None:
+                    on_error()
+            finally:
+                BACKGROUND_TASK_LATENCY.labels(name).observe(time.perf_counter() - start)
+                BACKGROUND_TASKS_ACTIVE.dec()
+
+    @property
+    def pending(self):
+        return len(self._tasks)
+
+    async def shutdown(self, timeout=30):
+        """Ожидание незавершенных задач при остановке бота"""
+        if not self._tasks:
+            return
+        logger.info(f"Ожидание фоновых задач: {len(self._tasks)}")
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+
+register_context_frame(BackgroundRunner._run)
+
+
+def deferred_callback(runner, ack_text=ACK_TEXT, deduplicator=None):
+    """
+    Декоратор callback-обработчика: сразу отвечает на нажатие и выполняет
+    обработчик в фоне
+
+    Внутри обработчика callback_query.answer() уже недоступен: результат
+    показывается правкой сообщения (edit_text / edit_reply_markup), ошибки -
+    новым сообщением, после которого исключение пробрасывается дальше. Если
+    фоновая часть упала, отметка нажатия снимается с deduplicator, чтобы
+    пользователь мог сразу повторить.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(callback_query, *args, **kwargs):
+            try:
+                await callback_query.answer(ack_text)
+            except Exception as e:
+                logger.error(f"Не удалось ответить на callback {callback_query.data}: {e}")
+
+            context = {
+                'update_type': 'CallbackQuery',
+                'user_id': callback_query.from_user.id,
+                'callback_data': callback_query.data,
+            }
+            on_error = None
+            if deduplicator is not None:
+                key = callback_key(callback_query)
+                on_error = lambda: deduplicator.release(key)
+            runner.spawn(handler(callback_query, *args, **kwargs), handler.__name__, context, on_error)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,9 @@
+"""
+Бенчмарки SFX Savdo Bot
+
+Запуск (нужен локальный PostgreSQL, база берется из BENCH_DB_NAME):
+    python -m benchmarks.data_generator --users 5000 --requests 100000
+    python -m benchmarks.db_benchmark --repeat 5
+    python -m benchmarks.excel_benchmark --sizes 10,1000,50000
+    python -m benchmarks.report bench_reports/before.json bench_reports/after.json
+"""
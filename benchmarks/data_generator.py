@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Генератор реалистичных данных для бенчмарков базы данных.
+
+Заполняет отдельную базу (BENCH_DB_NAME) через COPY, поэтому миллион строк
+загружается за десятки секунд, а не часы построчных INSERT.
+
+    python -m benchmarks.data_generator --users 5000 --requests 100000 \
+        --request-items 1000000 --offers 300000
+"""
+
+import argparse
+import io
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from config import DB_CONFIG, BENCH_DB_NAME
+from inline_search import normalize_search_text
+from object_routing import DEFAULT_OBJECT_NAMES
+
+# Объекты строительства (как в справочнике objects по умолчанию)
+OBJECTS = DEFAULT_OBJECT_NAMES
+
+# Типичные товары: (название, единица, описание)
+PRODUCTS = [
+    ("Цемент", "мешок", "Марка М400"),
+    ("Цемент", "мешок", "Марка М500"),
+    ("Арматура 12мм", "тонна", "А500С"),
+    ("Арматура 16мм", "тонна", "А500С"),
+    ("Қора қум", "Рес", "24 м3"),
+    ("Шағал", "м3", "Фракция 5-20"),
+    ("Ғишт", "шт", "Пишган ғишт"),
+    ("Газоблок", "м3", "D500 600x300x200"),
+    ("Профнастил", "лист", "С21 0.5мм"),
+    ("Гипсокартон", "лист", "Knauf 12.5мм"),
+    ("Кабель ВВГнг 3x2.5", "м", "ГОСТ"),
+    ("Труба ПП 25", "м", "PN20"),
+    ("Бетон", "м3", "B25 М350"),
+    ("Шпаклевка", "кг", "Финишная"),
+    ("Краска", "кг", "Водоэмульсионная, белая"),
+]
+
+ROLES_WEIGHTS = [('buyer', 10), ('seller', 60), ('warehouse', 25), ('admin', 5)]
+
+# Размер пачки строк для одного COPY
+CHUNK_SIZE = 100000
+
+
+def get_bench_config():
+    """Настройки подключения к базе бенчмарков"""
+    config = dict(DB_CONFIG)
+    config['database'] = BENCH_DB_NAME
+    return config
+
+
+def ensure_bench_database():
+    """Создание базы бенчмарков, если она не существует"""
+    if BENCH_DB_NAME == DB_CONFIG['database']:
+        raise RuntimeError("BENCH_DB_NAME совпадает с рабочей базой, генерация запрещена")
+
+    config = dict(DB_CONFIG)
+    config['database'] = 'postgres'
+    conn = psycopg2.connect(**config)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (BENCH_DB_NAME,))
+    if not cursor.fetchone():
+        cursor.execute(f"CREATE DATABASE {BENCH_DB_NAME}")
+        print(f"✅ База данных '{BENCH_DB_NAME}' создана")
+    cursor.close()
+    conn.close()
+
+
+def _fmt(value):
+    """Значение для текстового формата COPY"""
+    if value is None:
+        return r'\N'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', ' ').replace('\n', ' ')
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Загрузка строк в таблицу пачками через COPY"""
+    buffer = io.StringIO()
+    count = 0
+    total = 0
+
+    def flush():
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        buffer.write('\t'.join(_fmt(v) for v in row))
+        buffer.write('\n')
+        count += 1
+        if count == CHUNK_SIZE:
+            flush()
+            total += count
+            count = 0
+
+    if count:
+        flush()
+        total += count
+
+    return total
+
+
+class DataGenerator:
+    """Детерминированный генератор данных для всех таблиц бота"""
+
+    def __init__(self, users, requests, request_items, offers, offer_items, deliveries, seed=42, days=730):
+        self.users = users
+        self.requests = requests
+        self.request_items = request_items
+        self.offers = offers
+        self.offer_items = offer_items
+        self.deliveries = deliveries
+        self.random = random.Random(seed)
+        self.now = datetime.now().replace(microsecond=0)
+        self.days = days
+        # Нормализованный текст для поиска считается один раз на товар справочника
+        self._search_text = {
+            (name, description): normalize_search_text(name, description)
+            for name, unit, description in PRODUCTS
+        }
+
+        # Раскладываем пользователей по ролям заранее, чтобы ссылки были корректными
+        roles = [role for role, weight in ROLES_WEIGHTS for _ in range(weight)]
+        self.user_roles = [roles[self.random.randrange(len(roles))] for _ in range(users)]
+        self.buyer_ids = [i + 1 for i, role in enumerate(self.user_roles) if role == 'buyer'] or [1]
+        self.seller_ids = [i + 1 for i, role in enumerate(self.user_roles) if role == 'seller'] or [1]
+        self.warehouse_ids = [i + 1 for i, role in enumerate(self.user_roles) if role == 'warehouse'] or [1]
+
+    def _created_at(self, position, total):
+        """Время создания, монотонно растущее вместе с id"""
+        offset = self.days * 86400 * (total - position) / max(total, 1)
+        return self.now - timedelta(seconds=int(offset))
+
+    def user_rows(self):
+        for i, role in enumerate(self.user_roles):
+            user_id = i + 1
+            yield (
+                user_id,
+                100000000 + user_id,
+                f"user{user_id}",
+                f"Фойдаланувчи {user_id}",
+                f"99890{user_id:07d}",
+                role,
+                self.random.choice(OBJECTS) if role in ('buyer', 'warehouse') else None,
+                f"Координаты: {41.2 + self.random.random():.6f}, {69.2 + self.random.random():.6f}"
+                if role == 'warehouse' else None,
+                True,
+                self._created_at(user_id, self.users),
+            )
+
+    def request_rows(self):
+        for request_id in range(1, self.requests + 1):
+            yield (
+                request_id,
+                self.random.choice(self.buyer_ids),
+                None,
+                self.random.choice(OBJECTS),
+                'excel',
+                'active',
+                self._created_at(request_id, self.requests),
+            )
+
+    def request_item_rows(self):
+        for item_id in range(1, self.request_items + 1):
+            request_id = (item_id - 1) % self.requests + 1
+            name, unit, description = self.random.choice(PRODUCTS)
+            yield (
+                item_id,
+                request_id,
+                name,
+                self.random.randint(1, 500),
+                unit,
+                description,
+                self._search_text[name, description],
+                self._created_at(request_id, self.requests),
+            )
+
+    def offer_rows(self):
+        # Время предложений запоминается: строки предложения создаются вместе с ним
+        self.offer_created_at = []
+        for offer_id in range(1, self.offers + 1):
+            request_id = self.random.randint(1, self.requests)
+            self.offer_created_at.append(self._created_at(request_id, self.requests))
+            status = 'approved' if offer_id <= self.deliveries else self.random.choice(['pending', 'pending', 'rejected'])
+            yield (
+                offer_id,
+                request_id,
+                self.random.choice(self.seller_ids),
+                round(self.random.uniform(1e5, 5e8), 2),
+                'excel',
+                status,
+                f"offer_{offer_id}.xlsx",
+                self.offer_created_at[-1],
+            )
+
+    def offer_item_rows(self):
+        for item_id in range(1, self.offer_items + 1):
+            offer_id = (item_id - 1) % self.offers + 1
+            name, unit, description = self.random.choice(PRODUCTS)
+            quantity = self.random.randint(1, 500)
+            price = round(self.random.uniform(1e3, 1e6), 2)
+            yield (
+                item_id,
+                offer_id,
+                name,
+                quantity,
+                unit,
+                price,
+                round(quantity * price, 2),
+                description,
+                self.offer_created_at[offer_id - 1],
+            )
+
+    def delivery_rows(self):
+        for delivery_id in range(1, self.deliveries + 1):
+            status = self.random.choice(['pending', 'received'])
+            yield (
+                delivery_id,
+                delivery_id,
+                self.random.choice(self.warehouse_ids),
+                None,
+                status,
+                self.now if status == 'received' else None,
+                self.now,
+            )
+
+    def seed(self, conn):
+        """Очистка таблиц и загрузка всех данных"""
+        cursor = conn.cursor()
+        # Итоги заявок и предложений пересчитываются после загрузки (refresh_aggregates),
+        # а не триггерами на каждую пачку COPY
+        cursor.execute("SET app.skip_aggregates = 'on'")
+        cursor.execute("""
+            TRUNCATE deliveries, seller_offer_items, offer_items, seller_offers,
+                     request_items, purchase_requests, users, stock_movements, stock_balances
+            RESTART IDENTITY CASCADE
+        """)
+
+        plan = [
+            ('users', ['id', 'telegram_id', 'username', 'full_name', 'phone_number', 'role',
+                       'object_name', 'location', 'is_approved', 'created_at'], self.user_rows),
+            ('purchase_requests', ['id', 'buyer_id', 'supplier', 'object_name', 'request_type',
+                                   'status', 'created_at'], self.request_rows),
+            ('request_items', ['id', 'request_id', 'product_name', 'quantity', 'unit',
+                               'material_description', 'search_text', 'created_at'], self.request_item_rows),
+            ('seller_offers', ['id', 'purchase_request_id', 'seller_id', 'total_amount', 'offer_type',
+                               'status', 'excel_filename', 'created_at'], self.offer_rows),
+            ('seller_offer_items', ['id', 'offer_id', 'product_name', 'quantity', 'unit', 'price',
+                                    'total', 'description', 'created_at'], self.offer_item_rows),
+            ('deliveries', ['id', 'offer_id', 'warehouse_user_id', 'buyer_id', 'status',
+                            'received_at', 'created_at'], self.delivery_rows),
+        ]
+
+        for table, columns, rows in plan:
+            start = time.perf_counter()
+            total = copy_rows(cursor, table, columns, rows())
+            # Синхронизируем последовательность SERIAL с явно заданными id
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST((SELECT MAX(id) FROM {table}), 1))"
+            )
+            conn.commit()
+            print(f"✅ {table}: {total} строк за {time.perf_counter() - start:.1f} с")
+
+        cursor.execute("ANALYZE")
+        conn.commit()
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация данных для бенчмарков")
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=100000)
+    parser.add_argument('--request-items', type=int, default=1000000)
+    parser.add_argument('--offers', type=int, default=300000)
+    parser.add_argument('--offer-items', type=int, default=900000)
+    parser.add_argument('--deliveries', type=int, default=30000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.deliveries > args.offers:
+        print("❌ Доставок не может быть больше, чем предложений")
+        sys.exit(1)
+
+    print(f"🚀 Генерация данных в базе '{BENCH_DB_NAME}'")
+    print("=" * 50)
+
+    ensure_bench_database()
+
+    # Схема создается тем же кодом, что и в боте
+    from database import Database
+    db = Database()
+    db.config = get_bench_config()
+    db.create_tables()
+
+    generator = DataGenerator(
+        users=args.users,
+        requests=args.requests,
+        request_items=args.request_items,
+        offers=args.offers,
+        offer_items=args.offer_items,
+        deliveries=args.deliveries,
+        seed=args.seed,
+    )
+
+    # Месячные секции строк заявок и предложений на весь период данных
+    db.ensure_partitions(since=generator.now - timedelta(days=generator.days))
+
+    conn = db.get_connection()
+    try:
+        generator.seed(conn)
+    finally:
+        conn.close()
+    db.refresh_aggregates()
+    db.link_objects()
+    db.rebuild_stock()
+
+    print("🎉 Генерация завершена!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк слоя данных: все методы Database и inline SQL из bot.py.
+
+Перед запуском заполните базу: python -m benchmarks.data_generator
+    python -m benchmarks.db_benchmark --repeat 5 --output bench_reports/before.json
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+import psycopg2.extras
+
+from benchmarks.data_generator import get_bench_config
+from benchmarks.report import measure, write_report
+from config import EXPORT_ITERSIZE
+from database import Database
+from excel_handler import ExcelHandler
+from query_tracker import track_queries
+
+# Полные выборки без фильтра: на больших объемах выполняются минутами
+HEAVY_CASES = {'db.get_pending_requests', 'db.get_pending_deliveries',
+               'db.get_received_deliveries', 'bot.show_active_requests'}
+
+# Товары для замеров пакетной вставки заявки и предложения (формат парсеров ExcelHandler)
+BENCH_REQUEST_ITEMS = [
+    {'product_name': f"Товар {i}", 'quantity': 10, 'unit': 'шт', 'material_description': 'М400'}
+    for i in range(20)
+]
+BENCH_OFFER_ITEMS = [
+    {'product_name': f"Товар {i}", 'quantity': 10, 'unit': 'шт', 'price_per_unit': 1000,
+     'total_price': 10000, 'material_description': 'М400', 'request_item_id': None}
+    for i in range(20)
+]
+
+# --- Копии inline SQL из bot.py (держать в синхронизации с обработчиками) ---
+
+def bot_admin_pending_users(db):
+    """process_admin_callback: admin_pending_users"""
+    conn = db.get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""
+        SELECT * FROM users
+        WHERE is_approved = FALSE AND role != 'seller'
+        ORDER BY created_at DESC
+    """)
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return rows
+
+
+def bot_send_offer_request(db, request_id):
+    """process_send_offer: заявка с товарами"""
+    conn = db.get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""
+        SELECT pr.id, pr.buyer_id, pr.supplier as supplier_name, pr.object_name, pr.status, pr.created_at
+        FROM purchase_requests pr
+        WHERE pr.id = %s
+    """, (request_id,))
+    request = cursor.fetchone()
+    if request:
+        cursor.execute("""
+            SELECT * FROM request_items
+            WHERE request_id = %s AND created_at >= %s
+            ORDER BY created_at
+        """, (request_id, request['created_at']))
+        request['items'] = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return request
+
+
+def bot_reject_user(db, telegram_id):
+    """cmd_reject: удаление пользователя"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM users WHERE telegram_id = %s", (telegram_id,))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def bot_delivery_details(db, delivery_id):
+    """process_delivery_confirmation / process_goods_received: данные доставки"""
+    conn = db.get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""
+        SELECT d.*, so.total_amount, pr.supplier, pr.object_name,
+               u_seller.full_name as seller_name, u_buyer.full_name as buyer_name,
+               u_buyer.telegram_id as buyer_telegram_id
+        FROM deliveries d
+        JOIN seller_offers so ON d.offer_id = so.id
+        JOIN purchase_requests pr ON so.purchase_request_id = pr.id
+        JOIN users u_seller ON so.seller_id = u_seller.id
+        JOIN users u_buyer ON pr.buyer_id = u_buyer.id
+        WHERE d.id = %s
+    """, (delivery_id,))
+    delivery = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return delivery
+
+
+def bot_goods_received_lookup(db, delivery_id):
+    """process_goods_received: доставка и товары в одном соединении"""
+    conn = db.get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""
+        SELECT d.*, so.total_amount, so.created_at as offer_created_at, pr.supplier, pr.object_name,
+               u_seller.full_name as seller_name, u_buyer.full_name as buyer_name,
+               u_buyer.telegram_id as buyer_telegram_id
+        FROM deliveries d
+        JOIN seller_offers so ON d.offer_id = so.id
+        JOIN purchase_requests pr ON so.purchase_request_id = pr.id
+        JOIN users u_seller ON so.seller_id = u_seller.id
+        JOIN users u_buyer ON pr.buyer_id = u_buyer.id
+        WHERE d.id = %s
+    """, (delivery_id,))
+    delivery = cursor.fetchone()
+    cursor.execute("""
+        SELECT soi.product_name, soi.quantity, soi.unit, soi.price, soi.total, soi.description
+        FROM seller_offer_items soi
+        WHERE soi.offer_id = %s AND soi.awarded AND soi.created_at >= %s
+    """, (delivery['offer_id'], delivery['offer_created_at']))
+    items = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return delivery, items
+
+
+def bot_shipment_items(db, delivery_id):
+    """process_shipment_sent: товары доставки"""
+    conn = db.get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""
+        SELECT soi.product_name, soi.quantity, soi.unit, soi.price, soi.total, soi.description
+        FROM seller_offer_items soi
+        JOIN seller_offers so ON soi.offer_id = so.id AND soi.created_at >= so.created_at
+        JOIN deliveries d ON so.id = d.offer_id
+        WHERE d.id = %s
+    """, (delivery_id,))
+    items = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return items
+
+
+def bot_show_my_requests(db, buyer_id):
+    """show_my_requests: заявки заказчика с итогами из строки заявки"""
+    return db.get_requests_for_buyer(buyer_id)
+
+
+def bot_export(write, rows):
+    """send_streamed_export: потоковая запись выгрузки во временный файл"""
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        return write(rows, path)
+    finally:
+        os.remove(path)
+
+
+def bot_show_active_requests(db, handler):
+    """show_active_requests: последние заявки и потоковая выгрузка всех товаров"""
+    requests = db.get_active_requests_preview(5)
+    bot_export(handler.write_active_requests_stream, db.iter_active_request_items(EXPORT_ITERSIZE))
+    return requests
+
+
+def bot_show_my_orders(db, handler, buyer_id):
+    """show_my_orders: последние заказы и потоковая выгрузка всех одобренных товаров"""
+    offers = db.get_approved_offers_for_buyer(buyer_id, 10)
+    bot_export(handler.write_offers_stream, db.iter_approved_offer_items(buyer_id, EXPORT_ITERSIZE))
+    return offers
+
+
+def bot_show_my_offers(db, seller_id):
+    """show_my_offers: предложения поставщика"""
+    conn = db.get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""
+        SELECT so.*, pr.supplier, pr.object_name
+        FROM seller_offers so
+        JOIN purchase_requests pr ON so.purchase_request_id = pr.id
+        WHERE so.seller_id = %s
+        ORDER BY so.created_at DESC
+    """, (seller_id,))
+    offers = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return offers
+
+
+class BenchContext:
+    """Случайные, но воспроизводимые идентификаторы из заполненной базы"""
+
+    def __init__(self, db, seed=7):
+        self.db = db
+        self.random = random.Random(seed)
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, telegram_id FROM users WHERE role = 'buyer' ORDER BY id LIMIT 1000")
+        self.buyers = cursor.fetchall()
+        cursor.execute("SELECT id, telegram_id FROM users WHERE role = 'seller' ORDER BY id LIMIT 1000")
+        self.sellers = cursor.fetchall()
+        cursor.execute("SELECT object_name FROM users WHERE role = 'warehouse' AND object_name IS NOT NULL LIMIT 100")
+        self.objects = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT MAX(id) FROM purchase_requests")
+        self.max_request = cursor.fetchone()[0] or 1
+        cursor.execute("SELECT MAX(id) FROM seller_offers")
+        self.max_offer = cursor.fetchone()[0] or 1
+        cursor.execute("SELECT MAX(id) FROM deliveries")
+        self.max_delivery = cursor.fetchone()[0] or 1
+        cursor.close()
+        conn.close()
+        self._next_telegram_id = 900000000
+
+    def buyer(self):
+        return self.random.choice(self.buyers)
+
+    def seller(self):
+        return self.random.choice(self.sellers)
+
+    def object_name(self):
+        return self.random.choice(self.objects) if self.objects else "Сам Сити"
+
+    def request_id(self):
+        return self.random.randint(1, self.max_request)
+
+    def offer_id(self):
+        return self.random.randint(1, self.max_offer)
+
+    def delivery_id(self):
+        return self.random.randint(1, self.max_delivery)
+
+    def new_telegram_id(self):
+        self._next_telegram_id += 1
+        return self._next_telegram_id
+
+
+def build_cases(ctx, include_heavy=True):
+    """
+    Список кейсов бенчмарка
+
+    Схемные методы (create_tables, fix_decimal_fields, add_missing_columns,
+    create_search_index) не замеряются:
+    create_tables удаляет таблицу deliveries.
+    """
+    db = ctx.db
+    handler = ExcelHandler()
+
+    def new_user():
+        telegram_id = ctx.new_telegram_id()
+        db.add_user(telegram_id, 'bench', 'Бенчмарк', '998900000000', 'buyer', ctx.object_name())
+        return telegram_id
+
+    def new_offer():
+        # Доставка одна на предложение, поэтому каждому замеру нужно новое предложение
+        return db.add_seller_offer(ctx.request_id(), ctx.seller()[0], BENCH_OFFER_ITEMS[:1])
+
+    cases = {
+        # Методы Database: чтение
+        'db.get_user': (lambda: db.get_user(ctx.buyer()[1]), None),
+        'db.get_users_by_role[seller]': (lambda: db.get_users_by_role('seller'), None),
+        'db.get_users_by_role[warehouse]': (lambda: db.get_users_by_role('warehouse'), None),
+        'db.get_warehouse_users_by_object': (lambda: db.get_warehouse_users_by_object(ctx.object_name()), None),
+        'db.get_objects': (lambda: db.get_objects(), None),
+        'db.get_stock': (lambda: db.get_stock(1), None),
+        'db.get_stock[query]': (lambda: db.get_stock(1, ['%sement%']), None),
+        'db.get_request_with_buyer': (lambda: db.get_request_with_buyer(ctx.request_id()), None),
+        'db.get_offer_board_rows': (lambda: db.get_offer_board_rows(ctx.request_id()), None),
+        'db.get_request_items': (lambda: db.get_request_items(ctx.request_id()), None),
+        'db.get_offer_item_rows': (lambda: db.get_offer_item_rows(ctx.request_id()), None),
+        'db.get_offer_board': (lambda: db.get_offer_board(ctx.request_id()), None),
+        'db.get_requests_with_pending_offers': (lambda: db.get_requests_with_pending_offers(ctx.buyer()[0]), None),
+        'db.get_offers_for_request': (lambda: db.get_offers_for_request(ctx.request_id()), None),
+        'db.get_all_offers_for_buyer': (lambda: db.get_all_offers_for_buyer(ctx.buyer()[0]), None),
+        'db.get_approved_offers_for_buyer': (lambda: db.get_approved_offers_for_buyer(ctx.buyer()[0]), None),
+        'db.get_offer_with_items': (lambda: db.get_offer_with_items(ctx.offer_id()), None),
+        'db.search_active_request_items': (lambda: db.search_active_request_items(['sement'], 200), None),
+        # Методы Database: запись
+        'db.add_user': (lambda: db.add_user(ctx.new_telegram_id(), 'bench', 'Бенчмарк', '998900000000', 'buyer'), None),
+        'db.update_user_object': (lambda: db.update_user_object(ctx.buyer()[1], ctx.object_name()), None),
+        'db.update_user_location': (lambda: db.update_user_location(ctx.buyer()[1], 'Бенчмарк'), None),
+        'db.approve_user': (lambda: db.approve_user(ctx.buyer()[1]), None),
+        'db.add_purchase_request': (lambda: db.add_purchase_request(ctx.buyer()[0], ctx.object_name()), None),
+        'db.add_purchase_request[20 items]': (
+            lambda: db.add_purchase_request(ctx.buyer()[0], ctx.object_name(), items=BENCH_REQUEST_ITEMS), None),
+        'db.add_request_item': (lambda: db.add_request_item(ctx.request_id(), 'Цемент', 10, 'мешок', 'М400'), None),
+        'db.add_seller_offer': (lambda: db.add_seller_offer(ctx.request_id(), ctx.seller()[0]), None),
+        'db.add_seller_offer[20 items]': (
+            lambda: db.add_seller_offer(ctx.request_id(), ctx.seller()[0], BENCH_OFFER_ITEMS), None),
+        'db.add_offer_item': (lambda: db.add_offer_item(ctx.offer_id(), 'Цемент', 10, 'мешок', 1000, 10000, 'М400'), None),
+        'db.update_offer_status': (lambda: db.update_offer_status(ctx.offer_id(), 'pending'), None),
+        'db.add_delivery': (lambda offer_id: db.add_delivery(offer_id, None), new_offer),
+        'db.approve_offer': (lambda offer_id: db.approve_offer(offer_id), new_offer),
+        'db.approve_offer[repeat]': (lambda: db.approve_offer(ctx.offer_id()), None),
+        'db.update_delivery_status': (lambda: db.update_delivery_status(ctx.delivery_id(), 'received'), None),
+        # Inline SQL из bot.py
+        'bot.admin_pending_users': (lambda: bot_admin_pending_users(db), None),
+        'bot.send_offer_request': (lambda: bot_send_offer_request(db, ctx.request_id()), None),
+        'bot.reject_user': (lambda telegram_id: bot_reject_user(db, telegram_id), new_user),
+        'bot.delivery_details': (lambda: bot_delivery_details(db, ctx.delivery_id()), None),
+        'bot.goods_received_lookup': (lambda: bot_goods_received_lookup(db, ctx.delivery_id()), None),
+        'bot.shipment_items': (lambda: bot_shipment_items(db, ctx.delivery_id()), None),
+        'bot.show_my_requests': (lambda: bot_show_my_requests(db, ctx.buyer()[0]), None),
+        'bot.show_my_offers': (lambda: bot_show_my_offers(db, ctx.seller()[0]), None),
+        'bot.show_my_orders': (lambda: bot_show_my_orders(db, handler, ctx.buyer()[0]), None),
+    }
+
+    if include_heavy:
+        # Полные выборки активных заявок и доставок с N+1 запросами по товарам
+        cases.update({
+            'db.get_pending_requests': (db.get_pending_requests, None),
+            'db.get_pending_deliveries': (db.get_pending_deliveries, None),
+            'db.get_received_deliveries': (db.get_received_deliveries, None),
+            'bot.show_active_requests': (lambda: bot_show_active_requests(db, handler), None),
+        })
+
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк слоя данных")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--heavy-repeat', type=int, default=1,
+                        help="Количество замеров для полных выборок (get_pending_requests и т.п.)")
+    parser.add_argument('--skip-heavy', action='store_true')
+    parser.add_argument('--only', help="Замерять только кейсы, содержащие подстроку")
+    parser.add_argument('--output', help="Путь к JSON-отчету")
+    args = parser.parse_args()
+
+    db = Database()
+    db.config = get_bench_config()
+    ctx = BenchContext(db)
+
+    results = {}
+    for name, (func, setup) in build_cases(ctx, include_heavy=not args.skip_heavy).items():
+        if args.only and args.only not in name:
+            continue
+        repeat = args.heavy_repeat if name in HEAVY_CASES else args.repeat
+        warmup = 0 if name in HEAVY_CASES else args.warmup
+        try:
+            results[name] = measure(func, repeat=repeat, warmup=warmup, setup=setup)
+            # Отдельный прогон для подсчета запросов (N+1 виден по числу queries)
+            if name not in HEAVY_CASES:
+                arg = setup() if setup is not None else None
+                with track_queries(name) as log:
+                    func(arg) if setup is not None else func()
+                results[name]['queries'] = log.count
+            print(f"⏱️ {name:<45} median {results[name]['median_ms']:>10.2f} мс")
+        except Exception as e:
+            results[name] = {'error': str(e)}
+            print(f"❌ {name}: {e}")
+
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    volumes = {}
+    for table in ('users', 'purchase_requests', 'request_items', 'seller_offers',
+                  'seller_offer_items', 'deliveries'):
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        volumes[table] = cursor.fetchone()[0]
+    cursor.close()
+    conn.close()
+
+    params = {
+        'volumes': volumes,
+        'repeat': args.repeat,
+        'heavy_repeat': args.heavy_repeat,
+        'warmup': args.warmup,
+    }
+    path = write_report('db', params, results, args.output)
+    print(f"\n📄 Отчет сохранен: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк ExcelHandler: время выполнения и пиковая память (tracemalloc).
+
+    python -m benchmarks.excel_benchmark --sizes 10,1000,50000 --output bench_reports/excel_before.json
+"""
+
+import argparse
+import os
+
+from benchmarks.excel_corpus import (
+    DEFAULT_SIZES, VARIANTS, build_offers, build_requests, corpus_path, export_offer_rows,
+    export_request_rows, offer_item_rows, write_corpus
+)
+from benchmarks.report import measure, measure_memory, write_report
+from config import BENCH_CORPUS_DIR
+from excel_handler import ExcelHandler
+from price_matrix import build_price_matrix
+from split_award import optimize_split_award
+
+
+def _repeat_for(rows, repeat):
+    """Для больших файлов хватает одного-двух замеров"""
+    if rows >= 10000:
+        return 1
+    if rows >= 1000:
+        return min(repeat, 3)
+    return repeat
+
+
+def build_cases(sizes, directory):
+    """Кейсы бенчмарка: {имя: (функция, количество строк)}"""
+    handler = ExcelHandler()
+    cases = {}
+    export_path = os.path.join(directory, 'export_stream.xlsx')
+
+    for rows in sizes:
+        for variant in VARIANTS:
+            with open(corpus_path('request', rows, variant, directory), 'rb') as f:
+                request_content = f.read()
+            with open(corpus_path('offer', rows, variant, directory), 'rb') as f:
+                offer_content = f.read()
+
+            cases[f"validate_excel_structure[request,{rows},{variant}]"] = (
+                lambda c=request_content: handler.validate_excel_structure(c, 'request'), rows)
+            cases[f"validate_excel_structure[offer,{rows},{variant}]"] = (
+                lambda c=offer_content: handler.validate_excel_structure(c, 'offer'), rows)
+            cases[f"parse_purchase_request[{rows},{variant}]"] = (
+                lambda c=request_content: handler.parse_purchase_request(c), rows)
+            cases[f"parse_seller_offer[{rows},{variant}]"] = (
+                lambda c=offer_content: handler.parse_seller_offer(c), rows)
+
+        offers = build_offers(rows)
+        requests = build_requests(rows)
+        cases[f"create_offers_excel[{rows}]"] = (
+            lambda o=offers: handler.create_offers_excel(o, 'Заказчик'), rows)
+        cases[f"create_offers_summary[{rows}]"] = (
+            lambda o=offers: handler.create_offers_summary(o, 'Заказчик'), rows)
+        item_rows = offer_item_rows(offers)
+        matrix = build_price_matrix(offers[0].items, item_rows)
+        cases[f"build_price_matrix[{rows}]"] = (
+            lambda o=offers, r=item_rows: build_price_matrix(o[0].items, r), rows)
+        cases[f"create_price_comparison_excel[{rows}]"] = (
+            lambda m=matrix: handler.create_price_comparison_excel(m, 1), rows)
+        cases[f"optimize_split_award[{rows},max=3]"] = (
+            lambda m=matrix: optimize_split_award(m, max_suppliers=3), rows)
+        cases[f"create_active_requests_excel[{rows}]"] = (
+            lambda r=requests: handler.create_active_requests_excel(r, 'Поставщик'), rows)
+        # Потоковые выгрузки (строки подаются генератором, как из серверного курсора)
+        cases[f"write_active_requests_stream[{rows}]"] = (
+            lambda r=requests: handler.write_active_requests_stream(export_request_rows(r), export_path), rows)
+        cases[f"write_offers_stream[{rows}]"] = (
+            lambda o=offers: handler.write_offers_stream(export_offer_rows(o), export_path), rows)
+
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк обработки Excel")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--directory', default=BENCH_CORPUS_DIR)
+    parser.add_argument('--only', help="Замерять только кейсы, содержащие подстроку")
+    parser.add_argument('--output', help="Путь к JSON-отчету")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    created = write_corpus(sizes, args.directory)
+    if created:
+        print(f"✅ Создано файлов корпуса: {created}")
+
+    results = {}
+    for name, (func, rows) in build_cases(sizes, args.directory).items():
+        if args.only and args.only not in name:
+            continue
+        try:
+            stats = measure(func, repeat=_repeat_for(rows, args.repeat), warmup=0 if rows >= 10000 else 1)
+            stats.update(measure_memory(func))
+            results[name] = stats
+            print(f"⏱️ {name:<60} {stats['median_ms']:>10.1f} мс {stats['peak_kib']:>10.0f} КиБ")
+        except Exception as e:
+            # Грязные файлы могут ломать парсер - это тоже результат
+            results[name] = {'error': str(e)}
+            print(f"❌ {name}: {e}")
+
+    params = {
+        'sizes': sizes,
+        'variants': VARIANTS,
+        'repeat': args.repeat,
+        'corpus': os.path.abspath(args.directory),
+    }
+    path = write_report('excel', params, results, args.output)
+    print(f"\n📄 Отчет сохранен: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Корпус Excel-файлов заявок и предложений для бенчмарков ExcelHandler.
+
+Для каждого размера создаются «чистые» файлы в формате шаблонов бота и
+«грязные» варианты, которые реально присылают пользователи:
+    merged       - объединенные ячейки в колонке «Материал изох»
+    blank_rows   - пустые строки между товарами
+    text_numbers - числа, сохраненные как текст
+    extra_sheets - дополнительные листы после основного
+
+    python -m benchmarks.excel_corpus --sizes 10,100,1000,10000,50000
+"""
+
+import argparse
+import io
+import os
+import random
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook
+
+from benchmarks.data_generator import OBJECTS, PRODUCTS
+from config import BENCH_CORPUS_DIR
+from row_models import Offer, OfferItem
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 50000]
+VARIANTS = ['clean', 'merged', 'blank_rows', 'text_numbers', 'extra_sheets']
+
+REQUEST_HEADERS = ['Обект номи', 'Махсулот номи', 'Миқдори', 'Ўлчов бирлиги', 'Материал изох']
+OFFER_HEADERS = ['Махсулот номи', 'Миқдори', 'Ўлчов бирлиги', 'Материал изох', 'нархи', 'Суммаси']
+
+
+def _request_rows(rows, rnd):
+    """Строки заявки: объект указывается только в первой строке, как в шаблоне"""
+    object_name = rnd.choice(OBJECTS)
+    for i in range(rows):
+        name, unit, description = rnd.choice(PRODUCTS)
+        yield [object_name if i == 0 else None, name, rnd.randint(1, 500), unit, description]
+
+
+def _offer_rows(rows, rnd):
+    for _ in range(rows):
+        name, unit, description = rnd.choice(PRODUCTS)
+        quantity = rnd.randint(1, 500)
+        price = round(rnd.uniform(1e3, 1e6), 2)
+        yield [name, quantity, unit, description, price, round(quantity * price, 2)]
+
+
+def build_workbook(kind, rows, variant='clean', seed=42):
+    """
+    Создание Excel файла корпуса в памяти
+
+    Args:
+        kind (str): 'request' или 'offer'
+        rows (int): Количество товарных строк
+        variant (str): Один из VARIANTS
+        seed (int): Зерно генератора
+
+    Returns:
+        bytes: Содержимое .xlsx
+    """
+    rnd = random.Random(seed + rows)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Заявка' if kind == 'request' else 'Предложение'
+
+    headers = REQUEST_HEADERS if kind == 'request' else OFFER_HEADERS
+    ws.append(headers)
+    data = _request_rows(rows, rnd) if kind == 'request' else _offer_rows(rows, rnd)
+    numeric_columns = {2} if kind == 'request' else {1, 4, 5}
+    description_column = headers.index('Материал изох') + 1
+
+    for i, row in enumerate(data):
+        if variant == 'text_numbers':
+            row = [str(v) if idx in numeric_columns else v for idx, v in enumerate(row)]
+        ws.append(row)
+        if variant == 'blank_rows' and i % 7 == 6:
+            ws.append([None] * len(headers))
+
+    if variant == 'merged':
+        # Объединяем описание у пар соседних строк
+        for r in range(2, ws.max_row, 4):
+            ws.merge_cells(start_row=r, start_column=description_column,
+                           end_row=r + 1, end_column=description_column)
+
+    if variant == 'extra_sheets':
+        notes = wb.create_sheet('Изохлар')
+        for i in range(min(rows, 1000)):
+            notes.append([f"Изох {i}", rnd.random()])
+        summary = wb.create_sheet('Итого')
+        summary.append(['Жами', f"=SUM('{ws.title}'!F2:F{ws.max_row})"])
+
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def build_offers(rows, items_per_offer=20, seed=42):
+    """Предложения в формате get_offers_for_request (модели Offer) для create_offers_* методов"""
+    rnd = random.Random(seed + rows)
+    offers = []
+    now = datetime.now()
+    for offer_index in range(max(1, rows // items_per_offer)):
+        items = []
+        for _ in range(min(items_per_offer, rows)):
+            name, unit, description = rnd.choice(PRODUCTS)
+            quantity = rnd.randint(1, 500)
+            price = round(rnd.uniform(1e3, 1e6), 2)
+            items.append(OfferItem(
+                product_name=name,
+                quantity=quantity,
+                unit=unit,
+                price=price,
+                total=round(quantity * price, 2),
+                description=description,
+            ))
+        offers.append(Offer(
+            id=offer_index + 1,
+            full_name=f"Поставщик {offer_index + 1}",
+            phone_number=f"99890{offer_index:07d}",
+            total_amount=round(sum(item.total for item in items), 2),
+            created_at=now - timedelta(minutes=offer_index),
+            excel_filename=f"offer_{offer_index + 1}.xlsx",
+            items=items,
+        ))
+    return offers
+
+
+def offer_item_rows(offers):
+    """Плоские строки товаров предложений в формате get_offer_item_rows"""
+    return [
+        {'offer_id': offer.id, 'full_name': offer.full_name, 'status': 'pending',
+         'product_name': item.product_name, 'quantity': item.quantity, 'unit': item.unit,
+         'price': item.price, 'total': item.total, 'description': item.description}
+        for offer in offers
+        for item in offer.items
+    ]
+
+
+def export_offer_rows(offers):
+    """Строки выгрузки заказов в формате Database.iter_approved_offer_items (генератор)"""
+    for offer in offers:
+        for item in offer.items:
+            yield {'offer_id': offer.id, 'full_name': offer.full_name, 'phone_number': offer.phone_number,
+                   'total_amount': offer.total_amount, 'status': 'approved', 'created_at': offer.created_at,
+                   'product_name': item.product_name, 'quantity': item.quantity, 'unit': item.unit,
+                   'price': item.price, 'total': item.total, 'description': item.description}
+
+
+def build_requests(rows, items_per_request=10, seed=42):
+    """Заявки в формате show_active_requests для create_active_requests_excel"""
+    rnd = random.Random(seed + rows)
+    requests = []
+    now = datetime.now()
+    for request_index in range(max(1, rows // items_per_request)):
+        items = []
+        for _ in range(min(items_per_request, rows)):
+            name, unit, description = rnd.choice(PRODUCTS)
+            items.append({
+                'product_name': name,
+                'quantity': rnd.randint(1, 500),
+                'unit': unit,
+                'material_description': description,
+            })
+        requests.append({
+            'id': request_index + 1,
+            'buyer_name': f"Заказчик {request_index % 50 + 1}",
+            'supplier_name': 'Не указан',
+            'object_name': rnd.choice(OBJECTS),
+            'created_at': now - timedelta(minutes=request_index),
+            'items': items,
+        })
+    return requests
+
+
+def export_request_rows(requests):
+    """Строки выгрузки активных заявок в формате Database.iter_active_request_items (генератор)"""
+    for request in requests:
+        for item in request['items']:
+            yield {'request_id': request['id'], 'buyer_name': request['buyer_name'],
+                   'supplier_name': request['supplier_name'], 'object_name': request['object_name'],
+                   'created_at': request['created_at'], **item}
+
+
+def corpus_path(kind, rows, variant, directory=BENCH_CORPUS_DIR):
+    return os.path.join(directory, f"{kind}_{rows}_{variant}.xlsx")
+
+
+def write_corpus(sizes=DEFAULT_SIZES, directory=BENCH_CORPUS_DIR):
+    """Запись всего корпуса на диск (существующие файлы не пересоздаются)"""
+    os.makedirs(directory, exist_ok=True)
+    written = 0
+    for kind in ('request', 'offer'):
+        for rows in sizes:
+            for variant in VARIANTS:
+                path = corpus_path(kind, rows, variant, directory)
+                if os.path.exists(path):
+                    continue
+                with open(path, 'wb') as f:
+                    f.write(build_workbook(kind, rows, variant))
+                written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация корпуса Excel файлов")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)))
+    parser.add_argument('--directory', default=BENCH_CORPUS_DIR)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    written = write_corpus(sizes, args.directory)
+    print(f"✅ Корпус в '{args.directory}': создано {written} файлов")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк выбора ближайшего склада: полный перебор против k-d дерева geo_index.
+
+Склады случайно разбросаны по Узбекистану; замеряется серия запросов ближайшего
+склада для точек объектов. База не нужна.
+
+    python -m benchmarks.geo_benchmark --sizes 100,1000,10000 --output bench_reports/geo_after.json
+"""
+
+import argparse
+import random
+
+from benchmarks.report import measure, write_report
+from geo_index import KDTree, distance_km
+
+DEFAULT_SIZES = [100, 1000, 10000]
+QUERIES = 1000
+
+
+def build_points(count, seed=42):
+    """Склады: (широта, долгота, номер)"""
+    rnd = random.Random(seed + count)
+    return [(rnd.uniform(37.2, 45.6), rnd.uniform(56.0, 73.1), i) for i in range(count)]
+
+
+def build_queries(seed=7):
+    rnd = random.Random(seed)
+    return [(rnd.uniform(37.2, 45.6), rnd.uniform(56.0, 73.1)) for _ in range(QUERIES)]
+
+
+def nearest_linear(points, queries):
+    """Перебор всех складов на каждый запрос, как выбор по списку из базы"""
+    return [min(points, key=lambda point: distance_km(latitude, longitude, point[0], point[1]))[2]
+            for latitude, longitude in queries]
+
+
+def nearest_tree(tree, queries):
+    return [tree.nearest(latitude, longitude)[0][1] for latitude, longitude in queries]
+
+
+def build_cases(sizes):
+    """Кейсы бенчмарка: {имя: функция}"""
+    queries = build_queries()
+    cases = {}
+    for count in sizes:
+        points = build_points(count)
+        tree = KDTree(points)
+        cases[f"nearest[linear,{count}]"] = lambda p=points: nearest_linear(p, queries)
+        cases[f"nearest[kdtree,{count}]"] = lambda t=tree: nearest_tree(t, queries)
+        cases[f"build[kdtree,{count}]"] = lambda p=points: KDTree(p)
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк выбора ближайшего склада")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Путь к JSON-отчету")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    results = {}
+    for name, func in build_cases(sizes).items():
+        stats = measure(func, repeat=args.repeat)
+        results[name] = stats
+        print(f"⏱️ {name:<30} {stats['median_ms']:>10.2f} мс")
+
+    path = write_report('geo', {'sizes': sizes, 'repeat': args.repeat, 'queries': QUERIES}, results, args.output)
+    print(f"\n📄 Отчет сохранен: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Замеры времени и JSON-отчеты бенчмарков.
+
+Сравнение двух отчетов:
+    python -m benchmarks.report before.json after.json
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from config import BENCH_REPORTS_DIR
+
+
+def measure(func, repeat=5, warmup=1, setup=None):
+    """
+    Замер времени выполнения функции
+
+    Args:
+        func: Замеряемая функция. Если задан setup, получает его результат
+        repeat (int): Количество замеров
+        warmup (int): Количество прогревочных запусков (не учитываются)
+        setup: Функция подготовки, выполняется перед каждым запуском вне замера
+
+    Returns:
+        dict: Статистика в миллисекундах
+    """
+    def run_once():
+        if setup is not None:
+            arg = setup()
+            start = time.perf_counter()
+            func(arg)
+        else:
+            start = time.perf_counter()
+            func()
+        return (time.perf_counter() - start) * 1000
+
+    for _ in range(warmup):
+        run_once()
+
+    samples = [run_once() for _ in range(repeat)]
+    samples.sort()
+
+    return {
+        'repeat': repeat,
+        'min_ms': round(samples[0], 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+def measure_memory(func):
+    """
+    Пиковое потребление памяти Python при однократном вызове (tracemalloc)
+
+    Returns:
+        dict: Пик и остаток выделенной памяти в КиБ
+    """
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'peak_kib': round(peak / 1024, 1),
+        'retained_kib': round(current / 1024, 1),
+    }
+
+
+def _git_commit():
+    """Текущий коммит репозитория (если доступен)"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def write_report(suite, params, results, path=None):
+    """
+    Сохранение отчета бенчмарка в JSON
+
+    Args:
+        suite (str): Название набора бенчмарков (например, 'db')
+        params (dict): Параметры запуска (объемы данных, repeat и т.д.)
+        results (dict): Результаты по кейсам {имя: статистика}
+        path (str): Путь к файлу. По умолчанию BENCH_REPORTS_DIR/<suite>_<время>.json
+
+    Returns:
+        str: Путь к сохраненному отчету
+    """
+    if path is None:
+        os.makedirs(BENCH_REPORTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(BENCH_REPORTS_DIR, f"{suite}_{stamp}.json")
+
+    report = {
+        'suite': suite,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'params': params,
+        'results': results,
+    }
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    return path
+
+
+def compare_reports(before, after, metric='median_ms'):
+    """
+    Сравнение двух отчетов по выбранной метрике
+
+    Returns:
+        list: Строки (кейс, до, после, отношение после/до)
+    """
+    rows = []
+    for name in sorted(set(before['results']) | set(after['results'])):
+        old = before['results'].get(name, {}).get(metric)
+        new = after['results'].get(name, {}).get(metric)
+        ratio = round(new / old, 3) if old and new is not None else None
+        rows.append((name, old, new, ratio))
+    return rows
+
+
+def main():
+    """Вывод сравнения двух отчетов"""
+    if len(sys.argv) < 3:
+        print("Использование: python -m benchmarks.report before.json after.json [metric]")
+        sys.exit(1)
+
+    metric = sys.argv[3] if len(sys.argv) > 3 else 'median_ms'
+    with open(sys.argv[1], encoding='utf-8') as f:
+        before = json.load(f)
+    with open(sys.argv[2], encoding='utf-8') as f:
+        after = json.load(f)
+
+    print(f"📊 {before['suite']}: {before.get('commit')} → {after.get('commit')} ({metric})")
+    print("=" * 80)
+    for name, old, new, ratio in compare_reports(before, after, metric):
+        mark = ""
+        if ratio is not None:
+            mark = "🟢" if ratio < 0.95 else "🔴" if ratio > 1.05 else "⚪"
+        print(f"{mark} {name:<50} {old!s:>10} → {new!s:>10}  x{ratio}")
+
+
+if __name__ == "__main__":
+    main()
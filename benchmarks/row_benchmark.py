@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк строк БД: RealDictRow (RealDictCursor) против моделей row_models.
+
+Замеряются сборка строк из кортежей курсора (время и память на строку) и
+чтение полей при обходе, как в обработчиках и ExcelHandler. База не нужна:
+строки seller_offer_items генерируются в памяти.
+
+    python -m benchmarks.row_benchmark --sizes 1000,10000,100000 --output bench_reports/rows_after.json
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from psycopg2.extras import RealDictRow
+
+from benchmarks.data_generator import PRODUCTS
+from benchmarks.report import measure, measure_memory, write_report
+from row_models import OfferItem, row_factory
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Колонки SELECT * FROM seller_offer_items
+COLUMNS = ('id', 'offer_id', 'product_name', 'quantity', 'unit', 'price', 'total', 'description',
+           'created_at', 'awarded', 'request_item_id')
+
+
+def build_tuples(rows, seed=42):
+    """Кортежи строк в том виде, в каком их возвращает обычный курсор psycopg2"""
+    rnd = random.Random(seed + rows)
+    now = datetime.now()
+    result = []
+    for i in range(rows):
+        name, unit, description = rnd.choice(PRODUCTS)
+        quantity = Decimal(rnd.randint(1, 500))
+        price = Decimal(rnd.randint(1000, 1000000))
+        result.append((i + 1, i // 20 + 1, name, quantity, unit, price, quantity * price, description,
+                       now - timedelta(minutes=i), True, i + 1))
+    return result
+
+
+def load_dicts(tuples):
+    """Строки RealDictCursor"""
+    return [RealDictRow(zip(COLUMNS, row)) for row in tuples]
+
+
+def load_models(tuples):
+    """Строки row_models (как Database через fetch_all)"""
+    return list(map(row_factory(OfferItem, COLUMNS), tuples))
+
+
+def read_dicts(items):
+    """Чтение полей, как в write_offer_rows"""
+    total = 0
+    for item in items:
+        total += item['total']
+        item['product_name'], item['quantity'], item['unit'], item['price'], item['description']
+    return total
+
+
+def read_models(items):
+    total = 0
+    for item in items:
+        total += item.total
+        item.product_name, item.quantity, item.unit, item.price, item.description
+    return total
+
+
+def build_cases(sizes):
+    """Кейсы бенчмарка: {имя: (функция, количество строк)}"""
+    cases = {}
+    for rows in sizes:
+        tuples = build_tuples(rows)
+        dicts, models = load_dicts(tuples), load_models(tuples)
+        cases[f"load_rows[dict,{rows}]"] = (lambda t=tuples: load_dicts(t), rows)
+        cases[f"load_rows[model,{rows}]"] = (lambda t=tuples: load_models(t), rows)
+        cases[f"read_rows[dict,{rows}]"] = (lambda d=dicts: read_dicts(d), rows)
+        cases[f"read_rows[model,{rows}]"] = (lambda m=models: read_models(m), rows)
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк строк БД: словари против моделей")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Путь к JSON-отчету")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    results = {}
+    for name, (func, rows) in build_cases(sizes).items():
+        stats = measure(func, repeat=args.repeat)
+        stats.update(measure_memory(func))
+        stats['bytes_per_row'] = round(stats['peak_kib'] * 1024 / rows, 1)
+        results[name] = stats
+        print(f"⏱️ {name:<30} {stats['median_ms']:>10.2f} мс {stats['bytes_per_row']:>10.0f} Б/строка")
+
+    path = write_report('rows', {'sizes': sizes, 'repeat': args.repeat}, results, args.output)
+    print(f"\n📄 Отчет сохранен: {path}")
+
+
+if __name__ == "__main__":
+    main()
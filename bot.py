@@ -1,8 +1,12 @@
 import asyncio
 import logging
+import os
+import tempfile
+import weakref
 from datetime import datetime
 import pytz
 from aiogram import Bot, Dispatcher, types, Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -10,11 +14,43 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from config import BOT_TOKEN, ADMIN_IDS, TIMEZONE
+from config import (
+    BOT_TOKEN, ADMIN_IDS, TIMEZONE, LOOP_MONITOR_ENABLED, LOOP_LAG_INTERVAL, LOOP_LAG_THRESHOLD,
+    METRICS_ENABLED, METRICS_HOST, METRICS_PORT, QUERY_DEBUG, QUERY_BUDGET, QUERY_REPEAT_LIMIT,
+    CALLBACK_DEDUP_TTL, BACKGROUND_MAX_CONCURRENCY, INLINE_SEARCH_CACHE_TTL, INLINE_SEARCH_LIMIT,
+    OFFER_DIGEST_WINDOW, OFFERS_WORKBOOK_DIR, REQUEST_SWEEP_INTERVAL, REQUEST_SWEEP_BATCH,
+    REQUEST_STATUSES, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_BATCH_PAUSE, ARCHIVE_MAX_BATCHES,
+    ARCHIVE_INTERVAL, EXPORT_ITERSIZE
+)
 from database import Database
 from excel_handler import ExcelHandler
-from keyboards import get_role_keyboard, get_contact_keyboard, get_object_keyboard, get_cancel_keyboard
+from keyboards import (
+    get_role_keyboard, get_contact_keyboard, get_object_keyboard, get_cancel_keyboard,
+    get_subscriptions_keyboard, get_split_award_keyboard, get_my_request_keyboard
+)
 from google_sheets import GoogleSheetsManager, parse_delivery_message
+from loop_monitor import LoopLagMonitor, LoopMonitorMiddleware
+from query_tracker import QueryBudgetMiddleware
+from callback_dedup import CallbackDeduplicator, CallbackDedupMiddleware
+from background_tasks import BackgroundRunner, deferred_callback
+from inline_search import SearchCache, search_terms, group_search_rows
+from subscriptions import SubscriptionIndex, PRODUCT_CATEGORIES
+from object_routing import ObjectRouting
+from stock import stock_patterns, format_stock
+from debounce import Debouncer
+from offer_board import render_offer_board
+from offers_workbook import OffersWorkbookStore
+from price_matrix import build_price_matrix, format_price_matrix
+from split_award import (
+    optimize_split_award, awarded_item_ids, format_split_award, open_split_rows, SplitAwardError
+)
+from request_lifecycle import RequestSweeper, CLOSE_REASONS, format_seller_notice
+from archive import ArchiveJob
+from metrics import (
+    setup_metrics, start_metrics_server, instrument_methods,
+    DB_METHOD_LATENCY, DB_METHOD_ERRORS, EXCEL_LATENCY, EXCEL_ERRORS,
+    SHEETS_WRITE_LATENCY, SHEETS_WRITE_ERRORS
+)
 import pandas as pd
 import io
 import psycopg2.extras
@@ -34,6 +70,59 @@ dp.include_router(router)
 db = Database()
 excel_handler = ExcelHandler()
 
+# Книги предложений по заявкам на диске, обновляются по одному предложению
+offers_workbooks = OffersWorkbookStore(excel_handler, OFFERS_WORKBOOK_DIR)
+
+# Последнее рассчитанное распределение по заявке (подтверждается кнопкой)
+split_award_plans = {}
+
+# Повторные нажатия кнопок, меняющих данные, отсеиваются до обработчиков
+# (просмотр, обновление досок и переключатели можно нажимать повторно)
+callback_deduplicator = CallbackDeduplicator(ttl=CALLBACK_DEDUP_TTL)
+router.callback_query.outer_middleware(
+    CallbackDedupMiddleware(callback_deduplicator, prefixes=(
+        'approve_offer_', 'reject_offer_', 'split_ok_', 'ship_sent_',
+        'deliver_', 'goods_received_', 'request_cancel_ok_',
+    ))
+)
+
+# Тяжелые callback-обработчики отвечают сразу, а работу выполняют в фоне
+background_runner = BackgroundRunner(max_concurrency=BACKGROUND_MAX_CONCURRENCY)
+
+# Монитор блокировок event loop
+loop_monitor = LoopLagMonitor(interval=LOOP_LAG_INTERVAL, threshold=LOOP_LAG_THRESHOLD)
+router.message.middleware(LoopMonitorMiddleware(loop_monitor))
+router.callback_query.middleware(LoopMonitorMiddleware(loop_monitor))
+router.inline_query.middleware(LoopMonitorMiddleware(loop_monitor))
+
+# Кэш inline-поиска по заявкам (ключ - нормализованные слова запроса)
+inline_search_cache = SearchCache(ttl=INLINE_SEARCH_CACHE_TTL)
+
+# Индекс подписок поставщиков: новые заявки получают только заинтересованные
+subscription_index = SubscriptionIndex()
+
+# Справочник объектов и зав. склады по объектам: уведомления получает только склад объекта заявки
+object_routing = ObjectRouting()
+
+# Обновления досок предложений: не чаще одного за окно на заявку или заказчика
+offer_digests = Debouncer(window=OFFER_DIGEST_WINDOW)
+# Блокировка доски живет, пока ее кто-то держит или ждет, и не копится по истории заявок
+offer_board_locks = weakref.WeakValueDictionary()
+
+# Детектор N+1 и бюджет запросов (режим отладки)
+if QUERY_DEBUG:
+    query_budget_middleware = QueryBudgetMiddleware(QUERY_BUDGET, QUERY_REPEAT_LIMIT)
+    router.message.middleware(query_budget_middleware)
+    router.callback_query.middleware(query_budget_middleware)
+
+# Метрики Prometheus
+if METRICS_ENABLED:
+    instrument_methods(db, DB_METHOD_LATENCY, DB_METHOD_ERRORS,
+                       exclude=('create_tables', 'fix_decimal_fields', 'add_missing_columns',
+                                'create_search_index', 'create_archive_tables'))
+    instrument_methods(excel_handler, EXCEL_LATENCY, EXCEL_ERRORS)
+    setup_metrics(router, bot, storage, loop_monitor)
+
 # Состояния FSM
 class RegistrationStates(StatesGroup):
     waiting_for_name = State()
@@ -121,6 +210,7 @@ def get_main_keyboard(user_role: str):
             keyboard=[
                 [KeyboardButton(text="📦 Кутган етказиб беришлар")],
                 [KeyboardButton(text="✅ Кабул қилинган товарлар")],
+                [KeyboardButton(text="📦 Омбор қолдиғи")],
                 [KeyboardButton(text="ℹ️ Ёрдам")]
             ],
             resize_keyboard=True
@@ -155,14 +245,14 @@ async def cmd_start(message: types.Message, state: FSMContext):
     user = db.get_user(message.from_user.id)
     
     if user:
-        if user['is_approved']:
+        if user.is_approved:
             await message.answer(
-                f"Хуш келибсиз, {user['full_name']}!\n"
-                f"Ролингиз: {user['role']}\n"
+                f"Хуш келибсиз, {user.full_name}!\n"
+                f"Ролингиз: {user.role}\n"
                 f"Вақт: {get_current_time()}",
-                reply_markup=get_main_keyboard(user['role'])
+                reply_markup=get_main_keyboard(user.role)
             )
-            print(f"DEBUG: Показано главное меню для пользователя {message.from_user.id} с ролью {user['role']}")
+            print(f"DEBUG: Показано главное меню для пользователя {message.from_user.id} с ролью {user.role}")
         else:
             await message.answer(
                 "Рўйхатдан ўтиш аризангиз маъмур тасдиқлашини кутмоқда. "
@@ -184,7 +274,7 @@ async def cmd_register(message: types.Message, state: FSMContext):
     """Обработчик команды /register"""
     user = db.get_user(message.from_user.id)
     
-    if user and user['is_approved']:
+    if user and user.is_approved:
         await message.answer("Сиз аллақачон рўйхатдан ўтган ва тасдиқлангансиз!")
         return
     
@@ -294,28 +384,20 @@ async def process_role(message: types.Message, state: FSMContext):
         await message.answer(
             "Энди ролингизни танланг:\n"
             "Объект номини танланг:",
-            reply_markup=get_object_keyboard()
+            reply_markup=get_object_keyboard(object_routing.names())
         )
         await state.set_state(RegistrationStates.waiting_for_object)
 
 @router.message(RegistrationStates.waiting_for_object)
 async def process_object(message: types.Message, state: FSMContext):
     """Обработка выбора объекта"""
-    # Список допустимых объектов
-    valid_objects = [
-        "Сам Сити", "Ситй+Сиёб Б Й К блок", "Ал Бухорий", "Ал-Бухорий Хотел",
-        "Рубловка", "Қува ҚВП", "Макон Малл", "Карши Малл", "Карши Хотел",
-        "Воха Гавхари", "Зарметан усто Ғафур", "Кожа завод", "Мотрид катеж",
-        "Хишрав", "Махдуми Азам", "Сирдарё 1/10 Зухри", "Эшонгузар",
-        "Рубловка(Хожи бобо дом)", "Ургут", "Қўқон малл"
-    ]
-    
     if message.text == "❌ Отмена":
         await message.answer("Рўйхатдан ўтиш бекор қилинди.", reply_markup=ReplyKeyboardRemove())
         await state.clear()
         return
     
-    if message.text not in valid_objects:
+    # Допустимы только активные объекты справочника
+    if message.text not in object_routing.names():
         await message.answer("Илтимос, таклиф этилган объектлардан бирини танланг:")
         return
     
@@ -375,11 +457,13 @@ async def process_location(message: types.Message, state: FSMContext):
     
     user_data = await state.get_data()
     location_text = ""
+    latitude = longitude = None
     
     # Обработка разных типов локации
     if message.location:
-        # Геолокация
-        location_text = f"Координаты: {message.location.latitude}, {message.location.longitude}"
+        # Геолокация: координаты сохраняются числами, по ним выбирается ближайший склад
+        latitude, longitude = message.location.latitude, message.location.longitude
+        location_text = f"Координаты: {latitude}, {longitude}"
     elif message.venue:
         # Место
         location_text = f"Место: {message.venue.title}, {message.venue.address}"
@@ -398,9 +482,16 @@ async def process_location(message: types.Message, state: FSMContext):
         phone=user_data['phone'],
         role=user_data['role'],
         object_name=user_data['object_name'],
-        location=location_text
+        location=location_text,
+        latitude=latitude,
+        longitude=longitude
     )
     
+    # Повторная регистрация уже одобренного зав. склада переносит его на новый объект
+    registered = db.get_user(message.from_user.id)
+    if registered:
+        object_routing.set_user(registered)
+    
     # Уведомление администраторов
     for admin_id in ADMIN_IDS:
         try:
@@ -436,7 +527,8 @@ async def cmd_admin(message: types.Message):
         [InlineKeyboardButton(text="👥 Пользователи ожидающие одобрения", callback_data="admin_pending_users")],
         [InlineKeyboardButton(text="📊 Статистика", callback_data="admin_stats")],
         [InlineKeyboardButton(text="➕ Добавить заказчика", callback_data="admin_add_buyer")],
-        [InlineKeyboardButton(text="➕ Добавить зав. склада", callback_data="admin_add_warehouse")]
+        [InlineKeyboardButton(text="➕ Добавить зав. склада", callback_data="admin_add_warehouse")],
+        [InlineKeyboardButton(text="🏗️ Объекты", callback_data="admin_objects")]
     ])
     
     await message.answer("Панель администратора:", reply_markup=keyboard)
@@ -488,6 +580,9 @@ async def process_admin_callback(callback_query: types.CallbackQuery):
             "Зав. склад қўшиш учун, унингга /register буйруғини юбориш ва 'Зав. Склад' ролини танлашни сўранг"
         )
     
+    elif action == "admin_objects":
+        await callback_query.message.answer(format_objects())
+    
     await callback_query.answer()
 
 # Обработчики для Excel и предложений
@@ -540,19 +635,26 @@ async def process_send_offer(callback_query: types.CallbackQuery, state: FSMCont
     request = cursor.fetchone()
     
     if request:
-        # Получаем товары заявки
+        # Получаем товары заявки (граница по created_at отсекает более старые секции)
         cursor.execute("""
             SELECT * FROM request_items 
-            WHERE request_id = %s 
+            WHERE request_id = %s AND created_at >= %s
             ORDER BY created_at
-        """, (request_id,))
+        """, (request_id, request['created_at']))
         request['items'] = cursor.fetchall()
     
     cursor.close()
     conn.close()
     
+    # Кнопка может быть в сообщении из inline-поиска, у которого нет message,
+    # поэтому ответ отправляется пользователю напрямую
     if not request:
-        await callback_query.message.answer("❌ Заявка не найдена.")
+        await bot.send_message(callback_query.from_user.id, "❌ Заявка не найдена.")
+        await callback_query.answer()
+        return
+    
+    if request['status'] != 'active':
+        await bot.send_message(callback_query.from_user.id, f"🔒 Ариза #{request_id} ёпилган, таклифлар қабул қилинмайди.")
         await callback_query.answer()
         return
     
@@ -567,7 +669,8 @@ async def process_send_offer(callback_query: types.CallbackQuery, state: FSMCont
     }
     
     excel_file = excel_handler.create_seller_offer_template(request_data)
-    await callback_query.message.answer_document(
+    await bot.send_document(
+        callback_query.from_user.id,
         types.BufferedInputFile(
             excel_file.getvalue(),
             filename="предложение_шаблон.xlsx"
@@ -615,22 +718,18 @@ async def process_excel_request(message: types.Message, state: FSMContext):
         user = db.get_user(message.from_user.id)
         
         request_id = db.add_purchase_request(
-            buyer_id=user['id'],
-            object_name=request_data['object_name']
+            buyer_id=user.id,
+            object_name=request_data['object_name'],
+            items=request_data['items']
         )
         
-        # Сохраняем товары заявки
-        for item in request_data['items']:
-            db.add_request_item(
-                request_id=request_id,
-                product_name=item['product_name'],
-                quantity=item['quantity'],
-                unit=item['unit'],
-                material_description=item['material_description']
-            )
+        # Новая заявка должна сразу находиться в inline-поиске
+        inline_search_cache.clear()
         
-        # Отправляем всем поставщикам
-        sellers = db.get_users_by_role('seller')
+        # Отправляем только поставщикам, чьи подписки совпали с заявкой
+        sellers = subscription_index.recipients(
+            db.get_users_by_role('seller'), request_data['items'], request_data['object_name']
+        )
         for seller in sellers:
             try:
                 # Создаем сообщение с информацией о заявке
@@ -646,21 +745,114 @@ async def process_excel_request(message: types.Message, state: FSMContext):
                     message_text += f"... и еще {len(request_data['items']) - 3} товаров\n"
                 
                 await bot.send_message(
-                    seller['telegram_id'],
+                    seller.telegram_id,
                     message_text
                 )
             except Exception as e:
-                logger.error(f"Failed to send request to seller {seller['telegram_id']}: {e}")
+                logger.error(f"Failed to send request to seller {seller.telegram_id}: {e}")
         
         await message.answer(
             f"✅ {len(request_data['items'])} товар билан ариза муваффақиятли яратилди ва {len(sellers)} поставщикка юборилди!",
-            reply_markup=get_main_keyboard(user['role'])
+            reply_markup=get_main_keyboard(user.role)
         )
         await state.clear()
         
     except Exception as e:
         await message.answer(f"❌ Ошибка при обработке файла: {str(e)}")
 
+def offer_board_lock(request_id):
+    """Блокировка публикации доски заявки (одна на заявку, пока используется)"""
+    lock = offer_board_locks.get(request_id)
+    if lock is None:
+        lock = offer_board_locks[request_id] = asyncio.Lock()
+    return lock
+
+# Доска предложений: одно сообщение заказчика на заявку, редактируется на месте
+async def publish_offer_board(request_id, repost=False, new_offers=0):
+    """
+    Создание или обновление доски предложений
+    
+    Args:
+        request_id (int): ID заявки
+        repost (bool): Отправить доску заново внизу чата (старое сообщение удаляется)
+        new_offers (int): Число новых предложений для заголовка
+    """
+    async with offer_board_lock(request_id):
+        request = db.get_request_with_buyer(request_id)
+        if not request:
+            return None
+        
+        offers = db.get_offer_board_rows(request_id)
+        text, keyboard = render_offer_board(request, offers, get_current_time(), new_offers)
+        board = db.get_offer_board(request_id)
+        
+        if board and not repost:
+            try:
+                await bot.edit_message_text(
+                    text, chat_id=board['chat_id'], message_id=board['message_id'], reply_markup=keyboard
+                )
+                return board
+            except TelegramBadRequest as e:
+                if "message is not modified" in str(e):
+                    return board
+                # Сообщение удалено или слишком старое - отправляем новое
+                logger.info(f"Offer board {request_id} can't be edited: {e}")
+        elif board:
+            try:
+                await bot.delete_message(board['chat_id'], board['message_id'])
+            except TelegramBadRequest as e:
+                logger.info(f"Offer board {request_id} can't be deleted: {e}")
+        
+        sent = await bot.send_message(request['buyer_telegram_id'], text, reply_markup=keyboard)
+        db.save_offer_board(request_id, sent.chat.id, sent.message_id)
+        return db.get_offer_board(request_id)
+
+def schedule_offer_board_update(request_id):
+    """Отложенное обновление доски; предложения в пределах окна объединяются"""
+    async def update(count):
+        try:
+            await publish_offer_board(request_id, new_offers=count)
+        except Exception as e:
+            logger.error(f"Failed to update offer board {request_id}: {e}")
+    
+    offer_digests.schedule(('request', request_id), update)
+
+async def update_offers_workbook_status(request_id, offer_id, status):
+    """Смена статуса в книге предложений (запись файла в отдельном потоке)"""
+    try:
+        await asyncio.to_thread(offers_workbooks.update_status, request_id, offer_id, status)
+    except Exception as e:
+        logger.error(f"Failed to update offers workbook {request_id}: {e}")
+
+def is_offer_board_message(request_id, message):
+    """True, если сообщение с кнопкой - доска предложений заявки"""
+    board = db.get_offer_board(request_id)
+    return bool(board and message and board['message_id'] == message.message_id
+                and board['chat_id'] == message.chat.id)
+
+MISMATCH_LABELS = {
+    'quantity': "миқдор ўзгартирилган",
+    'name': "номи ўзгартирилган",
+    'missing': "нархсиз ёки ўчирилган",
+    'extra': "аризада йўқ",
+}
+
+def format_offer_mismatches(mismatches, limit=15):
+    """Расхождения предложения с заявкой для ответа поставщику"""
+    if not mismatches:
+        return ""
+    text = f"\n\n⚠️ Ариза билан фарқлар ({len(mismatches)}):\n"
+    for mismatch in mismatches[:limit]:
+        text += f"• {mismatch['product_name']} - {MISMATCH_LABELS[mismatch['type']]}"
+        if mismatch['type'] == 'quantity':
+            text += f" ({mismatch['expected']:g} → {mismatch['actual']:g})"
+        elif mismatch['type'] == 'name':
+            text += f" ({mismatch['actual']})"
+        text += "\n"
+    if len(mismatches) > limit:
+        text += f"... ва яна {len(mismatches) - limit} та\n"
+    return text
+
 @router.message(SellerOfferStates.waiting_for_excel_offer, F.document)
 async def process_excel_offer(message: types.Message, state: FSMContext):
     """Обработка Excel файла с предложением поставщика"""
@@ -675,14 +867,6 @@ async def process_excel_offer(message: types.Message, state: FSMContext):
             await message.answer(f"❌ {error_msg}")
             return
         
-        file_content.seek(0)
-        # Парсим Excel
-        offer_data = excel_handler.parse_seller_offer(file_content.read())
-        
-        if not offer_data['items']:
-            await message.answer("❌ Файл бўш ёки нархлар билан таклифларни ўз ичига олмаган.")
-            return
-        
         # Получаем данные из состояния
         state_data = await state.get_data()
         request_id = state_data.get('request_id')
@@ -691,131 +875,51 @@ async def process_excel_offer(message: types.Message, state: FSMContext):
             await message.answer("❌ Хатолик: ариза топилмади.")
             return
         
+        request = db.get_request_with_buyer(request_id)
+        if not request or request['status'] != 'active':
+            await message.answer(f"🔒 Ариза #{request_id} ёпилган, таклифлар қабул қилинмайди.")
+            await state.clear()
+            return
+        
+        file_content.seek(0)
+        # Парсим Excel; строки сопоставляются с товарами заявки по скрытому ключу
+        offer_data = excel_handler.parse_seller_offer(file_content.read(), db.get_request_items(request_id))
+        
+        if not offer_data['items']:
+            await message.answer("❌ Файл бўш ёки нархлар билан таклифларни ўз ичига олмаган.")
+            return
+        
         # Сохраняем предложение в базе данных
         user = db.get_user(message.from_user.id)
         
+        # Предложение и товары сохраняются одной транзакцией, сумму считает триггер
         offer_id = db.add_seller_offer(
             request_id=request_id,
-            seller_id=user['id'],
-            total_amount=offer_data['total_amount'],
+            seller_id=user.id,
+            items=offer_data['items'],
             excel_filename=message.document.file_name
         )
         
-        # Сохраняем товары предложения
-        for item in offer_data['items']:
-            db.add_offer_item(
-                offer_id=offer_id,
-                product_name=item['product_name'],
-                quantity=item['quantity'],
-                unit=item['unit'],
-                price_per_unit=item['price_per_unit'],
-                total_price=item['total_price'],
-                material_description=item['material_description']
-            )
+        # Новое предложение дописывается в журнал книги предложений заявки;
+        # журнал первой заявки (или заявки без журнала) собирается из базы
+        try:
+            if offers_workbooks.exists(request_id):
+                offer = db.get_offer_with_items(offer_id)
+                await asyncio.to_thread(offers_workbooks.append_offer, request_id, offer)
+            else:
+                offers = db.get_offers_for_request(request_id)
+                await asyncio.to_thread(offers_workbooks.seed, request_id, list(reversed(offers)))
+        except Exception as e:
+            logger.error(f"Failed to append offer {offer_id} to workbook: {e}")
         
-        # Уведомляем заказчика
-        conn = db.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cursor.execute("""
-            SELECT pr.id, pr.buyer_id, 
-                   COALESCE(pr.supplier, 'Не указан') as supplier_name, 
-                   COALESCE(pr.object_name, 'Не указан') as object_name,
-                   pr.status, pr.created_at,
-                   u.telegram_id as buyer_telegram_id, u.full_name as buyer_name
-            FROM purchase_requests pr
-            JOIN users u ON pr.buyer_id = u.id
-            WHERE pr.id = %s
-        """, (request_id,))
-        request = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        # Доска предложений заказчика обновляется одной правкой сообщения за окно
+        # OFFER_DIGEST_WINDOW, даже если за это время пришло несколько предложений
+        schedule_offer_board_update(request_id)
         
-        if request:
-            try:
-                # Получаем все предложения для этой заявки
-                offers = db.get_offers_for_request(request_id)
-                
-                # Создаем сводку предложений
-                summary = excel_handler.create_offers_summary(offers, request['buyer_name'])
-                
-                # Создаем Excel файл с предложениями
-                excel_file = excel_handler.create_offers_excel(offers, request['buyer_name'])
-                
-                # Создаем кнопки для каждого предложения
-                keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-                for offer in offers:
-                    excel_info = f" (📄 {offer['excel_filename']})" if offer.get('excel_filename') else ""
-                    keyboard.inline_keyboard.append([
-                        InlineKeyboardButton(
-                            text=f"✅ Одобрить #{offer['id']}{excel_info}", 
-                            callback_data=f"approve_offer_{offer['id']}"
-                        ),
-                        InlineKeyboardButton(
-                            text=f"❌ Отклонить #{offer['id']}{excel_info}", 
-                            callback_data=f"reject_offer_{offer['id']}"
-                        )
-                    ])
-                
-                # Отправляем Excel файл покупателю
-                await bot.send_document(
-                    request['buyer_telegram_id'],
-                    types.BufferedInputFile(
-                        excel_file.getvalue(),
-                        filename=f"предложения_заявка_{request_id}_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-                    ),
-                    caption="📊 Поставщиклар таклифлари билан Excel файл"
-                )
-                
-                # Функция для разбиения длинного текста на части
-                def split_message(text, max_length=4000):
-                    """Разбивает длинный текст на части, не превышающие max_length символов"""
-                    if len(text) <= max_length:
-                        return [text]
-                    
-                    parts = []
-                    current_part = ""
-                    lines = text.split('\n')
-                    
-                    for line in lines:
-                        if len(current_part + line + '\n') <= max_length:
-                            current_part += line + '\n'
-                        else:
-                            if current_part:
-                                parts.append(current_part.strip())
-                            current_part = line + '\n'
-                    
-                    if current_part:
-                        parts.append(current_part.strip())
-                    
-                    return parts
-                
-                # Разбиваем сводку на части, если она слишком длинная
-                summary_parts = split_message(summary)
-                
-                # Отправляем каждую часть отдельным сообщением
-                for i, part in enumerate(summary_parts):
-                    if i == 0:  # Только в первом сообщении добавляем кнопки
-                        await bot.send_message(
-                            request['buyer_telegram_id'],
-                            part,
-                            reply_markup=keyboard
-                        )
-                    else:
-                        await bot.send_message(
-                            request['buyer_telegram_id'],
-                            part
-                        )
-                
-                await message.answer(
-                    f"✅ Таклиф муваффақиятли заказчикка юборилди!",
-                    reply_markup=get_main_keyboard(user['role'])
-                )
-                
-            except Exception as e:
-                logger.error(f"Failed to notify buyer {request['buyer_telegram_id']}: {e}")
-                logger.error(f"Buyer data: {request}")
-                logger.error(f"Offers data: {offers}")
-                await message.answer("✅ Таклиф сақланди, лекин заказчикни хабардор қилиш мумкин эмас.")
+        await message.answer(
+            f"✅ Таклиф сақланди ва заказчикка юборилади!" + format_offer_mismatches(offer_data['mismatches']),
+            reply_markup=get_main_keyboard(user.role)
+        )
         
         await state.clear()
         
@@ -836,19 +940,22 @@ async def cmd_approve(message: types.Message):
         
         # Получаем данные пользователя для показа правильного меню
         user = db.get_user(telegram_id)
+        if user:
+            # Одобренный зав. склад начинает получать уведомления своего объекта
+            object_routing.set_user(user)
         
         # Уведомление пользователя с главным меню
         try:
-            if user and user['is_approved']:
+            if user and user.is_approved:
                 await bot.send_message(
                     telegram_id,
                     f"✅ Ваша заявка на регистрацию одобрена!\n\n"
-                    f"Хуш келибсиз, {user['full_name']}!\n"
-                    f"Ролингиз: {user['role']}\n"
+                    f"Хуш келибсиз, {user.full_name}!\n"
+                    f"Ролингиз: {user.role}\n"
                     f"Вақт: {get_current_time()}",
-                    reply_markup=get_main_keyboard(user['role'])
+                    reply_markup=get_main_keyboard(user.role)
                 )
-                print(f"DEBUG: Показано главное меню для одобренного пользователя {telegram_id} с ролью {user['role']}")
+                print(f"DEBUG: Показано главное меню для одобренного пользователя {telegram_id} с ролью {user.role}")
             else:
                 await bot.send_message(
                     telegram_id,
@@ -886,12 +993,12 @@ async def cmd_reset(message: types.Message, state: FSMContext):
     await state.clear()
     user = db.get_user(message.from_user.id)
     
-    if user and user['is_approved']:
+    if user and user.is_approved:
         await message.answer(
             f"🔄 Состояние сброшено!\n"
-            f"Хуш келибсиз, {user['full_name']}!\n"
-            f"Ролингиз: {user['role']}",
-            reply_markup=get_main_keyboard(user['role'])
+            f"Хуш келибсиз, {user.full_name}!\n"
+            f"Ролингиз: {user.role}",
+            reply_markup=get_main_keyboard(user.role)
         )
     else:
         await message.answer("Состояние сброшено. Используйте /register для регистрации.")
@@ -909,10 +1016,13 @@ async def cmd_reject(message: types.Message):
         # Удаление пользователя из базы
         conn = db.get_connection()
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM users WHERE telegram_id = %s", (telegram_id,))
+        cursor.execute("DELETE FROM users WHERE telegram_id = %s RETURNING id", (telegram_id,))
+        deleted = cursor.fetchone()
         conn.commit()
         cursor.close()
         conn.close()
+        if deleted:
+            object_routing.remove_user(deleted[0])
         
         # Уведомление пользователя
         try:
@@ -928,163 +1038,550 @@ async def cmd_reject(message: types.Message):
     except (IndexError, ValueError):
         await message.answer("Ишлатиш: /reject <telegram_id>")
 
+# Справочник объектов
+def refresh_object_routing():
+    """Перезагрузка справочника объектов и зав. складов в индекс маршрутизации"""
+    object_routing.load(db.get_objects(), db.get_users_by_role('warehouse'))
+
+def format_objects():
+    """Текст со списком объектов и числом зав. складов"""
+    objects = object_routing.objects(include_inactive=True)
+    if not objects:
+        return "🏗️ Объектлар йўқ.\n\nҚўшиш: /add_object <номи>"
+    
+    text = "🏗️ Объектлар:\n\n"
+    for obj in objects:
+        mark = "" if obj.is_active else " (ўчирилган)"
+        point = " 📍" if obj.latitude is not None else ""
+        text += f"#{obj.id} {obj.name}{mark}{point} - 🏭 {len(object_routing.staff(obj.id))}\n"
+    text += ("\nҚўшиш: /add_object <номи>\nЎчириш: /remove_object <id>\n"
+             "Координаталар: /object_location <id> <кенглик> <узунлик>")
+    return text
+
+@router.message(Command("objects"))
+async def cmd_objects(message: types.Message):
+    """Список объектов строительства"""
+    if not is_admin(message.from_user.id):
+        await message.answer("Сизда маъмур ҳуқуқлари йўқ!")
+        return
+    
+    await message.answer(format_objects())
+
+@router.message(Command("add_object"))
+async def cmd_add_object(message: types.Message):
+    """Добавление объекта: /add_object Сам Сити"""
+    if not is_admin(message.from_user.id):
+        await message.answer("Сизда маъмур ҳуқуқлари йўқ!")
+        return
+    
+    name = message.text.partition(' ')[2].strip()
+    if not name:
+        await message.answer("Ишлатиш: /add_object <номи>")
+        return
+    
+    obj = db.add_object(name)
+    refresh_object_routing()
+    await message.answer(f"✅ Объект #{obj.id} {obj.name} қўшилди.\n\n{format_objects()}")
+
+@router.message(Command("remove_object"))
+async def cmd_remove_object(message: types.Message):
+    """Отключение объекта: /remove_object 5 (пользователи и заявки объекта сохраняются)"""
+    if not is_admin(message.from_user.id):
+        await message.answer("Сизда маъмур ҳуқуқлари йўқ!")
+        return
+    
+    try:
+        object_id = int(message.text.split()[1])
+    except (IndexError, ValueError):
+        await message.answer("Ишлатиш: /remove_object <id>")
+        return
+    
+    obj = db.set_object_active(object_id, False)
+    if not obj:
+        await message.answer("❌ Объект топилмади")
+        return
+    refresh_object_routing()
+    await message.answer(f"🗑 Объект #{obj.id} {obj.name} ўчирилди.\n\n{format_objects()}")
+
+@router.message(Command("object_location"))
+async def cmd_object_location(message: types.Message):
+    """Координаты объекта: /object_location 5 41.311081 69.240562"""
+    if not is_admin(message.from_user.id):
+        await message.answer("Сизда маъмур ҳуқуқлари йўқ!")
+        return
+    
+    try:
+        _, object_id, latitude, longitude = message.text.replace(',', ' ').split()
+        object_id, latitude, longitude = int(object_id), float(latitude), float(longitude)
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError
+    except ValueError:
+        await message.answer("Ишлатиш: /object_location <id> <кенглик> <узунлик>")
+        return
+    
+    obj = db.set_object_location(object_id, latitude, longitude)
+    if not obj:
+        await message.answer("❌ Объект топилмади")
+        return
+    refresh_object_routing()
+    await message.answer(f"📍 Объект #{obj.id} {obj.name}: {latitude}, {longitude}\n\n{format_objects()}")
+
+# Подписки поставщиков
+CATEGORY_NAMES = list(PRODUCT_CATEGORIES)
+
+def format_subscriptions(subscriptions):
+    """Текст со списком подписок поставщика"""
+    if not subscriptions:
+        return (
+            "🔔 Обуналар йўқ - сиз барча янги аризаларни оласиз.\n\n"
+            "Фақат керакли аризаларни олиш учун категория ёки объектни танланг,\n"
+            "калит сўз қўшиш: /subscribe цемент, арматура\n"
+            "ўчириш: /unsubscribe цемент"
+        )
+    
+    titles = {'category': "📦 Категориялар", 'keyword': "🔑 Калит сўзлар", 'object': "🏗️ Объектлар"}
+    text = "🔔 Сизнинг обуналарингиз:\n"
+    for kind, title in titles.items():
+        values = [value for k, value in subscriptions if k == kind]
+        if values:
+            text += f"\n{title}: {', '.join(values)}"
+    text += "\n\nКалит сўз қўшиш: /subscribe цемент\nЎчириш: /unsubscribe цемент"
+    return text
+
+def get_seller_for_subscriptions(telegram_id):
+    """Одобренный поставщик или None"""
+    user = db.get_user(telegram_id)
+    if not user or user.role != 'seller' or not user.is_approved:
+        return None
+    return user
+
+def refresh_seller_subscriptions(seller_id):
+    """Перечитывает подписки поставщика и обновляет индекс"""
+    subscriptions = [tuple(row) for row in db.get_seller_subscriptions(seller_id)]
+    subscription_index.set_seller(seller_id, subscriptions)
+    return set(subscriptions)
+
+@router.message(Command("subscriptions"))
+async def cmd_subscriptions(message: types.Message):
+    """Просмотр и настройка подписок поставщика"""
+    user = get_seller_for_subscriptions(message.from_user.id)
+    if not user:
+        await message.answer("❌ Обуналар фақат поставщиклар учун.")
+        return
+    
+    subscriptions = set(tuple(row) for row in db.get_seller_subscriptions(user.id))
+    await message.answer(
+        format_subscriptions(sorted(subscriptions)),
+        reply_markup=get_subscriptions_keyboard(subscriptions, CATEGORY_NAMES)
+    )
+
+@router.message(Command("subscribe"))
+async def cmd_subscribe(message: types.Message):
+    """Подписка на ключевые слова: /subscribe цемент, арматура"""
+    user = get_seller_for_subscriptions(message.from_user.id)
+    if not user:
+        await message.answer("❌ Обуналар фақат поставщиклар учун.")
+        return
+    
+    keywords = [word.strip().lower() for word in message.text.partition(' ')[2].split(',') if word.strip()]
+    if not keywords:
+        await message.answer("Ишлатиш: /subscribe цемент, арматура")
+        return
+    
+    for keyword in keywords:
+        db.add_subscription(user.id, 'keyword', keyword)
+    subscriptions = refresh_seller_subscriptions(user.id)
+    await message.answer(format_subscriptions(sorted(subscriptions)))
+
+@router.message(Command("unsubscribe"))
+async def cmd_unsubscribe(message: types.Message):
+    """Отписка от ключевого слова: /unsubscribe цемент"""
+    user = get_seller_for_subscriptions(message.from_user.id)
+    if not user:
+        await message.answer("❌ Обуналар фақат поставщиклар учун.")
+        return
+    
+    keywords = [word.strip().lower() for word in message.text.partition(' ')[2].split(',') if word.strip()]
+    if not keywords:
+        await message.answer("Ишлатиш: /unsubscribe цемент")
+        return
+    
+    for keyword in keywords:
+        db.remove_subscription(user.id, 'keyword', keyword)
+    subscriptions = refresh_seller_subscriptions(user.id)
+    await message.answer(format_subscriptions(sorted(subscriptions)))
+
+@router.callback_query(lambda c: c.data.startswith('sub_'))
+async def process_subscription_callback(callback_query: types.CallbackQuery):
+    """Переключение подписок на категории и объекты"""
+    user = get_seller_for_subscriptions(callback_query.from_user.id)
+    if not user:
+        await callback_query.answer("❌ Обуналар фақат поставщиклар учун.")
+        return
+    
+    data = callback_query.data
+    show_objects = data.startswith('sub_obj_') or data == 'sub_show_objects'
+    
+    if data == 'sub_clear':
+        db.remove_subscription(user.id)
+    elif data.startswith('sub_cat_') or data.startswith('sub_obj_'):
+        index = int(data.split('_')[2])
+        if show_objects:
+            # Для объектов в кнопке передается id объекта справочника
+            kind, value = 'object', object_routing.object_name(index)
+        else:
+            kind, value = 'category', CATEGORY_NAMES[index] if index < len(CATEGORY_NAMES) else None
+        if value is None:
+            await callback_query.answer("❌ Топилмади")
+            return
+        current = set(tuple(row) for row in db.get_seller_subscriptions(user.id))
+        if (kind, value) in current:
+            db.remove_subscription(user.id, kind, value)
+        else:
+            db.add_subscription(user.id, kind, value)
+    
+    subscriptions = refresh_seller_subscriptions(user.id)
+    try:
+        await callback_query.message.edit_text(
+            format_subscriptions(sorted(subscriptions)),
+            reply_markup=get_subscriptions_keyboard(subscriptions, CATEGORY_NAMES, show_objects, object_routing.objects())
+        )
+    except Exception as e:
+        # Текст и клавиатура не изменились
+        logger.info(f"Subscriptions message not modified: {e}")
+    await callback_query.answer()
+
+# Жизненный цикл заявок
+async def notify_requests_closed(result, notify_buyers=False):
+    """
+    Уведомления после закрытия заявок: поставщикам - об отклоненных предложениях,
+    заказчикам - о просроченных заявках; доски и книги предложений обновляются
+    """
+    reason = result['reason']
+    for offer in result['offers']:
+        await update_offers_workbook_status(offer['purchase_request_id'], offer['id'], 'rejected')
+        try:
+            await bot.send_message(
+                offer['seller_telegram_id'],
+                format_seller_notice(offer['purchase_request_id'], offer['id'], reason)
+            )
+        except Exception as e:
+            logger.error(f"Failed to notify seller {offer['seller_telegram_id']}: {e}")
+    
+    if notify_buyers:
+        for request in result['closed']:
+            try:
+                await bot.send_message(
+                    request['buyer_telegram_id'],
+                    f"🔒 Ариза #{request['id']} ёпилди: {CLOSE_REASONS[reason]}."
+                )
+            except Exception as e:
+                logger.error(f"Failed to notify buyer {request['buyer_telegram_id']}: {e}")
+    
+    # Доски обновляются только у заявок, где были рассматриваемые предложения
+    for request_id in {offer['purchase_request_id'] for offer in result['offers']}:
+        await publish_offer_board(request_id)
+
+async def notify_expired_requests(result):
+    """Уведомления о заявках, закрытых фоновым проходом"""
+    await notify_requests_closed(result, notify_buyers=True)
+
+request_sweeper = RequestSweeper(
+    db.expire_requests, notify_expired_requests,
+    interval=REQUEST_SWEEP_INTERVAL, batch_size=REQUEST_SWEEP_BATCH
+)
+
+async def close_request_if_covered(request_id):
+    """
+    Завершение заявки после одобрения, если все товары покрыты
+    
+    Returns:
+        str: Строка для итогового сообщения заказчику (пустая, если заявка еще открыта)
+    """
+    try:
+        result = await asyncio.to_thread(db.complete_request_if_covered, request_id)
+    except Exception as e:
+        logger.error(f"Failed to complete request {request_id}: {e}")
+        return ""
+    if not result['closed']:
+        return ""
+    await notify_requests_closed(result)
+    return f"\n🔒 Ариза #{request_id} ёпилди: {CLOSE_REASONS['covered']}."
+
+@router.message(Command("cancel_request"))
+async def cmd_cancel_request(message: types.Message):
+    """Отмена заявки: /cancel_request 12"""
+    args = message.text.split()[1:]
+    if not args or not args[0].isdigit():
+        await message.answer("Ишлатиш: /cancel_request <ариза рақами>")
+        return
+    await cancel_request(message, int(args[0]), message.from_user.id)
+
+@router.callback_query(lambda c: c.data.startswith('request_cancel_'))
+async def process_request_cancel(callback_query: types.CallbackQuery):
+    """Отмена заявки кнопкой: первое нажатие просит подтверждения"""
+    parts = callback_query.data.split('_')
+    request_id = int(parts[-1])
+    action = parts[2] if len(parts) == 4 else None
+    if action is None:
+        await callback_query.message.edit_reply_markup(reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text="✅ Ҳа, бекор қилиш", callback_data=f"request_cancel_ok_{request_id}"),
+            InlineKeyboardButton(text="↩️ Йўқ", callback_data=f"request_cancel_no_{request_id}"),
+        ]]))
+        await callback_query.answer()
+        return
+    if action == 'no':
+        await callback_query.message.edit_reply_markup(reply_markup=get_my_request_keyboard(request_id))
+        await callback_query.answer()
+        return
+    
+    await callback_query.answer()
+    await cancel_request(callback_query.message, request_id, callback_query.from_user.id)
+
+async def cancel_request(message, request_id, telegram_id):
+    """Отмена заявки заказчиком и уведомление поставщиков"""
+    user = db.get_user(telegram_id)
+    if not user or user.role != 'buyer':
+        await message.answer("❌ Фақат заказчиклар аризани бекор қила олади.")
+        return
+    
+    result = await asyncio.to_thread(db.cancel_request, request_id, user.id)
+    if not result or not result['closed']:
+        await message.answer("❌ Фаол ариза топилмади.")
+        return
+    
+    await notify_requests_closed(result)
+    await message.answer(
+        f"🚫 Ариза #{request_id} бекор қилинди.\n"
+        f"📨 Хабардор қилинган поставщиклар: {len(result['offers'])}"
+    )
+
+# Архив закрытых заявок
+archive_job = ArchiveJob(
+    db.archive_closed_requests, older_than_days=ARCHIVE_AFTER_DAYS, interval=ARCHIVE_INTERVAL,
+    batch_size=ARCHIVE_BATCH_SIZE, pause=ARCHIVE_BATCH_PAUSE, max_batches=ARCHIVE_MAX_BATCHES,
+    maintenance=db.maintain_partitions
+)
+
+@router.message(Command("history"))
+async def cmd_history(message: types.Message):
+    """Архивная история: заказчику - одобренные заказы, зав. складу - полученные доставки"""
+    user = db.get_user(message.from_user.id)
+    if not user or user.role not in ('buyer', 'warehouse'):
+        await message.answer("❌ Архив фақат заказчиклар ва склад ходимлари учун.")
+        return
+    
+    # Архивные таблицы не входят в рабочий путь: запрос и файл готовятся в отдельном потоке
+    await message.answer(f"⏳ {ARCHIVE_AFTER_DAYS} кундан олдин ёпилган аризалар архиви тайёрланмоқда...")
+    if user.role == 'buyer':
+        records = await asyncio.to_thread(db.get_archived_offers_for_buyer, user.id)
+        if records:
+            excel_file = await asyncio.to_thread(excel_handler.create_offers_excel, records, user.full_name)
+        caption = f"🗄 Архивдаги буюртмалар: {len(records)} та"
+        filename = f"архив_заказов_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+    else:
+        records = await asyncio.to_thread(db.get_archived_deliveries, user.object_name)
+        if records:
+            excel_file = await asyncio.to_thread(excel_handler.create_archived_deliveries_excel, records)
+        caption = f"🗄 Архивдаги қабул қилинган товарлар: {len(records)} та"
+        filename = f"архив_доставок_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+    
+    if not records:
+        await message.answer("📭 Архивда ҳозирча ёзувлар йўқ.")
+        return
+    
+    await message.answer_document(
+        types.BufferedInputFile(excel_file.getvalue(), filename=filename),
+        caption=caption
+    )
+
+async def send_stock(message, telegram_id, query=None):
+    """Остатки склада объекта пользователя (зав. склад или заказчик)"""
+    user = db.get_user(telegram_id)
+    if not user or user.role not in ('warehouse', 'buyer') or not user.is_approved:
+        await message.answer("❌ Омбор қолдиғи фақат склад ходимлари ва заказчиклар учун.")
+        return
+    if user.object_id is None:
+        await message.answer("❌ Сизга объект бириктирилмаган.")
+        return
+    
+    balances = db.get_stock(user.object_id, stock_patterns(query))
+    object_name = object_routing.object_name(user.object_id) or user.object_name
+    await message.answer(format_stock(object_name, balances, query))
+
+@router.message(Command("stock"))
+async def cmd_stock(message: types.Message):
+    """Остатки склада объекта: /stock или /stock цемент"""
+    query = message.text.partition(' ')[2].strip()
+    await send_stock(message, message.from_user.id, query or None)
+
 # Обработчики для одобрения предложений
+async def notify_offer_approved(offer, buyer):
+    """
+    Уведомления зав. складов и поставщика об одобренном предложении
+    
+    Returns:
+        list: Имена уведомленных зав. складов
+    """
+    offer_id = offer.id
+    delivery_id = offer.delivery_id
+    # При распределении заявки поставщику достается только часть товаров
+    amount = offer.award_total if offer.award_total is not None else offer.total_amount
+    
+    # Зав. склады объекта заявки (ближайший к объекту первым) или ближайший склад
+    warehouse_users = object_routing.route(offer.object_id)
+    warehouse_info = ""
+    warehouse_notifications = []
+    
+    if warehouse_users:
+        warehouse_user = warehouse_users[0]  # Ближайший зав. склад - ответственный
+        warehouse_info = f"\n🏭 Зав. Склад Масул шахс: {warehouse_user.full_name}\n📞 Телефон: {warehouse_user.phone_number}"
+        
+        # Уведомляем зав. складов
+        for warehouse in warehouse_users:
+            try:
+                # Формируем локацию с кликабельной ссылкой
+
+                
+                # Формируем полный список товаров
+                items_text = "\n📦 **Товарлар рўйхати:**\n"
+                for i, item in enumerate(offer.items, 1):
+                    items_text += f"{i}. **{item.product_name}**\n"
+                    items_text += f"   📊 Миқдори: {item.quantity} {item.unit}\n"
+                    items_text += f"   📏 Ўлчов бирлиги: {item.unit}\n"
+                    items_text += f"   💰 Нархи: {item.price or 0:,} сўм\n"
+                    items_text += f"   💵 Сумма: {item.total or 0:,} сўм\n"
+                    if item.description:
+                        items_text += f"   📝 Изох: {item.description}\n"
+                    items_text += "\n"
+                
+                # Создаем клавиатуру с кнопками
+                keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+                
+                await bot.send_message(
+                    warehouse.telegram_id,
+                    f"🔔 Янги буюртма тасдиқланди!\n\n"
+                    f"📋 Буюртма #{offer.purchase_request_id}\n"
+                    f"👤 Буюртмачи: {buyer.full_name}\n"
+                    f"🏢 Объект: {offer.buyer_object}\n"
+                    f"👨‍💼 Поставщик: {offer.full_name}\n"
+                    f"💵 Умумий сумма: {amount:,} сўм\n"
+                    f"📦 Етказиб бериш #{delivery_id}\n\n"
+                    f"📞 Буюртмачи билан боғланиш: {buyer.phone_number}\n\n"
+                    f"{items_text}",
+                    parse_mode="Markdown",
+                    reply_markup=keyboard
+                )
+                warehouse_notifications.append(warehouse.full_name)
+            except Exception as e:
+                logger.error(f"Failed to notify warehouse {warehouse.telegram_id}: {e}")
+    else:
+        warehouse_info = "\n⚠️ Зав. Склад топилмади"
+    
+    # Уведомляем поставщика с кнопкой подтверждения отправки
+    try:
+        # Проверяем, есть ли telegram_id у поставщика
+        if not offer.seller_telegram_id:
+            logger.error(f"Seller telegram_id is missing for offer {offer_id}")
+            return warehouse_notifications
+        
+        logger.info(f"Sending notification to seller {offer.seller_telegram_id} for offer {offer_id}")
+        
+        # Создаем клавиатуру с кнопками
+        keyboard_buttons = [
+            [InlineKeyboardButton(text="🚚 Товарларни юборилди", callback_data=f"ship_sent_{delivery_id}")]
+        ]
+        
+        keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
+        
+        # Получаем локацию зав. склада для поставщика
+        warehouse_location = ""
+        if warehouse_users:
+            warehouse_user = warehouse_users[0]
+            if warehouse_user.latitude is not None and warehouse_user.longitude is not None:
+                # Создаем ссылку на Google Maps
+                google_maps_url = f"https://maps.google.com/?q={warehouse_user.latitude},{warehouse_user.longitude}"
+                warehouse_location = f"\n📍 Локация: [Google Maps]({google_maps_url})"
+            elif warehouse_user.location:
+                warehouse_location = f"\n📍 Локация: {warehouse_user.location}"
+        
+        message_text = (
+            f"✅ Сизнинг таклифингиз #{offer_id} буюртмачи томонидан тасдиқланди!\n\n"
+            f"💵 Умумий сумма: {amount:,} сўм\n"
+            f"📅 Тасдиқлаш санаси: {get_current_time()}\n"
+            f"📦 Етказиб бериш #{delivery_id} яратилди{warehouse_info}{warehouse_location}\n\n"
+            f"🚚 Илтимос, товарларни омборга етказиб беринг ва тўғридаги тугмани босинг:"
+        )
+        
+        await bot.send_message(
+            offer.seller_telegram_id,
+            message_text,
+            reply_markup=keyboard,
+            parse_mode="Markdown"
+        )
+        
+        logger.info(f"Successfully sent notification to seller {offer.seller_telegram_id}")
+        
+    except Exception as e:
+        logger.error(f"Failed to notify seller {offer.seller_telegram_id or 'unknown'}: {e}")
+        logger.error(f"Offer data: {offer}")
+    
+    return warehouse_notifications
+
 @router.callback_query(lambda c: c.data.startswith('approve_offer_'))
+@deferred_callback(background_runner, deduplicator=callback_deduplicator)
 async def process_approve_offer(callback_query: types.CallbackQuery):
-    """Одобрение предложения заказчиком"""
+    """Одобрение предложения заказчиком (выполняется в фоне)"""
     try:
         offer_id = int(callback_query.data.split('_')[2])
         buyer = db.get_user(callback_query.from_user.id)
         
-        if not buyer or buyer['role'] != 'buyer':
-            await callback_query.answer("❌ Только заказчики могут одобрять предложения!")
+        if not buyer or buyer.role != 'buyer':
+            await callback_query.message.answer("❌ Только заказчики могут одобрять предложения!")
             return
         
-        # Получаем данные предложения
-        offer = db.get_offer_with_items(offer_id)
+        # Одобряем предложение и создаем доставку в одной транзакции
+        offer = await asyncio.to_thread(db.approve_offer, offer_id)
         if not offer:
-            await callback_query.answer("❌ Предложение не найдено!")
+            await callback_query.message.answer("❌ Предложение не найдено!")
             return
         
-        # Получаем информацию о заявке
-        conn = db.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cursor.execute("""
-            SELECT pr.object_name, pr.buyer_id, u.object_name as buyer_object
-            FROM purchase_requests pr
-            JOIN users u ON pr.buyer_id = u.id
-            WHERE pr.id = %s
-        """, (offer['purchase_request_id'],))
-        request_info = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        if not request_info:
-            await callback_query.answer("❌ Информация о заявке не найдена!")
+        # Повторное нажатие или уже рассмотренное предложение
+        if offer.already_processed:
+            if offer.status == 'approved':
+                await callback_query.message.answer(f"ℹ️ Таклиф #{offer_id} аллақачон тасдиқланган!")
+            else:
+                await callback_query.message.answer(f"ℹ️ Таклиф #{offer_id} аллақачон кўриб чиқилган.")
             return
         
-        # Обновляем статус предложения
-        db.update_offer_status(offer_id, 'approved')
+        delivery_id = offer.delivery_id
+        warehouse_notifications = await notify_offer_approved(offer, buyer)
         
-        # Создаем запись доставки
-        delivery_id = db.add_delivery(offer_id, None)  # warehouse_user_id будет установлен позже
+        # Формируем информацию о уведомленных зав. складах
+        warehouse_list = ", ".join(warehouse_notifications) if warehouse_notifications else "Топилмади"
         
-        # Получаем зав. складов с тем же объектом
-        warehouse_users = db.get_warehouse_users_by_object(request_info['buyer_object'])
-        warehouse_info = ""
-        warehouse_notifications = []
+        result_text = (
+            f"✅ Таклиф #{offer_id} тасдиқланди!\n"
+            f"👤 Поставщик: {offer.full_name}\n"
+            f"💵 Сумма: {offer.total_amount:,} сўм\n"
+            f"📦 Етказиб бериш #{delivery_id} яратилди\n"
+            f"🏭 Уведомленные зав. склады: {warehouse_list}"
+        )
         
-        if warehouse_users:
-            warehouse_user = warehouse_users[0]  # Берем первого зав. склада
-            warehouse_info = f"\n🏭 Зав. Склад Масул шахс: {warehouse_user['full_name']}\n📞 Телефон: {warehouse_user['phone_number']}"
-            
-            # Уведомляем зав. складов
-            for warehouse in warehouse_users:
-                try:
-                    # Формируем локацию с кликабельной ссылкой
-
-                    
-                    # Формируем полный список товаров
-                    items_text = "\n📦 **Товарлар рўйхати:**\n"
-                    for i, item in enumerate(offer['items'], 1):
-                        items_text += f"{i}. **{item['product_name']}**\n"
-                        items_text += f"   📊 Миқдори: {item['quantity']} {item['unit']}\n"
-                        items_text += f"   📏 Ўлчов бирлиги: {item['unit']}\n"
-                        items_text += f"   💰 Нархи: {item['price_per_unit']:,} сўм\n"
-                        items_text += f"   💵 Сумма: {item['total_price']:,} сўм\n"
-                        if item['material_description']:
-                            items_text += f"   📝 Изох: {item['material_description']}\n"
-                        items_text += "\n"
-                    
-                    # Создаем клавиатуру с кнопками
-                    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-                    
-                    await bot.send_message(
-                        warehouse['telegram_id'],
-                        f"🔔 Янги буюртма тасдиқланди!\n\n"
-                        f"📋 Буюртма #{offer['purchase_request_id']}\n"
-                        f"👤 Буюртмачи: {buyer['full_name']}\n"
-                        f"🏢 Объект: {request_info['buyer_object']}\n"
-                        f"👨‍💼 Поставщик: {offer['full_name']}\n"
-                        f"💵 Умумий сумма: {offer['total_amount']:,} сўм\n"
-                        f"📦 Етказиб бериш #{delivery_id}\n\n"
-                        f"📞 Буюртмачи билан боғланиш: {buyer['phone_number']}\n\n"
-                        f"{items_text}",
-                        parse_mode="Markdown",
-                        reply_markup=keyboard
-                    )
-                    warehouse_notifications.append(warehouse['full_name'])
-                except Exception as e:
-                    logger.error(f"Failed to notify warehouse {warehouse['telegram_id']}: {e}")
+        # Доска остается на месте и показывает новый статус, итог - отдельным сообщением
+        request_id = offer.purchase_request_id
+        await update_offers_workbook_status(request_id, offer_id, 'approved')
+        result_text += await close_request_if_covered(request_id)
+        if is_offer_board_message(request_id, callback_query.message):
+            await callback_query.message.answer(result_text)
         else:
-            warehouse_info = "\n⚠️ Зав. Склад топилмади"
-        
-        # Уведомляем поставщика с кнопкой подтверждения отправки
-        try:
-            # Проверяем, есть ли telegram_id у поставщика
-            if not offer.get('seller_telegram_id'):
-                logger.error(f"Seller telegram_id is missing for offer {offer_id}")
-                return
-            
-            logger.info(f"Sending notification to seller {offer['seller_telegram_id']} for offer {offer_id}")
-            
-            # Создаем клавиатуру с кнопками
-            keyboard_buttons = [
-                [InlineKeyboardButton(text="🚚 Товарларни юборилди", callback_data=f"ship_sent_{delivery_id}")]
-            ]
-            
-            keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
-            
-            # Получаем локацию зав. склада для поставщика
-            warehouse_location = ""
-            if warehouse_users:
-                warehouse_user = warehouse_users[0]
-                if warehouse_user['location']:
-                    # Проверяем, содержит ли локация координаты
-                    if "Координаты:" in warehouse_user['location']:
-                        # Извлекаем координаты
-                        coords_text = warehouse_user['location'].replace("Координаты: ", "")
-                        lat, lon = coords_text.split(", ")
-                        # Создаем ссылку на Google Maps
-                        google_maps_url = f"https://maps.google.com/?q={lat},{lon}"
-                        warehouse_location = f"\n📍 Локация: [Google Maps]({google_maps_url})"
-                    else:
-                        warehouse_location = f"\n📍 Локация: {warehouse_user['location']}"
-            
-            message_text = (
-                f"✅ Сизнинг таклифингиз #{offer_id} буюртмачи томонидан тасдиқланди!\n\n"
-                f"💵 Умумий сумма: {offer['total_amount']:,} сўм\n"
-                f"📅 Тасдиқлаш санаси: {get_current_time()}\n"
-                f"📦 Етказиб бериш #{delivery_id} яратилди{warehouse_info}{warehouse_location}\n\n"
-                f"🚚 Илтимос, товарларни омборга етказиб беринг ва тўғридаги тугмани босинг:"
-            )
-            
-            await bot.send_message(
-                offer['seller_telegram_id'],
-                message_text,
-                reply_markup=keyboard,
-                parse_mode="Markdown"
-            )
-            
-            logger.info(f"Successfully sent notification to seller {offer['seller_telegram_id']}")
-            
-        except Exception as e:
-            logger.error(f"Failed to notify seller {offer.get('seller_telegram_id', 'unknown')}: {e}")
-            logger.error(f"Offer data: {offer}")
-        
-        # Формируем информацию о уведомленных зав. складах
-        warehouse_list = ", ".join(warehouse_notifications) if warehouse_notifications else "Топилмади"
-        
-        await callback_query.message.edit_text(
-            f"✅ Таклиф #{offer_id} тасдиқланди!\n"
-            f"👤 Поставщик: {offer['full_name']}\n"
-            f"💵 Сумма: {offer['total_amount']:,} сўм\n"
-            f"📦 Етказиб бериш #{delivery_id} яратилди\n"
-            f"🏭 Уведомленные зав. склады: {warehouse_list}"
-        )
+            await callback_query.message.edit_text(result_text)
+        await publish_offer_board(request_id)
         
     except Exception as e:
-        await callback_query.answer(f"❌ Ошибка: {str(e)}")
+        logger.error(f"Ошибка одобрения предложения: {e}")
+        await callback_query.message.answer(f"❌ Ошибка: {str(e)}")
+        raise
 
 @router.callback_query(lambda c: c.data.startswith('reject_offer_'))
 async def process_reject_offer(callback_query: types.CallbackQuery):
@@ -1093,7 +1590,7 @@ async def process_reject_offer(callback_query: types.CallbackQuery):
         offer_id = int(callback_query.data.split('_')[2])
         user = db.get_user(callback_query.from_user.id)
         
-        if not user or user['role'] != 'buyer':
+        if not user or user.role != 'buyer':
             await callback_query.answer("❌ Только заказчики могут отклонять предложения!")
             return
         
@@ -1109,17 +1606,24 @@ async def process_reject_offer(callback_query: types.CallbackQuery):
         # Уведомляем поставщика
         try:
             await bot.send_message(
-                offer['seller_telegram_id'],
+                offer.seller_telegram_id,
                 f"❌ Сизнинг таклифингиз #{offer_id} заказчик томонидан рад этилди.\n"
                 f"📅 Рад этиш санаси: {get_current_time()}"
             )
         except Exception as e:
-            logger.error(f"Failed to notify seller {offer['seller_telegram_id']}: {e}")
+            logger.error(f"Failed to notify seller {offer.seller_telegram_id}: {e}")
         
-        await callback_query.message.edit_text(
-            f"❌ Таклиф #{offer_id} рад этилди.\n"
-            f"👤 Поставщик: {offer['full_name']}"
-        )
+        # Доска остается на месте и показывает новый статус
+        request_id = offer.purchase_request_id
+        await update_offers_workbook_status(request_id, offer_id, 'rejected')
+        if is_offer_board_message(request_id, callback_query.message):
+            await callback_query.answer(f"❌ Таклиф #{offer_id} рад этилди.")
+        else:
+            await callback_query.message.edit_text(
+                f"❌ Таклиф #{offer_id} рад этилди.\n"
+                f"👤 Поставщик: {offer.full_name}"
+            )
+        await publish_offer_board(request_id)
         
     except Exception as e:
         await callback_query.answer(f"❌ Ошибка: {str(e)}")
@@ -1132,7 +1636,7 @@ async def process_delivery_confirmation(callback_query: types.CallbackQuery):
         delivery_id = int(callback_query.data.split('_')[1])
         user = db.get_user(callback_query.from_user.id)
         
-        if not user or user['role'] != 'warehouse':
+        if not user or user.role != 'warehouse':
             await callback_query.answer("❌ Только складские работники могут подтверждать доставки!")
             return
         
@@ -1142,7 +1646,9 @@ async def process_delivery_confirmation(callback_query: types.CallbackQuery):
         cursor.execute("""
             SELECT d.*, so.total_amount, pr.supplier, pr.object_name,
                    u_seller.full_name as seller_name, u_buyer.full_name as buyer_name,
-                   u_buyer.telegram_id as buyer_telegram_id
+                   u_buyer.telegram_id as buyer_telegram_id,
+                   (SELECT COALESCE(SUM(soi.total), 0) FROM seller_offer_items soi
+                    WHERE soi.offer_id = so.id AND soi.awarded AND soi.created_at >= so.created_at) as award_total
             FROM deliveries d
             JOIN seller_offers so ON d.offer_id = so.id
             JOIN purchase_requests pr ON so.purchase_request_id = pr.id
@@ -1170,7 +1676,7 @@ async def process_delivery_confirmation(callback_query: types.CallbackQuery):
                 f"🏢 Поставщик: {delivery['supplier']}\n"
                 f"🏗️ Объект: {delivery['object_name']}\n"
                 f"👤 Поставщик: {delivery['seller_name']}\n"
-                f"💵 Сумма: {delivery['total_amount']:,} сум\n"
+                f"💵 Сумма: {delivery['award_total']:,} сум\n"
                 f"📅 Время получения: {get_current_time()}\n\n"
                 f"✅ Товарлар омборда тайёр. Олишингиз мумкин!"
             )
@@ -1187,22 +1693,13 @@ async def process_delivery_confirmation(callback_query: types.CallbackQuery):
     except Exception as e:
         await callback_query.answer(f"❌ Ошибка: {str(e)}")
 
-@router.callback_query(lambda c: c.data.startswith('goods_received_'))
-async def process_goods_received(callback_query: types.CallbackQuery):
-    """Склад подтверждает получение товаров"""
+def load_received_delivery(delivery_id):
+    """Доставка с заказчиком и выигравшими товарами для приемки: (доставка, товары)"""
+    conn = db.get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     try:
-        delivery_id = int(callback_query.data.split('_')[2])
-        user = db.get_user(callback_query.from_user.id)
-        
-        if not user or user['role'] != 'warehouse':
-            await callback_query.answer("❌ Только складские работники могут подтверждать получение!")
-            return
-        
-        # Получаем данные доставки и товаров
-        conn = db.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         cursor.execute("""
-            SELECT d.*, so.total_amount, pr.supplier, pr.object_name,
+            SELECT d.*, so.total_amount, so.created_at as offer_created_at, pr.supplier, pr.object_name,
                    u_seller.full_name as seller_name, u_buyer.full_name as buyer_name,
                    u_buyer.telegram_id as buyer_telegram_id
             FROM deliveries d
@@ -1215,58 +1712,42 @@ async def process_goods_received(callback_query: types.CallbackQuery):
         delivery = cursor.fetchone()
         
         # Получаем товары из предложения поставщика
-        cursor.execute("""
-            SELECT soi.product_name, soi.quantity, soi.unit, soi.price, soi.total, soi.description
-            FROM seller_offer_items soi
-            WHERE soi.offer_id = %s
-        """, (delivery['offer_id'],))
-        items = cursor.fetchall()
+        items = []
+        if delivery:
+            cursor.execute("""
+                SELECT soi.product_name, soi.quantity, soi.unit, soi.price, soi.total, soi.description
+                FROM seller_offer_items soi
+                WHERE soi.offer_id = %s AND soi.awarded AND soi.created_at >= %s
+            """, (delivery['offer_id'], delivery['offer_created_at']))
+            items = cursor.fetchall()
+        return delivery, items
+    finally:
         cursor.close()
         conn.close()
+
+@router.callback_query(lambda c: c.data.startswith('goods_received_'))
+@deferred_callback(background_runner, deduplicator=callback_deduplicator)
+async def process_goods_received(callback_query: types.CallbackQuery):
+    """Склад подтверждает получение товаров (выполняется в фоне)"""
+    try:
+        delivery_id = int(callback_query.data.split('_')[2])
+        user = db.get_user(callback_query.from_user.id)
         
+        if not user or user.role != 'warehouse':
+            await callback_query.message.answer("❌ Только складские работники могут подтверждать получение!")
+            return
+        
+        # Данные доставки и товаров (запросы к базе - в отдельном потоке)
+        delivery, items = await asyncio.to_thread(load_received_delivery, delivery_id)
         if not delivery:
-            await callback_query.answer("❌ Етказиб бериш топилмади!")
+            await callback_query.message.answer("❌ Етказиб бериш топилмади!")
             return
         
-        # Обновляем статус доставки
-        db.update_delivery_status(delivery_id, 'received')
+        # Обновляем статус доставки; товары приходуются на склад объекта в той же транзакции
+        stocked = await asyncio.to_thread(db.update_delivery_status, delivery_id, 'received')
         
-        # Записываем данные в Google Sheets
-        try:
-            sheets_manager = GoogleSheetsManager()
-            
-            # Подготавливаем данные для записи
-            current_date = get_current_time().split()[0]  # Получаем только дату (07.08.2025)
-            
-            delivery_data = {
-                'date': current_date,
-                'supplier': delivery['seller_name'],
-                'object': delivery['object_name'],
-                'items': []
-            }
-            
-            for item in items:
-                # Форматируем цену и сумму (убираем лишние символы)
-                price = str(item['price']).replace(',', '') if item['price'] else '0'
-                total = str(item['total']).replace(',', '') if item['total'] else '0'
-                
-                delivery_data['items'].append({
-                    'name': item['product_name'],
-                    'quantity': str(item['quantity']),
-                    'unit': item['unit'],
-                    'price': price,
-                    'total': total,
-                    'description': item['description'] or ''
-                })
-            
-            # Записываем в Google Sheets
-            if sheets_manager.append_delivery_data(delivery_data):
-                logger.info(f"Данные успешно записаны в Google Sheets для доставки #{delivery_id}")
-            else:
-                logger.error(f"Ошибка записи в Google Sheets для доставки #{delivery_id}")
-                
-        except Exception as e:
-            logger.error(f"Ошибка работы с Google Sheets: {e}")
+        # Запись в Google Sheets синхронная, поэтому выполняется в отдельном потоке
+        await asyncio.to_thread(write_delivery_to_sheets, delivery_id, delivery, items)
         
         # Уведомляем заказчика
         try:
@@ -1276,19 +1757,66 @@ async def process_goods_received(callback_query: types.CallbackQuery):
                 f"📦 Етказиб бериш #{delivery_id}\n"
                 f"🏗️ Объект: {delivery['object_name']}\n"
                 f"👤 Поставщик: {delivery['seller_name']}\n"
-                f"💵 Сумма: {delivery['total_amount']:,} сум\n"
+                f"💵 Сумма: {sum(item['total'] or 0 for item in items):,} сум\n"
                 f"📅 Время получения: {get_current_time()}\n\n"
                 f"✅ Товарлар омборда тайёр. Олишингиз мумкин!"
             )
         except Exception as e:
             logger.error(f"Failed to notify buyer {delivery['buyer_telegram_id']}: {e}")
         
-        # Убираем кнопку из сообщения склада
-        await callback_query.message.edit_reply_markup(reply_markup=None)
-        await callback_query.answer("✅ Товары получены!")
+        # Итог показываем в сообщении склада и убираем кнопку
+        stock_note = f"\n📦 Омбор қолдиғига қўшилди: {stocked} та товар (/stock)" if stocked else ""
+        await callback_query.message.edit_text(
+            f"{callback_query.message.text}\n\n"
+            f"✅ Товарлар қабул қилинди: {get_current_time()}{stock_note}",
+            reply_markup=None
+        )
         
     except Exception as e:
-        await callback_query.answer(f"❌ Ошибка: {str(e)}")
+        logger.error(f"Ошибка подтверждения получения: {e}")
+        await callback_query.message.answer(f"❌ Ошибка: {str(e)}")
+        raise
+
+def write_delivery_to_sheets(delivery_id, delivery, items):
+    """Запись принятой доставки в Google Sheets"""
+    try:
+        sheets_manager = GoogleSheetsManager()
+        
+        # Подготавливаем данные для записи
+        current_date = get_current_time().split()[0]  # Получаем только дату (07.08.2025)
+        
+        delivery_data = {
+            'date': current_date,
+            'supplier': delivery['seller_name'],
+            'object': delivery['object_name'],
+            'items': []
+        }
+        
+        for item in items:
+            # Форматируем цену и сумму (убираем лишние символы)
+            price = str(item['price']).replace(',', '') if item['price'] else '0'
+            total = str(item['total']).replace(',', '') if item['total'] else '0'
+            
+            delivery_data['items'].append({
+                'name': item['product_name'],
+                'quantity': str(item['quantity']),
+                'unit': item['unit'],
+                'price': price,
+                'total': total,
+                'description': item['description'] or ''
+            })
+        
+        # Записываем в Google Sheets
+        with SHEETS_WRITE_LATENCY.time():
+            written = sheets_manager.append_delivery_data(delivery_data)
+        if written:
+            logger.info(f"Данные успешно записаны в Google Sheets для доставки #{delivery_id}")
+        else:
+            SHEETS_WRITE_ERRORS.inc()
+            logger.error(f"Ошибка записи в Google Sheets для доставки #{delivery_id}")
+            
+    except Exception as e:
+        logger.error(f"Ошибка работы с Google Sheets: {e}")
 
 @router.callback_query(lambda c: c.data.startswith('contact_seller_'))
 async def process_contact_seller(callback_query: types.CallbackQuery):
@@ -1312,127 +1840,242 @@ async def process_contact_buyer(callback_query: types.CallbackQuery):
 
 @router.callback_query(lambda c: c.data.startswith('show_offers_'))
 async def process_show_offers(callback_query: types.CallbackQuery):
-    """Показать все предложения для конкретной заявки"""
+    """Показать доску предложений для конкретной заявки"""
     try:
         request_id = int(callback_query.data.split('_')[2])
+        key = ('request', request_id)
         
-        # Получаем данные заявки
-        conn = db.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cursor.execute("""
-            SELECT pr.id, pr.buyer_id, pr.object_name, pr.status, pr.created_at,
-                   u.full_name as buyer_name, u.telegram_id as buyer_telegram_id
-            FROM purchase_requests pr
-            JOIN users u ON pr.buyer_id = u.id
-            WHERE pr.id = %s
-        """, (request_id,))
-        request = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        if not request:
+        # Доска переносится вниз чата не чаще раза за окно, иначе просто обновляется
+        board = await publish_offer_board(request_id, repost=not offer_digests.recently_run(key))
+        if not board:
             await callback_query.answer("❌ Заявка не найдена.")
             return
+        offer_digests.mark_run(key)
         
-        # Получаем все предложения для этой заявки
-        offers = db.get_offers_for_request(request_id)
+        await callback_query.answer("✅ Предложения отправлены!")
         
-        if not offers:
-            await callback_query.answer("📭 Для этой заявки пока нет предложений.")
-            return
+    except Exception as e:
+        await callback_query.answer(f"❌ Ошибка: {str(e)}")
+
+@router.callback_query(lambda c: c.data.startswith('board_refresh_'))
+async def process_board_refresh(callback_query: types.CallbackQuery):
+    """Обновление доски предложений кнопкой"""
+    try:
+        request_id = int(callback_query.data.split('_')[2])
+        await publish_offer_board(request_id)
+        await callback_query.answer("🔄 Янгиланди")
         
-        # Создаем сводку предложений
-        summary = excel_handler.create_offers_summary(offers, request['buyer_name'])
-        
-        # Создаем Excel файл с предложениями
-        excel_file = excel_handler.create_offers_excel(offers, request['buyer_name'])
-        
-        # Создаем кнопки для каждого предложения
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-        for offer in offers:
-            excel_info = f" (📄 {offer['excel_filename']})" if offer.get('excel_filename') else ""
-            keyboard.inline_keyboard.append([
-                InlineKeyboardButton(
-                    text=f"✅ Одобрить #{offer['id']}{excel_info}", 
-                    callback_data=f"approve_offer_{offer['id']}"
-                ),
-                InlineKeyboardButton(
-                    text=f"❌ Отклонить #{offer['id']}{excel_info}", 
-                    callback_data=f"reject_offer_{offer['id']}"
-                )
-            ])
+    except Exception as e:
+        await callback_query.answer(f"❌ Ошибка: {str(e)}")
+
+@router.callback_query(lambda c: c.data.startswith('board_excel_'))
+@deferred_callback(background_runner, deduplicator=callback_deduplicator)
+async def process_board_excel(callback_query: types.CallbackQuery):
+    """Excel файл со всеми предложениями по заявке (выполняется в фоне)"""
+    try:
+        request_id = int(callback_query.data.split('_')[2])
         
-        # Отправляем Excel файл покупателю
-        await bot.send_document(
-            request['buyer_telegram_id'],
-            types.BufferedInputFile(
-                excel_file.getvalue(),
-                filename=f"предложения_заявка_{request_id}_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-            ),
-            caption="📊 Поставщиклар таклифлари билан Excel файл"
+        # Журнал заявки, созданной до его появления, один раз собирается из базы
+        if not offers_workbooks.exists(request_id):
+            offers = await asyncio.to_thread(db.get_offers_for_request, request_id)
+            if not offers:
+                await callback_query.message.answer("📭 Для этой заявки пока нет предложений.")
+                return
+            await asyncio.to_thread(offers_workbooks.seed, request_id, list(reversed(offers)))
+        
+        file_id, version = offers_workbooks.snapshot(request_id)
+        caption = "📊 Поставщиклар таклифлари билан Excel файл"
+        if file_id:
+            # Файл уже загружен в Telegram и не менялся
+            await callback_query.message.answer_document(file_id, caption=caption)
+            return
+        
+        # xlsx собирается из журнала только здесь и только если журнал изменился
+        path = await asyncio.to_thread(offers_workbooks.export, request_id)
+        sent = await callback_query.message.answer_document(
+            types.FSInputFile(path, filename=f"предложения_заявка_{request_id}.xlsx"),
+            caption=caption
         )
+        offers_workbooks.set_file_id(request_id, sent.document.file_id, version)
         
-        # Функция для разбиения длинного текста на части
-        def split_message(text, max_length=4000):
-            """Разбивает длинный текст на части, не превышающие max_length символов"""
-            if len(text) <= max_length:
-                return [text]
-            
-            parts = []
-            current_part = ""
-            lines = text.split('\n')
-            
-            for line in lines:
-                if len(current_part + line + '\n') <= max_length:
-                    current_part += line + '\n'
-                else:
-                    if current_part:
-                        parts.append(current_part.strip())
-                    current_part = line + '\n'
-            
-            if current_part:
-                parts.append(current_part.strip())
-            
-            return parts
+    except Exception as e:
+        logger.error(f"Ошибка выгрузки предложений: {e}")
+        await callback_query.message.answer(f"❌ Ошибка: {str(e)}")
+        raise
+
+def build_price_comparison(request_id):
+    """Матрица цен по заявке: текст и Excel файл (pandas, выполняется в отдельном потоке)"""
+    matrix = build_price_matrix(db.get_request_items(request_id), db.get_offer_item_rows(request_id))
+    if matrix['sellers'].empty:
+        return format_price_matrix(matrix, request_id), None
+    return format_price_matrix(matrix, request_id), excel_handler.create_price_comparison_excel(matrix, request_id)
+
+@router.callback_query(lambda c: c.data.startswith('board_compare_'))
+@deferred_callback(background_runner, deduplicator=callback_deduplicator)
+async def process_board_compare(callback_query: types.CallbackQuery):
+    """Сравнение цен поставщиков по товарам заявки (выполняется в фоне)"""
+    try:
+        request_id = int(callback_query.data.split('_')[2])
+        text, excel_file = await asyncio.to_thread(build_price_comparison, request_id)
         
-        # Разбиваем сводку на части, если она слишком длинная
-        summary_parts = split_message(summary)
+        await callback_query.message.answer(text)
+        if excel_file:
+            await callback_query.message.answer_document(
+                types.BufferedInputFile(excel_file.getvalue(), filename=f"сравнение_цен_заявка_{request_id}.xlsx"),
+                caption="📈 Нархларни солиштириш (энг арзон нархлар яшил рангда)"
+            )
         
-        # Отправляем каждую часть отдельным сообщением
-        for i, part in enumerate(summary_parts):
-            if i == 0:  # Только в первом сообщении добавляем кнопки
-                await bot.send_message(
-                    request['buyer_telegram_id'],
-                    part,
-                    reply_markup=keyboard
-                )
-            else:
-                await bot.send_message(
-                    request['buyer_telegram_id'],
-                    part
-                )
+    except Exception as e:
+        logger.error(f"Ошибка сравнения цен: {e}")
+        await callback_query.message.answer(f"❌ Ошибка: {str(e)}")
+        raise
+
+def compute_split_award(request_id, max_suppliers=None, mandatory_numbers=()):
+    """Распределение товаров заявки между предложениями (numpy, выполняется в отдельном потоке)"""
+    # Только pending-предложения и товары, еще не выигранные одобренными предложениями
+    request_items, rows = open_split_rows(db.get_request_items(request_id), db.get_offer_item_rows(request_id))
+    matrix = build_price_matrix(request_items, rows)
+    keys = list(matrix['items'].index)
+    mandatory = [keys[number - 1] for number in mandatory_numbers if 1 <= number <= len(keys)]
+    plan = optimize_split_award(matrix, max_suppliers, mandatory)
+    plan['item_ids'] = awarded_item_ids(plan, matrix)
+    return format_split_award(plan, matrix, request_id, max_suppliers, mandatory), plan
+
+def get_own_request(request_id, telegram_id):
+    """Заявка, если она принадлежит заказчику с этим telegram_id"""
+    request = db.get_request_with_buyer(request_id)
+    if request and request['buyer_telegram_id'] == telegram_id:
+        return request
+    return None
+
+async def send_split_award(message, request_id, max_suppliers=None, mandatory_numbers=(), edit=False):
+    """Расчет распределения и отправка (или правка) сообщения с кнопками"""
+    try:
+        text, plan = await asyncio.to_thread(compute_split_award, request_id, max_suppliers, mandatory_numbers)
+        split_award_plans[request_id] = {
+            'plan': plan,
+            'max_suppliers': max_suppliers,
+            'mandatory_numbers': tuple(mandatory_numbers),
+        }
+    except SplitAwardError as e:
+        text = f"⚠️ {e}"
+        split_award_plans.pop(request_id, None)
+    
+    keyboard = get_split_award_keyboard(request_id, max_suppliers)
+    if not edit:
+        await message.answer(text, reply_markup=keyboard)
+        return
+    try:
+        await message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+
+@router.message(Command("split"))
+async def cmd_split(message: types.Message):
+    """Распределение заявки: /split 12 2 1,3 (заявка, максимум поставщиков, обязательные товары)"""
+    args = message.text.split()[1:]
+    try:
+        request_id = int(args[0])
+        max_suppliers = int(args[1]) if len(args) > 1 and int(args[1]) > 0 else None
+        mandatory_numbers = [int(number) for number in args[2].split(',') if number.strip()] if len(args) > 2 else []
+    except (IndexError, ValueError):
+        await message.answer("Ишлатиш: /split <ариза рақами> [поставщиклар сони] [мажбурий товарлар, масалан 1,3]")
+        return
+    
+    if not get_own_request(request_id, message.from_user.id):
+        await message.answer("❌ Ариза топилмади.")
+        return
+    await send_split_award(message, request_id, max_suppliers, mandatory_numbers)
+
+@router.callback_query(lambda c: c.data.startswith('split_max_'))
+@deferred_callback(background_runner, deduplicator=callback_deduplicator)
+async def process_split_max(callback_query: types.CallbackQuery):
+    """Пересчет распределения с другим ограничением числа поставщиков (выполняется в фоне)"""
+    try:
+        _, _, request_id, max_suppliers = callback_query.data.split('_')
+        request_id = int(request_id)
+        if not get_own_request(request_id, callback_query.from_user.id):
+            await callback_query.message.answer("❌ Ариза топилмади.")
+            return
         
-        await callback_query.answer("✅ Предложения отправлены!")
+        # Обязательные товары из /split сохраняются при смене ограничения
+        previous = split_award_plans.get(request_id, {})
+        await send_split_award(
+            callback_query.message, request_id,
+            max_suppliers=int(max_suppliers) or None,
+            mandatory_numbers=previous.get('mandatory_numbers', ()),
+            edit=not is_offer_board_message(request_id, callback_query.message)
+        )
         
     except Exception as e:
-        await callback_query.answer(f"❌ Ошибка: {str(e)}")
+        logger.error(f"Ошибка распределения заявки: {e}")
+        await callback_query.message.answer(f"❌ Ошибка: {str(e)}")
+        raise
 
-@router.callback_query(lambda c: c.data.startswith('ship_sent_'))
-async def process_shipment_sent(callback_query: types.CallbackQuery):
-    """Поставщик подтверждает отправку товаров"""
+@router.callback_query(lambda c: c.data.startswith('split_ok_'))
+@deferred_callback(background_runner, deduplicator=callback_deduplicator)
+async def process_split_approve(callback_query: types.CallbackQuery):
+    """Подтверждение распределения: по доставке на каждого поставщика-победителя (выполняется в фоне)"""
     try:
-        delivery_id = int(callback_query.data.split('_')[2])
-        user = db.get_user(callback_query.from_user.id)
+        request_id = int(callback_query.data.split('_')[2])
+        buyer = db.get_user(callback_query.from_user.id)
+        if not buyer or buyer.role != 'buyer' or not get_own_request(request_id, callback_query.from_user.id):
+            await callback_query.message.answer("❌ Только заказчики могут одобрять предложения!")
+            return
         
-        if not user or user['role'] != 'seller':
-            await callback_query.answer("❌ Только поставщики могут подтверждать отправку!")
+        stored = split_award_plans.pop(request_id, None)
+        if not stored or not stored['plan']['item_ids']:
+            await callback_query.message.answer("⚠️ Аввал тақсимотни ҳисобланг: /split " + str(request_id))
             return
         
-        # Получаем данные доставки
-        conn = db.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        result = await asyncio.to_thread(db.approve_split_award, request_id, stored['plan']['item_ids'])
+        if result is None:
+            await callback_query.message.answer("⚠️ Таклифлар ўзгарган, тақсимотни қайта ҳисобланг.")
+            return
+        
+        lines = [f"✅ Ариза #{request_id} тақсимланди!"]
+        # Зав. склады всех победителей без повторов (у поставщиков может быть один склад)
+        warehouse_notifications = {}
+        for offer in result['approved']:
+            warehouse_notifications.update(dict.fromkeys(await notify_offer_approved(offer, buyer)))
+            await update_offers_workbook_status(request_id, offer.id, 'approved')
+            lines.append(
+                f"🏆 #{offer.id} {offer.full_name}: {len(offer.items)} та товар, "
+                f"{offer.award_total:,} сўм, етказиб бериш #{offer.delivery_id}"
+            )
+        if result['approved']:
+            lines.append(f"🏭 Уведомленные зав. склады: {', '.join(warehouse_notifications) or 'Топилмади'}")
+        
+        for offer in result['rejected']:
+            await update_offers_workbook_status(request_id, offer.id, 'rejected')
+            try:
+                await bot.send_message(
+                    offer.seller_telegram_id,
+                    f"❌ Сизнинг таклифингиз #{offer.id} заказчик томонидан рад этилди.\n"
+                    f"📅 Рад этиш санаси: {get_current_time()}"
+                )
+            except Exception as e:
+                logger.error(f"Failed to notify seller {offer.seller_telegram_id}: {e}")
+        if result['rejected']:
+            lines.append(f"❌ Рад этилган таклифлар: {len(result['rejected'])}")
+        
+        closed_text = await close_request_if_covered(request_id)
+        await callback_query.message.edit_text("\n".join(lines) + closed_text)
+        await publish_offer_board(request_id)
+        
+    except Exception as e:
+        logger.error(f"Ошибка подтверждения распределения: {e}")
+        await callback_query.message.answer(f"❌ Ошибка: {str(e)}")
+        raise
+
+def load_shipped_delivery(delivery_id):
+    """Доставка с объектом и выигравшими товарами для уведомления складов: (доставка, товары)"""
+    conn = db.get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
         cursor.execute("""
-            SELECT d.*, so.total_amount, pr.supplier, pr.object_name,
+            SELECT d.*, so.total_amount, pr.supplier, pr.object_name, pr.object_id,
                    u_seller.full_name as seller_name, u_buyer.full_name as buyer_name
             FROM deliveries d
             JOIN seller_offers so ON d.offer_id = so.id
@@ -1442,26 +2085,42 @@ async def process_shipment_sent(callback_query: types.CallbackQuery):
             WHERE d.id = %s
         """, (delivery_id,))
         delivery = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
         if not delivery:
-            await callback_query.answer("❌ Етказиб бериш топилмади!")
-            return
+            return None, []
         
         # Получаем список товаров для этой доставки
-        conn = db.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         cursor.execute("""
             SELECT soi.product_name, soi.quantity, soi.unit, soi.price, soi.total, soi.description
             FROM seller_offer_items soi
-            JOIN seller_offers so ON soi.offer_id = so.id
+            JOIN seller_offers so ON soi.offer_id = so.id AND soi.created_at >= so.created_at
             JOIN deliveries d ON so.id = d.offer_id
-            WHERE d.id = %s
+            WHERE d.id = %s AND soi.awarded
         """, (delivery_id,))
-        delivery_items = cursor.fetchall()
+        return delivery, cursor.fetchall()
+    finally:
         cursor.close()
         conn.close()
+
+@router.callback_query(lambda c: c.data.startswith('ship_sent_'))
+@deferred_callback(background_runner, deduplicator=callback_deduplicator)
+async def process_shipment_sent(callback_query: types.CallbackQuery):
+    """Поставщик подтверждает отправку товаров (выполняется в фоне)"""
+    try:
+        delivery_id = int(callback_query.data.split('_')[2])
+        user = db.get_user(callback_query.from_user.id)
+        
+        if not user or user.role != 'seller':
+            await callback_query.message.answer("❌ Только поставщики могут подтверждать отправку!")
+            return
+        
+        # Данные доставки и товаров (запросы к базе - в отдельном потоке)
+        delivery, delivery_items = await asyncio.to_thread(load_shipped_delivery, delivery_id)
+        if not delivery:
+            await callback_query.message.answer("❌ Етказиб бериш топилмади!")
+            return
+        
+        # При распределении заявки поставщику достается только часть товаров
+        award_total = sum(item['total'] or 0 for item in delivery_items)
         
         # Формируем список товаров
         items_text = "\n📦 **Товарлар рўйхати:**\n"
@@ -1475,8 +2134,13 @@ async def process_shipment_sent(callback_query: types.CallbackQuery):
                 items_text += f"   📝 Изох: {item['description']}\n"
             items_text += "\n"
         
-        # Уведомляем всех складских работников
-        warehouse_users = db.get_users_by_role('warehouse')
+        # Уведомляем зав. склады объекта заявки (или ближайший склад); заявки без объекта - всем складам
+        if delivery['object_id'] is not None:
+            warehouse_users = object_routing.route(delivery['object_id'])
+        else:
+            warehouse_users = await asyncio.to_thread(db.get_users_by_role, 'warehouse')
+        if not warehouse_users:
+            logger.warning(f"Нет зав. складов для объекта {delivery['object_name']} (доставка #{delivery_id})")
         for warehouse_user in warehouse_users:
             try:
                 keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -1484,20 +2148,20 @@ async def process_shipment_sent(callback_query: types.CallbackQuery):
                 ])
                 
                 await bot.send_message(
-                    warehouse_user['telegram_id'],
+                    warehouse_user.telegram_id,
                     f"📦 **Товарлар омборга келди!**\n\n"
                     f"📦 Етказиб бериш #{delivery_id}\n"
                     f"🏗️ Объект: {delivery['object_name']}\n"
                     f"👤 Поставщик: {delivery['seller_name']}\n"
                     f"👤 Буюртмачи: {delivery['buyer_name']}\n"
-                    f"💵 Сумма: {delivery['total_amount']:,} сум\n"
+                    f"💵 Сумма: {award_total:,} сум\n"
                     f"📅 Время: {get_current_time()}\n\n"
                     f"{items_text}\n"
                     f"✅ Илтимос, товарларни текширинг ва тўғридаги тугмани босинг:",
                     reply_markup=keyboard
                 )
             except Exception as e:
-                logger.error(f"Failed to notify warehouse user {warehouse_user['telegram_id']}: {e}")
+                logger.error(f"Failed to notify warehouse user {warehouse_user.telegram_id}: {e}")
         
         # Обновляем сообщение поставщика
         await callback_query.message.edit_text(
@@ -1506,10 +2170,63 @@ async def process_shipment_sent(callback_query: types.CallbackQuery):
             f"📅 Время отправки: {get_current_time()}\n\n"
             f"✅ Склад ходимларига хабар юборилди. Улар товарларни текшириб, тасдиқлашади."
         )
-        await callback_query.answer("✅ Отправка подтверждена!")
         
     except Exception as e:
-        await callback_query.answer(f"❌ Ошибка: {str(e)}")
+        logger.error(f"Ошибка подтверждения отправки: {e}")
+        await callback_query.message.answer(f"❌ Ошибка: {str(e)}")
+        raise
+
+# Inline-поиск по активным заявкам: @bot цемент
+@router.inline_query()
+async def process_inline_search(inline_query: types.InlineQuery):
+    """Поиск активных заявок по названию и описанию товара"""
+    user = db.get_user(inline_query.from_user.id)
+    if not user or user.role != 'seller' or not user.is_approved:
+        await inline_query.answer([], cache_time=60, is_personal=True)
+        return
+    
+    terms = search_terms(inline_query.query)
+    if not terms:
+        await inline_query.answer([], cache_time=60, is_personal=True)
+        return
+    
+    key = tuple(terms)
+    requests = inline_search_cache.get(key)
+    if requests is None:
+        rows = db.search_active_request_items(terms, limit=INLINE_SEARCH_LIMIT * 10)
+        requests = group_search_rows(rows, INLINE_SEARCH_LIMIT)
+        inline_search_cache.put(key, requests)
+    
+    results = []
+    for req in requests:
+        items_text = ""
+        for i, item in enumerate(req['items'][:5], 1):
+            items_text += f"{i}. {item['product_name']} - {item['quantity']} {item['unit']}\n"
+            if item['material_description']:
+                items_text += f"   📝 {item['material_description']}\n"
+        if len(req['items']) > 5:
+            items_text += f"... и еще {len(req['items']) - 5} товаров\n"
+        
+        results.append(types.InlineQueryResultArticle(
+            id=str(req['id']),
+            title=f"📋 Заявка #{req['id']} - {req['object_name']}",
+            description=", ".join(item['product_name'] for item in req['items'][:3]),
+            input_message_content=types.InputTextMessageContent(
+                message_text=(
+                    f"📋 Заявка #{req['id']}\n\n"
+                    f"🏗️ Объект: {req['object_name']}\n"
+                    f"📅 Дата: {req['created_at'].strftime('%d.%m.%Y %H:%M')}\n\n"
+                    f"📋 Товары:\n{items_text}"
+                )
+            ),
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="💼 Отправить предложение", callback_data=f"send_offer_{req['id']}")]
+            ])
+        ))
+    
+    # Telegram тоже кэширует ответ на cache_time секунд - только для этого пользователя,
+    # иначе кэш отдал бы заявки не поставщику с тем же запросом
+    await inline_query.answer(results, cache_time=int(INLINE_SEARCH_CACHE_TTL), is_personal=True)
 
 # Обработчик текстовых сообщений
 @router.message()
@@ -1523,7 +2240,7 @@ async def handle_text(message: types.Message, state: FSMContext):
     
     user = db.get_user(message.from_user.id)
     
-    if not user or not user['is_approved']:
+    if not user or not user.is_approved:
         await message.answer("Илтимос, аввал /register ёрдамида рўйхатдан ўтинг")
         return
     
@@ -1537,28 +2254,31 @@ async def handle_text(message: types.Message, state: FSMContext):
         "📋 Фаол аризалар",
         "💼 Менинг таклифларим",
         "📦 Кутган етказиб беришлар",
+        "📦 Омбор қолдиғи",
         "📊 Барча таклифлар"
     ]
     
     # Если это команда меню, обрабатываем её
     if text in menu_commands:
         if text == "ℹ️ Ёрдам":
-            await show_help(message, user['role'])
-        elif text == "📋 Ариза яратиш" and user['role'] == 'buyer':
+            await show_help(message, user.role)
+        elif text == "📋 Ариза яратиш" and user.role == 'buyer':
             await start_purchase_request(message, state)
-        elif text == "📊 Менинг аризаларим" and user['role'] == 'buyer':
+        elif text == "📊 Менинг аризаларим" and user.role == 'buyer':
             await show_my_requests(message)
-        elif text == "📦 Менинг буюртмаларим" and user['role'] == 'buyer':
+        elif text == "📦 Менинг буюртмаларим" and user.role == 'buyer':
             await show_my_orders(message)
-        elif text == "📋 Фаол аризалар" and user['role'] == 'seller':
+        elif text == "📋 Фаол аризалар" and user.role == 'seller':
             await show_active_requests(message)
-        elif text == "💼 Менинг таклифларим" and user['role'] == 'seller':
+        elif text == "💼 Менинг таклифларим" and user.role == 'seller':
             await show_my_offers(message)
-        elif text == "📦 Кутган етказиб беришлар" and user['role'] == 'warehouse':
+        elif text == "📦 Кутган етказиб беришлар" and user.role == 'warehouse':
             await show_pending_deliveries(message)
-        elif text == "✅ Қабул қилинган товарлар" and user['role'] == 'warehouse':
+        elif text == "✅ Қабул қилинган товарлар" and user.role == 'warehouse':
             await show_received_deliveries(message)
-        elif text == "📊 Барча таклифлар" and user['role'] == 'buyer':
+        elif text == "📦 Омбор қолдиғи" and user.role == 'warehouse':
+            await send_stock(message, message.from_user.id)
+        elif text == "📊 Барча таклифлар" and user.role == 'buyer':
             await show_all_offers(message)
         else:
             await message.answer("❌ У вас нет прав для этой функции.")
@@ -1574,17 +2294,24 @@ async def show_help(message: types.Message, role: str):
         help_text += "👤 Заказчик:\n"
         help_text += "• Товар сотиб олиш учун аризалар яратинг\n"
         help_text += "• Поставщиклардан таклифлар олинг\n"
-        help_text += "• Буюртмалар статусини кузатинг\n\n"
+        help_text += "• Буюртмалар статусини кузатинг\n"
+        help_text += "• /split <ариза> [поставщиклар сони] [мажбурий товарлар: 1,3] - товарларни поставщиклар орасида тақсимлаш\n"
+        help_text += "• /cancel_request <ариза> - аризани бекор қилиш\n"
+        help_text += "• /stock [товар] - объект омборидаги қолдиқ\n"
+        help_text += "• /history - архивдаги буюртмалар (Excel)\n\n"
     elif role == 'seller':
         help_text += "🏪 Поставщик:\n"
         help_text += "• Фаол аризаларни кўринг\n"
         help_text += "• Заказчикларга таклифлар юборинг\n"
-        help_text += "• Ўзингизнинг таклифларингизни кузатинг\n\n"
+        help_text += "• Ўзингизнинг таклифларингизни кузатинг\n"
+        help_text += "• /subscriptions - қайси аризалар келишини танланг\n\n"
     elif role == 'warehouse':
         help_text += "🏭 Зав. Склад:\n"
         help_text += "• Поставщиклардан товарларни қабул қилинг\n"
         help_text += "• Товарларни олишни тасдиқланг\n"
-        help_text += "• Заказчикларни хабардор қилинг\n\n"
+        help_text += "• Заказчикларни хабардор қилинг\n"
+        help_text += "• /stock [товар] - объект омборидаги қолдиқ (масалан: /stock цемент)\n"
+        help_text += "• /history - архивдаги қабул қилинган товарлар (Excel)\n\n"
     
     help_text += "⏰ Вақт: " + get_current_time()
     await message.answer(help_text)
@@ -1605,35 +2332,12 @@ async def start_purchase_request(message: types.Message, state: FSMContext):
 async def show_my_requests(message: types.Message):
     """Показать заявки заказчика"""
     user = db.get_user(message.from_user.id)
-    if not user or user['role'] != 'buyer':
+    if not user or user.role != 'buyer':
         await message.answer("❌ Фақат заказчиклар аризаларни кўра олади.")
         return
     
-    # Получаем заявки пользователя
-    conn = db.get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cursor.execute("""
-        SELECT id, buyer_id, 
-               COALESCE(supplier, 'Не указан') as supplier_name, 
-               COALESCE(object_name, 'Не указан') as object_name,
-               status, created_at
-        FROM purchase_requests 
-        WHERE buyer_id = %s 
-        ORDER BY created_at DESC
-    """, (user['id'],))
-    requests = cursor.fetchall()
-    
-    # Получаем товары для каждой заявки
-    for request in requests:
-        cursor.execute("""
-            SELECT * FROM request_items 
-            WHERE request_id = %s 
-            ORDER BY created_at
-        """, (request['id'],))
-        request['items'] = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
+    # Итоги (товары, предложения, лучшая сумма) берутся из строки заявки
+    requests = db.get_requests_for_buyer(user.id)
     
     if not requests:
         await message.answer("📭 Ҳозирча аризаларингиз йўқ.")
@@ -1663,29 +2367,18 @@ async def show_my_requests(message: types.Message):
         return parts
 
     for req in requests:  # Показываем все заявки
-        text = f"📋 **Заявка #{req['id']}**\n\n"
-        text += f"🏢 Поставщик: {req['supplier_name']}\n"
-        text += f"🏗️ Объект: {req['object_name']}\n"
-        text += f"📦 Количество товаров: {len(req['items'])}\n"
-        text += f"📅 Дата: {req['created_at'].strftime('%d.%m.%Y %H:%M')}\n"
-        text += f"📊 Статус: {req['status']}\n\n"
-        
-        # Добавляем полную информацию о товарах
-        text += "📋 **Товары:**\n"
-        if req['items']:
-            for i, item in enumerate(req['items'], 1):
-                text += f"{i}. {item['product_name']}\n"
-                text += f"   📊 Количество: {item['quantity']} {item['unit']}\n"
-                if item['material_description']:
-                    text += f"   📝 Описание: {item['material_description']}\n"
-                text += "\n"
-        else:
-            text += "Товары не загружены\n"
+        text = f"📋 **Заявка #{req.id}**\n\n"
+        text += f"🏢 Поставщик: {req.supplier_name}\n"
+        text += f"🏗️ Объект: {req.object_name}\n"
+        text += f"📦 Количество товаров: {req.item_count}\n"
+        text += f"💼 Предложений: {req.offer_count}\n"
+        if req.best_total is not None:
+            text += f"🏆 Лучшая сумма: {req.best_total:,} сум\n"
+        text += f"📅 Дата: {req.created_at.strftime('%d.%m.%Y %H:%M')}\n"
+        text += f"📊 Статус: {REQUEST_STATUSES.get(req.status, req.status)}\n"
         
         # Создаем кнопку для показа всех предложений
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="📊 Барча таклифларни кўриш", callback_data=f"show_offers_{req['id']}")]
-        ])
+        keyboard = get_my_request_keyboard(req.id, active=req.status == 'active')
         
         # Разбиваем текст на части, если он слишком длинный
         text_parts = split_message(text)
@@ -1695,63 +2388,53 @@ async def show_my_requests(message: types.Message):
             else:
                 await message.answer(part)
 
+async def send_streamed_export(message, write, rows, filename, caption):
+    """
+    Потоковая выгрузка в Excel: запись во временный файл в отдельном потоке и отправка
+    
+    Args:
+        write: Метод ExcelHandler.write_*_stream(rows, path)
+        rows: Итератор строк (серверный курсор Database.iter_*)
+    
+    Returns:
+        int: Число выгруженных строк (файл без строк не отправляется)
+    """
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        count = await asyncio.to_thread(write, rows, path)
+        if count:
+            await message.answer_document(types.FSInputFile(path, filename=filename), caption=caption)
+        return count
+    finally:
+        os.remove(path)
+
 async def show_active_requests(message: types.Message):
     """Показать активные заявки для поставщиков"""
     user = db.get_user(message.from_user.id)
-    if not user or user['role'] != 'seller':
+    if not user or user.role != 'seller':
         await message.answer("❌ Фақат поставщиклар фаол аризаларни кўра олади.")
         return
     
-    # Получаем активные заявки
-    conn = db.get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cursor.execute("""
-        SELECT pr.id, pr.buyer_id, 
-               COALESCE(pr.supplier, 'Не указан') as supplier_name, 
-               COALESCE(pr.object_name, 'Не указан') as object_name,
-               pr.status, pr.created_at,
-               u.full_name as buyer_name 
-        FROM purchase_requests pr
-        JOIN users u ON pr.buyer_id = u.id
-        WHERE pr.status = 'active'
-        ORDER BY pr.created_at DESC
-    """)
-    requests = cursor.fetchall()
-    
-    # Получаем товары для каждой заявки
-    for request in requests:
-        cursor.execute("""
-            SELECT * FROM request_items 
-            WHERE request_id = %s 
-            ORDER BY created_at
-        """, (request['id'],))
-        request['items'] = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
+    # Последние заявки для текста; полный список выгружается в Excel потоково
+    requests = await asyncio.to_thread(db.get_active_requests_preview, 5)
     
     if not requests:
         await message.answer("📭 Фаол аризалар йўқ.")
         return
     
-    # Создаем Excel файл с активными заявками
-    excel_file = excel_handler.create_active_requests_excel(requests, user['full_name'])
-    
-    # Отправляем Excel файл
-    await message.answer_document(
-        types.BufferedInputFile(
-            excel_file.getvalue(),
-            filename=f"активные_заявки_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-        ),
+    await send_streamed_export(
+        message, excel_handler.write_active_requests_stream, db.iter_active_request_items(EXPORT_ITERSIZE),
+        filename=f"активные_заявки_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
         caption="📋 Excel файл с активными заявками"
     )
     
-    for req in requests[:5]:  # Показываем последние 5 заявок
+    for req in requests:  # Показываем последние 5 заявок
         text = f"📋 **Заявка #{req['id']}**\n\n"
         text += f"👤 Заказчик: {req['buyer_name']}\n"
         text += f"🏢 Поставщик: {req['supplier_name']}\n"
         text += f"🏗️ Объект: {req['object_name']}\n"
-        text += f"📦 Количество товаров: {len(req['items'])}\n"
+        text += f"📦 Количество товаров: {req['item_count']}\n"
         text += f"📅 Дата: {req['created_at'].strftime('%d.%m.%Y %H:%M')}\n\n"
         
         # Добавляем информацию о товарах
@@ -1762,8 +2445,8 @@ async def show_active_requests(message: types.Message):
                 if item['material_description']:
                     text += f"   📝 {item['material_description']}\n"
             
-            if len(req['items']) > 3:
-                text += f"... и еще {len(req['items']) - 3} товаров\n"
+            if req['item_count'] > 3:
+                text += f"... и еще {req['item_count'] - 3} товаров\n"
         else:
             text += "Товары не загружены\n"
         
@@ -1777,26 +2460,20 @@ async def show_active_requests(message: types.Message):
 async def show_my_orders(message: types.Message):
     """Показать одобренные заказы заказчика"""
     user = db.get_user(message.from_user.id)
-    if not user or user['role'] != 'buyer':
+    if not user or user.role != 'buyer':
         await message.answer("❌ Фақат заказчиклар буюртмаларни кўра олади.")
         return
     
-    # Получаем одобренные предложения
-    approved_offers = db.get_approved_offers_for_buyer(user['id'])
+    # Последние одобренные предложения для текста; полный список выгружается в Excel потоково
+    approved_offers = await asyncio.to_thread(db.get_approved_offers_for_buyer, user.id, 10)
     
     if not approved_offers:
         await message.answer("📭 Ҳозирча тасдиқланган буюртмаларингиз йўқ.")
         return
     
-    # Создаем Excel файл с одобренными заказами
-    excel_file = excel_handler.create_offers_excel(approved_offers, user['full_name'])
-    
-    # Отправляем Excel файл
-    await message.answer_document(
-        types.BufferedInputFile(
-            excel_file.getvalue(),
-            filename=f"одобренные_заказы_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-        ),
+    await send_streamed_export(
+        message, excel_handler.write_offers_stream, db.iter_approved_offer_items(user.id, EXPORT_ITERSIZE),
+        filename=f"одобренные_заказы_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
         caption="📦 Excel файл с одобренными заказами"
     )
     
@@ -1824,24 +2501,24 @@ async def show_my_orders(message: types.Message):
         return parts
 
     # Отправляем текстовую сводку
-    for offer in approved_offers:  # Показываем все заказы
-        text = f"📦 **Заказ #{offer['id']}**\n\n"
-        text += f"🏢 Поставщик: {offer['supplier_name']}\n"
-        text += f"🏗️ Объект: {offer['object_name']}\n"
-        text += f"👤 Поставщик: {offer['full_name']}\n"
-        text += f"📞 Телефон: {offer['phone_number']}\n"
-        text += f"💵 Общая сумма: {offer['total_amount']:,} сум\n"
-        text += f"📅 Дата: {offer['created_at'].strftime('%d.%m.%Y %H:%M')}\n\n"
+    for offer in approved_offers:  # Показываем последние 10 заказов, все - в Excel
+        text = f"📦 **Заказ #{offer.id}**\n\n"
+        text += f"🏢 Поставщик: {offer.supplier_name}\n"
+        text += f"🏗️ Объект: {offer.object_name}\n"
+        text += f"👤 Поставщик: {offer.full_name}\n"
+        text += f"📞 Телефон: {offer.phone_number}\n"
+        text += f"💵 Общая сумма: {offer.total_amount:,} сум\n"
+        text += f"📅 Дата: {offer.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
         
         # Детали товаров
         text += "📋 **Товары:**\n"
-        for i, item in enumerate(offer['items'], 1):
-            text += f"{i}. {item['product_name']}\n"
-            text += f"   📊 Количество: {item['quantity']} {item['unit']}\n"
-            text += f"   💰 Цена за единицу: {item['price_per_unit']:,} сум\n"
-            text += f"   💵 Сумма: {item['total_price']:,} сум\n"
-            if item['material_description']:
-                text += f"   📝 Описание: {item['material_description']}\n"
+        for i, item in enumerate(offer.items, 1):
+            text += f"{i}. {item.product_name}\n"
+            text += f"   📊 Количество: {item.quantity} {item.unit}\n"
+            text += f"   💰 Цена за единицу: {item.price or 0:,} сум\n"
+            text += f"   💵 Сумма: {item.total or 0:,} сум\n"
+            if item.description:
+                text += f"   📝 Описание: {item.description}\n"
             text += "\n"
         
         # Разбиваем текст на части, если он слишком длинный
@@ -1852,7 +2529,7 @@ async def show_my_orders(message: types.Message):
 async def show_my_offers(message: types.Message):
     """Показать предложения поставщика"""
     user = db.get_user(message.from_user.id)
-    if not user or user['role'] != 'seller':
+    if not user or user.role != 'seller':
         await message.answer("❌ Фақат поставщиклар ўз таклифларини кўра олади.")
         return
     
@@ -1865,7 +2542,7 @@ async def show_my_offers(message: types.Message):
         JOIN purchase_requests pr ON so.purchase_request_id = pr.id
         WHERE so.seller_id = %s 
         ORDER BY so.created_at DESC
-    """, (user['id'],))
+    """, (user.id,))
     offers = cursor.fetchall()
     
     cursor.close()
@@ -1894,7 +2571,7 @@ async def show_my_offers(message: types.Message):
 async def show_pending_deliveries(message: types.Message):
     """Показать ожидающие доставки для склада"""
     user = db.get_user(message.from_user.id)
-    if not user or user['role'] != 'warehouse':
+    if not user or user.role != 'warehouse':
         await message.answer("❌ Фақат склад ходимлари етказиб беришларни кўра олади.")
         return
     
@@ -1908,24 +2585,24 @@ async def show_pending_deliveries(message: types.Message):
     await message.answer(f"📦 Кутган етказиб беришлар: {len(deliveries)} та")
     
     for delivery in deliveries[:10]:  # Показываем последние 10 доставок
-        text = f"📦 **Етказиб бериш #{delivery['id']}**\n\n"
-        text += f"🏢 Поставщик: {delivery['supplier']}\n"
-        text += f"🏗️ Объект: {delivery['object_name']}\n"
-        text += f"👤 Поставщик: {delivery['seller_name']}\n"
-        text += f"📞 Телефон поставщика: {delivery['seller_phone']}\n"
-        text += f"👤 Заказчик: {delivery['buyer_name']}\n"
-        text += f"📞 Телефон заказчика: {delivery['buyer_phone']}\n"
-        text += f"💵 Общая сумма: {delivery['total_amount']:,} сум\n"
-        text += f"📅 Дата создания: {delivery['created_at'].strftime('%d.%m.%Y %H:%M')}\n\n"
+        text = f"📦 **Етказиб бериш #{delivery.id}**\n\n"
+        text += f"🏢 Поставщик: {delivery.supplier}\n"
+        text += f"🏗️ Объект: {delivery.object_name}\n"
+        text += f"👤 Поставщик: {delivery.seller_name}\n"
+        text += f"📞 Телефон поставщика: {delivery.seller_phone}\n"
+        text += f"👤 Заказчик: {delivery.buyer_name}\n"
+        text += f"📞 Телефон заказчика: {delivery.buyer_phone}\n"
+        text += f"💵 Общая сумма: {sum(item.total or 0 for item in delivery.items or []):,} сум\n"
+        text += f"📅 Дата создания: {delivery.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
         
         # Добавляем кнопки для управления доставкой
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [
-                InlineKeyboardButton(text="✅ Доставлено", callback_data=f"deliver_{delivery['id']}"),
-                InlineKeyboardButton(text="📞 Связаться с поставщиком", callback_data=f"contact_seller_{delivery['seller_phone']}")
+                InlineKeyboardButton(text="✅ Доставлено", callback_data=f"deliver_{delivery.id}"),
+                InlineKeyboardButton(text="📞 Связаться с поставщиком", callback_data=f"contact_seller_{delivery.seller_phone}")
             ],
             [
-                InlineKeyboardButton(text="📞 Связаться с заказчиком", callback_data=f"contact_buyer_{delivery['buyer_phone']}")
+                InlineKeyboardButton(text="📞 Связаться с заказчиком", callback_data=f"contact_buyer_{delivery.buyer_phone}")
             ]
         ])
         
@@ -1934,7 +2611,7 @@ async def show_pending_deliveries(message: types.Message):
 async def show_received_deliveries(message: types.Message):
     """Показать принятые доставки для склада"""
     user = db.get_user(message.from_user.id)
-    if not user or user['role'] != 'warehouse':
+    if not user or user.role != 'warehouse':
         await message.answer("❌ Фақат склад ходимлари қабул қилинган товарларни кўра олади.")
         return
     
@@ -1948,103 +2625,49 @@ async def show_received_deliveries(message: types.Message):
     await message.answer(f"✅ Қабул қилинган товарлар: {len(deliveries)} та")
     
     for delivery in deliveries[:10]:  # Показываем последние 10 доставок
-        text = f"✅ **Қабул қилинган товарлар #{delivery['id']}**\n\n"
-        text += f"🏢 Поставщик: {delivery['supplier']}\n"
-        text += f"🏗️ Объект: {delivery['object_name']}\n"
-        text += f"👤 Поставщик: {delivery['seller_name']}\n"
-        text += f"👤 Заказчик: {delivery['buyer_name']}\n"
-        text += f"💵 Общая сумма: {delivery['total_amount']:,} сум\n"
-        text += f"📅 Дата принятия: {delivery['received_at'].strftime('%d.%m.%Y %H:%M')}\n\n"
+        text = f"✅ **Қабул қилинган товарлар #{delivery.id}**\n\n"
+        text += f"🏢 Поставщик: {delivery.supplier}\n"
+        text += f"🏗️ Объект: {delivery.object_name}\n"
+        text += f"👤 Поставщик: {delivery.seller_name}\n"
+        text += f"👤 Заказчик: {delivery.buyer_name}\n"
+        text += f"💵 Общая сумма: {sum(item.total or 0 for item in delivery.items or []):,} сум\n"
+        text += f"📅 Дата принятия: {delivery.received_at.strftime('%d.%m.%Y %H:%M')}\n\n"
         
         # Детали товаров
         text += "📋 **Товары:**\n"
-        for i, item in enumerate(delivery['items'], 1):
-            text += f"{i}. {item['product_name']}\n"
-            text += f"   📊 Количество: {item['quantity']} {item['unit']}\n"
-            text += f"   💰 Цена за единицу: {item['price_per_unit']:,} сум\n"
-            text += f"   💵 Сумма: {item['total_price']:,} сум\n"
-            if item['material_description']:
-                text += f"   📝 Описание: {item['material_description']}\n"
+        for i, item in enumerate(delivery.items, 1):
+            text += f"{i}. {item.product_name}\n"
+            text += f"   📊 Количество: {item.quantity} {item.unit}\n"
+            text += f"   💰 Цена за единицу: {item.price or 0:,} сум\n"
+            text += f"   💵 Сумма: {item.total or 0:,} сум\n"
+            if item.description:
+                text += f"   📝 Описание: {item.description}\n"
             text += "\n"
         
         await message.answer(text)
 
 async def show_all_offers(message: types.Message):
-    """Показать все предложения для заказчика"""
+    """Показать доски предложений по заявкам заказчика"""
     user = db.get_user(message.from_user.id)
-    if not user or user['role'] != 'buyer':
+    if not user or user.role != 'buyer':
         await message.answer("❌ Фақат заказчиклар таклифларни кўра олади.")
         return
     
-    # Получаем все предложения для заказчика
-    offers = db.get_all_offers_for_buyer(user['id'])
+    request_ids = db.get_requests_with_pending_offers(user.id)
     
-    if not offers:
+    if not request_ids:
         await message.answer("📭 Ҳозирча таклифлар йўқ.")
         return
     
-    # Создаем сводку всех предложений
-    summary = excel_handler.create_offers_summary(offers, user['full_name'])
-    
-    # Создаем Excel файл с предложениями
-    excel_file = excel_handler.create_offers_excel(offers, user['full_name'])
-    
-    # Создаем кнопки для каждого предложения
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-    for offer in offers:
-        excel_info = f" (📄 {offer['excel_filename']})" if offer.get('excel_filename') else ""
-        keyboard.inline_keyboard.append([
-            InlineKeyboardButton(
-                text=f"✅ Одобрить #{offer['id']}{excel_info}", 
-                callback_data=f"approve_offer_{offer['id']}"
-            ),
-            InlineKeyboardButton(
-                text=f"❌ Отклонить #{offer['id']}{excel_info}", 
-                callback_data=f"reject_offer_{offer['id']}"
-            )
-        ])
-    
-    # Отправляем Excel файл покупателю
-    await message.answer_document(
-        types.BufferedInputFile(
-            excel_file.getvalue(),
-            filename=f"все_предложения_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-        ),
-        caption="📊 Поставщиклар таклифлари билан Excel файл"
-    )
-    
-    # Функция для разбиения длинного текста на части
-    def split_message(text, max_length=4000):
-        """Разбивает длинный текст на части, не превышающие max_length символов"""
-        if len(text) <= max_length:
-            return [text]
-        
-        parts = []
-        current_part = ""
-        lines = text.split('\n')
-        
-        for line in lines:
-            if len(current_part + line + '\n') <= max_length:
-                current_part += line + '\n'
-            else:
-                if current_part:
-                    parts.append(current_part.strip())
-                current_part = line + '\n'
-        
-        if current_part:
-            parts.append(current_part.strip())
-        
-        return parts
-    
-    # Разбиваем сводку на части, если она слишком длинная
-    summary_parts = split_message(summary)
+    # Доски переносятся вниз чата не чаще раза за окно, иначе просто обновляются
+    key = ('buyer', user.id)
+    repost = not offer_digests.recently_run(key)
+    for request_id in reversed(request_ids):
+        await publish_offer_board(request_id, repost=repost)
+    offer_digests.mark_run(key)
     
-    # Отправляем каждую часть отдельным сообщением
-    for i, part in enumerate(summary_parts):
-        if i == 0:  # Только в первом сообщении добавляем кнопки
-            await message.answer(part, reply_markup=keyboard)
-        else:
-            await message.answer(part)
+    if not repost:
+        await message.answer("🔄 Таклифлар тахтаси юқорида янгиланди.")
 
 # Запуск бота
 async def main():
@@ -2052,8 +2675,34 @@ async def main():
     # Создание таблиц базы данных
     db.create_tables()
     
-    # Запуск бота
-    await dp.start_polling(bot)
+    # Загрузка подписок поставщиков в память
+    subscription_index.load(db.get_all_subscriptions())
+    
+    # Справочник объектов и зав. склады по объектам
+    refresh_object_routing()
+    
+    # Запуск монитора event loop
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    
+    # Запуск HTTP сервера метрик
+    if METRICS_ENABLED:
+        start_metrics_server(METRICS_HOST, METRICS_PORT)
+    
+    # Фоновое закрытие заявок с истекшим сроком приема предложений
+    request_sweeper.start()
+    
+    # Перенос давно закрытых заявок в архив небольшими пакетами
+    archive_job.start()
+    
+    # Запуск бота; после остановки дожидаемся фоновых задач
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await request_sweeper.stop()
+        await archive_job.stop()
+        await offer_digests.flush()
+        await background_runner.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
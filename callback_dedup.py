@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+
+from aiogram import BaseMiddleware
+
+from metrics import CALLBACK_DUPLICATES, route_label
+
+DUPLICATE_ANSWER = "⏳ Сўровингиз аллақачон қабул қилинган, кутинг..."
+
+
+class CallbackDeduplicator:
+    """
+    Кратковременная таблица уже принятых нажатий
+
+    Ключ - (callback data, пользователь, сообщение). Записи живут ttl секунд;
+    так как ttl одинаковый, порядок вставки совпадает с порядком истечения.
+    """
+
+    def __init__(self, ttl=30.0, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def _purge(self, now):
+        while self._entries:
+            key, expires_at = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_size:
+                break
+            self._entries.popitem(last=False)
+
+    def acquire(self, key):
+        """True, если нажатие новое; False для повтора в пределах ttl"""
+        now = time.monotonic()
+        self._purge(now)
+        if key in self._entries:
+            return False
+        self._entries[key] = now + self.ttl
+        return True
+
+    def release(self, key):
+        """Снять отметку (например, если обработчик упал и повтор нужен)"""
+        self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def callback_key(callback_query):
+    """Ключ нажатия: данные кнопки, пользователь и сообщение с кнопкой"""
+    message = callback_query.message
+    message_id = message.message_id if message else callback_query.inline_message_id
+    return callback_query.data, callback_query.from_user.id, message_id
+
+
+class CallbackDedupMiddleware(BaseMiddleware):
+    """
+    Отвечает на повторные нажатия сразу, не доходя до обработчика и базы
+
+    Отсеиваются только кнопки с указанными префиксами - действия, меняющие
+    данные (одобрение, отправка, приемка). Просмотр, обновление и переключатели
+    нажимают повторно намеренно. Без префиксов отсеиваются все кнопки.
+    """
+
+    def __init__(self, deduplicator, prefixes=()):
+        self.deduplicator = deduplicator
+        self.prefixes = tuple(prefixes)
+
+    async def __call__(self, handler, event, data):
+        if self.prefixes and not (event.data or '').startswith(self.prefixes):
+            return await handler(event, data)
+
+        key = callback_key(event)
+        if not self.deduplicator.acquire(key):
+            CALLBACK_DUPLICATES.labels(route_label(event)).inc()
+            await event.answer(DUPLICATE_ANSWER)
+            return None
+
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.deduplicator.release(key)
+            raise
@@ -52,4 +52,61 @@ DELIVERY_STATUSES = {
     'pending': 'Ожидает доставки',
     'received': 'Получено',
     'completed': 'Завершено'
-} 
\ No newline at end of file
+}
+
+# Мониторинг задержки event loop (секунды)
+LOOP_MONITOR_ENABLED = os.getenv('LOOP_MONITOR_ENABLED', 'true').lower() == 'true'
+LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL', '0.5'))
+LOOP_LAG_THRESHOLD = float(os.getenv('LOOP_LAG_THRESHOLD', '0.25'))
+
+# Метрики Prometheus (HTTP /metrics)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+# Время (секунды), в течение которого повторное нажатие той же кнопки игнорируется
+CALLBACK_DEDUP_TTL = float(os.getenv('CALLBACK_DEDUP_TTL', '30'))
+
+# Отладка запросов: бюджет запросов на апдейт и порог повторов одного запроса (N+1)
+QUERY_DEBUG = os.getenv('QUERY_DEBUG', 'false').lower() == 'true'
+QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', '20'))
+QUERY_REPEAT_LIMIT = int(os.getenv('QUERY_REPEAT_LIMIT', '5'))
+
+# Фоновая обработка нажатий: сколько задач выполняется одновременно
+BACKGROUND_MAX_CONCURRENCY = int(os.getenv('BACKGROUND_MAX_CONCURRENCY', '8'))
+
+# Inline-поиск по заявкам: время жизни кэша результатов (секунды) и число заявок в ответе
+INLINE_SEARCH_CACHE_TTL = float(os.getenv('INLINE_SEARCH_CACHE_TTL', '30'))
+INLINE_SEARCH_LIMIT = int(os.getenv('INLINE_SEARCH_LIMIT', '20'))
+
+# Окно (секунды), в котором предложения по заявке объединяются в одно обновление доски предложений
+OFFER_DIGEST_WINDOW = float(os.getenv('OFFER_DIGEST_WINDOW', '10'))
+
+# Каталог книг предложений по заявкам (обновляются по одному предложению)
+OFFERS_WORKBOOK_DIR = os.getenv('OFFERS_WORKBOOK_DIR', 'data/offers_workbooks')
+
+# Жизненный цикл заявок: срок приема предложений (дни) и фоновое закрытие просроченных
+REQUEST_BIDDING_DAYS = int(os.getenv('REQUEST_BIDDING_DAYS', '14'))
+REQUEST_SWEEP_INTERVAL = float(os.getenv('REQUEST_SWEEP_INTERVAL', '300'))
+REQUEST_SWEEP_BATCH = int(os.getenv('REQUEST_SWEEP_BATCH', '500'))
+
+# Архивация закрытых заявок: через сколько дней после закрытия, размер пакета,
+# пауза между пакетами (секунды), пакетов за проход и интервал проходов (секунды)
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '90'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '200'))
+ARCHIVE_BATCH_PAUSE = float(os.getenv('ARCHIVE_BATCH_PAUSE', '1'))
+ARCHIVE_MAX_BATCHES = int(os.getenv('ARCHIVE_MAX_BATCHES', '50'))
+ARCHIVE_INTERVAL = float(os.getenv('ARCHIVE_INTERVAL', '3600'))
+
+# Секции request_items и seller_offer_items по месяцам: сколько месяцев создавать заранее
+# и старше скольких месяцев отключать секции, опустевшие после архивации
+PARTITION_PREMAKE_MONTHS = int(os.getenv('PARTITION_PREMAKE_MONTHS', '3'))
+PARTITION_RETENTION_MONTHS = int(os.getenv('PARTITION_RETENTION_MONTHS', '6'))
+
+# Выгрузки в Excel: сколько строк серверный курсор передает за одно обращение
+EXPORT_ITERSIZE = int(os.getenv('EXPORT_ITERSIZE', '2000'))
+
+# Настройки бенчмарков (отдельная база, чтобы не затронуть рабочие данные)
+BENCH_DB_NAME = os.getenv('BENCH_DB_NAME', 'sfx_savdo_bench')
+BENCH_REPORTS_DIR = os.getenv('BENCH_REPORTS_DIR', 'bench_reports')
+BENCH_CORPUS_DIR = os.getenv('BENCH_CORPUS_DIR', 'bench_reports/corpus')
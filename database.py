@@ -2,7 +2,28 @@ import psycopg2
 import psycopg2.extras
 from datetime import datetime
 import pytz
-from config import DB_CONFIG, TIMEZONE
+from config import (
+    DB_CONFIG, TIMEZONE, REQUEST_BIDDING_DAYS, PARTITION_PREMAKE_MONTHS, PARTITION_RETENTION_MONTHS
+)
+from query_tracker import TrackedConnection
+from inline_search import normalize_search_text
+from partitions import PARTITIONED_TABLES, add_months, partition_name, planned_months, expired_partitions
+from row_models import (
+    User, Site, PurchaseRequest, RequestItem, Offer, OfferItem, Delivery, StockBalance, fetch_all, fetch_one
+)
+from object_routing import DEFAULT_OBJECT_NAMES
+from geo_index import COORDINATES_RE
+from stock import receipt_movements, balance_changes
+
+# Таблицы, строки которых по закрытым заявкам переносятся в archive_<таблица>.
+# Порядок - от дочерних к родительским, как того требуют внешние ключи
+ARCHIVE_TABLES = ('deliveries', 'seller_offer_items', 'offer_items', 'seller_offers', 'request_items', 'purchase_requests')
+
+# Внешние ключи секционированных таблиц (при переводе старой таблицы в секционированную)
+PARTITION_FOREIGN_KEYS = {
+    'request_items': "FOREIGN KEY (request_id) REFERENCES purchase_requests(id) ON DELETE CASCADE",
+    'seller_offer_items': "FOREIGN KEY (offer_id) REFERENCES seller_offers(id) ON DELETE CASCADE",
+}
 
 class Database:
     def __init__(self):
@@ -10,15 +31,24 @@ class Database:
         self.timezone = pytz.timezone(TIMEZONE)
     
     def get_connection(self):
-        return psycopg2.connect(**self.config)
+        # TrackedConnection учитывает запросы для детектора N+1 (query_tracker.py)
+        return psycopg2.connect(**self.config, connection_factory=TrackedConnection)
     
     def create_tables(self):
         """Создание всех необходимых таблиц"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Удаляем старую таблицу deliveries если она существует
-        cursor.execute("DROP TABLE IF EXISTS deliveries CASCADE")
+        # Старая таблица deliveries (без offer_id, до доставок по предложениям) пересоздается;
+        # текущая сохраняется - на нее опираются складской учет, приемка и архив
+        cursor.execute("""
+            SELECT to_regclass('deliveries') IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'deliveries' AND column_name = 'offer_id'
+            )
+        """)
+        if cursor.fetchone()[0]:
+            cursor.execute("DROP TABLE deliveries CASCADE")
         
         # Таблица пользователей
         cursor.execute("""
@@ -49,17 +79,19 @@ class Database:
             )
         """)
         
-        # Таблица товаров в заявке
+        # Таблица товаров в заявке (секции по месяцу created_at)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS request_items (
-                id SERIAL PRIMARY KEY,
+                id SERIAL,
                 request_id INTEGER REFERENCES purchase_requests(id) ON DELETE CASCADE,
                 product_name VARCHAR(255),
                 quantity DECIMAL(10,2),
                 unit VARCHAR(50),
                 material_description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+                search_text TEXT,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
         """)
         
         # Таблица предложений поставщиков
@@ -105,10 +137,10 @@ class Database:
             )
         """)
         
-        # Таблица seller_offer_items (новая таблица для деталей предложений)
+        # Таблица seller_offer_items (новая таблица для деталей предложений, секции по месяцу created_at)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS seller_offer_items (
-                id SERIAL PRIMARY KEY,
+                id SERIAL,
                 offer_id INTEGER REFERENCES seller_offers(id) ON DELETE CASCADE,
                 product_name VARCHAR(255),
                 quantity DECIMAL(15,2),
@@ -116,10 +148,14 @@ class Database:
                 price DECIMAL(15,2),
                 total DECIMAL(15,2),
                 description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
         """)
         
+        # Старые несекционированные таблицы переводятся в секционированные, секции создаются заранее
+        self._partition_line_items(cursor)
+        
         # Таблица доставки
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS deliveries (
@@ -133,6 +169,91 @@ class Database:
             )
         """)
         
+        # Подписки поставщиков на категории, ключевые слова и объекты
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS seller_subscriptions (
+                id SERIAL PRIMARY KEY,
+                seller_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+                kind VARCHAR(20) NOT NULL CHECK (kind IN ('category', 'keyword', 'object')),
+                value VARCHAR(255) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (seller_id, kind, value)
+            )
+        """)
+        
+        # Доска предложений: сообщение заказчика, которое редактируется при новых предложениях
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS offer_boards (
+                request_id INTEGER PRIMARY KEY REFERENCES purchase_requests(id) ON DELETE CASCADE,
+                chat_id BIGINT NOT NULL,
+                message_id BIGINT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Строки предложения, вошедшие в заказ (при распределении заявки между поставщиками)
+        cursor.execute("ALTER TABLE seller_offer_items ADD COLUMN IF NOT EXISTS awarded BOOLEAN NOT NULL DEFAULT TRUE")
+        
+        # Связь строки предложения с товаром заявки (ключ из скрытой колонки шаблона).
+        # Внешнего ключа нет: у секционированной request_items уникален только (id, created_at)
+        cursor.execute("ALTER TABLE seller_offer_items ADD COLUMN IF NOT EXISTS request_item_id INTEGER")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_seller_offer_items_request_item_id ON seller_offer_items(request_item_id)")
+        
+        # Индексы для выборки предложений по заявке (доска предложений)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_seller_offers_request_id ON seller_offers(purchase_request_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_seller_offer_items_offer_id ON seller_offer_items(offer_id)")
+        
+        # Жизненный цикл заявки: срок приема предложений и причина закрытия
+        cursor.execute("ALTER TABLE purchase_requests ADD COLUMN IF NOT EXISTS bidding_deadline TIMESTAMP")
+        cursor.execute("ALTER TABLE purchase_requests ADD COLUMN IF NOT EXISTS closed_at TIMESTAMP")
+        cursor.execute("ALTER TABLE purchase_requests ADD COLUMN IF NOT EXISTS close_reason VARCHAR(20)")
+        cursor.execute("""
+            UPDATE purchase_requests
+            SET bidding_deadline = created_at + %s * INTERVAL '1 day'
+            WHERE status = 'active' AND bidding_deadline IS NULL
+        """, (REQUEST_BIDDING_DAYS,))
+        
+        # Частичные индексы только по активным заявкам: их размер не растет с историей
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_purchase_requests_active_created
+            ON purchase_requests(created_at DESC) WHERE status = 'active'
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_purchase_requests_active_deadline
+            ON purchase_requests(bidding_deadline) WHERE status = 'active'
+        """)
+        
+        # Одна доставка на предложение - защита от повторного одобрения. Дубли, созданные
+        # повторным нажатием до появления индекса, удаляются: остается принятая доставка,
+        # иначе самая ранняя
+        cursor.execute("SELECT to_regclass('idx_deliveries_offer_id_unique') IS NULL")
+        if cursor.fetchone()[0]:
+            cursor.execute("""
+                DELETE FROM deliveries WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (
+                            PARTITION BY offer_id ORDER BY (status = 'received') DESC, id
+                        ) AS position
+                        FROM deliveries WHERE offer_id IS NOT NULL
+                    ) ranked
+                    WHERE position > 1
+                )
+            """)
+            if cursor.rowcount:
+                print(f"✅ Удалено повторных доставок: {cursor.rowcount}")
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_deliveries_offer_id_unique ON deliveries(offer_id)
+        """)
+        
+        # Справочник объектов и ссылки на него из пользователей и заявок
+        self._create_objects(cursor)
+        
+        # Складской учет: движения и остатки по объектам
+        self._create_stock(cursor)
+        
+        # Счетчики и суммы в родительских строках, которые поддерживают триггеры
+        self._create_aggregates(cursor)
+        
         conn.commit()
         cursor.close()
         conn.close()
@@ -143,6 +264,669 @@ class Database:
         
         # Автоматическое добавление новых колонок
         self.add_missing_columns()
+        
+        # Индекс для inline-поиска по товарам заявок
+        self.create_search_index()
+        
+        # Архивные таблицы закрытых заявок
+        self.create_archive_tables()
+    
+    def _table_columns(self, cursor, table):
+        """Колонки таблицы через запятую в порядке attnum (для переноса строк между таблицами)"""
+        cursor.execute("""
+            SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) as columns FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+        """, (table,))
+        row = cursor.fetchone()
+        return row['columns'] if isinstance(row, dict) else row[0]
+    
+    def _partition_line_items(self, cursor):
+        """Перевод request_items и seller_offer_items в секционированные таблицы (внутри транзакции)"""
+        for table in PARTITIONED_TABLES:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", (table,))
+            if cursor.fetchone()[0] == 'p':
+                self._ensure_partitions(cursor, table)
+                continue
+            
+            # Старая таблица переименовывается; ее первичный ключ (и внешние ключи на него)
+            # и индексы удаляются, чтобы их имена достались новой таблице
+            legacy = f"{table}_unpartitioned"
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+            cursor.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT IF EXISTS {table}_pkey CASCADE")
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", (legacy,))
+            for (index,) in cursor.fetchall():
+                cursor.execute(f"DROP INDEX IF EXISTS {index}")
+            cursor.execute(f"UPDATE {legacy} SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+            
+            cursor.execute(f"""
+                CREATE TABLE {table} (
+                    LIKE {legacy} INCLUDING DEFAULTS,
+                    PRIMARY KEY (id, created_at),
+                    {PARTITION_FOREIGN_KEYS[table]}
+                ) PARTITION BY RANGE (created_at)
+            """)
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (legacy,))
+            sequence = cursor.fetchone()[0]
+            if sequence:
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+            
+            cursor.execute(f"SELECT MIN(created_at) FROM {legacy}")
+            self._ensure_partitions(cursor, table, since=cursor.fetchone()[0])
+            columns = self._table_columns(cursor, legacy)
+            cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy}")
+            moved = cursor.rowcount
+            cursor.execute(f"DROP TABLE {legacy}")
+            print(f"✅ Таблица {table} секционирована по месяцам ({moved} строк)")
+    
+    def _ensure_partitions(self, cursor, table, since=None):
+        """
+        Секции table на месяцы от since (или текущего) до PARTITION_PREMAKE_MONTHS вперед
+        
+        Строки, вне диапазона секций, попадают в секцию по умолчанию; при создании
+        секции месяца они переносятся в нее, после чего секция подключается.
+        
+        Returns:
+            list: Имена созданных секций
+        """
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+        cursor.execute("SELECT LOCALTIMESTAMP")
+        now = cursor.fetchone()[0]
+        
+        created = []
+        for month in planned_months(now, PARTITION_PREMAKE_MONTHS, since):
+            name = partition_name(table, month)
+            cursor.execute("SELECT to_regclass(%s)", (name,))
+            if cursor.fetchone()[0]:
+                continue
+            next_month = add_months(month, 1)
+            cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+            columns = self._table_columns(cursor, table)
+            cursor.execute(f"""
+                WITH moved AS (
+                    DELETE FROM {table}_default WHERE created_at >= %s AND created_at < %s
+                    RETURNING {columns}
+                )
+                INSERT INTO {name} ({columns}) SELECT {columns} FROM moved
+            """, (month, next_month))
+            cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{month}') TO ('{next_month}')")
+            created.append(name)
+        return created
+    
+    def ensure_partitions(self, since=None):
+        """Создание недостающих секций строк заявок и предложений; возвращает имена созданных"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            created = []
+            for table in PARTITIONED_TABLES:
+                created += self._ensure_partitions(cursor, table, since)
+            conn.commit()
+            return created
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def detach_old_partitions(self, retention_months):
+        """
+        Отключение и удаление секций старше retention_months месяцев
+        
+        Строки закрытых заявок уходят из секций в архив (archive_closed_requests);
+        секция отключается, только когда в ней не осталось строк.
+        
+        Returns:
+            dict: detached - удаленные секции, kept - старые секции, где еще есть строки
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("SELECT LOCALTIMESTAMP")
+            now = cursor.fetchone()[0]
+            detached, kept = [], []
+            for table in PARTITIONED_TABLES:
+                cursor.execute("""
+                    SELECT c.relname FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = %s::regclass
+                """, (table,))
+                names = [row[0] for row in cursor.fetchall()]
+                for name in expired_partitions(table, names, now, retention_months):
+                    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {name})")
+                    if cursor.fetchone()[0]:
+                        kept.append(name)
+                        continue
+                    cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                    cursor.execute(f"DROP TABLE {name}")
+                    detached.append(name)
+            conn.commit()
+            return {'detached': detached, 'kept': kept}
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def _create_objects(self, cursor):
+        """
+        Таблица objects и внешние ключи users.object_id, purchase_requests.object_id
+        
+        Пустой справочник заполняется списком по умолчанию и объектами, уже
+        указанными у пользователей. Колонки object_name остаются для отображения
+        и архива; ссылки на объекты проставляются по точному названию.
+        Координаты объектов и зав. складов хранятся числами (latitude, longitude).
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS objects (
+                id SERIAL PRIMARY KEY,
+                name VARCHAR(255) UNIQUE NOT NULL,
+                is_active BOOLEAN NOT NULL DEFAULT TRUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("SELECT 1 FROM objects LIMIT 1")
+        if cursor.fetchone() is None:
+            psycopg2.extras.execute_values(cursor, """
+                INSERT INTO objects (name) VALUES %s ON CONFLICT (name) DO NOTHING
+            """, [(name,) for name in DEFAULT_OBJECT_NAMES])
+            cursor.execute("""
+                INSERT INTO objects (name)
+                SELECT DISTINCT object_name FROM users
+                WHERE object_name IS NOT NULL AND object_name <> ''
+                ON CONFLICT (name) DO NOTHING
+            """)
+        
+        cursor.execute("ALTER TABLE objects ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION")
+        cursor.execute("ALTER TABLE objects ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION")
+        cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION")
+        cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION")
+        cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS object_id INTEGER REFERENCES objects(id)")
+        cursor.execute("ALTER TABLE purchase_requests ADD COLUMN IF NOT EXISTS object_id INTEGER REFERENCES objects(id)")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_users_warehouse_object
+            ON users(object_id) WHERE role = 'warehouse'
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_purchase_requests_object_id ON purchase_requests(object_id)")
+        self._link_objects(cursor)
+    
+    def _link_objects(self, cursor):
+        """
+        Ссылки на объекты для строк без object_id
+        
+        Пользователь - по названию объекта; заявка - по названию объекта из заявки,
+        а если такого объекта нет в справочнике - по объекту заказчика. Заодно
+        координаты из старых текстовых локаций ("Координаты: lat, lon") переносятся
+        в числовые колонки.
+        """
+        cursor.execute("""
+            UPDATE users u SET object_id = o.id
+            FROM objects o
+            WHERE u.object_id IS NULL AND u.object_name = o.name
+        """)
+        cursor.execute("""
+            UPDATE purchase_requests pr SET object_id = COALESCE(
+                (SELECT o.id FROM objects o WHERE o.name = pr.object_name),
+                (SELECT u.object_id FROM users u WHERE u.id = pr.buyer_id)
+            )
+            WHERE pr.object_id IS NULL
+        """)
+        cursor.execute("""
+            UPDATE users u SET latitude = c.m[1]::double precision, longitude = c.m[2]::double precision
+            FROM (
+                SELECT id, regexp_match(location, %s) AS m FROM users
+                WHERE latitude IS NULL AND location LIKE 'Координаты:%%'
+            ) c
+            WHERE u.id = c.id AND c.m IS NOT NULL
+        """, (COORDINATES_RE.pattern,))
+    
+    def link_objects(self):
+        """Проставление ссылок на объекты (после загрузки данных в обход add_user)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            self._link_objects(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_objects(self, include_inactive=True):
+        """Объекты строительства в порядке добавления"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, name, is_active, latitude, longitude, created_at FROM objects
+            WHERE %s OR is_active
+            ORDER BY id
+        """, (include_inactive,))
+        objects = fetch_all(cursor, Site)
+        
+        cursor.close()
+        conn.close()
+        return objects
+    
+    def add_object(self, name):
+        """Добавление объекта (отключенный объект с тем же названием включается снова)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            INSERT INTO objects (name) VALUES (%s)
+            ON CONFLICT (name) DO UPDATE SET is_active = TRUE
+            RETURNING id, name, is_active, latitude, longitude, created_at
+        """, (name,))
+        obj = fetch_one(cursor, Site)
+        
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return obj
+    
+    def set_object_active(self, object_id, is_active):
+        """
+        Включение или отключение объекта
+        
+        Объект не удаляется: на него ссылаются пользователи и заявки. Отключенный
+        объект не предлагается при регистрации и в подписках.
+        
+        Returns:
+            Site: Измененный объект или None, если объект не найден
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            UPDATE objects SET is_active = %s WHERE id = %s
+            RETURNING id, name, is_active, latitude, longitude, created_at
+        """, (is_active, object_id))
+        obj = fetch_one(cursor, Site)
+        
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return obj
+    
+    def set_object_location(self, object_id, latitude, longitude):
+        """Координаты объекта (для выбора ближайшего склада); None, если объект не найден"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            UPDATE objects SET latitude = %s, longitude = %s WHERE id = %s
+            RETURNING id, name, is_active, latitude, longitude, created_at
+        """, (latitude, longitude, object_id))
+        obj = fetch_one(cursor, Site)
+        
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return obj
+    
+    def _create_stock(self, cursor):
+        """
+        Складской учет: stock_movements (поступления) и stock_balances (остатки)
+        
+        Остаток товара на объекте обновляется в той же транзакции, что и прием
+        доставки, поэтому запрос остатков не суммирует историю доставок. Таблицы,
+        созданные впервые, заполняются по уже принятым доставкам.
+        """
+        cursor.execute("SELECT to_regclass('stock_balances') IS NULL")
+        backfill = cursor.fetchone()[0]
+        
+        # delivery_id без внешнего ключа: доставки переносятся в архив, движения остаются
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_movements (
+                id SERIAL PRIMARY KEY,
+                object_id INTEGER NOT NULL REFERENCES objects(id),
+                delivery_id INTEGER,
+                product_key VARCHAR(255) NOT NULL,
+                product_name VARCHAR(255) NOT NULL,
+                unit VARCHAR(50) NOT NULL DEFAULT '',
+                quantity DECIMAL(15,2) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_object ON stock_movements(object_id, created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_delivery ON stock_movements(delivery_id)")
+        
+        # Остатки по объекту и товару: первичный ключ - индекс выборки по объекту
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_balances (
+                object_id INTEGER NOT NULL REFERENCES objects(id),
+                product_key VARCHAR(255) NOT NULL,
+                unit VARCHAR(50) NOT NULL DEFAULT '',
+                product_name VARCHAR(255) NOT NULL,
+                quantity DECIMAL(15,2) NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (object_id, product_key, unit)
+            )
+        """)
+        cursor.execute("""
+            CREATE OR REPLACE VIEW object_stock AS
+            SELECT o.id AS object_id, o.name AS object_name, sb.product_name, sb.unit, sb.quantity, sb.updated_at
+            FROM stock_balances sb
+            JOIN objects o ON o.id = sb.object_id
+        """)
+        if backfill:
+            self._rebuild_stock(cursor)
+    
+    def _record_receipts(self, cursor, receipts):
+        """
+        Запись поступлений и изменение остатков (двумя пакетными запросами)
+        
+        Args:
+            receipts (list): Кортежи (объект, доставка, время приема или None, товары),
+                             товары - кортежи (название, единица, количество)
+        """
+        movements = []
+        for object_id, delivery_id, received_at, items in receipts:
+            for key, name, unit, quantity in receipt_movements(items):
+                movements.append((object_id, delivery_id, key, name, unit, quantity, received_at))
+        if not movements:
+            return 0
+        
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO stock_movements (object_id, delivery_id, product_key, product_name, unit, quantity, created_at)
+            VALUES %s
+        """, movements, template="(%s, %s, %s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP))", page_size=1000)
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO stock_balances (object_id, product_key, unit, product_name, quantity)
+            VALUES %s
+            ON CONFLICT (object_id, product_key, unit) DO UPDATE
+            SET quantity = stock_balances.quantity + EXCLUDED.quantity,
+                product_name = EXCLUDED.product_name, updated_at = CURRENT_TIMESTAMP
+        """, balance_changes([(object_id, key, name, unit, quantity)
+                               for object_id, _, key, name, unit, quantity, _ in movements]), page_size=1000)
+        return len(movements)
+    
+    def _rebuild_stock(self, cursor):
+        """
+        Пересчет складского учета по журналу движений
+        
+        Движения - основа учета: уже записанные не трогаются (в том числе по доставкам,
+        которые архив перенес в archive_deliveries), дописываются только принятые
+        доставки без движений - рабочие и архивные. Остатки пересчитываются по журналу.
+        """
+        sources = ["""
+            SELECT d.id AS delivery_id, pr.object_id, d.received_at, soi.product_name, soi.unit, soi.quantity
+            FROM deliveries d
+            JOIN seller_offers so ON d.offer_id = so.id
+            JOIN purchase_requests pr ON so.purchase_request_id = pr.id
+            JOIN seller_offer_items soi ON soi.offer_id = so.id AND soi.awarded AND soi.created_at >= so.created_at
+            WHERE d.status = 'received' AND pr.object_id IS NOT NULL
+        """]
+        cursor.execute("SELECT to_regclass('archive_deliveries') IS NOT NULL")
+        if cursor.fetchone()[0]:
+            # В архиве object_id может быть не заполнен (заявки, перенесенные до справочника объектов)
+            sources.append("""
+                SELECT d.id, o.id, d.received_at, soi.product_name, soi.unit, soi.quantity
+                FROM archive_deliveries d
+                JOIN archive_seller_offers so ON d.offer_id = so.id
+                JOIN archive_purchase_requests pr ON so.purchase_request_id = pr.id
+                JOIN objects o ON o.name = pr.object_name
+                JOIN archive_seller_offer_items soi ON soi.offer_id = so.id AND soi.awarded AND soi.created_at >= so.created_at
+                WHERE d.status = 'received'
+            """)
+        
+        cursor.execute("TRUNCATE stock_balances")
+        cursor.execute("""
+            INSERT INTO stock_balances (object_id, product_key, unit, product_name, quantity)
+            SELECT object_id, product_key, unit, (array_agg(product_name ORDER BY id DESC))[1], SUM(quantity)
+            FROM stock_movements
+            GROUP BY object_id, product_key, unit
+        """)
+        cursor.execute(f"""
+            SELECT * FROM ({' UNION ALL '.join(sources)}) received
+            WHERE NOT EXISTS (SELECT 1 FROM stock_movements sm WHERE sm.delivery_id = received.delivery_id)
+            ORDER BY delivery_id
+        """)
+        receipts = {}
+        for delivery_id, object_id, received_at, product_name, unit, quantity in cursor.fetchall():
+            receipt = receipts.setdefault(delivery_id, (object_id, delivery_id, received_at, []))
+            receipt[3].append((product_name, unit, quantity))
+        return self._record_receipts(cursor, list(receipts.values()))
+    
+    def rebuild_stock(self):
+        """
+        Пересчет складского учета (после загрузки данных в обход update_delivery_status)
+        
+        Returns:
+            int: Число дописанных движений
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            recorded = self._rebuild_stock(cursor)
+            conn.commit()
+            return recorded
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_stock(self, object_id, patterns=(), limit=None):
+        """
+        Остатки объекта (ненулевые), по названию товара
+        
+        Args:
+            object_id (int): ID объекта
+            patterns (list): Шаблоны LIKE по нормализованному названию (все должны совпасть)
+            limit (int): Ограничение числа строк
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT object_id, product_key, unit, product_name, quantity, updated_at
+            FROM stock_balances
+            WHERE object_id = %s AND quantity <> 0 AND product_key LIKE ALL(%s::text[])
+            ORDER BY product_name, unit
+            LIMIT %s
+        """, (object_id, list(patterns), limit))
+        balances = fetch_all(cursor, StockBalance)
+        
+        cursor.close()
+        conn.close()
+        return balances
+    
+    def _create_aggregates(self, cursor):
+        """
+        Денормализованные итоги: purchase_requests.item_count/offer_count/best_total,
+        seller_offers.item_count/total_amount
+        
+        Итоги меняют триггеры уровня оператора по таблицам переходов: пакетная вставка
+        товаров одним запросом обновляет родительскую строку один раз. Перенос в архив
+        выполняется с app.skip_aggregates = 'on' - итоги переносимых строк не меняются.
+        Колонки заполняются по текущим данным, только когда добавляются впервые.
+        """
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'purchase_requests' AND column_name = 'item_count'
+        """)
+        backfill = cursor.fetchone() is None
+        
+        cursor.execute("ALTER TABLE purchase_requests ADD COLUMN IF NOT EXISTS item_count INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("ALTER TABLE purchase_requests ADD COLUMN IF NOT EXISTS offer_count INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("ALTER TABLE purchase_requests ADD COLUMN IF NOT EXISTS best_total DECIMAL(15,2)")
+        cursor.execute("ALTER TABLE seller_offers ADD COLUMN IF NOT EXISTS item_count INTEGER NOT NULL DEFAULT 0")
+        if backfill:
+            self._refresh_aggregates(cursor)
+        
+        # Товары заявки -> purchase_requests.item_count
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION request_items_aggregates() RETURNS trigger AS $$
+            BEGIN
+                IF current_setting('app.skip_aggregates', true) = 'on' THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP = 'INSERT' THEN
+                    UPDATE purchase_requests pr SET item_count = pr.item_count + d.n
+                    FROM (SELECT request_id, COUNT(*) AS n FROM new_rows GROUP BY request_id) d
+                    WHERE pr.id = d.request_id;
+                ELSE
+                    UPDATE purchase_requests pr SET item_count = pr.item_count - d.n
+                    FROM (SELECT request_id, COUNT(*) AS n FROM old_rows GROUP BY request_id) d
+                    WHERE pr.id = d.request_id;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        
+        # Товары предложения -> seller_offers.item_count и total_amount
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION seller_offer_items_aggregates() RETURNS trigger AS $$
+            BEGIN
+                IF current_setting('app.skip_aggregates', true) = 'on' THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP = 'INSERT' THEN
+                    UPDATE seller_offers so
+                    SET item_count = so.item_count + d.n, total_amount = COALESCE(so.total_amount, 0) + d.total
+                    FROM (SELECT offer_id, COUNT(*) AS n, COALESCE(SUM(total), 0) AS total
+                          FROM new_rows GROUP BY offer_id) d
+                    WHERE so.id = d.offer_id;
+                ELSIF TG_OP = 'DELETE' THEN
+                    UPDATE seller_offers so
+                    SET item_count = so.item_count - d.n, total_amount = COALESCE(so.total_amount, 0) - d.total
+                    FROM (SELECT offer_id, COUNT(*) AS n, COALESCE(SUM(total), 0) AS total
+                          FROM old_rows GROUP BY offer_id) d
+                    WHERE so.id = d.offer_id;
+                ELSE
+                    UPDATE seller_offers so
+                    SET item_count = so.item_count + d.n, total_amount = COALESCE(so.total_amount, 0) + d.total
+                    FROM (
+                        SELECT offer_id, SUM(n) AS n, SUM(total) AS total FROM (
+                            SELECT offer_id, 1 AS n, COALESCE(total, 0) AS total FROM new_rows
+                            UNION ALL
+                            SELECT offer_id, -1, -COALESCE(total, 0) FROM old_rows
+                        ) changes
+                        GROUP BY offer_id
+                        HAVING SUM(n) <> 0 OR SUM(total) <> 0
+                    ) d
+                    WHERE so.id = d.offer_id;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        
+        # Предложения -> purchase_requests.offer_count и best_total (минимальная сумма
+        # непустого неотклоненного предложения пересчитывается по индексу заявки)
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION seller_offers_aggregates() RETURNS trigger AS $$
+            BEGIN
+                IF current_setting('app.skip_aggregates', true) = 'on' THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP = 'INSERT' THEN
+                    UPDATE purchase_requests pr SET offer_count = pr.offer_count + d.n
+                    FROM (SELECT purchase_request_id, COUNT(*) AS n FROM new_rows GROUP BY purchase_request_id) d
+                    WHERE pr.id = d.purchase_request_id;
+                ELSIF TG_OP = 'DELETE' THEN
+                    UPDATE purchase_requests pr SET offer_count = pr.offer_count - d.n
+                    FROM (SELECT purchase_request_id, COUNT(*) AS n FROM old_rows GROUP BY purchase_request_id) d
+                    WHERE pr.id = d.purchase_request_id;
+                END IF;
+                
+                IF TG_OP = 'DELETE' THEN
+                    UPDATE purchase_requests pr SET best_total = (
+                        SELECT MIN(so.total_amount) FROM seller_offers so
+                        WHERE so.purchase_request_id = pr.id AND so.status <> 'rejected' AND so.item_count > 0
+                    )
+                    WHERE pr.id IN (SELECT purchase_request_id FROM old_rows);
+                ELSE
+                    UPDATE purchase_requests pr SET best_total = (
+                        SELECT MIN(so.total_amount) FROM seller_offers so
+                        WHERE so.purchase_request_id = pr.id AND so.status <> 'rejected' AND so.item_count > 0
+                    )
+                    WHERE pr.id IN (SELECT purchase_request_id FROM new_rows);
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        
+        # Таблицы переходов допускают одно событие на триггер
+        triggers = [
+            ('request_items', 'request_items_aggregates', 'INSERT', 'NEW TABLE AS new_rows'),
+            ('request_items', 'request_items_aggregates', 'DELETE', 'OLD TABLE AS old_rows'),
+            ('seller_offer_items', 'seller_offer_items_aggregates', 'INSERT', 'NEW TABLE AS new_rows'),
+            ('seller_offer_items', 'seller_offer_items_aggregates', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+            ('seller_offer_items', 'seller_offer_items_aggregates', 'DELETE', 'OLD TABLE AS old_rows'),
+            ('seller_offers', 'seller_offers_aggregates', 'INSERT', 'NEW TABLE AS new_rows'),
+            ('seller_offers', 'seller_offers_aggregates', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+            ('seller_offers', 'seller_offers_aggregates', 'DELETE', 'OLD TABLE AS old_rows'),
+        ]
+        for table, function, event, referencing in triggers:
+            name = f"trg_{table}_aggregates_{event.lower()}"
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+            cursor.execute(f"""
+                CREATE TRIGGER {name} AFTER {event} ON {table}
+                REFERENCING {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+            """)
+    
+    def _refresh_aggregates(self, cursor):
+        """Пересчет всех денормализованных итогов по текущим строкам (одним проходом на таблицу)"""
+        cursor.execute("""
+            UPDATE seller_offers so
+            SET item_count = COALESCE(d.n, 0), total_amount = COALESCE(d.total, so.total_amount)
+            FROM seller_offers s
+            LEFT JOIN (
+                SELECT offer_id, COUNT(*) AS n, SUM(total) AS total
+                FROM seller_offer_items GROUP BY offer_id
+            ) d ON d.offer_id = s.id
+            WHERE so.id = s.id
+        """)
+        cursor.execute("""
+            UPDATE purchase_requests pr
+            SET item_count = COALESCE(i.n, 0), offer_count = COALESCE(o.n, 0), best_total = o.best_total
+            FROM purchase_requests p
+            LEFT JOIN (
+                SELECT request_id, COUNT(*) AS n FROM request_items GROUP BY request_id
+            ) i ON i.request_id = p.id
+            LEFT JOIN (
+                SELECT purchase_request_id, COUNT(*) AS n,
+                       MIN(total_amount) FILTER (WHERE status <> 'rejected' AND item_count > 0) AS best_total
+                FROM seller_offers GROUP BY purchase_request_id
+            ) o ON o.purchase_request_id = p.id
+            WHERE pr.id = p.id
+        """)
+    
+    def refresh_aggregates(self):
+        """Пересчет итогов заявок и предложений (после загрузки данных в обход триггеров)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("SET LOCAL app.skip_aggregates = 'on'")
+            self._refresh_aggregates(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def maintain_partitions(self):
+        """Секции на PARTITION_PREMAKE_MONTHS вперед и отключение опустевших старых секций"""
+        result = self.detach_old_partitions(PARTITION_RETENTION_MONTHS)
+        result['created'] = self.ensure_partitions()
+        return result
     
     def fix_decimal_fields(self):
         """Исправление типов полей для поддержки больших чисел"""
@@ -214,7 +998,7 @@ class Database:
             try:
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS seller_offer_items (
-                        id SERIAL PRIMARY KEY,
+                        id SERIAL,
                         offer_id INTEGER REFERENCES seller_offers(id) ON DELETE CASCADE,
                         product_name VARCHAR(255),
                         quantity DECIMAL(15,2),
@@ -222,8 +1006,9 @@ class Database:
                         price DECIMAL(15,2),
                         total DECIMAL(15,2),
                         description TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
+                        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (id, created_at)
+                    ) PARTITION BY RANGE (created_at)
                 """)
                 print("✅ Таблица seller_offer_items создана/проверена")
             except Exception as e:
@@ -236,8 +1021,55 @@ class Database:
             cursor.close()
             conn.close()
     
-    def add_user(self, telegram_id, username, full_name, phone, role, object_name=None, location=None):
-        """Добавление нового пользователя"""
+    def create_search_index(self, batch_size=5000):
+        """Колонка search_text, триграммный индекс и заполнение старых строк"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("ALTER TABLE request_items ADD COLUMN IF NOT EXISTS search_text TEXT")
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_request_items_search_trgm
+                ON request_items USING GIN (search_text gin_trgm_ops)
+            """)
+            conn.commit()
+            print("✅ Индекс поиска по товарам создан/проверен")
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️ Ошибка при создании индекса поиска: {e}")
+        
+        # Заполняем search_text для строк, созданных до появления колонки
+        try:
+            filled = 0
+            while True:
+                cursor.execute("""
+                    SELECT id, product_name, material_description FROM request_items
+                    WHERE search_text IS NULL
+                    LIMIT %s
+                """, (batch_size,))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                psycopg2.extras.execute_values(cursor, """
+                    UPDATE request_items AS ri SET search_text = v.search_text
+                    FROM (VALUES %s) AS v(id, search_text)
+                    WHERE ri.id = v.id
+                """, [(row[0], normalize_search_text(row[1], row[2])) for row in rows])
+                conn.commit()
+                filled += len(rows)
+            if filled:
+                print(f"✅ Заполнено search_text: {filled}")
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️ Ошибка при заполнении search_text: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def add_user(self, telegram_id, username, full_name, phone, role, object_name=None, location=None,
+                 latitude=None, longitude=None):
+        """Добавление нового пользователя (latitude/longitude - геолокация зав. склада)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -249,17 +1081,22 @@ class Database:
             # Обновляем существующего пользователя
             cursor.execute("""
                 UPDATE users SET 
-                username = %s, full_name = %s, phone_number = %s, role = %s, object_name = %s, location = %s
+                username = %s, full_name = %s, phone_number = %s, role = %s, object_name = %s, location = %s,
+                latitude = %s, longitude = %s, object_id = (SELECT id FROM objects WHERE name = %s)
                 WHERE telegram_id = %s
-            """, (username, full_name, phone, role, object_name, location, telegram_id))
+            """, (username, full_name, phone, role, object_name, location, latitude, longitude, object_name,
+                  telegram_id))
             user_id = existing_user[0]
         else:
             # Добавляем нового пользователя
             is_approved = True if role in ['seller'] else False
             cursor.execute("""
-                INSERT INTO users (telegram_id, username, full_name, phone_number, role, object_name, location, is_approved)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
-            """, (telegram_id, username, full_name, phone, role, object_name, location, is_approved))
+                INSERT INTO users (telegram_id, username, full_name, phone_number, role, object_name, location,
+                                   latitude, longitude, is_approved, object_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, (SELECT id FROM objects WHERE name = %s))
+                RETURNING id
+            """, (telegram_id, username, full_name, phone, role, object_name, location, latitude, longitude,
+                  is_approved, object_name))
             user_id = cursor.fetchone()[0]
         
         conn.commit()
@@ -273,23 +1110,23 @@ class Database:
         cursor = conn.cursor()
         
         cursor.execute("""
-            UPDATE users SET object_name = %s
+            UPDATE users SET object_name = %s, object_id = (SELECT id FROM objects WHERE name = %s)
             WHERE telegram_id = %s
-        """, (object_name, telegram_id))
+        """, (object_name, object_name, telegram_id))
         
         conn.commit()
         cursor.close()
         conn.close()
     
-    def update_user_location(self, telegram_id, location):
-        """Обновление локации пользователя"""
+    def update_user_location(self, telegram_id, location, latitude=None, longitude=None):
+        """Обновление локации пользователя (текст и координаты)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
-            UPDATE users SET location = %s
+            UPDATE users SET location = %s, latitude = %s, longitude = %s
             WHERE telegram_id = %s
-        """, (location, telegram_id))
+        """, (location, latitude, longitude, telegram_id))
         
         conn.commit()
         cursor.close()
@@ -298,13 +1135,14 @@ class Database:
     def get_warehouse_users_by_object(self, object_name):
         """Получение зав. складов по объекту"""
         conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT * FROM users 
-            WHERE role = 'warehouse' AND object_name = %s AND is_approved = TRUE
+            SELECT u.* FROM users u
+            JOIN objects o ON u.object_id = o.id
+            WHERE u.role = 'warehouse' AND o.name = %s AND u.is_approved = TRUE
         """, (object_name,))
-        users = cursor.fetchall()
+        users = fetch_all(cursor, User)
         
         cursor.close()
         conn.close()
@@ -313,13 +1151,14 @@ class Database:
     def get_user(self, telegram_id):
         """Получение пользователя по Telegram ID"""
         conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT id, telegram_id, username, full_name, phone_number, role, is_approved, created_at
+            SELECT id, telegram_id, username, full_name, phone_number, role, object_name, object_id, location,
+                   latitude, longitude, is_approved, created_at
             FROM users WHERE telegram_id = %s
         """, (telegram_id,))
-        user = cursor.fetchone()
+        user = fetch_one(cursor, User)
         
         cursor.close()
         conn.close()
@@ -328,10 +1167,10 @@ class Database:
     def get_users_by_role(self, role):
         """Получение всех пользователей по роли"""
         conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = conn.cursor()
         
         cursor.execute("SELECT * FROM users WHERE role = %s AND is_approved = TRUE", (role,))
-        users = cursor.fetchall()
+        users = fetch_all(cursor, User)
         
         cursor.close()
         conn.close()
@@ -351,106 +1190,594 @@ class Database:
         cursor.close()
         conn.close()
     
-    def add_purchase_request(self, buyer_id, object_name, request_type='excel'):
-        """Добавление заявки на покупку"""
+    def get_all_subscriptions(self):
+        """Подписки всех одобренных поставщиков (для загрузки индекса)"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         
         cursor.execute("""
-            INSERT INTO purchase_requests (buyer_id, object_name, request_type)
-            VALUES (%s, %s, %s) RETURNING id
-        """, (buyer_id, object_name, request_type))
+            SELECT ss.seller_id, ss.kind, ss.value
+            FROM seller_subscriptions ss
+            JOIN users u ON ss.seller_id = u.id
+            WHERE u.role = 'seller' AND u.is_approved = TRUE
+        """)
+        subscriptions = cursor.fetchall()
         
-        request_id = cursor.fetchone()[0]
-        conn.commit()
         cursor.close()
         conn.close()
-        return request_id
+        return subscriptions
     
-    def add_request_item(self, request_id, product_name, quantity, unit, material_description):
-        """Добавление товара в заявку"""
+    def get_seller_subscriptions(self, seller_id):
+        """Подписки поставщика в виде списка (kind, value)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
-            INSERT INTO request_items (request_id, product_name, quantity, unit, material_description)
-            VALUES (%s, %s, %s, %s, %s) RETURNING id
-        """, (request_id, product_name, quantity, unit, material_description))
+            SELECT kind, value FROM seller_subscriptions
+            WHERE seller_id = %s
+            ORDER BY kind, value
+        """, (seller_id,))
+        subscriptions = cursor.fetchall()
         
-        item_id = cursor.fetchone()[0]
-        conn.commit()
         cursor.close()
         conn.close()
-        return item_id
+        return subscriptions
     
-    def add_seller_offer(self, request_id, seller_id, total_amount, offer_type='excel', excel_filename=None):
-        """Добавление предложения поставщика"""
+    def add_subscription(self, seller_id, kind, value):
+        """Добавление подписки поставщика (повтор игнорируется)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
-            INSERT INTO seller_offers (purchase_request_id, seller_id, total_amount, offer_type, excel_filename)
-            VALUES (%s, %s, %s, %s, %s) RETURNING id
-        """, (request_id, seller_id, total_amount, offer_type, excel_filename))
+            INSERT INTO seller_subscriptions (seller_id, kind, value)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (seller_id, kind, value) DO NOTHING
+        """, (seller_id, kind, value))
         
-        offer_id = cursor.fetchone()[0]
         conn.commit()
         cursor.close()
         conn.close()
-        return offer_id
     
-    def add_offer_item(self, offer_id, product_name, quantity, unit, price_per_unit, total_price, material_description):
-        """Добавление товара в предложение"""
+    def remove_subscription(self, seller_id, kind=None, value=None):
+        """Удаление подписки; без kind и value удаляются все подписки поставщика"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO seller_offer_items (offer_id, product_name, quantity, unit, price, total, description)
-            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
-        """, (offer_id, product_name, quantity, unit, price_per_unit, total_price, material_description))
+        if kind is None:
+            cursor.execute("DELETE FROM seller_subscriptions WHERE seller_id = %s", (seller_id,))
+        else:
+            cursor.execute("""
+                DELETE FROM seller_subscriptions
+                WHERE seller_id = %s AND kind = %s AND value = %s
+            """, (seller_id, kind, value))
         
-        item_id = cursor.fetchone()[0]
         conn.commit()
         cursor.close()
         conn.close()
-        return item_id
     
-    def get_pending_requests(self):
-        """Получение активных заявок"""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    def add_purchase_request(self, buyer_id, object_name, request_type='excel', items=()):
+        """
+        Добавление заявки на покупку вместе с товарами в одной транзакции
         
-        cursor.execute("""
-            SELECT pr.id, pr.buyer_id, 
-                   COALESCE(pr.supplier, 'Не указан') as supplier_name, 
-                   COALESCE(pr.object_name, 'Не указан') as object_name,
-                   pr.status, pr.created_at,
-                   u.full_name, u.phone_number
-            FROM purchase_requests pr
-            JOIN users u ON pr.buyer_id = u.id
-            WHERE pr.status = 'active'
-            ORDER BY pr.created_at DESC
-        """)
+        Товары вставляются одним запросом, поэтому триггер обновляет
+        purchase_requests.item_count один раз на всю заявку.
         
-        requests = cursor.fetchall()
+        Args:
+            items (list): Товары (product_name, quantity, unit, material_description)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        # Получаем товары для каждой заявки
-        for request in requests:
+        try:
+            cursor.execute("""
+                INSERT INTO purchase_requests (buyer_id, object_name, request_type, bidding_deadline, object_id)
+                VALUES (%s, %s, %s, CURRENT_TIMESTAMP + %s * INTERVAL '1 day', COALESCE(
+                    (SELECT id FROM objects WHERE name = %s),
+                    (SELECT object_id FROM users WHERE id = %s)
+                )) RETURNING id
+            """, (buyer_id, object_name, request_type, REQUEST_BIDDING_DAYS, object_name, buyer_id))
+            request_id = cursor.fetchone()[0]
+            
+            if items:
+                psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO request_items (request_id, product_name, quantity, unit, material_description, search_text)
+                    VALUES %s
+                """, [
+                    (request_id, item['product_name'], item['quantity'], item['unit'], item['material_description'],
+                     normalize_search_text(item['product_name'], item['material_description']))
+                    for item in items
+                ], page_size=len(items))
+            
+            conn.commit()
+            return request_id
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def add_request_item(self, request_id, product_name, quantity, unit, material_description):
+        """Добавление товара в заявку"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            INSERT INTO request_items (request_id, product_name, quantity, unit, material_description, search_text)
+            VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
+        """, (request_id, product_name, quantity, unit, material_description,
+              normalize_search_text(product_name, material_description)))
+        
+        item_id = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return item_id
+    
+    def add_seller_offer(self, request_id, seller_id, items=(), offer_type='excel', excel_filename=None):
+        """
+        Добавление предложения поставщика вместе с товарами в одной транзакции
+        
+        total_amount и item_count предложения считает триггер по вставленным товарам.
+        
+        Args:
+            items (list): Товары из ExcelHandler.parse_seller_offer (product_name, quantity, unit,
+                          price_per_unit, total_price, material_description, request_item_id)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                INSERT INTO seller_offers (purchase_request_id, seller_id, total_amount, offer_type, excel_filename)
+                VALUES (%s, %s, 0, %s, %s) RETURNING id
+            """, (request_id, seller_id, offer_type, excel_filename))
+            offer_id = cursor.fetchone()[0]
+            
+            if items:
+                psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO seller_offer_items (offer_id, product_name, quantity, unit, price, total, description,
+                                                    request_item_id)
+                    VALUES %s
+                """, [
+                    (offer_id, item['product_name'], item['quantity'], item['unit'], item['price_per_unit'],
+                     item['total_price'], item['material_description'], item.get('request_item_id'))
+                    for item in items
+                ], page_size=len(items))
+            
+            conn.commit()
+            return offer_id
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def add_offer_item(self, offer_id, product_name, quantity, unit, price_per_unit, total_price, material_description,
+                       request_item_id=None):
+        """Добавление товара в предложение"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            INSERT INTO seller_offer_items (offer_id, product_name, quantity, unit, price, total, description, request_item_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
+        """, (offer_id, product_name, quantity, unit, price_per_unit, total_price, material_description, request_item_id))
+        
+        item_id = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return item_id
+    
+    def get_pending_requests(self):
+        """Получение активных заявок"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT pr.id, pr.buyer_id, 
+                   COALESCE(pr.supplier, 'Не указан') as supplier_name, 
+                   COALESCE(pr.object_name, 'Не указан') as object_name,
+                   pr.status, pr.created_at,
+                   u.full_name, u.phone_number
+            FROM purchase_requests pr
+            JOIN users u ON pr.buyer_id = u.id
+            WHERE pr.status = 'active'
+            ORDER BY pr.created_at DESC
+        """)
+        
+        requests = fetch_all(cursor, PurchaseRequest)
+        
+        # Получаем товары для каждой заявки; граница по created_at отсекает более старые секции
+        for request in requests:
             cursor.execute("""
                 SELECT * FROM request_items 
-                WHERE request_id = %s 
+                WHERE request_id = %s AND created_at >= %s
                 ORDER BY created_at
-            """, (request['id'],))
-            request['items'] = cursor.fetchall()
+            """, (request.id, request.created_at))
+            request.items = fetch_all(cursor, RequestItem)
         
         cursor.close()
         conn.close()
         return requests
     
+    def get_requests_for_buyer(self, buyer_id):
+        """Заявки заказчика с итогами из самой строки заявки (без товаров и предложений)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, buyer_id,
+                   COALESCE(supplier, 'Не указан') as supplier_name,
+                   COALESCE(object_name, 'Не указан') as object_name,
+                   status, created_at, item_count, offer_count, best_total
+            FROM purchase_requests
+            WHERE buyer_id = %s
+            ORDER BY created_at DESC
+        """, (buyer_id,))
+        requests = fetch_all(cursor, PurchaseRequest)
+        
+        cursor.close()
+        conn.close()
+        return requests
+    
+    def get_active_requests_preview(self, limit=5, items_per_request=3):
+        """
+        Последние активные заявки с числом товаров и первыми товарами (для текста в чате)
+        
+        Полный список выгружается потоково через iter_active_request_items.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        cursor.execute("""
+            SELECT pr.id,
+                   COALESCE(pr.supplier, 'Не указан') as supplier_name,
+                   COALESCE(pr.object_name, 'Не указан') as object_name,
+                   pr.created_at, u.full_name as buyer_name, pr.item_count
+            FROM purchase_requests pr
+            JOIN users u ON pr.buyer_id = u.id
+            WHERE pr.status = 'active'
+            ORDER BY pr.created_at DESC
+            LIMIT %s
+        """, (limit,))
+        requests = cursor.fetchall()
+        
+        items = {}
+        if requests:
+            cursor.execute("""
+                SELECT request_id, product_name, quantity, unit, material_description
+                FROM (
+                    SELECT ri.*, ROW_NUMBER() OVER (PARTITION BY ri.request_id ORDER BY ri.created_at, ri.id) as position
+                    FROM request_items ri
+                    WHERE ri.request_id = ANY(%s) AND ri.created_at >= %s
+                ) ri
+                WHERE position <= %s
+                ORDER BY request_id, position
+            """, ([request['id'] for request in requests],
+                  min(request['created_at'] for request in requests), items_per_request))
+            for item in cursor.fetchall():
+                items.setdefault(item['request_id'], []).append(item)
+        for request in requests:
+            request['items'] = items.get(request['id'], [])
+        
+        cursor.close()
+        conn.close()
+        return requests
+    
+    def iter_active_request_items(self, itersize=2000):
+        """
+        Товары активных заявок для выгрузки в Excel, по строке на товар
+        
+        Именованный (серверный) курсор отдает строки порциями по itersize, поэтому
+        память не зависит от объема выгрузки. Генератор держит соединение открытым,
+        пока его не дочитают.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor('active_requests_export', cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.itersize = itersize
+        
+        try:
+            cursor.execute("""
+                SELECT pr.id as request_id, u.full_name as buyer_name,
+                       COALESCE(pr.supplier, 'Не указан') as supplier_name,
+                       COALESCE(pr.object_name, 'Не указан') as object_name,
+                       pr.created_at, ri.product_name, ri.quantity, ri.unit, ri.material_description
+                FROM purchase_requests pr
+                JOIN users u ON pr.buyer_id = u.id
+                JOIN request_items ri ON ri.request_id = pr.id AND ri.created_at >= pr.created_at
+                WHERE pr.status = 'active'
+                ORDER BY pr.created_at DESC, pr.id, ri.created_at, ri.id
+            """)
+            yield from cursor
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def _close_requests(self, cursor, request_ids, status, reason):
+        """
+        Закрытие активных заявок и отклонение их рассматриваемых предложений (внутри транзакции)
+        
+        Returns:
+            dict: closed - заявки (id, buyer_telegram_id), offers - отклоненные
+                  предложения (id, purchase_request_id, seller_telegram_id), reason
+        """
+        cursor.execute("""
+            UPDATE purchase_requests pr
+            SET status = %s, closed_at = CURRENT_TIMESTAMP, close_reason = %s
+            FROM users u
+            WHERE pr.id = ANY(%s) AND pr.status = 'active' AND u.id = pr.buyer_id
+            RETURNING pr.id, u.telegram_id as buyer_telegram_id
+        """, (status, reason, list(request_ids)))
+        closed = cursor.fetchall()
+        
+        offers = []
+        if closed:
+            cursor.execute("""
+                UPDATE seller_offers so
+                SET status = 'rejected'
+                FROM users u
+                WHERE so.purchase_request_id = ANY(%s) AND so.status = 'pending' AND u.id = so.seller_id
+                RETURNING so.id, so.purchase_request_id, u.telegram_id as seller_telegram_id
+            """, ([request['id'] for request in closed],))
+            offers = cursor.fetchall()
+        
+        return {'closed': closed, 'offers': offers, 'reason': reason}
+    
+    def _run_close(self, close):
+        """Выполнение закрытия заявок в одной транзакции"""
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        try:
+            result = close(cursor)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def cancel_request(self, request_id, buyer_id):
+        """Отмена заявки заказчиком (только своей и только активной)"""
+        def close(cursor):
+            cursor.execute("""
+                SELECT id FROM purchase_requests
+                WHERE id = %s AND buyer_id = %s AND status = 'active'
+                FOR UPDATE
+            """, (request_id, buyer_id))
+            if not cursor.fetchone():
+                return None
+            return self._close_requests(cursor, [request_id], 'cancelled', 'cancelled')
+        
+        return self._run_close(close)
+    
+    def complete_request_if_covered(self, request_id):
+        """
+        Завершение заявки, если каждый ее товар покрыт одобренным предложением
+        
+        Товар покрыт выигравшей строкой одобренного (или доставленного) предложения,
+        связанной через request_item_id, а для строк без связи - по названию.
+        
+        Returns:
+            dict: Как _close_requests (closed пуст, если заявка еще не покрыта)
+        """
+        def close(cursor):
+            cursor.execute("""
+                SELECT pr.id FROM purchase_requests pr
+                WHERE pr.id = %s AND pr.status = 'active'
+                  AND EXISTS (
+                      SELECT 1 FROM request_items ri
+                      WHERE ri.request_id = pr.id AND ri.created_at >= pr.created_at
+                  )
+                  AND NOT EXISTS (
+                      SELECT 1 FROM request_items ri
+                      WHERE ri.request_id = pr.id AND ri.created_at >= pr.created_at
+                        AND NOT EXISTS (
+                            SELECT 1
+                            FROM seller_offers so
+                            JOIN seller_offer_items soi ON soi.offer_id = so.id AND soi.created_at >= so.created_at
+                            WHERE so.purchase_request_id = pr.id
+                              AND so.status IN ('approved', 'delivered')
+                              AND soi.awarded
+                              AND (soi.request_item_id = ri.id
+                                   OR (soi.request_item_id IS NULL
+                                       AND lower(trim(soi.product_name)) = lower(trim(ri.product_name))))
+                        )
+                  )
+                FOR UPDATE
+            """, (request_id,))
+            if not cursor.fetchone():
+                return {'closed': [], 'offers': [], 'reason': 'covered'}
+            return self._close_requests(cursor, [request_id], 'completed', 'covered')
+        
+        return self._run_close(close)
+    
+    def expire_requests(self, batch_size=500):
+        """
+        Закрытие пакета заявок с истекшим сроком приема предложений
+        
+        Строки выбираются по частичному индексу idx_purchase_requests_active_deadline;
+        SKIP LOCKED не дает ждать заявки, которые сейчас одобряются или отменяются.
+        """
+        def close(cursor):
+            cursor.execute("""
+                SELECT id FROM purchase_requests
+                WHERE status = 'active' AND bidding_deadline < CURRENT_TIMESTAMP
+                ORDER BY bidding_deadline
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (batch_size,))
+            request_ids = [row['id'] for row in cursor.fetchall()]
+            if not request_ids:
+                return {'closed': [], 'offers': [], 'reason': 'expired'}
+            return self._close_requests(cursor, request_ids, 'cancelled', 'expired')
+        
+        return self._run_close(close)
+    
+    def search_active_request_items(self, terms, limit=200):
+        """
+        Поиск товаров активных заявок по нормализованным словам (inline-режим)
+        
+        Args:
+            terms (list): Слова из inline_search.search_terms, все должны совпасть
+            limit (int): Максимум строк товаров
+        """
+        if not terms:
+            return []
+        
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        # LIKE '%слово%' использует триграммный индекс idx_request_items_search_trgm
+        cursor.execute("""
+            SELECT ri.request_id, ri.product_name, ri.quantity, ri.unit, ri.material_description,
+                   COALESCE(pr.object_name, 'Не указан') as object_name, pr.created_at
+            FROM request_items ri
+            JOIN purchase_requests pr ON pr.id = ri.request_id AND ri.created_at >= pr.created_at
+            WHERE pr.status = 'active' AND ri.search_text LIKE ALL(%s)
+            ORDER BY pr.created_at DESC, ri.id
+            LIMIT %s
+        """, ([f"%{term}%" for term in terms], limit))
+        rows = cursor.fetchall()
+        
+        cursor.close()
+        conn.close()
+        return rows
+    
+    def get_request_with_buyer(self, request_id):
+        """Заявка с данными заказчика"""
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        cursor.execute("""
+            SELECT pr.id, pr.buyer_id, 
+                   COALESCE(pr.supplier, 'Не указан') as supplier_name, 
+                   COALESCE(pr.object_name, 'Не указан') as object_name,
+                   pr.status, pr.created_at,
+                   u.telegram_id as buyer_telegram_id, u.full_name as buyer_name
+            FROM purchase_requests pr
+            JOIN users u ON pr.buyer_id = u.id
+            WHERE pr.id = %s
+        """, (request_id,))
+        request = cursor.fetchone()
+        
+        cursor.close()
+        conn.close()
+        return request
+    
+    def get_offer_board_rows(self, request_id):
+        """Предложения по заявке без товаров (только item_count) для доски предложений"""
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        cursor.execute("""
+            SELECT so.id, so.total_amount, so.status, so.created_at, u.full_name, so.item_count
+            FROM seller_offers so
+            JOIN users u ON so.seller_id = u.id
+            WHERE so.purchase_request_id = %s
+        """, (request_id,))
+        offers = cursor.fetchall()
+        
+        cursor.close()
+        conn.close()
+        return offers
+    
+    def get_request_items(self, request_id):
+        """Товары заявки"""
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        cursor.execute("""
+            SELECT ri.id, ri.request_id, ri.product_name, ri.quantity, ri.unit, ri.material_description
+            FROM purchase_requests pr
+            JOIN request_items ri ON ri.request_id = pr.id AND ri.created_at >= pr.created_at
+            WHERE pr.id = %s
+            ORDER BY ri.id
+        """, (request_id,))
+        items = cursor.fetchall()
+        
+        cursor.close()
+        conn.close()
+        return items
+    
+    def get_offer_item_rows(self, request_id):
+        """Плоские строки товаров всех предложений по заявке (для матрицы сравнения цен)"""
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        cursor.execute("""
+            SELECT so.id as offer_id, u.full_name, so.status, soi.id as item_id, soi.request_item_id,
+                   soi.product_name, soi.quantity, soi.unit, soi.price, soi.total, soi.awarded
+            FROM seller_offers so
+            JOIN users u ON so.seller_id = u.id
+            JOIN seller_offer_items soi ON soi.offer_id = so.id AND soi.created_at >= so.created_at
+            WHERE so.purchase_request_id = %s
+        """, (request_id,))
+        rows = cursor.fetchall()
+        
+        cursor.close()
+        conn.close()
+        return rows
+    
+    def get_offer_board(self, request_id):
+        """Сообщение доски предложений по заявке"""
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        cursor.execute("SELECT * FROM offer_boards WHERE request_id = %s", (request_id,))
+        board = cursor.fetchone()
+        
+        cursor.close()
+        conn.close()
+        return board
+    
+    def save_offer_board(self, request_id, chat_id, message_id):
+        """Сохранение сообщения доски предложений"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            INSERT INTO offer_boards (request_id, chat_id, message_id)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (request_id) DO UPDATE
+            SET chat_id = EXCLUDED.chat_id, message_id = EXCLUDED.message_id, updated_at = CURRENT_TIMESTAMP
+        """, (request_id, chat_id, message_id))
+        
+        conn.commit()
+        cursor.close()
+        conn.close()
+    
+    def get_requests_with_pending_offers(self, buyer_id, limit=10):
+        """Заявки заказчика, по которым есть нерассмотренные предложения"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT pr.id
+            FROM purchase_requests pr
+            WHERE pr.buyer_id = %s
+              AND EXISTS (
+                  SELECT 1 FROM seller_offers so
+                  WHERE so.purchase_request_id = pr.id AND so.status = 'pending'
+              )
+            ORDER BY pr.created_at DESC
+            LIMIT %s
+        """, (buyer_id, limit))
+        request_ids = [row[0] for row in cursor.fetchall()]
+        
+        cursor.close()
+        conn.close()
+        return request_ids
+    
     def get_offers_for_request(self, request_id):
         """Получение предложений для заявки"""
         conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = conn.cursor()
         
         cursor.execute("""
             SELECT so.*, u.full_name, u.phone_number, so.excel_filename
@@ -460,16 +1787,16 @@ class Database:
             ORDER BY so.created_at DESC
         """, (request_id,))
         
-        offers = cursor.fetchall()
+        offers = fetch_all(cursor, Offer)
         
                 # Получаем детали товаров для каждого предложения
         for offer in offers:
             cursor.execute("""
                 SELECT * FROM seller_offer_items 
-                WHERE offer_id = %s 
+                WHERE offer_id = %s AND created_at >= %s
                 ORDER BY created_at
-            """, (offer['id'],))
-            offer['items'] = cursor.fetchall()
+            """, (offer.id, offer.created_at))
+            offer.items = fetch_all(cursor, OfferItem)
         
         cursor.close()
         conn.close()
@@ -478,7 +1805,7 @@ class Database:
     def get_all_offers_for_buyer(self, buyer_id):
         """Получение всех предложений для заказчика (для всех его заявок)"""
         conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = conn.cursor()
         
         cursor.execute("""
             SELECT so.*, u.full_name, u.phone_number, so.excel_filename,
@@ -490,25 +1817,25 @@ class Database:
             ORDER BY so.created_at DESC
         """, (buyer_id,))
         
-        offers = cursor.fetchall()
+        offers = fetch_all(cursor, Offer)
         
         # Получаем детали товаров для каждого предложения
         for offer in offers:
             cursor.execute("""
                 SELECT * FROM seller_offer_items 
-                WHERE offer_id = %s 
+                WHERE offer_id = %s AND created_at >= %s
                 ORDER BY created_at
-            """, (offer['id'],))
-            offer['items'] = cursor.fetchall()
+            """, (offer.id, offer.created_at))
+            offer.items = fetch_all(cursor, OfferItem)
         
         cursor.close()
         conn.close()
         return offers
     
-    def get_approved_offers_for_buyer(self, buyer_id):
-        """Получение одобренных предложений для заказчика"""
+    def get_approved_offers_for_buyer(self, buyer_id, limit=None):
+        """Получение одобренных предложений для заказчика (limit - только последние)"""
         conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = conn.cursor()
         
         cursor.execute("""
             SELECT so.*, u.full_name, u.phone_number, 
@@ -519,23 +1846,51 @@ class Database:
             JOIN purchase_requests pr ON so.purchase_request_id = pr.id
             WHERE pr.buyer_id = %s AND so.status = 'approved'
             ORDER BY so.created_at DESC
-        """, (buyer_id,))
+            LIMIT %s
+        """, (buyer_id, limit))
         
-        offers = cursor.fetchall()
+        offers = fetch_all(cursor, Offer)
         
         # Получаем детали товаров для каждого предложения
         for offer in offers:
             cursor.execute("""
                 SELECT * FROM seller_offer_items 
-                WHERE offer_id = %s 
+                WHERE offer_id = %s AND created_at >= %s
                 ORDER BY created_at
-            """, (offer['id'],))
-            offer['items'] = cursor.fetchall()
+            """, (offer.id, offer.created_at))
+            offer.items = fetch_all(cursor, OfferItem)
         
         cursor.close()
         conn.close()
         return offers
     
+    def iter_approved_offer_items(self, buyer_id, itersize=2000):
+        """
+        Строки товаров одобренных предложений заказчика для выгрузки в Excel
+        
+        Как iter_active_request_items: серверный курсор с порциями по itersize.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor('approved_offers_export', cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.itersize = itersize
+        
+        try:
+            cursor.execute("""
+                SELECT so.id as offer_id, u.full_name, u.phone_number, so.total_amount, so.status,
+                       so.created_at, soi.product_name, soi.quantity, soi.unit, soi.price, soi.total,
+                       soi.description
+                FROM seller_offers so
+                JOIN users u ON so.seller_id = u.id
+                JOIN purchase_requests pr ON so.purchase_request_id = pr.id
+                JOIN seller_offer_items soi ON soi.offer_id = so.id AND soi.created_at >= so.created_at
+                WHERE pr.buyer_id = %s AND so.status = 'approved' AND soi.awarded
+                ORDER BY so.created_at DESC, so.id, soi.created_at, soi.id
+            """, (buyer_id,))
+            yield from cursor
+        finally:
+            cursor.close()
+            conn.close()
+    
     def update_offer_status(self, offer_id, status):
         """Обновление статуса предложения"""
         conn = self.get_connection()
@@ -553,7 +1908,7 @@ class Database:
     def get_offer_with_items(self, offer_id):
         """Получение предложения с товарами"""
         conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = conn.cursor()
         
         cursor.execute("""
             SELECT so.*, u.full_name, u.phone_number, u.telegram_id as seller_telegram_id
@@ -562,15 +1917,15 @@ class Database:
             WHERE so.id = %s
         """, (offer_id,))
         
-        offer = cursor.fetchone()
+        offer = fetch_one(cursor, Offer)
         
         if offer:
             cursor.execute("""
                 SELECT * FROM seller_offer_items 
-                WHERE offer_id = %s 
+                WHERE offer_id = %s AND created_at >= %s
                 ORDER BY created_at
-            """, (offer_id,))
-            offer['items'] = cursor.fetchall()
+            """, (offer_id, offer.created_at))
+            offer.items = fetch_all(cursor, OfferItem)
         
         cursor.close()
         conn.close()
@@ -592,34 +1947,207 @@ class Database:
         conn.close()
         return delivery_id
     
-    def update_delivery_status(self, delivery_id, status):
-        """Обновление статуса доставки"""
+    def approve_offer(self, offer_id):
+        """
+        Одобрение предложения в одной транзакции
+        
+        Блокирует строку предложения, меняет статус и создает доставку. Повторное
+        нажатие (или одобрение уже рассмотренного предложения) ничего не меняет.
+        
+        Returns:
+            Offer: Предложение с полями items, delivery_id, buyer_object, object_id
+                  и already_processed, или None если предложение не найдено
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        if status == 'received':
+        try:
             cursor.execute("""
-                UPDATE deliveries SET status = %s, received_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-            """, (status, delivery_id))
-        else:
+                SELECT so.*, u.full_name, u.phone_number, u.telegram_id as seller_telegram_id,
+                       pr.object_name as request_object, pr.buyer_id, pr.object_id,
+                       u_buyer.object_name as buyer_object
+                FROM seller_offers so
+                JOIN users u ON so.seller_id = u.id
+                JOIN purchase_requests pr ON so.purchase_request_id = pr.id
+                JOIN users u_buyer ON pr.buyer_id = u_buyer.id
+                WHERE so.id = %s
+                FOR UPDATE OF so
+            """, (offer_id,))
+            offer = fetch_one(cursor, Offer)
+            
+            if not offer:
+                conn.rollback()
+                return None
+            
+            offer.already_processed = offer.status != 'pending'
+            
+            if offer.already_processed:
+                cursor.execute("SELECT id FROM deliveries WHERE offer_id = %s", (offer_id,))
+                delivery = cursor.fetchone()
+                offer.delivery_id = delivery[0] if delivery else None
+            else:
+                cursor.execute("""
+                    UPDATE seller_offers SET status = 'approved'
+                    WHERE id = %s
+                """, (offer_id,))
+                cursor.execute("""
+                    INSERT INTO deliveries (offer_id, warehouse_user_id)
+                    VALUES (%s, NULL) RETURNING id
+                """, (offer_id,))
+                offer.delivery_id = cursor.fetchone()[0]
+            
             cursor.execute("""
-                UPDATE deliveries SET status = %s
-                WHERE id = %s
-            """, (status, delivery_id))
+                SELECT * FROM seller_offer_items 
+                WHERE offer_id = %s AND created_at >= %s
+                ORDER BY created_at
+            """, (offer_id, offer.created_at))
+            offer.items = fetch_all(cursor, OfferItem)
+            
+            conn.commit()
+            return offer
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def approve_split_award(self, request_id, awards):
+        """
+        Одобрение распределения товаров заявки между несколькими предложениями
+        
+        В одной транзакции: победившие предложения одобряются, в их товарах
+        отмечаются выигравшие строки, на каждое создается доставка; остальные
+        рассматриваемые предложения по заявке отклоняются.
+        
+        Args:
+            request_id (int): ID заявки
+            awards (dict): {offer_id: [id строк seller_offer_items]}
+        
+        Returns:
+            dict: approved - одобренные предложения (как в approve_offer, items - только
+                  выигравшие строки, award_total - их сумма), rejected - отклоненные предложения;
+                  None, если какое-то из предложений уже рассмотрено
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+        try:
+            cursor.execute("""
+                SELECT so.*, u.full_name, u.phone_number, u.telegram_id as seller_telegram_id,
+                       pr.object_name as request_object, pr.buyer_id, pr.object_id,
+                       u_buyer.object_name as buyer_object
+                FROM seller_offers so
+                JOIN users u ON so.seller_id = u.id
+                JOIN purchase_requests pr ON so.purchase_request_id = pr.id
+                JOIN users u_buyer ON pr.buyer_id = u_buyer.id
+                WHERE so.purchase_request_id = %s
+                ORDER BY so.id
+                FOR UPDATE OF so
+            """, (request_id,))
+            offers = {offer.id: offer for offer in fetch_all(cursor, Offer)}
+            
+            if any(offer_id not in offers or offers[offer_id].status != 'pending' for offer_id in awards):
+                conn.rollback()
+                return None
+            
+            approved = []
+            for offer_id, item_ids in awards.items():
+                offer = offers[offer_id]
+                cursor.execute("UPDATE seller_offers SET status = 'approved' WHERE id = %s", (offer_id,))
+                cursor.execute("""
+                    UPDATE seller_offer_items SET awarded = (id = ANY(%s))
+                    WHERE offer_id = %s AND created_at >= %s
+                """, (list(item_ids), offer_id, offer.created_at))
+                cursor.execute("""
+                    INSERT INTO deliveries (offer_id, warehouse_user_id)
+                    VALUES (%s, NULL) RETURNING id
+                """, (offer_id,))
+                offer.delivery_id = cursor.fetchone()[0]
+                offer.already_processed = False
+                
+                cursor.execute("""
+                    SELECT * FROM seller_offer_items 
+                    WHERE offer_id = %s AND awarded AND created_at >= %s
+                    ORDER BY created_at
+                """, (offer_id, offer.created_at))
+                offer.items = fetch_all(cursor, OfferItem)
+                offer.award_total = sum(item.total or 0 for item in offer.items)
+                approved.append(offer)
+            
+            rejected = [offer for offer_id, offer in offers.items()
+                        if offer_id not in awards and offer.status == 'pending']
+            if rejected:
+                cursor.execute("UPDATE seller_offers SET status = 'rejected' WHERE id = ANY(%s)",
+                               ([offer.id for offer in rejected],))
+            
+            conn.commit()
+            return {'approved': approved, 'rejected': rejected}
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def update_delivery_status(self, delivery_id, status):
+        """
+        Обновление статуса доставки
+        
+        При приеме ('received') в той же транзакции выигравшие товары предложения
+        приходуются на склад объекта заявки. Повторный прием ничего не меняет.
+        
+        Returns:
+            int: Число оприходованных строк товаров (для статусов кроме 'received' - 0)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            recorded = 0
+            if status == 'received':
+                cursor.execute("""
+                    UPDATE deliveries SET status = %s, received_at = CURRENT_TIMESTAMP
+                    WHERE id = %s AND status <> 'received'
+                    RETURNING offer_id
+                """, (status, delivery_id))
+                received = cursor.fetchone()
+                if received:
+                    cursor.execute("""
+                        SELECT pr.object_id, soi.product_name, soi.unit, soi.quantity
+                        FROM seller_offers so
+                        JOIN purchase_requests pr ON so.purchase_request_id = pr.id
+                        JOIN seller_offer_items soi
+                          ON soi.offer_id = so.id AND soi.awarded AND soi.created_at >= so.created_at
+                        WHERE so.id = %s AND pr.object_id IS NOT NULL
+                    """, (received[0],))
+                    rows = cursor.fetchall()
+                    if rows:
+                        items = [(product_name, unit, quantity) for _, product_name, unit, quantity in rows]
+                        recorded = self._record_receipts(cursor, [(rows[0][0], delivery_id, None, items)])
+            else:
+                cursor.execute("""
+                    UPDATE deliveries SET status = %s
+                    WHERE id = %s
+                """, (status, delivery_id))
+            
+            conn.commit()
+            return recorded
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
     
     def get_pending_deliveries(self):
         """Получение ожидающих доставок"""
         conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = conn.cursor()
         
         cursor.execute("""
             SELECT d.id, d.offer_id, d.warehouse_user_id, d.status, d.received_at, d.created_at,
-                   so.total_amount,
+                   so.total_amount, so.created_at as offer_created_at,
                    u_seller.full_name as seller_name,
                    u_seller.phone_number as seller_phone,
                    u_buyer.full_name as buyer_name,
@@ -634,16 +2162,16 @@ class Database:
             ORDER BY d.created_at DESC
         """)
         
-        deliveries = cursor.fetchall()
+        deliveries = fetch_all(cursor, Delivery)
         
         # Получаем товары для каждой доставки
         for delivery in deliveries:
             cursor.execute("""
                 SELECT * FROM seller_offer_items 
-                WHERE offer_id = %s 
+                WHERE offer_id = %s AND awarded AND created_at >= %s
                 ORDER BY created_at
-            """, (delivery['offer_id'],))
-            delivery['items'] = cursor.fetchall()
+            """, (delivery.offer_id, delivery.offer_created_at))
+            delivery.items = fetch_all(cursor, OfferItem)
         
         cursor.close()
         conn.close()
@@ -652,11 +2180,11 @@ class Database:
     def get_received_deliveries(self):
         """Получение принятых доставок"""
         conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = conn.cursor()
         
         cursor.execute("""
             SELECT d.id, d.offer_id, d.warehouse_user_id, d.status, d.received_at, d.created_at,
-                   so.total_amount,
+                   so.total_amount, so.created_at as offer_created_at,
                    u_seller.full_name as seller_name,
                    u_seller.phone_number as seller_phone,
                    u_buyer.full_name as buyer_name,
@@ -671,17 +2199,212 @@ class Database:
             ORDER BY d.received_at DESC
         """)
         
-        deliveries = cursor.fetchall()
+        deliveries = fetch_all(cursor, Delivery)
         
         # Получаем товары для каждой доставки
         for delivery in deliveries:
             cursor.execute("""
                 SELECT * FROM seller_offer_items 
-                WHERE offer_id = %s 
+                WHERE offer_id = %s AND awarded AND created_at >= %s
                 ORDER BY created_at
-            """, (delivery['offer_id'],))
-            delivery['items'] = cursor.fetchall()
+            """, (delivery.offer_id, delivery.offer_created_at))
+            delivery.items = fetch_all(cursor, OfferItem)
         
         cursor.close()
         conn.close()
-        return deliveries 
\ No newline at end of file
+        return deliveries 
+    
+    def create_archive_tables(self):
+        """
+        Архивные таблицы archive_<таблица> для закрытых заявок
+        
+        Создаются по образцу рабочих таблиц без внешних ключей; колонки, добавленные
+        в рабочие таблицы позже, дописываются при каждом запуске.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            for table in ARCHIVE_TABLES:
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS archive_{table} (LIKE {table})")
+                cursor.execute("""
+                    SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute
+                    WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+                    ORDER BY attnum
+                """, (table,))
+                for column, column_type in cursor.fetchall():
+                    cursor.execute(f"ALTER TABLE archive_{table} ADD COLUMN IF NOT EXISTS {column} {column_type}")
+                cursor.execute(f"""
+                    ALTER TABLE archive_{table}
+                    ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                """)
+                cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_archive_{table}_id ON archive_{table}(id)")
+            
+            # Индексы для выдачи истории по запросу
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_purchase_requests_buyer ON archive_purchase_requests(buyer_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_purchase_requests_object ON archive_purchase_requests(object_name)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_seller_offers_request ON archive_seller_offers(purchase_request_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_seller_offer_items_offer ON archive_seller_offer_items(offer_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_deliveries_offer ON archive_deliveries(offer_id)")
+            
+            # Поиск кандидатов на архивацию: закрытые заявки по дате закрытия
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_purchase_requests_closed_at
+                ON purchase_requests(closed_at) WHERE status IN ('completed', 'cancelled')
+            """)
+            conn.commit()
+            print("✅ Архивные таблицы созданы/проверены")
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️ Ошибка при создании архивных таблиц: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def _move_to_archive(self, cursor, table, condition, params):
+        """
+        Перенос строк table, подходящих под condition, в archive_<table> одним запросом
+        
+        Строка, id которой уже есть в архиве, нарушает уникальный индекс и откатывает
+        весь пакет: удаленная из рабочей таблицы строка не может пропасть мимо архива.
+        """
+        columns = self._table_columns(cursor, table)
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {table} WHERE {condition}
+                RETURNING {columns}
+            )
+            INSERT INTO archive_{table} ({columns})
+            SELECT {columns} FROM moved
+        """, params)
+        return cursor.rowcount
+    
+    def archive_closed_requests(self, older_than_days, batch_size=200):
+        """
+        Перенос пакета закрытых заявок с товарами, предложениями и доставками в архив
+        
+        Берутся завершенные и отмененные заявки, закрытые раньше older_than_days дней
+        назад, у которых не осталось неполученных доставок. Пакет переносится в одной
+        транзакции; SKIP LOCKED не дает ждать заявки, с которыми сейчас работают.
+        
+        Returns:
+            int: Число перенесенных заявок
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        try:
+            cursor.execute("""
+                SELECT pr.id FROM purchase_requests pr
+                WHERE pr.status IN ('completed', 'cancelled')
+                  AND pr.closed_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 day'
+                  AND NOT EXISTS (
+                      SELECT 1 FROM seller_offers so
+                      JOIN deliveries d ON d.offer_id = so.id
+                      WHERE so.purchase_request_id = pr.id AND d.status <> 'received'
+                  )
+                ORDER BY pr.closed_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (older_than_days, batch_size))
+            request_ids = [row['id'] for row in cursor.fetchall()]
+            if not request_ids:
+                conn.commit()
+                return 0
+            
+            # Итоги переносимых строк переезжают в архив как есть, без пересчета триггерами
+            cursor.execute("SET LOCAL app.skip_aggregates = 'on'")
+            offers = "offer_id IN (SELECT id FROM seller_offers WHERE purchase_request_id = ANY(%s))"
+            self._move_to_archive(cursor, 'deliveries', offers, (request_ids,))
+            self._move_to_archive(cursor, 'seller_offer_items', offers, (request_ids,))
+            # Старая таблица товаров предложений удалилась бы каскадом вместе с seller_offers
+            self._move_to_archive(cursor, 'offer_items', offers, (request_ids,))
+            self._move_to_archive(cursor, 'seller_offers', "purchase_request_id = ANY(%s)", (request_ids,))
+            self._move_to_archive(cursor, 'request_items', "request_id = ANY(%s)", (request_ids,))
+            archived = self._move_to_archive(cursor, 'purchase_requests', "id = ANY(%s)", (request_ids,))
+            conn.commit()
+            return archived
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_archived_offers_for_buyer(self, buyer_id, limit=500):
+        """
+        Одобренные предложения архивных заявок заказчика (медленный путь, по запросу)
+        
+        Товары выбираются одним запросом для всех предложений.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT so.*, u.full_name, u.phone_number,
+                   COALESCE(pr.object_name, 'Не указан') as object_name, pr.closed_at
+            FROM archive_purchase_requests pr
+            JOIN archive_seller_offers so ON so.purchase_request_id = pr.id
+            LEFT JOIN users u ON u.id = so.seller_id
+            WHERE pr.buyer_id = %s AND so.status IN ('approved', 'delivered')
+            ORDER BY pr.closed_at DESC, so.id
+            LIMIT %s
+        """, (buyer_id, limit))
+        offers = fetch_all(cursor, Offer)
+        
+        items = {}
+        if offers:
+            cursor.execute("""
+                SELECT * FROM archive_seller_offer_items
+                WHERE offer_id = ANY(%s) AND awarded
+                ORDER BY offer_id, created_at
+            """, ([offer.id for offer in offers],))
+            for item in fetch_all(cursor, OfferItem):
+                items.setdefault(item.offer_id, []).append(item)
+        for offer in offers:
+            offer.items = items.get(offer.id, [])
+        
+        cursor.close()
+        conn.close()
+        return offers
+    
+    def get_archived_deliveries(self, object_name=None, limit=500):
+        """
+        Полученные доставки архивных заявок (медленный путь, по запросу)
+        
+        Args:
+            object_name (str): Объект склада; None - по всем объектам
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT d.id, d.offer_id, d.received_at, d.created_at, so.total_amount,
+                   u_seller.full_name as seller_name, u_buyer.full_name as buyer_name,
+                   COALESCE(pr.object_name, 'Не указан') as object_name
+            FROM archive_deliveries d
+            JOIN archive_seller_offers so ON so.id = d.offer_id
+            JOIN archive_purchase_requests pr ON pr.id = so.purchase_request_id
+            LEFT JOIN users u_seller ON u_seller.id = so.seller_id
+            LEFT JOIN users u_buyer ON u_buyer.id = pr.buyer_id
+            WHERE %s::text IS NULL OR pr.object_name = %s
+            ORDER BY d.received_at DESC NULLS LAST
+            LIMIT %s
+        """, (object_name, object_name, limit))
+        deliveries = fetch_all(cursor, Delivery)
+        
+        items = {}
+        if deliveries:
+            cursor.execute("""
+                SELECT * FROM archive_seller_offer_items
+                WHERE offer_id = ANY(%s) AND awarded
+                ORDER BY offer_id, created_at
+            """, ([delivery.offer_id for delivery in deliveries],))
+            for item in fetch_all(cursor, OfferItem):
+                items.setdefault(item.offer_id, []).append(item)
+        for delivery in deliveries:
+            delivery.items = items.get(delivery.offer_id, [])
+        
+        cursor.close()
+        conn.close()
+        return deliveries
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Debouncer:
+    """
+    Объединение событий по ключу в окне window секунд
+
+    Первое событие для ключа запускает таймер, последующие в пределах окна
+    только увеличивают счетчик. По истечении окна действие выполняется один раз
+    и получает число объединенных событий.
+    """
+
+    def __init__(self, window=30.0):
+        self.window = window
+        self._pending = {}
+        self._counts = {}
+        self._actions = {}
+        self._last_run = {}
+
+    def schedule(self, key, action):
+        """
+        Регистрация события
+
+        Args:
+            key: Ключ объединения (например, ('request', request_id))
+            action: Корутинная функция action(count), выполняется по истечении окна
+
+        Returns:
+            bool: True, если запущен новый таймер; False, если событие объединено
+        """
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self._actions[key] = action
+        if key in self._pending:
+            return False
+
+        self._pending[key] = asyncio.create_task(self._fire_later(key))
+        return True
+
+    async def _fire_later(self, key):
+        try:
+            await asyncio.sleep(self.window)
+        except asyncio.CancelledError:
+            return
+        await self._fire(key)
+
+    async def _fire(self, key):
+        self._pending.pop(key, None)
+        count = self._counts.pop(key, 0)
+        action = self._actions.pop(key, None)
+        if action is None:
+            return
+        self.mark_run(key)
+        try:
+            await action(count)
+        except Exception as e:
+            logger.error(f"Ошибка отложенного действия {key}: {e}", exc_info=True)
+
+    def is_pending(self, key):
+        return key in self._pending
+
+    def mark_run(self, key):
+        """Отметка выполнения (для ограничения частоты ручных запросов)"""
+        now = time.monotonic()
+        self._last_run[key] = now
+        # Старые отметки не нужны дольше окна
+        if len(self._last_run) > 10000:
+            self._last_run = {k: t for k, t in self._last_run.items() if now - t < self.window}
+
+    def recently_run(self, key):
+        """True, если действие по ключу выполнялось в пределах окна"""
+        last_run = self._last_run.get(key)
+        return last_run is not None and time.monotonic() - last_run < self.window
+
+    async def flush(self):
+        """Немедленное выполнение всех ожидающих действий (при остановке бота)"""
+        for key, task in list(self._pending.items()):
+            task.cancel()
+            await self._fire(key)
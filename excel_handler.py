@@ -1,13 +1,33 @@
 import pandas as pd
 import io
+import hashlib
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 import pytz
-from config import TIMEZONE
+from config import TIMEZONE, OFFER_STATUSES
+
+CENTS = Decimal('0.01')
+
+
+def to_amount(value):
+    """Цена или сумма из ячейки Excel как Decimal с копейками (как DECIMAL(15,2) в базе)"""
+    return Decimal(repr(float(value))).quantize(CENTS, rounding=ROUND_HALF_UP)
+
 
 class ExcelHandler:
+    # Скрытые колонки шаблона предложения: ID товара заявки и контрольная сумма
+    OFFER_KEY_COLUMN = 'Ариза товари ID'
+    OFFER_CHECKSUM_COLUMN = 'Назорат'
+    
     def __init__(self):
         self.timezone = pytz.timezone(TIMEZONE)
     
+    @staticmethod
+    def item_checksum(item):
+        """Контрольная сумма товара заявки для скрытой колонки шаблона предложения"""
+        payload = f"{item['request_id']}:{item['id']}:{' '.join(str(item['product_name'] or '').lower().split())}"
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+    
     def create_purchase_request_template(self):
         """Создание шаблона заявки на покупку"""
         # Создаем DataFrame с заголовками и примерами
@@ -52,7 +72,9 @@ class ExcelHandler:
                 'Ўлчов бирлиги': [''],
                 'Материал изох': [''],
                 'нархи': [''],
-                'Суммаси': ['']
+                'Суммаси': [''],
+                self.OFFER_KEY_COLUMN: [''],
+                self.OFFER_CHECKSUM_COLUMN: ['']
             }
         else:
             # Создаем данные из товаров заявки
@@ -62,7 +84,10 @@ class ExcelHandler:
                 'Ўлчов бирлиги': [item['unit'] for item in items],
                 'Материал изох': [item['material_description'] for item in items],
                 'нархи': [''] * len(items),
-                'Суммаси': [''] * len(items)
+                'Суммаси': [''] * len(items),
+                # Ключ строки: по нему предложение сопоставляется с товаром заявки
+                self.OFFER_KEY_COLUMN: [item['id'] for item in items],
+                self.OFFER_CHECKSUM_COLUMN: [self.item_checksum(item) for item in items]
             }
         
         df = pd.DataFrame(data)
@@ -98,6 +123,10 @@ class ExcelHandler:
             for row in range(2, len(items) + 2):
                 quantity_cell = worksheet.cell(row=row, column=2)  # Столбец B (Миқдори)
                 quantity_cell.number_format = '0'  # Формат целого числа
+            
+            # Колонки ключа скрыты от поставщика
+            worksheet.column_dimensions['G'].hidden = True
+            worksheet.column_dimensions['H'].hidden = True
         
         output.seek(0)
         return output
@@ -138,14 +167,33 @@ class ExcelHandler:
         except Exception as e:
             raise Exception(f"Ошибка при парсинге Excel файла: {str(e)}")
     
-    def parse_seller_offer(self, file_content):
-        """Парсинг Excel файла с предложением поставщика"""
+    def parse_seller_offer(self, file_content, request_items=None):
+        """
+        Парсинг Excel файла с предложением поставщика
+        
+        Строки шаблона сопоставляются с товарами заявки по контрольной сумме из
+        скрытой колонки (словарь, без сравнения названий). В том же проходе
+        собираются расхождения: измененное количество или название, лишние
+        строки и товары заявки без цены.
+        
+        Args:
+            file_content (bytes): Содержимое файла
+            request_items (list): Товары заявки (id, request_id, product_name, quantity)
+        
+        Returns:
+            dict: items (с request_item_id), total_amount, mismatches
+        """
         try:
             # Читаем Excel файл
             df = pd.read_excel(io.BytesIO(file_content), sheet_name=0)
             
+            by_checksum = {self.item_checksum(item): item for item in request_items or []}
+            has_keys = self.OFFER_CHECKSUM_COLUMN in df.columns
+            matched_ids = set()
+            mismatches = []
+            
             items = []
-            total_amount = 0
+            total_amount = Decimal('0.00')
             
             for index, row in df.iterrows():
                 # Пропускаем пустые строки
@@ -156,8 +204,9 @@ class ExcelHandler:
                 if pd.isna(row['нархи']) or pd.isna(row['Суммаси']):
                     continue
                 
-                price_per_unit = float(row['нархи'])
-                item_total = float(row['Суммаси'])
+                # Деньги считаются в Decimal: сумма float по тысячам строк теряет копейки
+                price_per_unit = to_amount(row['нархи'])
+                item_total = to_amount(row['Суммаси'])
                 total_amount += item_total
                 
                 item = {
@@ -166,20 +215,43 @@ class ExcelHandler:
                     'unit': str(row['Ўлчов бирлиги']) if pd.notna(row['Ўлчов бирлиги']) else 'шт',
                     'material_description': str(row['Материал изох']) if pd.notna(row['Материал изох']) else '',
                     'price_per_unit': price_per_unit,
-                    'total_price': item_total
+                    'total_price': item_total,
+                    'request_item_id': None
                 }
+                
+                request_item = None
+                if has_keys and pd.notna(row[self.OFFER_CHECKSUM_COLUMN]):
+                    request_item = by_checksum.get(str(row[self.OFFER_CHECKSUM_COLUMN]).strip())
+                
+                if request_item is not None and request_item['id'] not in matched_ids:
+                    matched_ids.add(request_item['id'])
+                    item['request_item_id'] = request_item['id']
+                    if abs(float(request_item['quantity'] or 0) - item['quantity']) > 1e-6:
+                        mismatches.append({'type': 'quantity', 'product_name': request_item['product_name'],
+                                           'expected': float(request_item['quantity'] or 0), 'actual': item['quantity']})
+                    if item['product_name'].strip() != str(request_item['product_name']).strip():
+                        mismatches.append({'type': 'name', 'product_name': request_item['product_name'],
+                                           'expected': request_item['product_name'], 'actual': item['product_name']})
+                elif by_checksum:
+                    mismatches.append({'type': 'extra', 'product_name': item['product_name']})
+                
                 items.append(item)
             
+            for request_item in request_items or []:
+                if request_item['id'] not in matched_ids:
+                    mismatches.append({'type': 'missing', 'product_name': request_item['product_name']})
+            
             return {
                 'items': items,
-                'total_amount': total_amount
+                'total_amount': total_amount,
+                'mismatches': mismatches
             }
             
         except Exception as e:
             raise Exception(f"Ошибка при парсинге предложения: {str(e)}")
     
     def create_offers_summary(self, offers, buyer_name):
-        """Создание сводки предложений для заказчика"""
+        """Создание сводки предложений для заказчика (offers - модели Offer с items)"""
         if not offers:
             return "Нет предложений по вашей заявке."
         
@@ -188,40 +260,188 @@ class ExcelHandler:
         summary += "=" * 50 + "\n\n"
         
         for i, offer in enumerate(offers, 1):
-            excel_info = f"\n📄 Excel файл: {offer['excel_filename']}" if offer.get('excel_filename') else ""
-            summary += f"💼 **Предложение #{offer['id']}**\n"
-            summary += f"👤 Поставщик: {offer['full_name']}\n"
-            summary += f"📞 Телефон: {offer['phone_number']}\n"
-            summary += f"💵 Общая сумма: {offer['total_amount']:,} сум\n"
-            summary += f"📅 Дата: {offer['created_at'].strftime('%d.%m.%Y %H:%M')}{excel_info}\n"
+            excel_info = f"\n📄 Excel файл: {offer.excel_filename}" if offer.excel_filename else ""
+            summary += f"💼 **Предложение #{offer.id}**\n"
+            summary += f"👤 Поставщик: {offer.full_name}\n"
+            summary += f"📞 Телефон: {offer.phone_number}\n"
+            summary += f"💵 Общая сумма: {offer.total_amount:,} сум\n"
+            summary += f"📅 Дата: {offer.created_at.strftime('%d.%m.%Y %H:%M')}{excel_info}\n"
             summary += "─" * 30 + "\n"
             
             # Детали товаров
-            for j, item in enumerate(offer['items'], 1):
-                summary += f"  {j}. {item['product_name']}\n"
-                summary += f"     📊 Количество: {item['quantity']} {item['unit']}\n"
-                summary += f"     💰 Цена за единицу: {item['price']:,} сум\n"
-                summary += f"     💵 Сумма: {item['total']:,} сум\n"
-                if item['description']:
-                    summary += f"     📝 Описание: {item['description']}\n"
+            for j, item in enumerate(offer.items, 1):
+                summary += f"  {j}. {item.product_name}\n"
+                summary += f"     📊 Количество: {item.quantity} {item.unit}\n"
+                summary += f"     💰 Цена за единицу: {item.price:,} сум\n"
+                summary += f"     💵 Сумма: {item.total:,} сум\n"
+                if item.description:
+                    summary += f"     📝 Описание: {item.description}\n"
                 summary += "\n"
             
             summary += "─" * 30 + "\n\n"
         
         return summary
     
+    # Колонки книги предложений; колонка статуса обновляется при одобрении/отклонении
+    OFFERS_HEADERS = ['Предложение ID', 'Поставщик', 'Телефон', 'Товар', 'Количество', 'Единица',
+                      'Цена за единицу', 'Сумма', 'Описание', 'Общая сумма', 'Дата предложения', 'Статус']
+    OFFERS_STATUS_COLUMN = 12
+    
+    def create_offers_workbook(self):
+        """Пустая книга предложений с заголовками"""
+        from openpyxl import Workbook
+        from openpyxl.styles import Font, PatternFill, Alignment
+        
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Предложения"
+        
+        for col, header in enumerate(self.OFFERS_HEADERS, 1):
+            cell = ws.cell(row=1, column=col, value=header)
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+            cell.alignment = Alignment(horizontal="center")
+        
+        # Настройка ширины колонок
+        for col in range(1, len(self.OFFERS_HEADERS) + 1):
+            ws.column_dimensions[chr(64 + col)].width = 15
+        
+        return wb
+    
+    def offer_rows(self, offer):
+        """
+        Значения строк одного предложения (по строке на товар)
+        
+        Args:
+            offer (Offer): Предложение с товарами (row_models)
+        
+        Returns:
+            list: Списки значений колонок OFFERS_HEADERS
+        """
+        status = OFFER_STATUSES.get(offer.status, offer.status)
+        # Поля предложения одинаковы для всех его строк
+        offer_id, full_name, phone_number = offer.id, offer.full_name, offer.phone_number
+        total_amount, created_at = offer.total_amount, offer.created_at.strftime('%d.%m.%Y %H:%M')
+        return [
+            [offer_id, full_name, phone_number, item.product_name, item.quantity, item.unit,
+             item.price, item.total, item.description, total_amount, created_at, status]
+            for item in offer.items
+        ]
+    
+    def write_offer_rows(self, ws, row, offer):
+        """
+        Запись строк одного предложения (по строке на товар)
+        
+        Args:
+            offer (Offer): Предложение с товарами (row_models)
+        
+        Returns:
+            int: Номер следующей свободной строки
+        """
+        for values in self.offer_rows(offer):
+            for col, value in enumerate(values, 1):
+                ws.cell(row=row, column=col, value=value)
+            row += 1
+        return row
+    
     def create_offers_excel(self, offers, buyer_name):
         """Создание Excel файла с предложениями для заказчика"""
+        wb = self.create_offers_workbook()
+        ws = wb.active
+        
+        # Заполняем данными
+        row = 2
+        for offer in offers:
+            row = self.write_offer_rows(ws, row, offer)
+        
+        output = io.BytesIO()
+        wb.save(output)
+        output.seek(0)
+        return output
+    
+    def create_price_comparison_excel(self, matrix, request_id):
+        """Создание Excel файла со сравнением цен (товары x поставщики) из price_matrix.build_price_matrix"""
         from openpyxl import Workbook
         from openpyxl.styles import Font, PatternFill, Alignment
+        from openpyxl.utils import get_column_letter
+        
+        items = matrix['items']
+        prices = matrix['prices']
+        best = matrix['best']
+        sellers = matrix['sellers']
         
         wb = Workbook()
         ws = wb.active
-        ws.title = "Предложения"
+        ws.title = f"Сравнение цен #{request_id}"
         
-        # Заголовки
-        headers = ['Предложение ID', 'Поставщик', 'Телефон', 'Товар', 'Количество', 'Единица', 
-                  'Цена за единицу', 'Сумма', 'Описание', 'Общая сумма', 'Дата предложения']
+        # Заголовки: товар, затем по колонке на предложение, затем лучшая цена
+        headers = ['Товар', 'Единица', 'Количество'] + list(sellers['label']) + ['Лучшая цена', 'Сумма по лучшей цене']
+        for col, header in enumerate(headers, 1):
+            cell = ws.cell(row=1, column=col, value=header)
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+            cell.alignment = Alignment(horizontal="center", wrap_text=True)
+        
+        best_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+        first_price_col = 4
+        best_col = first_price_col + len(sellers)
+        
+        row = 2
+        for key in items.index:
+            item = items.loc[key]
+            ws.cell(row=row, column=1, value=item['name'])
+            ws.cell(row=row, column=2, value=item['unit'])
+            ws.cell(row=row, column=3, value=None if pd.isna(item['quantity']) else float(item['quantity']))
+            for offset, offer_id in enumerate(sellers.index):
+                price = prices.at[key, offer_id]
+                if pd.isna(price):
+                    continue
+                cell = ws.cell(row=row, column=first_price_col + offset, value=float(price))
+                if best.at[key, offer_id]:
+                    cell.fill = best_fill
+                    cell.font = Font(bold=True)
+            if pd.notna(item['best_price']):
+                ws.cell(row=row, column=best_col, value=float(item['best_price']))
+            if pd.notna(item['best_total']):
+                ws.cell(row=row, column=best_col + 1, value=float(item['best_total']))
+            row += 1
+        
+        # Итоги по предложениям
+        row += 1
+        summary_rows = [
+            ('Итого по предложению', lambda seller: float(seller['total'])),
+            ('Покрытие, %', lambda seller: round(float(seller['coverage']) * 100, 1)),
+            ('Лучших цен', lambda seller: int(seller['best_count'])),
+        ]
+        for title, value in summary_rows:
+            ws.cell(row=row, column=1, value=title).font = Font(bold=True)
+            for offset, offer_id in enumerate(sellers.index):
+                ws.cell(row=row, column=first_price_col + offset, value=value(sellers.loc[offer_id]))
+            row += 1
+        ws.cell(row=row - len(summary_rows), column=best_col + 1, value=matrix['best_total']).font = Font(bold=True)
+        
+        # Настройка ширины колонок
+        ws.column_dimensions['A'].width = 30
+        for col in range(2, len(headers) + 1):
+            ws.column_dimensions[get_column_letter(col)].width = 15
+        ws.freeze_panes = 'D2'
+        
+        output = io.BytesIO()
+        wb.save(output)
+        output.seek(0)
+        return output
+    
+    def create_archived_deliveries_excel(self, deliveries):
+        """Создание Excel файла с полученными доставками архивных заявок (по строке на товар)"""
+        from openpyxl import Workbook
+        from openpyxl.styles import Font, PatternFill, Alignment
+        
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Архив доставок"
+        
+        headers = ['Доставка ID', 'Объект', 'Поставщик', 'Заказчик', 'Товар', 'Количество',
+                   'Единица', 'Цена за единицу', 'Сумма', 'Дата принятия']
         
         for col, header in enumerate(headers, 1):
             cell = ws.cell(row=1, column=col, value=header)
@@ -229,24 +449,22 @@ class ExcelHandler:
             cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
             cell.alignment = Alignment(horizontal="center")
         
-        # Заполняем данными
         row = 2
-        for offer in offers:
-            for item in offer['items']:
-                ws.cell(row=row, column=1, value=offer['id'])
-                ws.cell(row=row, column=2, value=offer['full_name'])
-                ws.cell(row=row, column=3, value=offer['phone_number'])
-                ws.cell(row=row, column=4, value=item['product_name'])
-                ws.cell(row=row, column=5, value=item['quantity'])
-                ws.cell(row=row, column=6, value=item['unit'])
-                ws.cell(row=row, column=7, value=item['price'])
-                ws.cell(row=row, column=8, value=item['total'])
-                ws.cell(row=row, column=9, value=item['description'])
-                ws.cell(row=row, column=10, value=offer['total_amount'])
-                ws.cell(row=row, column=11, value=offer['created_at'].strftime('%d.%m.%Y %H:%M'))
+        for delivery in deliveries:
+            received_at = delivery.received_at.strftime('%d.%m.%Y %H:%M') if delivery.received_at else ''
+            for item in delivery.items:
+                ws.cell(row=row, column=1, value=delivery.id)
+                ws.cell(row=row, column=2, value=delivery.object_name)
+                ws.cell(row=row, column=3, value=delivery.seller_name)
+                ws.cell(row=row, column=4, value=delivery.buyer_name)
+                ws.cell(row=row, column=5, value=item.product_name)
+                ws.cell(row=row, column=6, value=item.quantity)
+                ws.cell(row=row, column=7, value=item.unit)
+                ws.cell(row=row, column=8, value=item.price)
+                ws.cell(row=row, column=9, value=item.total)
+                ws.cell(row=row, column=10, value=received_at)
                 row += 1
         
-        # Настройка ширины колонок
         for col in range(1, len(headers) + 1):
             ws.column_dimensions[chr(64 + col)].width = 15
         
@@ -255,6 +473,10 @@ class ExcelHandler:
         output.seek(0)
         return output
     
+    # Колонки выгрузки активных заявок для поставщиков
+    ACTIVE_REQUESTS_HEADERS = ['Заявка ID', 'Заказчик', 'Поставщик', 'Объект', 'Товар', 'Количество',
+                               'Единица', 'Описание', 'Дата заявки']
+    
     def create_active_requests_excel(self, requests, seller_name):
         """Создание Excel файла с активными заявками для поставщиков"""
         from openpyxl import Workbook
@@ -265,8 +487,7 @@ class ExcelHandler:
         ws.title = "Активные заявки"
         
         # Заголовки
-        headers = ['Заявка ID', 'Заказчик', 'Поставщик', 'Объект', 'Товар', 'Количество', 
-                  'Единица', 'Описание', 'Дата заявки']
+        headers = self.ACTIVE_REQUESTS_HEADERS
         
         for col, header in enumerate(headers, 1):
             cell = ws.cell(row=1, column=col, value=header)
@@ -298,6 +519,62 @@ class ExcelHandler:
         output.seek(0)
         return output
     
+    def write_stream(self, path, title, headers, values):
+        """
+        Потоковая запись таблицы в файл (write-only книга openpyxl)
+        
+        Строки сразу уходят во временный XML на диске, поэтому память не зависит
+        от их числа, если values - итератор (например, серверный курсор).
+        
+        Returns:
+            int: Число записанных строк без заголовка
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Alignment
+        from openpyxl.utils import get_column_letter
+        
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title)
+        for col in range(1, len(headers) + 1):
+            ws.column_dimensions[get_column_letter(col)].width = 15
+        
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+            cell.alignment = Alignment(horizontal="center")
+            header_cells.append(cell)
+        ws.append(header_cells)
+        
+        count = 0
+        for row in values:
+            ws.append(row)
+            count += 1
+        
+        wb.save(path)
+        return count
+    
+    def write_active_requests_stream(self, rows, path):
+        """Потоковая выгрузка активных заявок (строки Database.iter_active_request_items)"""
+        return self.write_stream(path, "Активные заявки", self.ACTIVE_REQUESTS_HEADERS, (
+            (row['request_id'], row['buyer_name'], row['supplier_name'], row['object_name'],
+             row['product_name'], row['quantity'], row['unit'], row['material_description'],
+             row['created_at'].strftime('%d.%m.%Y %H:%M'))
+            for row in rows
+        ))
+    
+    def write_offers_stream(self, rows, path):
+        """Потоковая выгрузка предложений в колонках книги предложений (строки Database.iter_approved_offer_items)"""
+        return self.write_stream(path, "Предложения", self.OFFERS_HEADERS, (
+            (row['offer_id'], row['full_name'], row['phone_number'], row['product_name'],
+             row['quantity'], row['unit'], row['price'], row['total'], row['description'],
+             row['total_amount'], row['created_at'].strftime('%d.%m.%Y %H:%M'),
+             OFFER_STATUSES.get(row['status'], row['status']))
+            for row in rows
+        ))
+    
     def validate_excel_structure(self, file_content, file_type='request'):
         """Проверка структуры Excel файла"""
         try:
@@ -0,0 +1,103 @@
+import heapq
+import itertools
+import math
+import re
+
+EARTH_RADIUS_KM = 6371.0
+
+# Локация, сохраненная старой регистрацией: "Координаты: 41.311081, 69.240562"
+COORDINATES_RE = re.compile(r'Координаты:\s*(-?\d+(?:\.\d+)?),\s*(-?\d+(?:\.\d+)?)')
+
+
+def parse_coordinates(text):
+    """Широта и долгота из текстовой локации или None"""
+    match = COORDINATES_RE.search(text or '')
+    if not match:
+        return None
+    latitude, longitude = float(match.group(1)), float(match.group(2))
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def to_xyz(latitude, longitude):
+    """Точка на единичной сфере"""
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def chord_to_km(chord):
+    """Расстояние по поверхности Земли по длине хорды единичной сферы"""
+    return 2 * math.asin(min(1.0, chord / 2)) * EARTH_RADIUS_KM
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Расстояние между двумя точками по поверхности Земли"""
+    return chord_to_km(math.dist(to_xyz(lat1, lon1), to_xyz(lat2, lon2)))
+
+
+class KDTree:
+    """
+    k-d дерево по точкам (широта, долгота)
+
+    Точки переводятся в координаты на единичной сфере: евклидово расстояние между
+    ними (хорда) растет вместе с расстоянием по поверхности, поэтому ближайшие
+    соседи находятся без поправок на долготу и переход через 180-й меридиан.
+    Дерево строится один раз за O(n log n); поиск ближайшего - O(log n) в среднем.
+    """
+
+    def __init__(self, points):
+        """
+        Args:
+            points (list): Кортежи (широта, долгота, значение)
+        """
+        nodes = [(to_xyz(latitude, longitude), value) for latitude, longitude, value in points]
+        self._size = len(nodes)
+        self._root = self._build(nodes, 0)
+
+    def _build(self, nodes, axis):
+        if not nodes:
+            return None
+        nodes.sort(key=lambda node: node[0][axis])
+        middle = len(nodes) // 2
+        point, value = nodes[middle]
+        following = (axis + 1) % 3
+        return (point, value, axis,
+                self._build(nodes[:middle], following), self._build(nodes[middle + 1:], following))
+
+    def nearest(self, latitude, longitude, k=1):
+        """
+        k ближайших точек
+
+        Returns:
+            list: Кортежи (расстояние в км, значение) по возрастанию расстояния
+        """
+        if self._root is None or k <= 0:
+            return []
+        target = to_xyz(latitude, longitude)
+        # Куча k лучших по убыванию хорды: (-хорда, порядковый номер, значение)
+        best = []
+        order = itertools.count()
+
+        def visit(node):
+            if node is None:
+                return
+            point, value, axis, left, right = node
+            chord = math.dist(point, target)
+            if len(best) < k:
+                heapq.heappush(best, (-chord, next(order), value))
+            elif chord < -best[0][0]:
+                heapq.heapreplace(best, (-chord, next(order), value))
+
+            offset = target[axis] - point[axis]
+            near, far = (left, right) if offset < 0 else (right, left)
+            visit(near)
+            # Дальняя ветвь нужна, только если плоскость разбиения ближе текущего k-го соседа
+            if len(best) < k or abs(offset) < -best[0][0]:
+                visit(far)
+
+        visit(self._root)
+        return [(chord_to_km(-chord), value) for chord, _, value in sorted(best, reverse=True)]
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,102 @@
+import re
+import time
+from collections import OrderedDict
+
+# Кириллица (русская и узбекская) -> латиница в упрощенной записи
+_CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'j',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 's',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': '', 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya', 'ў': 'o', 'қ': 'k', 'ғ': 'g', 'ҳ': 'h',
+}
+_TRANSLIT_TABLE = str.maketrans(_CYRILLIC_TO_LATIN)
+
+# Апострофы узбекской латиницы: o', g', oʻ, gʻ и т.п.
+_APOSTROPHES = re.compile(r"['`ʻʼ‘’]")
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+# Триграммный индекс работает только для подстрок от 3 символов
+MIN_TERM_LENGTH = 3
+MAX_TERMS = 5
+
+
+def normalize_search_text(*parts):
+    """
+    Приведение текста к единой латинской записи для поиска
+
+    "Цемент М400", "sement m400" и "Cement M400" дают одинаковый результат,
+    так же как "Ғишт", "G'isht" и "gisht".
+    """
+    text = ' '.join(part for part in parts if part).lower()
+    text = text.translate(_TRANSLIT_TABLE)
+    text = _APOSTROPHES.sub('', text)
+    # Схожие звуки, которые пишут по-разному: ts/c -> s, x -> h, q -> k
+    text = text.replace('ts', 's')
+    text = re.sub(r'c(?!h)', 's', text)
+    text = text.replace('x', 'h').replace('q', 'k')
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def search_terms(query):
+    """Слова запроса в нормализованном виде, пригодные для поиска по индексу"""
+    terms = []
+    for term in normalize_search_text(query).split():
+        if len(term) >= MIN_TERM_LENGTH and term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+class SearchCache:
+    """Кэш результатов поиска с ограниченным временем жизни и размером"""
+
+    def __init__(self, ttl=60.0, max_size=1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def group_search_rows(rows, limit):
+    """
+    Группировка найденных товаров по заявкам с сохранением порядка
+
+    Returns:
+        list: [{'id', 'object_name', 'created_at', 'items': [...]}, ...]
+    """
+    requests = OrderedDict()
+    for row in rows:
+        request = requests.get(row['request_id'])
+        if request is None:
+            if len(requests) >= limit:
+                continue
+            request = requests[row['request_id']] = {
+                'id': row['request_id'],
+                'object_name': row['object_name'],
+                'created_at': row['created_at'],
+                'items': [],
+            }
+        request['items'].append(row)
+    return list(requests.values())
@@ -109,32 +109,49 @@ def get_contact_keyboard():
     )
     return keyboard
 
-def get_object_keyboard():
-    """Клавиатура выбора объекта"""
+def get_object_keyboard(names):
+    """Клавиатура выбора объекта из справочника"""
     keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="Сам Сити")],
-            [KeyboardButton(text="Ситй+Сиёб Б Й К блок")],
-            [KeyboardButton(text="Ал Бухорий")],
-            [KeyboardButton(text="Ал-Бухорий Хотел")],
-            [KeyboardButton(text="Рубловка")],
-            [KeyboardButton(text="Қува ҚВП")],
-            [KeyboardButton(text="Макон Малл")],
-            [KeyboardButton(text="Карши Малл")],
-            [KeyboardButton(text="Карши Хотел")],
-            [KeyboardButton(text="Воха Гавхари")],
-            [KeyboardButton(text="Зарметан усто Ғафур")],
-            [KeyboardButton(text="Кожа завод")],
-            [KeyboardButton(text="Мотрид катеж")],
-            [KeyboardButton(text="Хишрав")],
-            [KeyboardButton(text="Махдуми Азам")],
-            [KeyboardButton(text="Сирдарё 1/10 Зухри")],
-            [KeyboardButton(text="Эшонгузар")],
-            [KeyboardButton(text="Рубловка(Хожи бобо дом)")],
-            [KeyboardButton(text="Ургут")],
-            [KeyboardButton(text="Қўқон малл")],
+        keyboard=[[KeyboardButton(text=name)] for name in names] + [
             [KeyboardButton(text="❌ Отмена")]
         ],
         resize_keyboard=True
     )
-    return keyboard 
\ No newline at end of file
+    return keyboard
+
+def get_subscriptions_keyboard(subscriptions, categories, show_objects=False, objects=()):
+    """Клавиатура подписок поставщика: категории или объекты справочника (по id) с отметкой выбранных"""
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+    if show_objects:
+        for obj in objects:
+            mark = "✅" if ('object', obj.name) in subscriptions else "➕"
+            keyboard.inline_keyboard.append([InlineKeyboardButton(text=f"{mark} {obj.name}", callback_data=f"sub_obj_{obj.id}")])
+        keyboard.inline_keyboard.append([InlineKeyboardButton(text="📦 Категориялар", callback_data="sub_show_categories")])
+    else:
+        for i, name in enumerate(categories):
+            mark = "✅" if ('category', name) in subscriptions else "➕"
+            keyboard.inline_keyboard.append([InlineKeyboardButton(text=f"{mark} {name}", callback_data=f"sub_cat_{i}")])
+        keyboard.inline_keyboard.append([InlineKeyboardButton(text="🏗️ Объектлар", callback_data="sub_show_objects")])
+    keyboard.inline_keyboard.append([InlineKeyboardButton(text="🗑 Барча обуналарни ўчириш", callback_data="sub_clear")])
+    return keyboard
+
+def get_split_award_keyboard(request_id, max_suppliers=None):
+    """Клавиатура распределения заявки: ограничение числа поставщиков и подтверждение"""
+    limits = [InlineKeyboardButton(text=f"{'• ' if max_suppliers == k else ''}👥 {k}", callback_data=f"split_max_{request_id}_{k}")
+              for k in (1, 2, 3)]
+    limits.append(InlineKeyboardButton(text=f"{'• ' if not max_suppliers else ''}♾", callback_data=f"split_max_{request_id}_0"))
+    return InlineKeyboardMarkup(inline_keyboard=[
+        limits,
+        [InlineKeyboardButton(text="✅ Тақсимотни тасдиқлаш", callback_data=f"split_ok_{request_id}")],
+    ])
+
+def get_my_request_keyboard(request_id, active=True):
+    """Кнопки заявки заказчика: предложения и отмена активной заявки"""
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📊 Барча таклифларни кўриш", callback_data=f"show_offers_{request_id}")]
+    ])
+    if active:
+        keyboard.inline_keyboard.append(
+            [InlineKeyboardButton(text="🚫 Аризани бекор қилиш", callback_data=f"request_cancel_{request_id}")]
+        )
+    return keyboard
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from aiogram import BaseMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Кадры функций с локальной переменной handler_context (middleware, фоновые задачи)
+_context_codes = set()
+
+
+def register_context_frame(func):
+    """Регистрирует функцию, кадр которой хранит handler_context для атрибуции"""
+    _context_codes.add(func.__code__)
+    return func
+
+
+class LoopMonitorMiddleware(BaseMiddleware):
+    """Middleware, по которому монитор определяет текущий обработчик"""
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+
+    async def __call__(self, handler, event, data):
+        # Локальная переменная читается потоком-сторожем из кадра стека
+        handler_context = describe_handler(event, data)
+        return await handler(event, data)
+
+
+register_context_frame(LoopMonitorMiddleware.__call__)
+
+
+def describe_handler(event, data):
+    """Описание обработчика и апдейта для логов"""
+    handler_object = data.get('handler')
+    callback = getattr(handler_object, 'callback', None)
+    from_user = getattr(event, 'from_user', None)
+
+    return {
+        'handler': getattr(callback, '__name__', 'unknown'),
+        'update_type': type(event).__name__,
+        'user_id': getattr(from_user, 'id', None),
+        'callback_data': getattr(event, 'data', None) if type(event).__name__ == 'CallbackQuery' else None,
+    }
+
+
+class LoopLagMonitor:
+    """
+    Монитор задержки event loop
+
+    Корутина-пульс засыпает на interval и измеряет, насколько позже она проснулась.
+    Поток-сторож следит за пульсом: если loop не отвечает дольше threshold, он снимает
+    стек потока loop прямо во время блокировки и находит обработчик по кадру
+    LoopMonitorMiddleware или фоновой задачи.
+    """
+
+    def __init__(self, interval=0.5, threshold=0.25, max_stack=15):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_stack = max_stack
+
+        self._loop = None
+        self._loop_thread_id = None
+        self._task = None
+        self._watchdog = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._last_beat = None
+        self._captured = None
+
+        # Статистика для экспорта в метрики
+        self.samples = 0
+        self.lag_sum = 0.0
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.stalls_total = 0
+        self.stalls_by_handler = {}
+        self.last_stall = None
+
+    def start(self):
+        """Запуск пульса и сторожа (вызывать внутри работающего loop)"""
+        if self._task is not None:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        self._task = self._loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-lag-watchdog', daemon=True)
+        self._watchdog.start()
+        logger.info(f"Монитор event loop запущен: интервал {self.interval} с, порог {self.threshold} с")
+
+    async def stop(self):
+        """Остановка монитора"""
+        self._stop_event.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._last_beat = time.monotonic()
+            self.record(lag)
+
+    def _watch(self):
+        """Поток-сторож: снимает стек, пока loop заблокирован"""
+        check_every = min(self.threshold, self.interval) / 2
+        while not self._stop_event.wait(check_every):
+            overdue = time.monotonic() - self._last_beat - self.interval
+            if overdue < self.threshold:
+                continue
+            with self._lock:
+                if self._captured is None:
+                    self._captured = self.capture_stack()
+
+    def capture_stack(self):
+        """Стек потока event loop и контекст обработчика"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+
+        handler_context = None
+        current = frame
+        while current is not None:
+            if current.f_code in _context_codes:
+                handler_context = current.f_locals.get('handler_context')
+                break
+            current = current.f_back
+
+        stack = traceback.format_list(traceback.extract_stack(frame)[-self.max_stack:])
+        blocking = traceback.extract_stack(frame, limit=1)[-1]
+
+        return {
+            'blocking_frame': f"{blocking.filename}:{blocking.lineno} {blocking.name}",
+            'stack': [line.rstrip() for line in stack],
+            'context': handler_context,
+        }
+
+    def record(self, lag):
+        """Учет одного измерения задержки"""
+        self.samples += 1
+        self.lag_sum += lag
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+
+        with self._lock:
+            captured, self._captured = self._captured, None
+
+        if lag < self.threshold:
+            return
+
+        context = (captured or {}).get('context') or {}
+        handler = context.get('handler', 'unknown')
+        self.stalls_total += 1
+        self.stalls_by_handler[handler] = self.stalls_by_handler.get(handler, 0) + 1
+
+        stall = {
+            'event': 'event_loop_stall',
+            'lag_ms': round(lag * 1000, 1),
+            'handler': handler,
+            'update_type': context.get('update_type'),
+            'user_id': context.get('user_id'),
+            'callback_data': context.get('callback_data'),
+            'blocking_frame': (captured or {}).get('blocking_frame'),
+            'stack': (captured or {}).get('stack', []),
+        }
+        self.last_stall = stall
+        logger.warning(json.dumps(stall, ensure_ascii=False))
+
+    def snapshot(self):
+        """Текущая статистика монитора"""
+        return {
+            'samples': self.samples,
+            'avg_lag_ms': round(self.lag_sum / self.samples * 1000, 2) if self.samples else 0.0,
+            'max_lag_ms': round(self.max_lag * 1000, 2),
+            'last_lag_ms': round(self.last_lag * 1000, 2),
+            'stalls_total': self.stalls_total,
+            'stalls_by_handler': dict(self.stalls_by_handler),
+        }
@@ -0,0 +1,253 @@
+import functools
+import inspect
+import logging
+import re
+import time
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# Бакеты под задержки бота: от быстрых запросов к БД до многосекундных Excel
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HANDLER_LATENCY = Histogram(
+    'bot_handler_duration_seconds', 'Время выполнения обработчиков',
+    ['handler', 'update_type', 'route'], buckets=LATENCY_BUCKETS
+)
+HANDLER_ERRORS = Counter(
+    'bot_handler_errors_total', 'Необработанные исключения в обработчиках',
+    ['handler', 'update_type', 'route']
+)
+DB_METHOD_LATENCY = Histogram(
+    'bot_db_method_duration_seconds', 'Время выполнения методов Database',
+    ['method'], buckets=LATENCY_BUCKETS
+)
+DB_METHOD_ERRORS = Counter(
+    'bot_db_method_errors_total', 'Ошибки в методах Database', ['method']
+)
+TELEGRAM_LATENCY = Histogram(
+    'bot_telegram_request_duration_seconds', 'Время запросов к Telegram Bot API',
+    ['method'], buckets=LATENCY_BUCKETS
+)
+TELEGRAM_ERRORS = Counter(
+    'bot_telegram_request_errors_total', 'Ошибки запросов к Telegram Bot API',
+    ['method', 'error']
+)
+SHEETS_WRITE_LATENCY = Histogram(
+    'bot_sheets_write_duration_seconds', 'Время записи в Google Sheets', buckets=LATENCY_BUCKETS
+)
+SHEETS_WRITE_ERRORS = Counter(
+    'bot_sheets_write_errors_total', 'Неудачные записи в Google Sheets'
+)
+EXCEL_LATENCY = Histogram(
+    'bot_excel_duration_seconds', 'Время разбора и генерации Excel',
+    ['method'], buckets=LATENCY_BUCKETS
+)
+EXCEL_ERRORS = Counter(
+    'bot_excel_errors_total', 'Ошибки разбора и генерации Excel', ['method']
+)
+CALLBACK_DUPLICATES = Counter(
+    'bot_callback_duplicates_total', 'Повторные нажатия, отсеянные без обработки', ['route']
+)
+BACKGROUND_TASK_LATENCY = Histogram(
+    'bot_background_task_duration_seconds', 'Время выполнения фоновой части обработчиков',
+    ['task'], buckets=LATENCY_BUCKETS
+)
+BACKGROUND_TASK_ERRORS = Counter(
+    'bot_background_task_errors_total', 'Ошибки в фоновых задачах', ['task']
+)
+BACKGROUND_TASKS_ACTIVE = Gauge(
+    'bot_background_tasks_active', 'Фоновые задачи, выполняющиеся сейчас'
+)
+FSM_STORAGE_SIZE = Gauge(
+    'bot_fsm_storage_keys', 'Количество ключей в хранилище FSM'
+)
+
+# Числа в конце callback data (id заявок, телефоны) убираются, чтобы не плодить метки
+_ROUTE_SUFFIX = re.compile(r'\d+$')
+MAX_ROUTE_LENGTH = 40
+
+
+def route_label(event):
+    """Метка маршрута: префикс callback data или команда"""
+    if type(event).__name__ == 'CallbackQuery':
+        data = event.data or ''
+        return _ROUTE_SUFFIX.sub('', data)[:MAX_ROUTE_LENGTH]
+
+    if type(event).__name__ == 'InlineQuery':
+        return 'inline'
+
+    text = getattr(event, 'text', None) or ''
+    if text.startswith('/'):
+        return text.split()[0][:MAX_ROUTE_LENGTH]
+    if getattr(event, 'document', None):
+        return 'document'
+    if getattr(event, 'contact', None):
+        return 'contact'
+    return 'message'
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Гистограмма задержек по обработчикам и маршрутам"""
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get('handler')
+        name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+        labels = (name, type(event).__name__, route_label(event))
+
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(*labels).inc()
+            raise
+        finally:
+            HANDLER_LATENCY.labels(*labels).observe(time.perf_counter() - start)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Задержки и ошибки запросов к Telegram Bot API"""
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            TELEGRAM_ERRORS.labels(name, type(e).__name__).inc()
+            raise
+        finally:
+            TELEGRAM_LATENCY.labels(name).observe(time.perf_counter() - start)
+
+
+def _timed(method, name, latency, errors):
+    """Обертка метода с замером времени и подсчетом ошибок"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            errors.labels(name).inc()
+            raise
+        finally:
+            latency.labels(name).observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+def _timed_generator(method, name, latency, errors):
+    """
+    Обертка генератора: замеряется время внутри генератора за всю итерацию
+
+    Время потребителя между шагами (запись строк в Excel) не учитывается;
+    ошибки, возникшие при итерации, попадают в счетчик. Наблюдение
+    записывается один раз - по завершении или закрытии генератора.
+    """
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        elapsed = 0.0
+        start = time.perf_counter()
+        try:
+            iterator = method(*args, **kwargs)
+            while True:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+                start = time.perf_counter()
+        except GeneratorExit:
+            iterator.close()
+            raise
+        except Exception:
+            errors.labels(name).inc()
+            raise
+        finally:
+            latency.labels(name).observe(elapsed)
+
+    return wrapper
+
+
+def instrument_methods(obj, latency, errors, exclude=()):
+    """
+    Оборачивает публичные методы объекта замером времени
+
+    Методы-генераторы (потоковые выборки) замеряются за всю итерацию, а не
+    только за создание генератора.
+
+    Args:
+        obj: Экземпляр (Database, ExcelHandler)
+        latency (Histogram): Гистограмма с меткой method
+        errors (Counter): Счетчик ошибок с меткой method
+        exclude (tuple): Методы, которые не нужно оборачивать
+
+    Returns:
+        Тот же объект с обернутыми методами
+    """
+    for name in dir(obj):
+        if name.startswith('_') or name in exclude:
+            continue
+        method = getattr(obj, name)
+        if inspect.isgeneratorfunction(method):
+            setattr(obj, name, _timed_generator(method, name, latency, errors))
+        elif callable(method):
+            setattr(obj, name, _timed(method, name, latency, errors))
+
+    return obj
+
+
+class LoopMonitorCollector:
+    """Экспорт статистики LoopLagMonitor"""
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+
+    def collect(self):
+        snapshot = self.monitor.snapshot()
+
+        yield GaugeMetricFamily(
+            'bot_event_loop_lag_seconds', 'Последняя задержка event loop',
+            value=snapshot['last_lag_ms'] / 1000
+        )
+        yield GaugeMetricFamily(
+            'bot_event_loop_lag_max_seconds', 'Максимальная задержка event loop',
+            value=snapshot['max_lag_ms'] / 1000
+        )
+
+        stalls = CounterMetricFamily(
+            'bot_event_loop_stalls', 'Блокировки event loop выше порога', labels=['handler']
+        )
+        for handler, count in snapshot['stalls_by_handler'].items():
+            stalls.add_metric([handler], count)
+        yield stalls
+
+
+def setup_metrics(router, bot, storage, loop_monitor=None):
+    """Подключение middleware и сборщиков к роутеру и боту"""
+    # Внутренние middleware: обработчик уже выбран фильтрами и доступен в data['handler']
+    handler_middleware = HandlerMetricsMiddleware()
+    router.message.middleware(handler_middleware)
+    router.callback_query.middleware(handler_middleware)
+    router.inline_query.middleware(handler_middleware)
+
+    bot.session.middleware(TelegramMetricsMiddleware())
+
+    # MemoryStorage хранит состояния в словаре storage
+    if hasattr(storage, 'storage'):
+        FSM_STORAGE_SIZE.set_function(lambda: len(storage.storage))
+
+    if loop_monitor is not None:
+        REGISTRY.register(LoopMonitorCollector(loop_monitor))
+
+
+def start_metrics_server(host, port):
+    """Запуск HTTP сервера /metrics в отдельном потоке"""
+    start_http_server(port, addr=host)
+    logger.info(f"Метрики Prometheus доступны на http://{host}:{port}/metrics")
@@ -0,0 +1,143 @@
+from geo_index import KDTree, distance_km
+
+# Объекты строительства, которыми заполняется пустая таблица objects
+DEFAULT_OBJECT_NAMES = [
+    "Сам Сити", "Ситй+Сиёб Б Й К блок", "Ал Бухорий", "Ал-Бухорий Хотел",
+    "Рубловка", "Қува ҚВП", "Макон Малл", "Карши Малл", "Карши Хотел",
+    "Воха Гавхари", "Зарметан усто Ғафур", "Кожа завод", "Мотрид катеж",
+    "Хишрав", "Махдуми Азам", "Сирдарё 1/10 Зухри", "Эшонгузар",
+    "Рубловка(Хожи бобо дом)", "Ургут", "Қўқон малл"
+]
+
+
+class ObjectRouting:
+    """
+    Справочник объектов и маршрутизация к зав. складами в памяти
+
+    Объект -> одобренные зав. склады этого объекта. Уведомления об одобренных
+    заказах и отправленных товарах получают только зав. склады объекта заявки,
+    без запроса к users на каждое уведомление.
+
+    Индекс загружается при запуске целиком (load) и обновляется при изменениях:
+    одобрение или удаление зав. склада - set_user/remove_user, изменение
+    справочника объектов - повторная загрузка.
+
+    Зав. склады с координатами дополнительно лежат в k-d дереве (geo_index):
+    объекту без своих зав. складов достается ближайший склад. Дерево
+    перестраивается при первом поиске после изменения состава.
+    """
+
+    def __init__(self):
+        self._objects = {}
+        self._ids = {}
+        self._staff = {}
+        self._user_objects = {}
+        self._located = {}
+        self._tree = None
+
+    def load(self, objects, warehouse_users):
+        """
+        Полная загрузка
+
+        Args:
+            objects (list): Строки objects (id, name, is_active, latitude, longitude)
+            warehouse_users (list): Одобренные зав. склады (строки users с object_id и координатами)
+        """
+        self._objects = {obj.id: obj for obj in objects}
+        self._ids = {obj.name: obj.id for obj in objects}
+        self._staff.clear()
+        self._user_objects.clear()
+        self._located.clear()
+        self._tree = None
+        for user in warehouse_users:
+            self.set_user(user)
+
+    def set_user(self, user):
+        """Добавление или перенос зав. склада (после одобрения или смены объекта)"""
+        self.remove_user(user.id)
+        if user.role != 'warehouse' or not user.is_approved:
+            return
+        if user.latitude is not None and user.longitude is not None:
+            self._located[user.id] = user
+            self._tree = None
+        if user.object_id is None:
+            return
+        self._staff.setdefault(user.object_id, []).append(user)
+        self._user_objects[user.id] = user.object_id
+
+    def remove_user(self, user_id):
+        """Исключение пользователя из маршрутизации"""
+        if self._located.pop(user_id, None) is not None:
+            self._tree = None
+        object_id = self._user_objects.pop(user_id, None)
+        if object_id is None:
+            return
+        staff = [user for user in self._staff[object_id] if user.id != user_id]
+        if staff:
+            self._staff[object_id] = staff
+        else:
+            del self._staff[object_id]
+
+    def objects(self, include_inactive=False):
+        """Объекты в порядке добавления (для клавиатур - только активные)"""
+        return [obj for obj in self._objects.values() if include_inactive or obj.is_active]
+
+    def names(self):
+        """Названия активных объектов"""
+        return [obj.name for obj in self.objects()]
+
+    def object_id(self, name):
+        """ID объекта по точному названию или None"""
+        return self._ids.get(name)
+
+    def object_name(self, object_id):
+        """Название объекта по ID или None"""
+        obj = self._objects.get(object_id)
+        return obj.name if obj else None
+
+    def staff(self, object_id):
+        """Одобренные зав. склады объекта"""
+        return list(self._staff.get(object_id, ()))
+
+    def object_point(self, object_id):
+        """
+        Координаты объекта: заданные в справочнике, иначе центр его зав. складов
+        с координатами; None, если координат нет
+        """
+        obj = self._objects.get(object_id)
+        if obj is not None and obj.latitude is not None and obj.longitude is not None:
+            return obj.latitude, obj.longitude
+        located = [user for user in self._staff.get(object_id, ()) if user.id in self._located]
+        if not located:
+            return None
+        return (sum(user.latitude for user in located) / len(located),
+                sum(user.longitude for user in located) / len(located))
+
+    def nearest(self, latitude, longitude, k=1):
+        """k ближайших зав. складов: список (расстояние в км, пользователь)"""
+        if self._tree is None:
+            self._tree = KDTree([(user.latitude, user.longitude, user) for user in self._located.values()])
+        return self._tree.nearest(latitude, longitude, k)
+
+    def route(self, object_id):
+        """
+        Зав. склады, которым направляется заказ объекта
+
+        Свои зав. склады объекта - ближайший к объекту первым (он указывается
+        поставщику как ответственный); если у объекта их нет - ближайший склад по
+        координатам объекта. Пустой список - объект без складов и координат.
+        """
+        point = self.object_point(object_id)
+        staff = self.staff(object_id)
+        if staff:
+            if point is not None:
+                far = float('inf')
+                staff.sort(key=lambda user: distance_km(point[0], point[1], user.latitude, user.longitude)
+                           if user.id in self._located else far)
+            return staff
+        if point is None:
+            return []
+        return [user for _, user in self.nearest(point[0], point[1])]
+
+    def __len__(self):
+        return len(self._objects)
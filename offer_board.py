@@ -0,0 +1,80 @@
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+# Сколько предложений показывать на доске (ограничения длины текста и числа кнопок)
+MAX_BOARD_OFFERS = 30
+
+STATUS_ICONS = {
+    'pending': "⏳",
+    'approved': "✅",
+    'rejected': "❌",
+    'delivered': "🚚",
+}
+
+MEDALS = ["🥇", "🥈", "🥉"]
+
+
+def rank_offers(offers):
+    """Порядок на доске: рассматриваемые и одобренные по возрастанию суммы, отклоненные в конце"""
+    return sorted(offers, key=lambda offer: (offer['status'] == 'rejected', offer['total_amount'] or 0, offer['id']))
+
+
+def render_offer_board(request, offers, updated_at, new_offers=0):
+    """
+    Текст и клавиатура доски предложений по заявке
+
+    Args:
+        request (dict): Заявка (id, object_name)
+        offers (list): Строки Database.get_offer_board_rows
+        updated_at (str): Время обновления для заголовка
+        new_offers (int): Число новых предложений с прошлого обновления
+
+    Returns:
+        tuple: (text, InlineKeyboardMarkup)
+    """
+    ranked = rank_offers(offers)
+    pending = sum(1 for offer in offers if offer['status'] == 'pending')
+
+    text = f"📊 Ариза #{request['id']} - таклифлар\n"
+    text += f"🏗️ Объект: {request['object_name']}\n"
+    text += f"📦 Таклифлар: {len(offers)} (кутилмоқда: {pending})\n"
+    if new_offers:
+        text += f"📥 Янги таклифлар: {new_offers}\n"
+    text += f"🕒 Янгиланди: {updated_at}\n"
+    text += "─" * 30 + "\n"
+
+    if not offers:
+        text += "Ҳозирча таклифлар йўқ."
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+    place = 0
+    for offer in ranked[:MAX_BOARD_OFFERS]:
+        if offer['status'] != 'rejected' and place < len(MEDALS):
+            prefix = MEDALS[place]
+        else:
+            prefix = "•"
+        if offer['status'] != 'rejected':
+            place += 1
+
+        text += (
+            f"{prefix} #{offer['id']} {offer['full_name']} - {offer['total_amount']:,} сўм "
+            f"({offer['item_count']} та товар) {STATUS_ICONS.get(offer['status'], '')}\n"
+        )
+
+        if offer['status'] == 'pending':
+            keyboard.inline_keyboard.append([
+                InlineKeyboardButton(text=f"✅ Одобрить #{offer['id']}", callback_data=f"approve_offer_{offer['id']}"),
+                InlineKeyboardButton(text=f"❌ Отклонить #{offer['id']}", callback_data=f"reject_offer_{offer['id']}"),
+            ])
+
+    if len(ranked) > MAX_BOARD_OFFERS:
+        text += f"... ва яна {len(ranked) - MAX_BOARD_OFFERS} та таклиф (Excel файлда)\n"
+
+    keyboard.inline_keyboard.append([
+        InlineKeyboardButton(text="📊 Excel файл", callback_data=f"board_excel_{request['id']}"),
+        InlineKeyboardButton(text="📈 Солиштириш", callback_data=f"board_compare_{request['id']}"),
+    ])
+    keyboard.inline_keyboard.append([
+        InlineKeyboardButton(text="🧮 Тақсимлаш", callback_data=f"split_max_{request['id']}_0"),
+        InlineKeyboardButton(text="🔄 Янгилаш", callback_data=f"board_refresh_{request['id']}"),
+    ])
+    return text, keyboard
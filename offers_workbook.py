@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+from decimal import Decimal
+
+from config import OFFER_STATUSES
+
+
+def _json_default(value):
+    # Excel хранит числа как double, поэтому Decimal в журнале - float
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Не сериализуется: {type(value).__name__}")
+
+
+class OffersWorkbookStore:
+    """
+    Книги предложений по заявкам, хранящиеся на диске
+
+    Основа книги - журнал request_<id>.jsonl, в который только дописываются
+    записи: строки нового предложения или смена его статуса. Новое предложение
+    и смена статуса стоят одну запись в конец файла, независимо от числа строк
+    в книге; остальные предложения и их товары из базы не читаются.
+
+    Файл request_<id>.xlsx собирается из журнала только при выгрузке и только
+    если журнал изменился с прошлой сборки. Версия книги - размер журнала;
+    рядом в request_<id>.json лежат версия собранной книги и file_id ее
+    последней отправки в Telegram.
+    """
+
+    def __init__(self, excel_handler, base_dir):
+        self.excel_handler = excel_handler
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        os.makedirs(base_dir, exist_ok=True)
+
+    def path(self, request_id):
+        return os.path.join(self.base_dir, f"request_{request_id}.xlsx")
+
+    def _log_path(self, request_id):
+        return os.path.join(self.base_dir, f"request_{request_id}.jsonl")
+
+    def _meta_path(self, request_id):
+        return os.path.join(self.base_dir, f"request_{request_id}.json")
+
+    def _version(self, request_id):
+        try:
+            return os.path.getsize(self._log_path(request_id))
+        except FileNotFoundError:
+            return None
+
+    def _load_meta(self, request_id):
+        try:
+            with open(self._meta_path(request_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_meta(self, request_id, meta):
+        meta_path = self._meta_path(request_id)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def _offer_record(self, offer):
+        return json.dumps({'offer': offer.id, 'rows': self.excel_handler.offer_rows(offer)},
+                          ensure_ascii=False, default=_json_default) + '\n'
+
+    def _write(self, request_id, records):
+        with open(self._log_path(request_id), 'a', encoding='utf-8') as f:
+            f.writelines(records)
+
+    def exists(self, request_id):
+        return self._version(request_id) is not None
+
+    def seed(self, request_id, offers):
+        """
+        Журнал по уже сохраненным предложениям (первое предложение заявки или
+        заявка, созданная до появления журнала)
+        """
+        log_path = self._log_path(request_id)
+        with self._lock:
+            with open(log_path + '.tmp', 'w', encoding='utf-8') as f:
+                f.writelines(self._offer_record(offer) for offer in offers)
+            os.replace(log_path + '.tmp', log_path)
+
+    def append_offer(self, request_id, offer):
+        """
+        Дописывает новое предложение в журнал
+
+        Returns:
+            bool: False, если журнала еще нет (его нужно создать через seed)
+        """
+        with self._lock:
+            if not self.exists(request_id):
+                return False
+            self._write(request_id, [self._offer_record(offer)])
+            return True
+
+    def update_status(self, request_id, offer_id, status):
+        """Дописывает смену статуса предложения; False, если журнала нет"""
+        with self._lock:
+            if not self.exists(request_id):
+                return False
+            self._write(request_id, [json.dumps({'offer': offer_id, 'status': status}) + '\n'])
+            return True
+
+    def _replay(self, request_id):
+        """Строки книги по журналу: предложения в порядке поступления с последним статусом"""
+        offers = {}
+        status_index = self.excel_handler.OFFERS_STATUS_COLUMN - 1
+        with open(self._log_path(request_id), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Недописанная строка после аварийной остановки
+                    continue
+                if 'rows' in record:
+                    offers.setdefault(record['offer'], record['rows'])
+                elif record['offer'] in offers:
+                    label = OFFER_STATUSES.get(record['status'], record['status'])
+                    for row in offers[record['offer']]:
+                        row[status_index] = label
+        return [row for rows in offers.values() for row in rows]
+
+    def export(self, request_id):
+        """
+        Путь к актуальной книге; книга пересобирается, только если журнал
+        изменился с прошлой сборки
+
+        Returns:
+            str: Путь к xlsx или None, если журнала нет
+        """
+        with self._lock:
+            version = self._version(request_id)
+            if version is None:
+                return None
+            meta = self._load_meta(request_id)
+            path = self.path(request_id)
+            if meta.get('built') == version and os.path.exists(path):
+                return path
+
+            wb = self.excel_handler.create_offers_workbook()
+            ws = wb.active
+            for row in self._replay(request_id):
+                ws.append(row)
+            # Запись через временный файл, чтобы не отдать наполовину записанную книгу
+            wb.save(path + '.tmp')
+            os.replace(path + '.tmp', path)
+            self._save_meta(request_id, {'built': version, 'file_id': None, 'version': None})
+            return path
+
+    def snapshot(self, request_id):
+        """
+        (file_id, version) текущей книги; file_id - None, если книга менялась
+        после отправки; (None, None), если журнала нет
+        """
+        version = self._version(request_id)
+        if version is None:
+            return None, None
+        meta = self._load_meta(request_id)
+        file_id = meta.get('file_id') if meta.get('version') == version else None
+        return file_id, version
+
+    def set_file_id(self, request_id, file_id, version):
+        """
+        Запоминает file_id отправленной книги для повторной отправки без загрузки
+
+        file_id сохраняется, только если журнал не менялся с момента отправки.
+        """
+        with self._lock:
+            if self._version(request_id) != version:
+                return
+            meta = self._load_meta(request_id)
+            meta.update(file_id=file_id, version=version)
+            self._save_meta(request_id, meta)
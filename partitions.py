@@ -0,0 +1,60 @@
+from datetime import date, datetime
+
+# Таблицы строк заявок и предложений, секционированные по месяцу created_at
+PARTITIONED_TABLES = ('request_items', 'seller_offer_items')
+
+
+def month_start(value):
+    """Первое число месяца для даты или datetime"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """Сдвиг начала месяца на count месяцев (count может быть отрицательным)"""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    """Имя секции месяца: request_items_p202410"""
+    return f"{table}_p{month:%Y%m}"
+
+
+def partition_month(table, name):
+    """Месяц секции по ее имени; None для чужих имен и секции по умолчанию"""
+    prefix = f"{table}_p"
+    if not name.startswith(prefix):
+        return None
+    try:
+        return month_start(datetime.strptime(name[len(prefix):], '%Y%m'))
+    except ValueError:
+        return None
+
+
+def planned_months(now, ahead, since=None):
+    """
+    Месяцы, для которых должны существовать секции
+
+    Args:
+        now (datetime): Текущее время
+        ahead (int): Сколько месяцев вперед создавать заранее
+        since (datetime): Самая ранняя дата строк (по умолчанию - текущий месяц)
+    """
+    month = month_start(since or now)
+    last = add_months(month_start(now), ahead)
+    months = []
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def expired_partitions(table, names, now, retention_months):
+    """Секции, целиком лежащие раньше чем retention_months месяцев до текущего"""
+    cutoff = add_months(month_start(now), -retention_months)
+    expired = []
+    for name in names:
+        month = partition_month(table, name)
+        if month is not None and month < cutoff:
+            expired.append(name)
+    return sorted(expired)
@@ -0,0 +1,142 @@
+import pandas as pd
+
+# Сколько поставщиков и товаров помещается в текстовое сообщение
+TEXT_MAX_SELLERS = 4
+TEXT_MAX_ITEMS = 25
+
+
+def item_key(names):
+    """Ключ товара для сопоставления строк заявки и предложений"""
+    return names.fillna('').astype(str).str.strip().str.lower().str.replace(r'\s+', ' ', regex=True)
+
+
+def request_keys(request_items):
+    """Ключи товаров заявки: '#<id>', для товаров без ID (старые данные) - по названию"""
+    requested = pd.DataFrame(request_items, columns=['id', 'product_name', 'quantity', 'unit'])
+    return ('#' + requested['id'].astype('Int64').astype(str)).where(
+        requested['id'].notna(), item_key(requested['product_name']))
+
+
+def build_price_matrix(request_items, offer_rows):
+    """
+    Матрица цен: товары (строки) x предложения поставщиков (колонки)
+
+    Считается одним проходом pandas по строкам seller_offer_items, без циклов
+    по предложениям.
+
+    Args:
+        request_items (list): Строки request_items (id, product_name, quantity, unit)
+        offer_rows (list): Строки Database.get_offer_item_rows (offer_id, full_name, status,
+            item_id, request_item_id, product_name, quantity, unit, price, total)
+
+    Returns:
+        dict: items - товары (name, unit, quantity, best_price, best_total),
+              prices - цены за единицу (index - товар, columns - offer_id),
+              best - маска лучших цен той же формы,
+              sellers - итоги по предложениям (label, status, total, covered, coverage, best_count),
+              item_count - число товаров для расчета покрытия,
+              rows - строки предложений с ключом товара (offer_id, item_id, key, price),
+              best_total - стоимость заявки по лучшим ценам
+    """
+    # Товары заявки с ID получают ключ '#<id>', без ID (старые данные) - по названию
+    requested = pd.DataFrame(request_items, columns=['id', 'product_name', 'quantity', 'unit'])
+    requested_names = item_key(requested['product_name'])
+    requested = requested.assign(
+        key=request_keys(request_items),
+        quantity=pd.to_numeric(requested['quantity'], errors='coerce'),
+    )
+
+    # Строки предложений связаны с товаром заявки через request_item_id; строки
+    # без связи (шаблоны без ключа) сопоставляются по названию
+    offers = pd.DataFrame(offer_rows, columns=['offer_id', 'full_name', 'status', 'item_id', 'request_item_id',
+                                               'product_name', 'quantity', 'unit', 'price', 'total'])
+    offers = offers[offers['status'] != 'rejected']
+    offer_names = item_key(offers['product_name'])
+    by_name = pd.Series(requested['key'].to_numpy(), index=requested_names.to_numpy())
+    by_name = by_name[~by_name.index.duplicated()]
+    offers = offers.assign(
+        key=('#' + offers['request_item_id'].astype('Int64').astype(str)).where(
+            offers['request_item_id'].notna(), offer_names.map(by_name).fillna(offer_names)),
+        price=pd.to_numeric(offers['price'], errors='coerce'),
+        total=pd.to_numeric(offers['total'], errors='coerce').fillna(0),
+        quantity=pd.to_numeric(offers['quantity'], errors='coerce'),
+    )
+
+    # Товары в порядке заявки; товары, которых нет в заявке, добавляются в конец
+    items = pd.concat([
+        requested[['key', 'product_name', 'unit', 'quantity']],
+        offers[['key', 'product_name', 'unit', 'quantity']],
+    ]).drop_duplicates('key').set_index('key').rename(columns={'product_name': 'name'})
+    items['name'] = items['name'].astype(str).str.strip()
+
+    prices = offers.pivot_table(index='key', columns='offer_id', values='price', aggfunc='min')
+    prices = prices.reindex(index=items.index)
+    best_price = prices.min(axis=1)
+    best = prices.eq(best_price, axis=0) & prices.notna()
+
+    items['best_price'] = best_price
+    items['best_total'] = best_price * items['quantity']
+
+    # Покрытие считается по товарам заявки (для старых заявок без товаров - по всем)
+    counted = prices[items.index.isin(requested['key'])] if len(requested) else prices
+    covered = counted.notna().sum()
+    item_count = len(counted)
+
+    sellers = offers.drop_duplicates('offer_id').set_index('offer_id')[['full_name', 'status']]
+    sellers = sellers.reindex(prices.columns)
+    sellers['label'] = '#' + sellers.index.astype(str) + ' ' + sellers['full_name'].astype(str)
+    sellers['total'] = offers.groupby('offer_id')['total'].sum().reindex(prices.columns)
+    sellers['covered'] = covered.astype(int)
+    sellers['coverage'] = covered / item_count if item_count else 0.0
+    sellers['best_count'] = best.sum().astype(int)
+    sellers = sellers.sort_values(['covered', 'total'], ascending=[False, True])
+
+    order = list(sellers.index)
+    return {
+        'items': items,
+        'prices': prices[order],
+        'best': best[order],
+        'sellers': sellers,
+        'item_count': item_count,
+        'rows': offers[['offer_id', 'item_id', 'key', 'price']],
+        'best_total': float(items['best_total'].sum()),
+    }
+
+
+def format_price_matrix(matrix, request_id):
+    """Компактный текстовый вид матрицы цен для сообщения"""
+    items = matrix['items']
+    sellers = matrix['sellers']
+    if sellers.empty:
+        return "📭 Бу ариза бўйича таклифлар йўқ."
+
+    shown = list(sellers.index[:TEXT_MAX_SELLERS])
+    text = f"📈 Ариза #{request_id} - нархларни солиштириш\n"
+    for number, offer_id in enumerate(shown, 1):
+        seller = sellers.loc[offer_id]
+        text += (
+            f"{number}) {seller['label']}: {seller['total']:,.0f} сўм, "
+            f"қамров {seller['covered']}/{matrix['item_count']} "
+            f"({seller['coverage']:.0%}), энг арзон: {seller['best_count']}\n"
+        )
+    if len(sellers) > len(shown):
+        text += f"... ва яна {len(sellers) - len(shown)} та таклиф (Excel файлда)\n"
+    text += "─" * 30 + "\n"
+
+    prices = matrix['prices']
+    best = matrix['best']
+    for key in items.index[:TEXT_MAX_ITEMS]:
+        cells = []
+        for offer_id in shown:
+            price = prices.at[key, offer_id]
+            if pd.isna(price):
+                cells.append("—")
+            else:
+                cells.append(f"{price:,.0f}{'✅' if best.at[key, offer_id] else ''}")
+        text += f"• {items.at[key, 'name']}: " + " | ".join(cells) + "\n"
+    if len(items) > TEXT_MAX_ITEMS:
+        text += f"... ва яна {len(items) - TEXT_MAX_ITEMS} та товар (Excel файлда)\n"
+
+    text += "─" * 30 + "\n"
+    text += f"💡 Энг арзон нархлар бўйича жами: {matrix['best_total']:,.0f} сўм"
+    return text
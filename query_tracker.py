@@ -0,0 +1,153 @@
+import contextvars
+import json
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+
+import psycopg2.extensions
+from aiogram import BaseMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Журнал запросов текущего апдейта (None - учет выключен)
+current_query_log = contextvars.ContextVar('current_query_log', default=None)
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def normalize_sql(query):
+    """Приведение SQL к виду, одинаковому для повторов одного и того же запроса"""
+    query = _STRING_LITERAL.sub('?', query)
+    query = _NUMBER_LITERAL.sub('?', query)
+    return _WHITESPACE.sub(' ', query).strip()
+
+
+class QueryLog:
+    """Запросы, выполненные в рамках одного апдейта или теста"""
+
+    def __init__(self, label=None):
+        self.label = label
+        self.queries = []
+        self.counts = Counter()
+
+    def record(self, query):
+        normalized = normalize_sql(query)
+        self.queries.append(normalized)
+        self.counts[normalized] += 1
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def repeated(self, limit):
+        """Запросы, повторенные limit и более раз (признак N+1)"""
+        return {sql: n for sql, n in self.counts.items() if n >= limit}
+
+    def problems(self, budget=None, repeat_limit=None):
+        """Нарушения бюджета запросов в виде текстовых описаний"""
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append(f"{self.count} запросов при бюджете {budget}")
+        if repeat_limit is not None:
+            for sql, n in self.repeated(repeat_limit).items():
+                problems.append(f"N+1: {n} раз «{sql[:120]}»")
+        return problems
+
+
+def _query_text(cursor, query):
+    if isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    if isinstance(query, str):
+        return query
+    # psycopg2.sql.Composable
+    return query.as_string(cursor)
+
+
+_tracked_cursor_classes = {}
+
+
+def tracked_cursor_class(base):
+    """Подкласс курсора, который пишет запросы в текущий QueryLog"""
+    cls = _tracked_cursor_classes.get(base)
+    if cls is not None:
+        return cls
+
+    class TrackedCursor(base):
+        def execute(self, query, vars=None):
+            log = current_query_log.get()
+            if log is not None:
+                log.record(_query_text(self, query))
+            return super().execute(query, vars)
+
+        def executemany(self, query, vars_list):
+            log = current_query_log.get()
+            if log is not None:
+                log.record(_query_text(self, query))
+            return super().executemany(query, vars_list)
+
+    TrackedCursor.__name__ = f"Tracked{base.__name__}"
+    _tracked_cursor_classes[base] = TrackedCursor
+    return TrackedCursor
+
+
+class TrackedConnection(psycopg2.extensions.connection):
+    """Соединение, все курсоры которого учитываются в QueryLog"""
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = tracked_cursor_class(factory)
+        return super().cursor(*args, **kwargs)
+
+
+@contextmanager
+def track_queries(label=None):
+    """Учет запросов внутри блока"""
+    log = QueryLog(label)
+    token = current_query_log.set(log)
+    try:
+        yield log
+    finally:
+        current_query_log.reset(token)
+
+
+@contextmanager
+def assert_query_budget(max_queries=None, repeat_limit=None, label=None):
+    """
+    Проверка бюджета запросов для тестов
+
+    Пример:
+        with assert_query_budget(max_queries=3, repeat_limit=2):
+            db.get_offers_for_request(request_id)
+    """
+    with track_queries(label) as log:
+        yield log
+    problems = log.problems(max_queries, repeat_limit)
+    if problems:
+        raise AssertionError(f"{label or 'Бюджет запросов'}: " + "; ".join(problems))
+
+
+class QueryBudgetMiddleware(BaseMiddleware):
+    """Считает запросы каждого апдейта и предупреждает о превышении бюджета и N+1"""
+
+    def __init__(self, budget, repeat_limit):
+        self.budget = budget
+        self.repeat_limit = repeat_limit
+
+    async def __call__(self, handler, event, data):
+        name = getattr(getattr(data.get('handler'), 'callback', None), '__name__', 'unknown')
+        with track_queries(name) as log:
+            try:
+                return await handler(event, data)
+            finally:
+                problems = log.problems(self.budget, self.repeat_limit)
+                if problems:
+                    logger.warning(json.dumps({
+                        'event': 'query_budget_exceeded',
+                        'handler': name,
+                        'update_type': type(event).__name__,
+                        'queries': log.count,
+                        'problems': problems,
+                    }, ensure_ascii=False))
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Причины закрытия заявки (purchase_requests.close_reason)
+CLOSE_REASONS = {
+    'covered': "барча товарлар тасдиқланган таклифлар билан ёпилди",
+    'cancelled': "заказчик томонидан бекор қилинди",
+    'expired': "таклифлар қабул қилиш муддати тугади",
+}
+
+
+def format_seller_notice(request_id, offer_id, reason):
+    """Уведомление поставщику, чье рассматриваемое предложение закрыто вместе с заявкой"""
+    return (
+        f"🔒 Ариза #{request_id} ёпилди: {CLOSE_REASONS.get(reason, reason)}.\n"
+        f"❌ Сизнинг таклифингиз #{offer_id} рад этилди."
+    )
+
+
+class RequestSweeper:
+    """
+    Фоновое закрытие заявок с истекшим сроком приема предложений
+
+    Раз в interval секунд вызывает expire_batch(batch_size) в отдельном потоке,
+    пока пакет заполнен целиком, и передает каждый результат в on_closed.
+    Так за один проход обрабатывается любой накопившийся хвост, а транзакции
+    остаются короткими.
+    """
+
+    def __init__(self, expire_batch, on_closed, interval=300.0, batch_size=500):
+        self.expire_batch = expire_batch
+        self.on_closed = on_closed
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task = None
+
+    async def sweep(self):
+        """Один проход; возвращает число закрытых заявок"""
+        closed = 0
+        while True:
+            result = await asyncio.to_thread(self.expire_batch, self.batch_size)
+            if not result['closed']:
+                break
+            closed += len(result['closed'])
+            try:
+                await self.on_closed(result)
+            except Exception as e:
+                logger.error(f"Ошибка уведомлений о закрытых заявках: {e}", exc_info=True)
+            if len(result['closed']) < self.batch_size:
+                break
+        if closed:
+            logger.info(f"Закрыто заявок с истекшим сроком: {closed}")
+        return closed
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Ошибка закрытия заявок: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Запуск периодического прохода (вызывать внутри работающего loop)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Остановка"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
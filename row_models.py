@@ -0,0 +1,228 @@
+import operator
+from dataclasses import dataclass, fields
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+
+class RowModel:
+    """
+    Базовый класс строк БД с атрибутами в __slots__
+
+    Строка занимает место одного объекта без словаря атрибутов, а поле читается
+    как обычный атрибут (user.full_name). Доступ row['поле'] и row.get('поле')
+    оставлен для кода, который еще работает со строками RealDictCursor.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+@dataclass(slots=True, eq=False)
+class User(RowModel):
+    """Строка users"""
+    id: Optional[int] = None
+    telegram_id: Optional[int] = None
+    username: Optional[str] = None
+    full_name: Optional[str] = None
+    phone_number: Optional[str] = None
+    role: Optional[str] = None
+    object_name: Optional[str] = None
+    object_id: Optional[int] = None
+    location: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    is_approved: Optional[bool] = None
+    created_at: Optional[datetime] = None
+
+
+@dataclass(slots=True, eq=False)
+class Site(RowModel):
+    """Строка objects (объект строительства)"""
+    id: Optional[int] = None
+    name: Optional[str] = None
+    is_active: Optional[bool] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    created_at: Optional[datetime] = None
+
+
+@dataclass(slots=True, eq=False)
+class RequestItem(RowModel):
+    """Строка request_items"""
+    id: Optional[int] = None
+    request_id: Optional[int] = None
+    product_name: Optional[str] = None
+    quantity: Optional[Decimal] = None
+    unit: Optional[str] = None
+    material_description: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+@dataclass(slots=True, eq=False)
+class PurchaseRequest(RowModel):
+    """Строка purchase_requests с заказчиком и товарами"""
+    id: Optional[int] = None
+    buyer_id: Optional[int] = None
+    supplier_name: Optional[str] = None
+    object_name: Optional[str] = None
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+    full_name: Optional[str] = None
+    phone_number: Optional[str] = None
+    item_count: Optional[int] = None
+    offer_count: Optional[int] = None
+    best_total: Optional[Decimal] = None
+    items: Optional[list] = None
+
+
+@dataclass(slots=True, eq=False)
+class OfferItem(RowModel):
+    """Строка seller_offer_items"""
+    id: Optional[int] = None
+    offer_id: Optional[int] = None
+    product_name: Optional[str] = None
+    quantity: Optional[Decimal] = None
+    unit: Optional[str] = None
+    price: Optional[Decimal] = None
+    total: Optional[Decimal] = None
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+    awarded: Optional[bool] = None
+    request_item_id: Optional[int] = None
+
+
+@dataclass(slots=True, eq=False)
+class Offer(RowModel):
+    """
+    Строка seller_offers с поставщиком, заявкой и товарами
+
+    Кроме колонок таблицы содержит поля соединений (full_name, object_name, ...)
+    и поля, которые заполняет approve_offer/approve_split_award.
+    """
+    id: Optional[int] = None
+    purchase_request_id: Optional[int] = None
+    seller_id: Optional[int] = None
+    total_amount: Optional[Decimal] = None
+    offer_type: Optional[str] = None
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+    excel_filename: Optional[str] = None
+    item_count: Optional[int] = None
+    full_name: Optional[str] = None
+    phone_number: Optional[str] = None
+    seller_telegram_id: Optional[int] = None
+    supplier: Optional[str] = None
+    supplier_name: Optional[str] = None
+    object_name: Optional[str] = None
+    request_object: Optional[str] = None
+    buyer_id: Optional[int] = None
+    buyer_object: Optional[str] = None
+    object_id: Optional[int] = None
+    closed_at: Optional[datetime] = None
+    items: Optional[list] = None
+    delivery_id: Optional[int] = None
+    already_processed: Optional[bool] = None
+    award_total: Optional[Decimal] = None
+
+
+@dataclass(slots=True, eq=False)
+class Delivery(RowModel):
+    """Строка deliveries с предложением, поставщиком, заказчиком и товарами"""
+    id: Optional[int] = None
+    offer_id: Optional[int] = None
+    warehouse_user_id: Optional[int] = None
+    status: Optional[str] = None
+    received_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    total_amount: Optional[Decimal] = None
+    offer_created_at: Optional[datetime] = None
+    seller_name: Optional[str] = None
+    seller_phone: Optional[str] = None
+    buyer_name: Optional[str] = None
+    buyer_phone: Optional[str] = None
+    supplier: Optional[str] = None
+    object_name: Optional[str] = None
+    items: Optional[list] = None
+
+
+@dataclass(slots=True, eq=False)
+class StockBalance(RowModel):
+    """Строка stock_balances (остаток товара на объекте)"""
+    object_id: Optional[int] = None
+    product_key: Optional[str] = None
+    unit: Optional[str] = None
+    product_name: Optional[str] = None
+    quantity: Optional[Decimal] = None
+    updated_at: Optional[datetime] = None
+
+
+# (модель, колонки курсора) -> функция tuple -> модель
+_factories = {}
+
+# Значение полей модели, для которых в строке нет колонки
+_MISSING = (None,)
+
+
+def row_factory(model, columns):
+    """
+    Функция, собирающая модель из кортежа строки курсора
+
+    Для каждого набора колонок функция строится один раз: аргументы конструктора
+    берутся из строки по заранее вычисленным позициям (operator.itemgetter), без
+    промежуточного словаря. Колонки, которых нет в модели, пропускаются; поля без
+    колонки получают None из добавленного в конец строки элемента.
+
+    Args:
+        model: Класс модели (User, Offer, ...)
+        columns (tuple): Имена колонок в порядке cursor.description
+    """
+    key = (model, columns)
+    make = _factories.get(key)
+    if make is None:
+        positions = {name: index for index, name in enumerate(columns)}
+        missing = len(columns)
+        indexes = [positions.get(field.name, missing) for field in fields(model)]
+        getter = operator.itemgetter(*indexes)
+        if len(indexes) == 1:
+            # itemgetter с одной позицией возвращает значение, а не кортеж
+            single = getter
+            getter = lambda row: (single(row),)
+        if missing in indexes:
+            make = lambda row: model(*getter(row + _MISSING))
+        else:
+            make = lambda row: model(*getter(row))
+        _factories[key] = make
+    return make
+
+
+def cursor_columns(cursor):
+    """Имена колонок последнего запроса курсора"""
+    return tuple(column[0] for column in cursor.description)
+
+
+def fetch_all(cursor, model):
+    """Все строки курсора (обычного, не RealDictCursor) в виде моделей"""
+    rows = cursor.fetchall()
+    if not rows:
+        return []
+    return list(map(row_factory(model, cursor_columns(cursor)), rows))
+
+
+def fetch_one(cursor, model):
+    """Одна строка курсора в виде модели или None"""
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row_factory(model, cursor_columns(cursor))(row)
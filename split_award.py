@@ -0,0 +1,228 @@
+import itertools
+import math
+
+import numpy as np
+
+from price_matrix import build_price_matrix, request_keys
+
+# До скольки комбинаций поставщиков перебор выполняется полностью
+EXACT_SEARCH_LIMIT = 20000
+# Ограничение итераций локального поиска (обмен одного поставщика на другого)
+MAX_SWAP_ROUNDS = 100
+
+
+# Статусы предложений, выигравшие товары которых уже закреплены за поставщиком
+AWARDED_STATUSES = ('approved', 'delivered')
+
+
+class SplitAwardError(ValueError):
+    """Ограничения распределения невыполнимы"""
+
+
+def open_split_rows(request_items, offer_rows):
+    """
+    Товары заявки и строки предложений, которые еще можно распределить
+
+    Распределяются только предложения в статусе pending: одобренные уже нельзя
+    одобрить повторно. Товары, выигранные одобренными предложениями (строки с
+    awarded), считаются покрытыми и в распределение не попадают - вместе со
+    строками pending-предложений по этим товарам.
+
+    Args:
+        request_items (list): Строки request_items
+        offer_rows (list): Строки Database.get_offer_item_rows (со статусом и awarded)
+
+    Returns:
+        tuple: (товары заявки, строки pending-предложений)
+    """
+    pending = [row for row in offer_rows if row['status'] == 'pending']
+    awarded = [row for row in offer_rows if row['status'] in AWARDED_STATUSES and row.get('awarded', True)]
+    if not awarded:
+        return request_items, pending
+
+    # Ключи строк считаются по всем строкам сразу, как в матрице цен
+    rows = build_price_matrix(request_items, awarded + pending)['rows']
+    key_of = dict(zip(rows['item_id'], rows['key']))
+    covered = {key_of[row['item_id']] for row in awarded}
+    items = [item for item, key in zip(request_items, request_keys(request_items)) if key not in covered]
+    return items, [row for row in pending if key_of[row['item_id']] not in covered]
+
+
+def _item_costs(costs, columns, penalty):
+    """Лучшая стоимость каждого товара среди выбранных предложений"""
+    if not columns:
+        return penalty.copy()
+    return costs[:, columns].min(axis=1)
+
+
+def _greedy_with_swaps(costs, limit, penalty):
+    """Жадный выбор поставщиков с последующим улучшением обменами"""
+    chosen = []
+    current = penalty.copy()
+    for _ in range(limit):
+        # Выигрыш от добавления каждого предложения считается сразу для всех колонок
+        totals = np.minimum(current[:, None], costs).sum(axis=0)
+        totals[chosen] = np.inf
+        best = int(np.argmin(totals))
+        chosen.append(best)
+        current = np.minimum(current, costs[:, best])
+
+    total = current.sum()
+    for _ in range(MAX_SWAP_ROUNDS):
+        improved = False
+        for position in range(len(chosen)):
+            rest = chosen[:position] + chosen[position + 1:]
+            base = _item_costs(costs, rest, penalty)
+            totals = np.minimum(base[:, None], costs).sum(axis=0)
+            totals[chosen] = np.inf
+            candidate = int(np.argmin(totals))
+            if totals[candidate] < total - 1e-6:
+                chosen[position] = candidate
+                total = totals[candidate]
+                improved = True
+        if not improved:
+            break
+    return chosen
+
+
+def _exact(costs, limit, penalty):
+    """Полный перебор комбинаций из limit предложений"""
+    best_columns, best_total = None, np.inf
+    for columns in itertools.combinations(range(costs.shape[1]), limit):
+        total = costs[:, columns].min(axis=1).sum()
+        if total < best_total:
+            best_columns, best_total = list(columns), total
+    return best_columns
+
+
+def optimize_split_award(matrix, max_suppliers=None, mandatory=()):
+    """
+    Распределение товаров заявки между предложениями с минимальной стоимостью
+
+    Стоимость товара у предложения - цена за единицу, умноженная на количество
+    из заявки. Сначала покрывается как можно больше товаров (обязательные - в
+    первую очередь), затем минимизируется сумма. Без ограничения числа
+    поставщиков каждый товар достается самому дешевому предложению; с
+    ограничением - полный перебор, если комбинаций не больше EXACT_SEARCH_LIMIT,
+    иначе жадный выбор и локальный поиск обменами.
+
+    Args:
+        matrix (dict): Результат price_matrix.build_price_matrix
+        max_suppliers (int): Максимум предложений-победителей (None - без ограничения)
+        mandatory (iterable): Ключи товаров (item_key), которые обязательно должны быть покрыты
+
+    Returns:
+        dict: awards - {offer_id: [ключи товаров]}, amounts - {offer_id: сумма},
+              total - сумма распределения,
+              uncovered - непокрытые ключи, exact - найден ли точный оптимум
+
+    Raises:
+        SplitAwardError: Обязательный товар не может быть покрыт
+    """
+    items = matrix['items']
+    prices = matrix['prices']
+    keys = list(items.index)
+    offers = list(prices.columns)
+    if not keys or not offers:
+        return {'awards': {}, 'amounts': {}, 'total': 0.0, 'uncovered': keys, 'exact': True}
+
+    quantity = items['quantity'].fillna(1).to_numpy(dtype=float)
+    costs = prices.to_numpy(dtype=float) * quantity[:, None]
+    available = ~np.isnan(costs)
+
+    mandatory_mask = items.index.isin(list(mandatory))
+    missing = [items.at[key, 'name'] for key in np.array(keys)[mandatory_mask & ~available.any(axis=1)]]
+    if missing:
+        raise SplitAwardError(f"Нет предложений по обязательным товарам: {', '.join(missing)}")
+
+    # Непокрытый товар дороже любого покрытия, обязательный - дороже любых необязательных
+    optional_penalty = np.nansum(costs) + 1.0
+    penalty = np.where(mandatory_mask, optional_penalty * (len(keys) + 1), optional_penalty)
+    costs = np.where(available, costs, penalty[:, None])
+
+    limit = len(offers) if max_suppliers is None else max(1, min(max_suppliers, len(offers)))
+    exact = True
+    if limit == len(offers):
+        chosen = list(range(len(offers)))
+    elif math.comb(len(offers), limit) <= EXACT_SEARCH_LIMIT:
+        chosen = _exact(costs, limit, penalty)
+    else:
+        chosen = _greedy_with_swaps(costs, limit, penalty)
+        exact = False
+
+    chosen_costs = costs[:, chosen]
+    winners = np.array(chosen)[chosen_costs.argmin(axis=1)]
+    covered = available[np.arange(len(keys)), winners]
+
+    uncovered_mandatory = [items.at[key, 'name'] for key, ok, must in zip(keys, covered, mandatory_mask) if must and not ok]
+    if uncovered_mandatory:
+        raise SplitAwardError(
+            f"Обязательные товары нельзя покрыть {limit} поставщиками: {', '.join(uncovered_mandatory)}"
+        )
+
+    awards = {}
+    amounts = {}
+    for key, winner, cost, ok in zip(keys, winners, chosen_costs.min(axis=1), covered):
+        if ok:
+            awards.setdefault(offers[winner], []).append(key)
+            amounts[offers[winner]] = amounts.get(offers[winner], 0.0) + float(cost)
+
+    return {
+        'awards': awards,
+        'amounts': amounts,
+        'total': float(sum(amounts.values())),
+        'uncovered': [key for key, ok in zip(keys, covered) if not ok],
+        'exact': exact,
+    }
+
+
+def awarded_item_ids(plan, matrix):
+    """
+    Строки seller_offer_items, выигравшие в распределении
+
+    Если у предложения несколько строк одного товара, выбирается самая дешевая.
+
+    Returns:
+        dict: {offer_id: [id строк seller_offer_items]}
+    """
+    winners = {(offer_id, key) for offer_id, keys in plan['awards'].items() for key in keys}
+    rows = matrix['rows'].sort_values('price')
+    rows = rows[[pair in winners for pair in zip(rows['offer_id'], rows['key'])]]
+    rows = rows.drop_duplicates(['offer_id', 'key'])
+
+    result = {}
+    for offer_id, item_id in zip(rows['offer_id'], rows['item_id']):
+        result.setdefault(int(offer_id), []).append(int(item_id))
+    return result
+
+
+def format_split_award(plan, matrix, request_id, max_suppliers=None, mandatory=()):
+    """Текст предлагаемого распределения для заказчика"""
+    items = matrix['items']
+    sellers = matrix['sellers']
+    if not plan['awards']:
+        return "📭 Бу ариза бўйича тақсимлаш учун таклифлар йўқ."
+
+    text = f"🧮 Ариза #{request_id} - товарларни тақсимлаш\n"
+    limit_text = f"{max_suppliers} та" if max_suppliers else "чекланмаган"
+    text += f"👥 Поставщиклар сони: {limit_text}"
+    if mandatory:
+        text += f", мажбурий товарлар: {len(mandatory)}"
+    text += "\n" + "─" * 30 + "\n"
+
+    for offer_id, keys in plan['awards'].items():
+        text += f"🏆 {sellers.at[offer_id, 'label']}: {len(keys)} та товар, {plan['amounts'][offer_id]:,.0f} сўм\n"
+        for key in keys[:10]:
+            text += f"   • {items.at[key, 'name']}\n"
+        if len(keys) > 10:
+            text += f"   ... ва яна {len(keys) - 10} та\n"
+
+    if plan['uncovered']:
+        names = ", ".join(items.at[key, 'name'] for key in plan['uncovered'][:10])
+        text += f"⚠️ Қопланмаган товарлар ({len(plan['uncovered'])}): {names}\n"
+
+    text += "─" * 30 + "\n"
+    text += f"💵 Жами: {plan['total']:,.0f} сўм"
+    if not plan['exact']:
+        text += " (тахминий оптимум)"
+    return text
@@ -0,0 +1,81 @@
+from decimal import Decimal
+
+from inline_search import normalize_search_text, search_terms
+
+# Сколько строк остатков показывать в одном сообщении
+STOCK_MESSAGE_LIMIT = 50
+
+
+def stock_key(product_name):
+    """
+    Ключ товара в остатках: нормализованное название
+
+    "Цемент М400", "цемент  м400" и "Sement M400" - один товар склада.
+    """
+    return normalize_search_text(product_name)
+
+
+def receipt_movements(items):
+    """
+    Строки поступления на склад по принятым товарам доставки
+
+    Товары без названия или количества пропускаются.
+
+    Args:
+        items (list): Кортежи (название, единица, количество)
+
+    Returns:
+        list: Кортежи (ключ, название, единица, количество)
+    """
+    movements = []
+    for product_name, unit, quantity in items:
+        name = (product_name or '').strip()
+        key = stock_key(name)
+        if not key or quantity is None:
+            continue
+        movements.append((key, name, (unit or '').strip(), Decimal(quantity)))
+    return movements
+
+
+def balance_changes(movements):
+    """
+    Изменения остатков: одна строка на объект, товар и единицу
+
+    Повторы одного товара складываются, чтобы upsert не менял одну строку
+    остатков дважды за запрос.
+
+    Args:
+        movements (list): Кортежи (объект, ключ, название, единица, количество)
+
+    Returns:
+        list: Кортежи (объект, ключ, единица, название, количество)
+    """
+    changes = {}
+    for object_id, key, name, unit, quantity in movements:
+        previous = changes.get((object_id, key, unit))
+        changes[(object_id, key, unit)] = (name, quantity + (previous[1] if previous else 0))
+    return [(object_id, key, unit, name, quantity) for (object_id, key, unit), (name, quantity) in changes.items()]
+
+
+def stock_patterns(query):
+    """Шаблоны LIKE по словам запроса (пустой список - все товары)"""
+    return [f"%{term}%" for term in search_terms(query or '')]
+
+
+def format_stock(object_name, balances, query=None):
+    """Текст с остатками объекта"""
+    if not balances:
+        if query:
+            return f"📦 {object_name}: «{query}» бўйича қолдиқ йўқ."
+        return f"📦 {object_name}: омборда қолдиқ йўқ."
+
+    text = f"📦 Омбор қолдиғи - {object_name}\n"
+    if query:
+        text += f"🔎 {query}\n"
+    text += "\n"
+    for i, balance in enumerate(balances[:STOCK_MESSAGE_LIMIT], 1):
+        quantity = f"{balance.quantity:,.2f}".rstrip('0').rstrip('.')
+        text += f"{i}. {balance.product_name} - {quantity} {balance.unit}\n"
+    if len(balances) > STOCK_MESSAGE_LIMIT:
+        text += f"\n... ва яна {len(balances) - STOCK_MESSAGE_LIMIT} та товар. Қидириш: /stock цемент"
+    return text
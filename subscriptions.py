@@ -0,0 +1,145 @@
+from inline_search import normalize_search_text, MIN_TERM_LENGTH
+
+# Категории товаров и основы слов, по которым товар относится к категории
+PRODUCT_CATEGORIES = {
+    "Цемент ва бетон": ["цемент", "бетон", "раствор"],
+    "Арматура ва металл": ["арматура", "металл", "профнастил", "швеллер", "уголок", "лист", "сетка"],
+    "Ғишт ва блок": ["ғишт", "кирпич", "блок", "газоблок", "пеноблок"],
+    "Қум ва шағал": ["қум", "песок", "шағал", "щебень", "шебень"],
+    "Ёғоч": ["ёғоч", "доска", "брус", "фанера", "ДСП"],
+    "Электр": ["кабель", "провод", "розетка", "выключатель", "автомат", "лампа"],
+    "Сантехника": ["труба", "кран", "смеситель", "унитаз", "канализация", "фитинг"],
+    "Бўёқ ва қуруқ аралашмалар": ["бўёқ", "краска", "шпаклевка", "грунтовка", "штукатурка", "гипсокартон", "клей"],
+}
+
+SUBSCRIPTION_KINDS = ('category', 'keyword', 'object')
+
+
+def keyword_stems(kind, value):
+    """Нормализованные основы слов для подписки на категорию или ключевое слово"""
+    if kind == 'category':
+        words = PRODUCT_CATEGORIES.get(value, [])
+    elif kind == 'keyword':
+        words = [value]
+    else:
+        return []
+
+    stems = set()
+    for word in words:
+        for stem in normalize_search_text(word).split():
+            if len(stem) >= MIN_TERM_LENGTH:
+                stems.add(stem)
+    return stems
+
+
+class SubscriptionIndex:
+    """
+    Инвертированный индекс подписок поставщиков
+
+    Основа слова -> поставщики, объект -> поставщики. Товары новой заявки
+    разбиваются на слова, и для каждого слова проверяются его префиксы, поэтому
+    подписка «арматура» совпадает с «Арматура 12мм», а «цемент» - с «Sement».
+
+    Поставщик без подписок получает все заявки. Подписки на товары и на объекты
+    проверяются независимо: если есть подписки обоих видов, должны совпасть обе.
+    """
+
+    def __init__(self):
+        self._stems = {}
+        self._objects = {}
+        self._seller_stems = {}
+        self._seller_objects = {}
+
+    def load(self, rows):
+        """Полная загрузка из строк seller_subscriptions (seller_id, kind, value)"""
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row['seller_id'], []).append((row['kind'], row['value']))
+
+        self._stems.clear()
+        self._objects.clear()
+        self._seller_stems.clear()
+        self._seller_objects.clear()
+        for seller_id, subscriptions in grouped.items():
+            self.set_seller(seller_id, subscriptions)
+
+    def set_seller(self, seller_id, subscriptions):
+        """Замена подписок одного поставщика (после изменения в базе)"""
+        for stem in self._seller_stems.pop(seller_id, ()):
+            self._discard(self._stems, stem, seller_id)
+        for obj in self._seller_objects.pop(seller_id, ()):
+            self._discard(self._objects, obj, seller_id)
+
+        stems = set()
+        objects = set()
+        for kind, value in subscriptions:
+            if kind == 'object':
+                normalized = normalize_search_text(value)
+                if normalized:
+                    objects.add(normalized)
+            else:
+                stems |= keyword_stems(kind, value)
+
+        for stem in stems:
+            self._stems.setdefault(stem, set()).add(seller_id)
+        for obj in objects:
+            self._objects.setdefault(obj, set()).add(seller_id)
+        if stems:
+            self._seller_stems[seller_id] = stems
+        if objects:
+            self._seller_objects[seller_id] = objects
+
+    @staticmethod
+    def _discard(index, key, seller_id):
+        sellers = index.get(key)
+        if sellers is not None:
+            sellers.discard(seller_id)
+            if not sellers:
+                del index[key]
+
+    def match_products(self, texts):
+        """Поставщики, подписанные на слова из текстов товаров"""
+        matched = set()
+        for text in texts:
+            for token in set(normalize_search_text(text).split()):
+                for length in range(MIN_TERM_LENGTH, len(token) + 1):
+                    sellers = self._stems.get(token[:length])
+                    if sellers:
+                        matched |= sellers
+        return matched
+
+    def match_object(self, object_name):
+        """Поставщики, подписанные на объект (название объекта входит в название из заявки)"""
+        normalized = normalize_search_text(object_name)
+        matched = set()
+        for obj, sellers in self._objects.items():
+            if obj in normalized:
+                matched |= sellers
+        return matched
+
+    def recipients(self, sellers, items, object_name):
+        """
+        Поставщики, которых нужно уведомить о новой заявке
+
+        Args:
+            sellers (list): Одобренные поставщики (строки users)
+            items (list): Товары заявки с product_name и material_description
+            object_name (str): Объект заявки
+        """
+        products = self.match_products(
+            f"{item.get('product_name') or ''} {item.get('material_description') or ''}" for item in items
+        )
+        objects = self.match_object(object_name)
+
+        result = []
+        for seller in sellers:
+            seller_id = seller['id']
+            if seller_id in self._seller_stems and seller_id not in products:
+                continue
+            if seller_id in self._seller_objects and seller_id not in objects:
+                continue
+            result.append(seller)
+        return result
+
+    def __len__(self):
+        return len(self._seller_stems.keys() | self._seller_objects.keys())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки фоновой архивации закрытых заявок
+"""
+
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+from openpyxl import load_workbook
+
+from archive import ArchiveJob
+from excel_handler import ExcelHandler
+from row_models import Delivery, OfferItem
+
+
+class FakeArchive:
+    """Имитация Database.archive_closed_requests: count закрытых заявок"""
+
+    def __init__(self, count):
+        self.remaining = count
+        self.calls = []
+
+    def __call__(self, older_than_days, batch_size):
+        self.calls.append((older_than_days, batch_size))
+        moved = min(batch_size, self.remaining)
+        self.remaining -= moved
+        return moved
+
+
+def test_run_stops_on_partial_batch():
+    """Проход переносит хвост пакетами и останавливается на неполном пакете"""
+    archive = FakeArchive(7)
+    job = ArchiveJob(archive, older_than_days=30, batch_size=3, pause=0)
+
+    assert asyncio.run(job.run_once()) == 7
+    assert archive.calls == [(30, 3)] * 3
+    assert asyncio.run(job.run_once()) == 0
+    print("✅ Заявки переносятся пакетами")
+
+
+def test_run_is_throttled():
+    """За проход не больше max_batches пакетов, остаток - в следующих проходах"""
+    archive = FakeArchive(10)
+    job = ArchiveJob(archive, batch_size=2, pause=0, max_batches=3)
+
+    assert asyncio.run(job.run_once()) == 6 and archive.remaining == 4
+    assert asyncio.run(job.run_once()) == 4
+    print("✅ Проход ограничен числом пакетов")
+
+
+def test_archived_deliveries_excel():
+    """Excel с архивными доставками: строка на товар"""
+    deliveries = [Delivery(
+        id=5, object_name='Объект 1', seller_name='Поставщик', buyer_name='Заказчик',
+        received_at=datetime(2024, 3, 1, 10, 30),
+        items=[
+            OfferItem(product_name='Цемент', quantity=Decimal('10'), unit='мешок', price=Decimal('90'), total=Decimal('900')),
+            OfferItem(product_name='Ғишт', quantity=Decimal('1000'), unit='дона', price=Decimal('1'), total=Decimal('1000')),
+        ],
+    )]
+    ws = load_workbook(ExcelHandler().create_archived_deliveries_excel(deliveries)).active
+    assert ws.max_row == 3
+    assert ws['E2'].value == 'Цемент' and ws['I3'].value == 1000 and ws['J2'].value == '01.03.2024 10:30'
+    print("✅ Excel архива доставок сформирован")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование архивации заявок...")
+    test_run_stops_on_partial_batch()
+    test_run_is_throttled()
+    test_archived_deliveries_excel()
+    print("\n🎉 Тест прошел успешно!")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки фоновой обработки нажатий
+"""
+
+import asyncio
+
+from background_tasks import BackgroundRunner, deferred_callback, ACK_TEXT
+from callback_dedup import CallbackDeduplicator, CallbackDedupMiddleware
+
+
+class User:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class Message:
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+
+class CallbackQuery:
+    """Имитация CallbackQuery с записью ответов"""
+
+    def __init__(self, data, user_id=1):
+        self.data = data
+        self.from_user = User(user_id)
+        self.message = Message(10)
+        self.inline_message_id = None
+        self.answers = []
+
+    async def answer(self, text=None):
+        self.answers.append(text)
+
+
+def test_answer_before_work():
+    """Ответ на нажатие уходит до завершения обработчика"""
+    runner = BackgroundRunner(max_concurrency=2)
+    finished = []
+
+    @deferred_callback(runner)
+    async def process_goods_received(callback_query):
+        await asyncio.sleep(0.05)
+        finished.append(callback_query.data)
+
+    async def scenario():
+        query = CallbackQuery('goods_received_5')
+        await process_goods_received(query)
+        assert query.answers == [ACK_TEXT]
+        assert finished == []
+        assert runner.pending == 1
+        await runner.shutdown()
+        return query
+
+    asyncio.run(scenario())
+
+    assert finished == ['goods_received_5']
+    assert process_goods_received.__name__ == 'process_goods_received'
+    print("✅ Ответ отправлен сразу, работа выполнена в фоне")
+
+
+def test_concurrency_bounded():
+    """Одновременно выполняется не больше max_concurrency задач"""
+    runner = BackgroundRunner(max_concurrency=2)
+    state = {'active': 0, 'peak': 0}
+
+    async def job():
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+        await asyncio.sleep(0.01)
+        state['active'] -= 1
+
+    async def failing():
+        raise ValueError("ошибка в задаче")
+
+    async def scenario():
+        for _ in range(6):
+            runner.spawn(job(), 'job')
+        runner.spawn(failing(), 'failing')
+        await runner.shutdown()
+
+    asyncio.run(scenario())
+
+    assert state['peak'] == 2
+    assert runner.pending == 0
+    print(f"✅ Пик параллельности: {state['peak']}")
+
+
+def test_failed_task_releases_press():
+    """После ошибки в фоновой части нажатие можно сразу повторить"""
+    runner = BackgroundRunner(max_concurrency=2)
+    deduplicator = CallbackDeduplicator(ttl=30)
+    middleware = CallbackDedupMiddleware(deduplicator)
+    attempts = []
+
+    @deferred_callback(runner, deduplicator=deduplicator)
+    async def process_goods_received(callback_query):
+        attempts.append(callback_query.data)
+        if len(attempts) == 1:
+            raise ConnectionError("база недоступна")
+
+    async def handler(event, data):
+        return await process_goods_received(event)
+
+    async def scenario():
+        for _ in range(3):
+            await middleware(handler, CallbackQuery('goods_received_5'), {})
+            await runner.shutdown()
+
+    asyncio.run(scenario())
+
+    # Первое нажатие упало и сняло отметку, второе прошло, третье - повтор
+    assert attempts == ['goods_received_5', 'goods_received_5']
+    assert len(deduplicator) == 1
+    print("✅ Упавшее нажатие можно повторить сразу")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование фоновой обработки нажатий...")
+    test_answer_before_work()
+    test_concurrency_bounded()
+    test_failed_task_releases_press()
+    print("\n🎉 Тест прошел успешно!")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки отсеивания повторных нажатий
+"""
+
+import asyncio
+import time
+
+from callback_dedup import CallbackDeduplicator, CallbackDedupMiddleware, DUPLICATE_ANSWER
+
+
+class User:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class Message:
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+
+class CallbackQuery:
+    """Имитация CallbackQuery с записью ответов"""
+
+    def __init__(self, data, user_id=1, message_id=10):
+        self.data = data
+        self.from_user = User(user_id)
+        self.message = Message(message_id)
+        self.inline_message_id = None
+        self.answers = []
+
+    async def answer(self, text=None):
+        self.answers.append(text)
+
+
+def test_duplicate_press_suppressed():
+    """Второе нажатие той же кнопки не доходит до обработчика"""
+    calls = []
+
+    async def process_goods_received(event, data):
+        calls.append(event.data)
+
+    async def scenario():
+        middleware = CallbackDedupMiddleware(CallbackDeduplicator(ttl=30))
+        first = CallbackQuery('goods_received_7')
+        second = CallbackQuery('goods_received_7')
+        other_user = CallbackQuery('goods_received_7', user_id=2)
+        for event in (first, second, other_user):
+            await middleware(process_goods_received, event, {})
+        return second
+
+    second = asyncio.run(scenario())
+
+    assert calls == ['goods_received_7', 'goods_received_7']
+    assert second.answers == [DUPLICATE_ANSWER]
+    print("✅ Повторное нажатие отсеяно")
+
+
+def test_only_mutating_buttons_deduplicated():
+    """Кнопки просмотра и обновления нажимаются повторно; действия - один раз"""
+    calls = []
+
+    async def handler(event, data):
+        calls.append(event.data)
+
+    async def scenario():
+        middleware = CallbackDedupMiddleware(CallbackDeduplicator(ttl=30),
+                                             prefixes=('split_ok_', 'request_cancel_ok_'))
+        for data in ('board_refresh_5', 'board_refresh_5', 'split_max_5_2', 'split_max_5_3',
+                     'split_max_5_2', 'request_cancel_5', 'request_cancel_no_5', 'request_cancel_5',
+                     'request_cancel_ok_5', 'request_cancel_ok_5', 'split_ok_5', 'split_ok_5'):
+            await middleware(handler, CallbackQuery(data), {})
+
+    asyncio.run(scenario())
+
+    assert calls == ['board_refresh_5', 'board_refresh_5', 'split_max_5_2', 'split_max_5_3',
+                     'split_max_5_2', 'request_cancel_5', 'request_cancel_no_5', 'request_cancel_5',
+                     'request_cancel_ok_5', 'split_ok_5']
+    print("✅ Отсеиваются только кнопки, меняющие данные")
+
+
+def test_entries_expire():
+    """После ttl нажатие снова обрабатывается"""
+    dedup = CallbackDeduplicator(ttl=0.05)
+    key = ('approve_offer_3', 1, 10)
+
+    assert dedup.acquire(key)
+    assert not dedup.acquire(key)
+    time.sleep(0.06)
+    assert dedup.acquire(key)
+    assert len(dedup) == 1
+    print("✅ Записи истекают по ttl")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование отсеивания повторных нажатий...")
+    test_duplicate_press_suppressed()
+    test_only_mutating_buttons_deduplicated()
+    test_entries_expire()
+    print("\n🎉 Тест прошел успешно!")
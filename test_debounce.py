@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки объединения предложений в сводку
+"""
+
+import asyncio
+
+from debounce import Debouncer
+
+
+def test_events_coalesced():
+    """Несколько предложений в окне дают одну сводку"""
+    digests = []
+
+    async def scenario():
+        debouncer = Debouncer(window=0.2)
+        key = ('request', 7)
+
+        async def send_digest(count):
+            digests.append(count)
+
+        started = [debouncer.schedule(key, send_digest) for _ in range(5)]
+        assert started == [True, False, False, False, False]
+        assert debouncer.is_pending(key)
+
+        await asyncio.sleep(0.25)
+        assert not debouncer.is_pending(key)
+        assert debouncer.recently_run(key)
+
+        # Следующее предложение после окна - новая сводка
+        debouncer.schedule(key, send_digest)
+        await debouncer.flush()
+
+    asyncio.run(scenario())
+
+    assert digests == [5, 1]
+    print(f"✅ Сводки: {digests}")
+
+
+def test_recently_run_expires():
+    """Ограничение ручных запросов снимается после окна"""
+    async def scenario():
+        debouncer = Debouncer(window=0.05)
+        debouncer.mark_run(('buyer', 1))
+        assert debouncer.recently_run(('buyer', 1))
+        assert not debouncer.recently_run(('buyer', 2))
+        await asyncio.sleep(0.06)
+        assert not debouncer.recently_run(('buyer', 1))
+
+    asyncio.run(scenario())
+    print("✅ Ограничение частоты истекает")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование сводок предложений...")
+    test_events_coalesced()
+    test_recently_run_expires()
+    print("\n🎉 Тест прошел успешно!")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки поиска ближайших складов по координатам
+"""
+
+import random
+
+from geo_index import KDTree, distance_km, parse_coordinates
+
+
+def test_parse_coordinates():
+    """Координаты из старой текстовой локации"""
+    assert parse_coordinates("Координаты: 41.311081, 69.240562") == (41.311081, 69.240562)
+    assert parse_coordinates("Координаты: -33.9, 151") == (-33.9, 151.0)
+    assert parse_coordinates("Место: Склад, Ташкент") is None
+    assert parse_coordinates("Координаты: 141.3, 69.2") is None
+    assert parse_coordinates(None) is None
+    print("✅ Координаты из текста разбираются")
+
+
+def test_distance():
+    """Расстояние по поверхности Земли"""
+    # Ташкент - Самарканд около 270 км
+    assert 260 < distance_km(41.2995, 69.2401, 39.6542, 66.9597) < 280
+    assert distance_km(41.3, 69.2, 41.3, 69.2) == 0
+    print("✅ Расстояние считается по сфере")
+
+
+def test_nearest_matches_linear_scan():
+    """k-d дерево находит тех же соседей, что и полный перебор"""
+    rnd = random.Random(7)
+    points = [(rnd.uniform(37, 46), rnd.uniform(56, 74), i) for i in range(1000)]
+    tree = KDTree(points)
+    assert len(tree) == 1000
+    for _ in range(200):
+        latitude, longitude = rnd.uniform(37, 46), rnd.uniform(56, 74)
+        expected = sorted((distance_km(latitude, longitude, lat, lon), value) for lat, lon, value in points)[:3]
+        found = tree.nearest(latitude, longitude, k=3)
+        assert [value for _, value in found] == [value for _, value in expected]
+        assert abs(found[0][0] - expected[0][0]) < 1e-6
+    print("✅ Ближайшие соседи совпадают с полным перебором")
+
+
+def test_antimeridian_and_empty():
+    """Соседи через 180-й меридиан; пустое дерево"""
+    tree = KDTree([(0.0, 179.9, 'east'), (0.0, -179.9, 'west'), (0.0, 170.0, 'far')])
+    assert [value for _, value in tree.nearest(0.0, -179.95, k=2)] == ['west', 'east']
+    assert KDTree([]).nearest(41.3, 69.2) == []
+    assert tree.nearest(0.0, 0.0, k=0) == []
+    print("✅ Поиск через 180-й меридиан и пустое дерево")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование поиска ближайших складов...")
+    test_parse_coordinates()
+    test_distance()
+    test_nearest_matches_linear_scan()
+    test_antimeridian_and_empty()
+    print("\n🎉 Тест прошел успешно!")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки inline-поиска по заявкам
+"""
+
+import time
+
+from inline_search import normalize_search_text, search_terms, SearchCache, group_search_rows
+
+
+def test_cyrillic_and_latin_spellings():
+    """Кириллица и латиница приводятся к одной записи"""
+    assert normalize_search_text("Цемент М400") == normalize_search_text("Sement m400") == "sement m400"
+    assert normalize_search_text("Cement") == normalize_search_text("tsement") == "sement"
+    assert normalize_search_text("Ғишт") == normalize_search_text("G'isht") == normalize_search_text("gʻisht")
+    assert normalize_search_text("Қора қум", None) == normalize_search_text("qora qum")
+    print("✅ Написания на кириллице и латинице совпадают")
+
+
+def test_search_terms():
+    """Короткие и повторные слова отбрасываются"""
+    assert search_terms("цемент m4 Цемент арматура") == ["sement", "armatura"]
+    assert search_terms("  ") == []
+    print("✅ Слова запроса выделяются корректно")
+
+
+def test_cache_expires():
+    """Результаты живут ttl секунд, размер ограничен"""
+    cache = SearchCache(ttl=0.05, max_size=2)
+    cache.put(('sement',), [1])
+    assert cache.get(('sement',)) == [1]
+    time.sleep(0.06)
+    assert cache.get(('sement',)) is None
+
+    for key in ('a', 'b', 'c'):
+        cache.put((key,), key)
+    assert len(cache) == 2 and cache.get(('a',)) is None
+    print("✅ Кэш истекает по ttl")
+
+
+def test_group_rows_by_request():
+    """Товары группируются по заявкам, лишние заявки отсекаются"""
+    rows = [
+        {'request_id': 7, 'object_name': 'Ургут', 'created_at': None, 'product_name': 'Цемент'},
+        {'request_id': 7, 'object_name': 'Ургут', 'created_at': None, 'product_name': 'Цемент М500'},
+        {'request_id': 3, 'object_name': 'Хишрав', 'created_at': None, 'product_name': 'Цемент'},
+        {'request_id': 1, 'object_name': 'Ургут', 'created_at': None, 'product_name': 'Цемент'},
+    ]
+    requests = group_search_rows(rows, limit=2)
+    assert [r['id'] for r in requests] == [7, 3]
+    assert len(requests[0]['items']) == 2
+    print("✅ Результаты сгруппированы по заявкам")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование inline-поиска...")
+    test_cyrillic_and_latin_spellings()
+    test_search_terms()
+    test_cache_expires()
+    test_group_rows_by_request()
+    print("\n🎉 Тест прошел успешно!")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки монитора задержки event loop
+"""
+
+import asyncio
+import time
+
+from loop_monitor import LoopLagMonitor, LoopMonitorMiddleware
+
+
+class FakeHandler:
+    """Имитация HandlerObject из aiogram"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+
+class CallbackQuery:
+    """Имитация CallbackQuery: монитору нужны только имя типа и поля"""
+
+    def __init__(self, data):
+        self.data = data
+        self.from_user = None
+
+
+async def process_goods_received(event, data):
+    """Обработчик с синхронной блокировкой, как psycopg2 или pandas"""
+    time.sleep(0.6)
+
+
+def test_stall_attributed_to_handler():
+    """Блокировка внутри обработчика попадает в статистику с его именем и стеком"""
+
+    async def scenario():
+        monitor = LoopLagMonitor(interval=0.1, threshold=0.2)
+        monitor.start()
+        middleware = LoopMonitorMiddleware(monitor)
+
+        await asyncio.sleep(0.2)
+        await middleware(
+            process_goods_received,
+            CallbackQuery('goods_received_15'),
+            {'handler': FakeHandler(process_goods_received)}
+        )
+        await asyncio.sleep(0.3)
+        await monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+
+    assert monitor.stalls_total >= 1
+    assert monitor.stalls_by_handler.get('process_goods_received') == 1
+    assert monitor.last_stall['update_type'] == 'CallbackQuery'
+    assert monitor.last_stall['callback_data'] == 'goods_received_15'
+    assert 'sleep' in monitor.last_stall['blocking_frame'] or 'process_goods_received' in monitor.last_stall['blocking_frame']
+    print(f"✅ Блокировка обнаружена: {monitor.last_stall['lag_ms']} мс в {monitor.last_stall['handler']}")
+
+
+def test_no_stall_when_loop_is_free():
+    """Без блокировок задержка остается ниже порога"""
+
+    async def scenario():
+        monitor = LoopLagMonitor(interval=0.05, threshold=0.2)
+        monitor.start()
+        await asyncio.sleep(0.3)
+        await monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+
+    assert monitor.samples > 0
+    assert monitor.stalls_total == 0
+    print(f"✅ Задержка в норме: {monitor.snapshot()}")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование монитора event loop...")
+    test_stall_attributed_to_handler()
+    test_no_stall_when_loop_is_free()
+    print("\n🎉 Тест прошел успешно!")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки метрик Prometheus
+"""
+
+from prometheus_client import generate_latest
+
+from metrics import (
+    route_label, instrument_methods, DB_METHOD_LATENCY, DB_METHOD_ERRORS
+)
+
+
+class CallbackQuery:
+    def __init__(self, data):
+        self.data = data
+
+
+class Message:
+    def __init__(self, text=None, document=None):
+        self.text = text
+        self.document = document
+        self.contact = None
+
+
+class FakeDatabase:
+    def get_user(self, telegram_id):
+        return {'telegram_id': telegram_id}
+
+    def broken(self):
+        raise RuntimeError("нет соединения")
+
+    def iter_rows(self, count):
+        for i in range(count):
+            yield i
+
+    def iter_broken(self):
+        yield 1
+        raise RuntimeError("соединение разорвано")
+
+
+def test_route_labels():
+    """Id в callback data не попадают в метки"""
+    assert route_label(CallbackQuery('approve_offer_125')) == 'approve_offer_'
+    assert route_label(CallbackQuery('goods_received_7')) == 'goods_received_'
+    assert route_label(CallbackQuery('admin_pending_users')) == 'admin_pending_users'
+    assert route_label(Message('/approve 5657091547')) == '/approve'
+    assert route_label(Message(document=object())) == 'document'
+    assert route_label(Message('📋 Фаол аризалар')) == 'message'
+    print("✅ Метки маршрутов корректны")
+
+
+def test_instrumented_methods_exported():
+    """Вызовы и ошибки методов попадают в вывод /metrics"""
+    db = instrument_methods(FakeDatabase(), DB_METHOD_LATENCY, DB_METHOD_ERRORS)
+
+    assert db.get_user(42) == {'telegram_id': 42}
+    try:
+        db.broken()
+    except RuntimeError:
+        pass
+
+    output = generate_latest().decode()
+    assert 'bot_db_method_duration_seconds_count{method="get_user"} 1.0' in output
+    assert 'bot_db_method_errors_total{method="broken"} 1.0' in output
+    print("✅ Метрики методов экспортируются")
+
+
+def test_instrumented_generators():
+    """Методы-генераторы замеряются за всю итерацию; ошибки при итерации считаются"""
+    db = instrument_methods(FakeDatabase(), DB_METHOD_LATENCY, DB_METHOD_ERRORS)
+
+    rows = db.iter_rows(3)
+    output = generate_latest().decode()
+    assert 'bot_db_method_duration_seconds_count{method="iter_rows"}' not in output
+    assert list(rows) == [0, 1, 2]
+
+    try:
+        list(db.iter_broken())
+    except RuntimeError:
+        pass
+
+    output = generate_latest().decode()
+    assert 'bot_db_method_duration_seconds_count{method="iter_rows"} 1.0' in output
+    assert 'bot_db_method_errors_total{method="iter_broken"} 1.0' in output
+    print("✅ Генераторы замеряются за всю итерацию")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование метрик...")
+    test_route_labels()
+    test_instrumented_methods_exported()
+    test_instrumented_generators()
+    print("\n🎉 Тест прошел успешно!")
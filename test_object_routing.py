@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки маршрутизации объектов к зав. складам
+"""
+
+from object_routing import ObjectRouting, DEFAULT_OBJECT_NAMES
+from row_models import Site, User
+
+
+def build_routing():
+    objects = [Site(id=1, name="Сам Сити", is_active=True), Site(id=2, name="Ургут", is_active=True),
+               Site(id=3, name="Рубловка", is_active=False)]
+    users = [
+        User(id=10, full_name="Али", role='warehouse', is_approved=True, object_id=1),
+        User(id=11, full_name="Вали", role='warehouse', is_approved=True, object_id=1),
+        User(id=12, full_name="Гани", role='warehouse', is_approved=True, object_id=2),
+        User(id=13, full_name="Без объекта", role='warehouse', is_approved=True, object_id=None),
+    ]
+    routing = ObjectRouting()
+    routing.load(objects, users)
+    return routing
+
+
+def test_staff_by_object():
+    """Уведомления получают только зав. склады объекта"""
+    routing = build_routing()
+    assert [user.full_name for user in routing.staff(1)] == ["Али", "Вали"]
+    assert [user.full_name for user in routing.staff(2)] == ["Гани"]
+    assert routing.staff(3) == [] and routing.staff(None) == []
+    print("✅ Зав. склады выбираются по объекту")
+
+
+def test_objects_directory():
+    """Клавиатуры показывают только активные объекты; поиск по названию и id"""
+    routing = build_routing()
+    assert routing.names() == ["Сам Сити", "Ургут"]
+    assert [obj.id for obj in routing.objects(include_inactive=True)] == [1, 2, 3]
+    assert routing.object_id("Ургут") == 2 and routing.object_id("Нет такого") is None
+    assert routing.object_name(3) == "Рубловка" and routing.object_name(99) is None
+    assert len(routing) == 3
+    print("✅ Справочник объектов работает")
+
+
+def test_incremental_updates():
+    """Одобрение, перенос и удаление зав. склада меняют индекс без перезагрузки"""
+    routing = build_routing()
+    routing.set_user(User(id=14, full_name="Дилшод", role='warehouse', is_approved=True, object_id=2))
+    assert [user.full_name for user in routing.staff(2)] == ["Гани", "Дилшод"]
+
+    routing.set_user(User(id=10, full_name="Али", role='warehouse', is_approved=True, object_id=2))
+    assert [user.full_name for user in routing.staff(1)] == ["Вали"]
+    assert [user.id for user in routing.staff(2)] == [12, 14, 10]
+
+    routing.remove_user(11)
+    assert routing.staff(1) == []
+    routing.set_user(User(id=12, role='warehouse', is_approved=False, object_id=2))
+    routing.set_user(User(id=15, role='buyer', is_approved=True, object_id=2))
+    assert [user.id for user in routing.staff(2)] == [14, 10]
+    routing.remove_user(999)
+    print("✅ Индекс обновляется по одному пользователю")
+
+
+def test_route_nearest_warehouse():
+    """Свои зав. склады объекта - ближайший первым; объекту без складов - ближайший склад"""
+    objects = [Site(id=1, name="Сам Сити", is_active=True, latitude=41.30, longitude=69.25),
+               Site(id=2, name="Ургут", is_active=True, latitude=39.40, longitude=67.25),
+               Site(id=3, name="Рубловка", is_active=True)]
+    users = [
+        User(id=10, full_name="Далеко", role='warehouse', is_approved=True, object_id=1, latitude=41.60, longitude=69.60),
+        User(id=11, full_name="Рядом", role='warehouse', is_approved=True, object_id=1, latitude=41.31, longitude=69.26),
+        User(id=12, full_name="Без координат", role='warehouse', is_approved=True, object_id=1),
+        User(id=13, full_name="Самарканд", role='warehouse', is_approved=True, object_id=4, latitude=39.65, longitude=66.96),
+    ]
+    routing = ObjectRouting()
+    routing.load(objects, users)
+
+    assert [user.id for user in routing.route(1)] == [11, 10, 12]
+    assert [user.full_name for user in routing.route(2)] == ["Самарканд"]
+    assert routing.route(3) == []
+    assert routing.object_point(4) == (39.65, 66.96)
+
+    # Новый склад рядом с Ургутом попадает в индекс без полной перезагрузки
+    routing.set_user(User(id=14, full_name="Ургут склад", role='warehouse', is_approved=True,
+                          latitude=39.41, longitude=67.24))
+    assert [user.id for user in routing.route(2)] == [14]
+    routing.remove_user(14)
+    assert [user.id for user in routing.route(2)] == [13]
+    print("✅ Заказ направляется ближайшему складу")
+
+
+def test_default_objects():
+    """Список объектов по умолчанию без повторов"""
+    assert len(DEFAULT_OBJECT_NAMES) == len(set(DEFAULT_OBJECT_NAMES)) == 20
+    print("✅ Объекты по умолчанию уникальны")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование маршрутизации объектов...")
+    test_staff_by_object()
+    test_objects_directory()
+    test_incremental_updates()
+    test_route_nearest_warehouse()
+    test_default_objects()
+    print("\n🎉 Тест прошел успешно!")
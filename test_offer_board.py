@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки доски предложений
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+from offer_board import render_offer_board, rank_offers
+
+
+def offer(offer_id, total, status='pending', name='Поставщик'):
+    return {
+        'id': offer_id,
+        'total_amount': Decimal(total),
+        'status': status,
+        'created_at': datetime(2025, 8, 7, 10, 0),
+        'full_name': name,
+        'item_count': 3,
+    }
+
+
+REQUEST = {'id': 12, 'object_name': 'Ургут'}
+
+
+def test_ranking():
+    """Дешевые выше, отклоненные в конце"""
+    offers = [offer(1, 500), offer(2, 300, 'rejected'), offer(3, 400), offer(4, 450, 'approved')]
+    assert [o['id'] for o in rank_offers(offers)] == [3, 4, 1, 2]
+    print("✅ Предложения отсортированы по сумме")
+
+
+def test_render_board():
+    """Кнопки только у рассматриваемых предложений, медали по местам"""
+    offers = [offer(1, 500), offer(2, 300, 'rejected'), offer(3, 400), offer(4, 450, 'approved')]
+    text, keyboard = render_offer_board(REQUEST, offers, '07.08.2025 10:00', new_offers=2)
+
+    assert "Ариза #12" in text and "кутилмоқда: 2" in text and "Янги таклифлар: 2" in text
+    assert text.index("🥇 #3") < text.index("🥈 #4") < text.index("🥉 #1") < text.index("• #2")
+
+    callbacks = [button.callback_data for row in keyboard.inline_keyboard for button in row]
+    assert callbacks == [
+        'approve_offer_3', 'reject_offer_3', 'approve_offer_1', 'reject_offer_1',
+        'board_excel_12', 'board_compare_12', 'split_max_12_0', 'board_refresh_12',
+    ]
+    print("✅ Доска предложений собрана")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование доски предложений...")
+    test_ranking()
+    test_render_board()
+    print("\n🎉 Тест прошел успешно!")
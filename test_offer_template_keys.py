@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки ключей товаров в шаблоне предложения
+"""
+
+import io
+from decimal import Decimal
+
+from openpyxl import load_workbook
+
+from excel_handler import ExcelHandler
+
+REQUEST_ITEMS = [
+    {'id': 101, 'request_id': 7, 'product_name': 'Цемент М400', 'quantity': 100, 'unit': 'мешок', 'material_description': ''},
+    {'id': 102, 'request_id': 7, 'product_name': 'Арматура 12мм', 'quantity': 5, 'unit': 'т', 'material_description': ''},
+    {'id': 103, 'request_id': 7, 'product_name': 'Ғишт', 'quantity': 1000, 'unit': 'дона', 'material_description': ''},
+]
+
+
+def fill_template(handler, edit):
+    """Шаблон заявки, заполненный «поставщиком»"""
+    template = handler.create_seller_offer_template({'items': REQUEST_ITEMS})
+    wb = load_workbook(template)
+    ws = wb.active
+    edit(ws)
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def test_template_has_hidden_keys():
+    """Ключ и контрольная сумма лежат в скрытых колонках"""
+    handler = ExcelHandler()
+    ws = load_workbook(handler.create_seller_offer_template({'items': REQUEST_ITEMS})).active
+    assert ws['G1'].value == ExcelHandler.OFFER_KEY_COLUMN and ws['H1'].value == ExcelHandler.OFFER_CHECKSUM_COLUMN
+    assert ws.column_dimensions['G'].hidden and ws.column_dimensions['H'].hidden
+    assert ws['G2'].value == 101 and ws['H2'].value == ExcelHandler.item_checksum(REQUEST_ITEMS[0])
+    print("✅ Скрытые колонки ключа в шаблоне")
+
+
+def test_parse_matches_by_checksum_and_reports_mismatches():
+    """Сопоставление по контрольной сумме и расхождения в одном проходе"""
+    handler = ExcelHandler()
+
+    def edit(ws):
+        # Цемент: цена и измененное количество; арматура: цена; кирпич без цены
+        ws['B2'], ws['E2'], ws['F2'] = 90, 1000, 90000
+        ws['A3'], ws['E3'], ws['F3'] = 'Арматура A500', 800, 4000
+        # Лишняя строка без ключа
+        ws['A5'], ws['B5'], ws['C5'], ws['E5'], ws['F5'] = 'Доставка', 1, 'рейс', 50000, 50000
+
+    offer = handler.parse_seller_offer(fill_template(handler, edit), REQUEST_ITEMS)
+    assert [item['request_item_id'] for item in offer['items']] == [101, 102, None]
+    assert offer['total_amount'] == 90000 + 4000 + 50000
+
+    kinds = sorted((mismatch['type'], mismatch['product_name']) for mismatch in offer['mismatches'])
+    assert kinds == [
+        ('extra', 'Доставка'), ('missing', 'Ғишт'), ('name', 'Арматура 12мм'), ('quantity', 'Цемент М400'),
+    ]
+    quantity = next(mismatch for mismatch in offer['mismatches'] if mismatch['type'] == 'quantity')
+    assert (quantity['expected'], quantity['actual']) == (100, 90)
+    print("✅ Строки сопоставлены по ключу, расхождения найдены")
+
+
+def test_key_from_another_request_is_not_trusted():
+    """Ключ из шаблона другой заявки не совпадает"""
+    handler = ExcelHandler()
+
+    def edit(ws):
+        for row in (2, 3, 4):
+            ws[f'E{row}'], ws[f'F{row}'] = 1, 1
+
+    other_request = [dict(item, request_id=8) for item in REQUEST_ITEMS]
+    offer = handler.parse_seller_offer(fill_template(handler, edit), other_request)
+    assert all(item['request_item_id'] is None for item in offer['items'])
+
+    # Без товаров заявки (старый порядок вызова) парсинг работает как раньше
+    offer = handler.parse_seller_offer(fill_template(handler, edit))
+    assert len(offer['items']) == 3 and offer['mismatches'] == []
+    print("✅ Чужие ключи не принимаются")
+
+
+def test_total_amount_is_decimal():
+    """Суммы считаются в Decimal с копейками, без ошибок округления float"""
+    handler = ExcelHandler()
+
+    def edit(ws):
+        for row, total in zip((2, 3, 4), (0.1, 0.2, 0.3)):
+            ws[f'E{row}'], ws[f'F{row}'] = total, total
+
+    offer = handler.parse_seller_offer(fill_template(handler, edit), REQUEST_ITEMS)
+    assert offer['total_amount'] == Decimal('0.60')
+    assert offer['items'][0]['price_per_unit'] == Decimal('0.10')
+    print("✅ Сумма предложения в Decimal")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование ключей шаблона предложения...")
+    test_template_has_hidden_keys()
+    test_parse_matches_by_checksum_and_reports_mismatches()
+    test_key_from_another_request_is_not_trusted()
+    test_total_amount_is_decimal()
+    print("\n🎉 Тест прошел успешно!")
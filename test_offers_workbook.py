@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки книги предложений с журналом изменений
+"""
+
+import os
+import tempfile
+from datetime import datetime
+
+from openpyxl import load_workbook
+
+from excel_handler import ExcelHandler
+from offers_workbook import OffersWorkbookStore
+from row_models import Offer, OfferItem
+
+
+def make_offer(offer_id, items=2, status='pending'):
+    return Offer(
+        id=offer_id,
+        full_name=f'Поставщик {offer_id}',
+        phone_number='+998901234567',
+        total_amount=1000 * offer_id,
+        created_at=datetime(2024, 1, 1, 12, 0),
+        status=status,
+        items=[
+            OfferItem(product_name=f'Товар {i}', quantity=1, unit='шт', price=100, total=100, description='')
+            for i in range(items)
+        ],
+    )
+
+
+def test_append_and_status():
+    """Предложения и статусы дописываются в журнал, книга собирается при выгрузке"""
+    with tempfile.TemporaryDirectory() as base_dir:
+        store = OffersWorkbookStore(ExcelHandler(), base_dir)
+        assert not store.append_offer(1, make_offer(1))
+        assert store.export(1) is None
+
+        store.seed(1, [make_offer(1)])
+        assert store.append_offer(1, make_offer(2, items=3))
+        assert store.update_status(1, 1, 'approved')
+        assert not store.update_status(2, 1, 'approved')
+        # Повтор уже записанного предложения не дублирует строки
+        assert store.append_offer(1, make_offer(1))
+
+        ws = load_workbook(store.export(1)).active
+        assert ws.max_row == 1 + 2 + 3
+        assert [ws.cell(row=r, column=1).value for r in range(2, 7)] == [1, 1, 2, 2, 2]
+        assert ws.cell(row=2, column=10).value == 1000
+        status_column = ExcelHandler.OFFERS_STATUS_COLUMN
+        assert ws.cell(row=2, column=status_column).value == ws.cell(row=3, column=status_column).value
+        assert ws.cell(row=2, column=status_column).value != ws.cell(row=4, column=status_column).value
+    print("✅ Предложения дописываются, статусы применяются при сборке")
+
+
+def test_append_cost_independent_of_rows():
+    """Новое предложение - одна запись в конец журнала, книга не перечитывается"""
+    with tempfile.TemporaryDirectory() as base_dir:
+        store = OffersWorkbookStore(ExcelHandler(), base_dir)
+        store.seed(3, [make_offer(i, items=20) for i in range(1, 51)])
+        path = store.export(3)
+        built_at = os.path.getmtime(path)
+        size = os.path.getsize(store._log_path(3))
+
+        store.append_offer(3, make_offer(51))
+        store.update_status(3, 51, 'rejected')
+        with open(store._log_path(3), 'rb') as f:
+            f.seek(size)
+            assert len(f.read().splitlines()) == 2
+        assert os.path.getmtime(path) == built_at
+
+        ws = load_workbook(store.export(3)).active
+        assert ws.max_row == 1 + 50 * 20 + 2
+    print("✅ Добавление не зависит от размера книги")
+
+
+def test_file_id_version():
+    """file_id сохраняется только для неизмененной книги"""
+    with tempfile.TemporaryDirectory() as base_dir:
+        store = OffersWorkbookStore(ExcelHandler(), base_dir)
+        assert store.snapshot(5) == (None, None)
+
+        store.seed(5, [make_offer(1)])
+        file_id, version = store.snapshot(5)
+        assert file_id is None
+
+        store.export(5)
+        store.set_file_id(5, 'file-1', version)
+        assert store.snapshot(5) == ('file-1', version)
+
+        # Книга изменилась во время отправки - старый file_id не сохраняется
+        _, version = store.snapshot(5)
+        store.append_offer(5, make_offer(2))
+        store.set_file_id(5, 'file-2', version)
+        assert store.snapshot(5)[0] is None
+    print("✅ file_id привязан к версии книги")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование книги предложений...")
+    test_append_and_status()
+    test_append_cost_independent_of_rows()
+    test_file_id_version()
+    print("\n🎉 Тест прошел успешно!")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки плана месячных секций
+"""
+
+import asyncio
+from datetime import date, datetime
+
+from archive import ArchiveJob
+from partitions import add_months, partition_name, partition_month, planned_months, expired_partitions
+
+
+def test_month_arithmetic_and_names():
+    """Сдвиг месяцев через границу года и имена секций"""
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert partition_name('request_items', date(2024, 3, 1)) == 'request_items_p202403'
+    assert partition_month('request_items', 'request_items_p202403') == date(2024, 3, 1)
+
+    # Секция по умолчанию и секции другой таблицы не разбираются
+    assert partition_month('request_items', 'request_items_default') is None
+    assert partition_month('request_items', 'seller_offer_items_p202403') is None
+    print("✅ Месяцы и имена секций")
+
+
+def test_planned_and_expired_partitions():
+    """Секции вперед от текущего месяца (или от самых старых строк) и устаревшие секции"""
+    now = datetime(2024, 11, 20, 15, 0)
+    assert planned_months(now, 2) == [date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1)]
+    assert planned_months(now, 0, since=datetime(2024, 9, 30)) == [date(2024, 9, 1), date(2024, 10, 1), date(2024, 11, 1)]
+
+    names = ['request_items_default', 'request_items_p202404', 'request_items_p202405', 'request_items_p202411']
+    assert expired_partitions('request_items', names, now, 6) == ['request_items_p202404']
+    print("✅ План секций посчитан")
+
+
+def test_archive_job_runs_maintenance():
+    """Обслуживание секций после прохода архивации; ошибка не прерывает проход"""
+    calls = []
+
+    def maintenance():
+        calls.append('maintenance')
+        raise RuntimeError("нет соединения")
+
+    job = ArchiveJob(lambda days, size: 0, pause=0, maintenance=maintenance)
+    assert asyncio.run(job.run_once()) == 0
+    assert calls == ['maintenance']
+    print("✅ Обслуживание секций вызывается после архивации")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование секционирования...")
+    test_month_arithmetic_and_names()
+    test_planned_and_expired_partitions()
+    test_archive_job_runs_maintenance()
+    print("\n🎉 Тест прошел успешно!")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки матрицы сравнения цен
+"""
+
+from decimal import Decimal
+
+from openpyxl import load_workbook
+
+from excel_handler import ExcelHandler
+from price_matrix import build_price_matrix, format_price_matrix
+
+REQUEST_ITEMS = [
+    {'product_name': 'Цемент М400', 'quantity': Decimal('10'), 'unit': 'мешок'},
+    {'product_name': 'Арматура 12мм', 'quantity': Decimal('5'), 'unit': 'т'},
+]
+
+
+def row(offer_id, name, price, quantity, status='pending'):
+    return {
+        'offer_id': offer_id, 'full_name': f'Поставщик {offer_id}', 'status': status,
+        'product_name': name, 'quantity': Decimal(quantity), 'unit': 'шт',
+        'price': Decimal(price), 'total': Decimal(price) * Decimal(quantity),
+    }
+
+
+OFFER_ROWS = [
+    row(1, 'Цемент М400', 100, 10),
+    row(2, ' цемент  м400', 90, 10),
+    row(2, 'Арматура 12мм', 50, 5),
+    row(3, 'Цемент М400', 1, 10, status='rejected'),
+]
+
+
+def test_best_prices_and_coverage():
+    """Лучшая цена по товару, итоги и покрытие по предложениям"""
+    matrix = build_price_matrix(REQUEST_ITEMS, OFFER_ROWS)
+    sellers = matrix['sellers']
+
+    # Отклоненные предложения в сравнение не попадают; полное покрытие - первым
+    assert list(sellers.index) == [2, 1]
+    assert sellers.loc[2, 'covered'] == 2 and sellers.loc[1, 'coverage'] == 0.5
+    assert sellers.loc[2, 'total'] == 1150 and sellers.loc[2, 'best_count'] == 2
+
+    assert matrix['best'].loc['цемент м400', 2] and not matrix['best'].loc['цемент м400', 1]
+    assert matrix['best_total'] == 90 * 10 + 50 * 5
+    print("✅ Лучшие цены и покрытие посчитаны")
+
+
+def test_text_and_excel_views():
+    """Текстовый вид и лист Excel"""
+    matrix = build_price_matrix(REQUEST_ITEMS, OFFER_ROWS)
+    text = format_price_matrix(matrix, 7)
+    assert "Ариза #7" in text and "қамров 1/2" in text and "90✅ | 100" in text
+
+    ws = load_workbook(ExcelHandler().create_price_comparison_excel(matrix, 7)).active
+    assert [ws.cell(row=1, column=col).value for col in (4, 5)] == ['#2 Поставщик 2', '#1 Поставщик 1']
+    assert ws.cell(row=2, column=4).fill.start_color.rgb.endswith('C6EFCE')
+    assert ws.cell(row=3, column=5).value is None
+
+    assert format_price_matrix(build_price_matrix(REQUEST_ITEMS, []), 7).startswith("📭")
+    print("✅ Текст и Excel сформированы")
+
+
+def test_items_joined_by_request_item_id():
+    """Строки с request_item_id сопоставляются по ID, даже если название изменено"""
+    request_items = [{'id': 11, 'product_name': 'Цемент М400', 'quantity': 10, 'unit': 'мешок'}]
+    rows = [
+        dict(row(1, 'Цемент (Ахангаран)', 100, 10), item_id=1, request_item_id=11),
+        dict(row(2, 'цемент м400', 90, 10), item_id=2, request_item_id=None),
+    ]
+    matrix = build_price_matrix(request_items, rows)
+    assert list(matrix['items'].index) == ['#11']
+    assert matrix['sellers'].loc[1, 'covered'] == 1 and matrix['sellers'].loc[2, 'covered'] == 1
+    print("✅ Товары связаны по request_item_id")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование матрицы цен...")
+    test_best_prices_and_coverage()
+    test_text_and_excel_views()
+    test_items_joined_by_request_item_id()
+    print("\n🎉 Тест прошел успешно!")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки учета запросов и детектора N+1
+"""
+
+import psycopg2.extras
+
+from query_tracker import (
+    normalize_sql, track_queries, assert_query_budget, current_query_log, tracked_cursor_class
+)
+
+ITEMS_QUERY = """
+    SELECT * FROM seller_offer_items
+    WHERE offer_id = %s
+    ORDER BY created_at
+"""
+
+
+def test_normalize_sql():
+    """Пробелы и литералы не влияют на нормализованный запрос"""
+    assert normalize_sql(ITEMS_QUERY) == "SELECT * FROM seller_offer_items WHERE offer_id = %s ORDER BY created_at"
+    assert normalize_sql("SELECT 1 FROM users WHERE role = 'seller'") == "SELECT ? FROM users WHERE role = ?"
+    print("✅ Нормализация SQL работает")
+
+
+def test_n_plus_one_detected():
+    """Повтор запроса товаров в цикле по предложениям считается N+1"""
+    with track_queries('get_offers_for_request') as log:
+        current_query_log.get().record("SELECT so.* FROM seller_offers so WHERE so.purchase_request_id = %s")
+        for _ in range(6):
+            current_query_log.get().record(ITEMS_QUERY)
+
+    assert log.count == 7
+    problems = log.problems(budget=5, repeat_limit=5)
+    assert len(problems) == 2
+    assert "7 запросов при бюджете 5" in problems[0]
+    assert "N+1: 6 раз" in problems[1]
+    assert current_query_log.get() is None
+    print(f"✅ Найдено: {problems}")
+
+
+def test_assert_query_budget():
+    """assert_query_budget падает при превышении бюджета"""
+    with assert_query_budget(max_queries=2, repeat_limit=2):
+        current_query_log.get().record(ITEMS_QUERY)
+
+    try:
+        with assert_query_budget(max_queries=2, label='show_my_requests'):
+            for _ in range(3):
+                current_query_log.get().record(ITEMS_QUERY)
+    except AssertionError as e:
+        assert 'show_my_requests' in str(e)
+    else:
+        raise AssertionError("Бюджет не проверен")
+    print("✅ Бюджет запросов проверяется")
+
+
+def test_tracked_cursor_keeps_factory():
+    """Учет не меняет тип строк: RealDictCursor остается базой"""
+    cls = tracked_cursor_class(psycopg2.extras.RealDictCursor)
+    assert issubclass(cls, psycopg2.extras.RealDictCursor)
+    assert tracked_cursor_class(psycopg2.extras.RealDictCursor) is cls
+    print("✅ Курсоры оборачиваются без смены фабрики")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование учета запросов...")
+    test_normalize_sql()
+    test_n_plus_one_detected()
+    test_assert_query_budget()
+    test_tracked_cursor_keeps_factory()
+    print("\n🎉 Тест прошел успешно!")
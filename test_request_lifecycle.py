@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки фонового закрытия просроченных заявок
+"""
+
+import asyncio
+
+from request_lifecycle import RequestSweeper, format_seller_notice
+
+
+class FakeExpiry:
+    """Имитация Database.expire_requests: count просроченных заявок"""
+
+    def __init__(self, count):
+        self.remaining = list(range(1, count + 1))
+        self.calls = []
+
+    def __call__(self, batch_size):
+        self.calls.append(batch_size)
+        batch, self.remaining = self.remaining[:batch_size], self.remaining[batch_size:]
+        return {
+            'closed': [{'id': request_id, 'buyer_telegram_id': 1000 + request_id} for request_id in batch],
+            'offers': [{'id': request_id * 10, 'purchase_request_id': request_id, 'seller_telegram_id': 7}
+                       for request_id in batch],
+            'reason': 'expired',
+        }
+
+
+def test_sweep_runs_in_batches():
+    """Проход закрывает весь хвост пакетами и останавливается на неполном пакете"""
+    expiry = FakeExpiry(7)
+    notified = []
+
+    async def on_closed(result):
+        notified.append([request['id'] for request in result['closed']])
+
+    sweeper = RequestSweeper(expiry, on_closed, batch_size=3)
+    closed = asyncio.run(sweeper.sweep())
+
+    assert closed == 7
+    assert notified == [[1, 2, 3], [4, 5, 6], [7]]
+    assert expiry.calls == [3, 3, 3]
+
+    # Пустой проход не вызывает уведомлений
+    assert asyncio.run(sweeper.sweep()) == 0 and len(notified) == 3
+    print("✅ Заявки закрываются пакетами")
+
+
+def test_notification_errors_do_not_stop_sweep():
+    """Ошибка уведомления не прерывает закрытие следующих пакетов"""
+    expiry = FakeExpiry(4)
+
+    async def on_closed(result):
+        raise RuntimeError("Telegram недоступен")
+
+    assert asyncio.run(RequestSweeper(expiry, on_closed, batch_size=2).sweep()) == 4
+    print("✅ Ошибки уведомлений не прерывают проход")
+
+
+def test_seller_notice():
+    """Текст уведомления поставщику"""
+    text = format_seller_notice(12, 40, 'expired')
+    assert "#12" in text and "#40" in text and "муддати тугади" in text
+    print("✅ Уведомление поставщику сформировано")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование жизненного цикла заявок...")
+    test_sweep_runs_in_batches()
+    test_notification_errors_do_not_stop_sweep()
+    test_seller_notice()
+    print("\n🎉 Тест прошел успешно!")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки моделей строк БД
+"""
+
+import sys
+from decimal import Decimal
+
+from row_models import Offer, OfferItem, User, fetch_all, fetch_one, row_factory
+
+
+class FakeCursor:
+    """Имитация обычного курсора psycopg2: description и кортежи строк"""
+
+    def __init__(self, columns, rows):
+        self.description = [(name, None, None, None, None, None, None) for name in columns]
+        self.rows = list(rows)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+
+def test_factory_maps_columns():
+    """Колонки сопоставляются по имени; лишние пропускаются, недостающие - None"""
+    columns = ('total', 'id', 'search_text', 'product_name')
+    item = row_factory(OfferItem, columns)((Decimal('900'), 7, 'цемент', 'Цемент'))
+    assert (item.id, item.product_name, item.total) == (7, 'Цемент', Decimal('900'))
+    assert item.price is None and item.awarded is None
+    assert row_factory(OfferItem, columns) is row_factory(OfferItem, columns)
+    print("✅ Фабрика строк сопоставляет колонки")
+
+
+def test_fetch_helpers():
+    """fetch_all/fetch_one собирают модели из курсора"""
+    cursor = FakeCursor(('id', 'telegram_id', 'full_name', 'role'), [(1, 42, 'Али', 'buyer'), (2, 43, 'Вали', 'seller')])
+    users = fetch_all(cursor, User)
+    assert [user.full_name for user in users] == ['Али', 'Вали'] and users[1].role == 'seller'
+    assert fetch_all(cursor, User) == []
+
+    cursor = FakeCursor(('id', 'status'), [(5, 'pending')])
+    offer = fetch_one(cursor, Offer)
+    assert offer.id == 5 and offer.items is None
+    assert fetch_one(cursor, Offer) is None
+    print("✅ Модели загружаются из курсора")
+
+
+def test_compat_access():
+    """Старый доступ по ключу работает, атрибутов сверх полей нет"""
+    offer = Offer(id=3, total_amount=Decimal('100'))
+    offer['items'] = []
+    assert offer['id'] == 3 and offer.get('award_total') is None and offer.get('missing', 'x') == 'x'
+    assert offer.items == []
+    try:
+        offer['missing']
+        assert False, "ожидался KeyError"
+    except KeyError:
+        pass
+    assert not hasattr(offer, '__dict__')
+    print("✅ Доступ по ключу совместим со строками RealDictCursor")
+
+
+def test_model_is_smaller_than_dict():
+    """Модель занимает меньше памяти, чем словарь с теми же полями"""
+    item = OfferItem(id=1, offer_id=2, product_name='Цемент', quantity=1, unit='мешок', price=1, total=1)
+    as_dict = {name: item[name] for name in OfferItem.__slots__}
+    assert sys.getsizeof(item) < sys.getsizeof(as_dict)
+    print("✅ Модель компактнее словаря")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование моделей строк...")
+    test_factory_maps_columns()
+    test_fetch_helpers()
+    test_compat_access()
+    test_model_is_smaller_than_dict()
+    print("\n🎉 Тест прошел успешно!")
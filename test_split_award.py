@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки распределения заявки между поставщиками
+"""
+
+import random
+import time
+
+from price_matrix import build_price_matrix
+from split_award import (
+    optimize_split_award, awarded_item_ids, format_split_award, open_split_rows, SplitAwardError
+)
+
+REQUEST_ITEMS = [
+    {'product_name': 'Цемент', 'quantity': 10, 'unit': 'мешок'},
+    {'product_name': 'Арматура', 'quantity': 2, 'unit': 'т'},
+    {'product_name': 'Ғишт', 'quantity': 1000, 'unit': 'дона'},
+]
+
+# Поставщик 1 дешевле по цементу, 2 - по арматуре и кирпичу, 3 - только кирпич, но дешевле всех
+PRICES = {
+    1: {'Цемент': 50, 'Арматура': 900, 'Ғишт': 2.0},
+    2: {'Цемент': 60, 'Арматура': 800, 'Ғишт': 1.5},
+    3: {'Ғишт': 1.0},
+}
+
+
+def offer_rows(prices):
+    rows = []
+    item_id = 1
+    for offer_id, offer_prices in prices.items():
+        for name, price in offer_prices.items():
+            quantity = next(item['quantity'] for item in REQUEST_ITEMS if item['product_name'] == name)
+            rows.append({
+                'offer_id': offer_id, 'full_name': f'Поставщик {offer_id}', 'status': 'pending',
+                'item_id': item_id, 'product_name': name, 'quantity': quantity, 'unit': 'шт',
+                'price': price, 'total': price * quantity,
+            })
+            item_id += 1
+    return rows
+
+
+def test_unlimited_takes_cheapest_per_item():
+    """Без ограничения каждый товар достается самому дешевому предложению"""
+    rows = offer_rows(PRICES)
+    matrix = build_price_matrix(REQUEST_ITEMS, rows)
+    plan = optimize_split_award(matrix)
+
+    assert plan['awards'] == {1: ['цемент'], 2: ['арматура'], 3: ['ғишт']}
+    assert plan['total'] == 500 + 1600 + 1000 and plan['exact']
+    assert awarded_item_ids(plan, matrix) == {1: [1], 2: [5], 3: [7]}
+    assert "Жами: 3,100" in format_split_award(plan, matrix, 5)
+    print("✅ Без ограничения выбраны лучшие цены")
+
+
+def test_supplier_limit_and_mandatory():
+    """Ограничение числа поставщиков и обязательные товары"""
+    matrix = build_price_matrix(REQUEST_ITEMS, offer_rows(PRICES))
+
+    plan = optimize_split_award(matrix, max_suppliers=1)
+    assert list(plan['awards']) == [2] and plan['total'] == 600 + 1600 + 1500
+
+    plan = optimize_split_award(matrix, max_suppliers=2)
+    assert plan['total'] == 600 + 1600 + 1000 and not plan['uncovered']
+
+    # С одним поставщиком обязательный цемент важнее более дешевого кирпича
+    only_bricks = build_price_matrix(REQUEST_ITEMS, offer_rows({3: PRICES[3], 1: {'Цемент': 50}}))
+    plan = optimize_split_award(only_bricks, max_suppliers=1, mandatory=['цемент'])
+    assert list(plan['awards']) == [1] and set(plan['uncovered']) == {'арматура', 'ғишт'}
+
+    try:
+        optimize_split_award(only_bricks, mandatory=['арматура'])
+        assert False, "Ожидалась ошибка"
+    except SplitAwardError:
+        pass
+    print("✅ Ограничения учитываются")
+
+
+def test_approved_offer_excluded():
+    """Одобренное предложение не попадает в распределение, его товары считаются покрытыми"""
+    rows = offer_rows(PRICES)
+    for row in rows:
+        if row['offer_id'] == 2:
+            row['status'] = 'approved'
+            # Поставщику 2 ранее достался только кирпич
+            row['awarded'] = row['product_name'] == 'Ғишт'
+
+    items, pending = open_split_rows(REQUEST_ITEMS, rows)
+    assert [item['product_name'] for item in items] == ['Цемент', 'Арматура']
+    assert {row['offer_id'] for row in pending} == {1}
+
+    matrix = build_price_matrix(items, pending)
+    plan = optimize_split_award(matrix)
+    assert plan['awards'] == {1: ['цемент', 'арматура']} and not plan['uncovered']
+    assert awarded_item_ids(plan, matrix) == {1: [1, 2]}
+
+    # Без одобренных предложений строки не меняются
+    assert open_split_rows(REQUEST_ITEMS, offer_rows(PRICES)) == (REQUEST_ITEMS, offer_rows(PRICES))
+    print("✅ Одобренные предложения исключены из распределения")
+
+
+def test_large_request_is_fast():
+    """Сотни товаров и десятки предложений - за секунды"""
+    rnd = random.Random(7)
+    items = [{'product_name': f'Товар {i}', 'quantity': rnd.randint(1, 100), 'unit': 'шт'} for i in range(300)]
+    rows = []
+    for offer_id in range(1, 41):
+        for item in rnd.sample(items, 200):
+            price = rnd.uniform(100, 1000)
+            rows.append({
+                'offer_id': offer_id, 'full_name': f'Поставщик {offer_id}', 'status': 'pending',
+                'item_id': len(rows) + 1, 'product_name': item['product_name'], 'quantity': item['quantity'],
+                'unit': 'шт', 'price': price, 'total': price * item['quantity'],
+            })
+
+    matrix = build_price_matrix(items, rows)
+    started = time.perf_counter()
+    unlimited = optimize_split_award(matrix)
+    limited = optimize_split_award(matrix, max_suppliers=5)
+    elapsed = time.perf_counter() - started
+
+    assert not limited['exact'] and len(limited['awards']) <= 5
+    assert limited['total'] >= unlimited['total']
+    assert elapsed < 5, elapsed
+    print(f"✅ 300 товаров x 40 предложений: {elapsed:.2f} с")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование распределения заявки...")
+    test_unlimited_takes_cheapest_per_item()
+    test_supplier_limit_and_mandatory()
+    test_approved_offer_excluded()
+    test_large_request_is_fast()
+    print("\n🎉 Тест прошел успешно!")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки складского учета
+"""
+
+from decimal import Decimal
+
+from row_models import StockBalance
+from stock import (
+    stock_key, receipt_movements, balance_changes, stock_patterns, format_stock, STOCK_MESSAGE_LIMIT
+)
+
+
+def test_stock_key():
+    """Одно и то же название в разной записи - один товар склада"""
+    assert stock_key("Цемент М400") == stock_key("  цемент   м400 ") == stock_key("Sement M400")
+    assert stock_key("Цемент М400") != stock_key("Цемент М500")
+    print("✅ Ключ товара нормализуется")
+
+
+def test_receipt_movements():
+    """Товары доставки превращаются в поступления; пустые строки пропускаются"""
+    movements = receipt_movements([
+        ("Цемент М400", "мешок", Decimal('100')),
+        ("  Арматура 12мм ", None, Decimal('2.5')),
+        ("", "мешок", Decimal('5')),
+        ("Қум", "м3", None),
+    ])
+    assert movements == [
+        (stock_key("Цемент М400"), "Цемент М400", "мешок", Decimal('100')),
+        (stock_key("Арматура 12мм"), "Арматура 12мм", "", Decimal('2.5')),
+    ]
+    print("✅ Поступления по товарам доставки")
+
+
+def test_balance_changes():
+    """Повторы товара складываются по объекту и единице"""
+    cement = stock_key("Цемент")
+    changes = balance_changes([
+        (1, cement, "Цемент", "мешок", Decimal('100')),
+        (1, cement, "цемент", "мешок", Decimal('50')),
+        (1, cement, "Цемент", "тонна", Decimal('2')),
+        (2, cement, "Цемент", "мешок", Decimal('10')),
+    ])
+    assert sorted(changes) == sorted([
+        (1, cement, "мешок", "цемент", Decimal('150')),
+        (1, cement, "тонна", "Цемент", Decimal('2')),
+        (2, cement, "мешок", "Цемент", Decimal('10')),
+    ])
+    print("✅ Изменения остатков сгруппированы")
+
+
+def test_stock_patterns():
+    """Запрос по остаткам: кириллица и латиница дают одни шаблоны"""
+    assert stock_patterns("цемент") == stock_patterns("sement") == ["%sement%"]
+    assert stock_patterns(None) == [] and stock_patterns("") == []
+    print("✅ Шаблоны поиска по остаткам")
+
+
+def test_format_stock():
+    """Текст остатков объекта"""
+    balances = [StockBalance(product_name="Цемент М400", unit="мешок", quantity=Decimal('1500.00')),
+                StockBalance(product_name="Арматура 12мм", unit="тонна", quantity=Decimal('2.50'))]
+    text = format_stock("Сам Сити", balances, "цемент")
+    assert "Сам Сити" in text and "1. Цемент М400 - 1,500 мешок" in text and "2. Арматура 12мм - 2.5 тонна" in text
+    assert "қолдиқ йўқ" in format_stock("Сам Сити", [])
+    many = [StockBalance(product_name=f"Товар {i}", unit="шт", quantity=Decimal(1)) for i in range(STOCK_MESSAGE_LIMIT + 3)]
+    assert "ва яна 3 та товар" in format_stock("Сам Сити", many)
+    print("✅ Остатки форматируются")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование складского учета...")
+    test_stock_key()
+    test_receipt_movements()
+    test_balance_changes()
+    test_stock_patterns()
+    test_format_stock()
+    print("\n🎉 Тест прошел успешно!")
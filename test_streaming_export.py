@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки потоковой выгрузки в Excel
+"""
+
+import os
+import tempfile
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+
+from openpyxl import load_workbook
+
+from excel_handler import ExcelHandler
+
+
+def request_rows(count):
+    """Имитация серверного курсора Database.iter_active_request_items"""
+    created_at = datetime(2024, 5, 1, 9, 0)
+    for i in range(count):
+        yield {
+            'request_id': i // 10 + 1, 'buyer_name': 'Заказчик', 'supplier_name': 'Не указан',
+            'object_name': 'Объект 1', 'created_at': created_at, 'product_name': f'Товар {i}',
+            'quantity': Decimal('10.50'), 'unit': 'шт', 'material_description': 'М400',
+        }
+
+
+def export_peak(count, path):
+    """Пиковая память (байты) выгрузки count строк"""
+    tracemalloc.start()
+    written = ExcelHandler().write_active_requests_stream(request_rows(count), path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert written == count
+    return peak
+
+
+def test_stream_content():
+    """Заголовки и строки выгрузки совпадают с create_active_requests_excel"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'export.xlsx')
+        assert ExcelHandler().write_active_requests_stream(request_rows(25), path) == 25
+        ws = load_workbook(path, read_only=True).active
+        rows = list(ws.iter_rows(values_only=True))
+
+    assert list(rows[0]) == ExcelHandler.ACTIVE_REQUESTS_HEADERS
+    assert len(rows) == 26
+    assert rows[1][:5] == (1, 'Заказчик', 'Не указан', 'Объект 1', 'Товар 0')
+    assert rows[1][5] == 10.5 and rows[1][8] == '01.05.2024 09:00'
+    print("✅ Потоковая выгрузка записана")
+
+
+def test_offers_stream():
+    """Выгрузка заказов в колонках книги предложений"""
+    row = {
+        'offer_id': 3, 'full_name': 'Поставщик', 'phone_number': '998901234567', 'product_name': 'Цемент',
+        'quantity': 10, 'unit': 'мешок', 'price': 90, 'total': 900, 'description': '',
+        'total_amount': 900, 'created_at': datetime(2024, 5, 1, 9, 0), 'status': 'approved',
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'orders.xlsx')
+        assert ExcelHandler().write_offers_stream(iter([row]), path) == 1
+        rows = list(load_workbook(path, read_only=True).active.iter_rows(values_only=True))
+    assert list(rows[0]) == ExcelHandler.OFFERS_HEADERS
+    assert rows[1][0] == 3 and rows[1][-1] == 'Одобрено'
+    print("✅ Выгрузка заказов записана")
+
+
+def test_memory_does_not_grow_with_rows():
+    """Пиковая память почти не зависит от числа строк"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'export.xlsx')
+        small = export_peak(2000, path)
+        large = export_peak(20000, path)
+    assert large < small * 2, (small, large)
+    print(f"✅ Пик памяти: 2 000 строк - {small // 1024} КБ, 20 000 строк - {large // 1024} КБ")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование потоковой выгрузки...")
+    test_stream_content()
+    test_offers_stream()
+    test_memory_does_not_grow_with_rows()
+    print("\n🎉 Тест прошел успешно!")
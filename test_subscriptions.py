@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки подписок поставщиков
+"""
+
+from subscriptions import SubscriptionIndex
+
+SELLERS = [{'id': seller_id, 'telegram_id': 1000 + seller_id} for seller_id in range(1, 6)]
+
+ITEMS = [
+    {'product_name': 'Арматура 12мм', 'material_description': 'А500С'},
+    {'product_name': 'Sement M400', 'material_description': None},
+]
+
+
+def build_index():
+    index = SubscriptionIndex()
+    index.load([
+        {'seller_id': 1, 'kind': 'category', 'value': 'Арматура ва металл'},
+        {'seller_id': 2, 'kind': 'keyword', 'value': 'цемент'},
+        {'seller_id': 3, 'kind': 'keyword', 'value': 'кабель'},
+        {'seller_id': 4, 'kind': 'keyword', 'value': 'цемент'},
+        {'seller_id': 4, 'kind': 'object', 'value': 'Ургут'},
+    ])
+    return index
+
+
+def test_recipients():
+    """Уведомляются совпавшие поставщики и поставщики без подписок"""
+    index = build_index()
+
+    recipients = index.recipients(SELLERS, ITEMS, 'Жилой комплекс "Сам Сити"')
+    assert [s['id'] for s in recipients] == [1, 2, 5]
+
+    recipients = index.recipients(SELLERS, ITEMS, 'Ургут')
+    assert [s['id'] for s in recipients] == [1, 2, 4, 5]
+    print("✅ Заявку получают только заинтересованные поставщики")
+
+
+def test_set_seller_replaces():
+    """Изменение подписок поставщика не задевает других"""
+    index = build_index()
+    index.set_seller(2, [('keyword', 'кабель')])
+    index.set_seller(3, [])
+
+    recipients = index.recipients(SELLERS, ITEMS, 'Ургут')
+    assert [s['id'] for s in recipients] == [1, 3, 4, 5]
+    assert len(index) == 3
+    print("✅ Подписки поставщика обновляются в индексе")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование подписок поставщиков...")
+    test_recipients()
+    test_set_seller_replaces()
+    print("\n🎉 Тест прошел успешно!")